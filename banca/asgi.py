@@ -5,6 +5,13 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Las vistas asíncronas (p. ej. clientes:consultar_documento_ajax) esperan a
+RENIEC/SUNAT en el loop de eventos cuando se sirve con un servidor ASGI. Los
+middlewares del proyecto son síncronos; Django adapta la vista detrás de
+ellos:
+
+    uvicorn banca.asgi:application --workers 4
 """
 
 import os
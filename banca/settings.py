@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -50,6 +50,8 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'core.Usuario'
 
 MIDDLEWARE = [
+    'core.middleware.MetricasMiddleware',
+    'core.middleware.HuellasSQLMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,6 +61,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'core.middleware.SessionTimeoutMiddleware',
     'core.middleware.LoginAttemptMiddleware',
+    'core.middleware.ReplicaLecturaMiddleware',
+    'core.middleware.PerfiladorMiddleware',
 ]
 
 ROOT_URLCONF = 'banca.urls'
@@ -93,13 +97,51 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD', default='root'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='3306'),
+        # Conexiones persistentes: deben durar menos que wait_timeout de MySQL.
+        # Las verificaciones de salud descartan conexiones cerradas por el
+        # servidor ("MySQL server has gone away") antes de reutilizarlas
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True,
+                                     cast=bool),
         'OPTIONS': {
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
             'charset': 'utf8mb4',
+            'connect_timeout': config('DB_CONNECT_TIMEOUT', default=10, cast=int),
         },
     }
 }
 
+# Réplica de lectura opcional para reportes, listados y búsquedas.
+# En pruebas la réplica refleja la base de datos de prueba del primario.
+DB_REPLICA_HOST = config('DB_REPLICA_HOST', default='')
+
+if DB_REPLICA_HOST:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': DB_REPLICA_HOST,
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'USER': config('DB_REPLICA_USER', default=DATABASES['default']['USER']),
+        'PASSWORD': config('DB_REPLICA_PASSWORD',
+                           default=DATABASES['default']['PASSWORD']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.db_router.RouterReplica']
+
+# Vistas GET que leen de la réplica ('app:*' incluye todo el namespace)
+DB_REPLICA_VISTAS = [
+    'reportes:*',
+    'clientes:lista_clientes',
+    'cuentas:lista_cuentas',
+    'cuentas:movimientos_cuenta',
+    'cuentas:saldo_en_ajax',
+    'cuentas:saldos_en_ajax',
+    'core:explorar_auditoria',
+]
+# Segundos que un usuario permanece en el primario después de escribir
+DB_REPLICA_VENTANA_PRIMARIO = config('DB_REPLICA_VENTANA_PRIMARIO', default=10,
+                                     cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -151,9 +193,40 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
+# Configuración de Caché
+# Con REDIS_URL la caché es compartida entre workers; sin ella es local al proceso
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Configuración de Sesiones
-SESSION_COOKIE_AGE = 60  # 1 minuto de inactividad
-SESSION_SAVE_EVERY_REQUEST = True
+# cached_db requiere una caché compartida; con caché local cada worker
+# podría servir una sesión ya cerrada en otro
+SESSION_ENGINE = config(
+    'SESSION_ENGINE',
+    default='django.contrib.sessions.backends.cached_db' if REDIS_URL
+    else 'django.contrib.sessions.backends.db'
+)
+SESSION_INACTIVIDAD_SEGUNDOS = 60  # 1 minuto de inactividad
+# last_activity solo se reescribe si avanzó más de este umbral, por lo que el
+# cierre por inactividad ocurre entre 55 y 60 segundos
+SESSION_ACTIVIDAD_UMBRAL = 5
+# La sesión en el servidor dura un umbral más que la inactividad permitida,
+# así el middleware siempre decide el cierre
+SESSION_COOKIE_AGE = SESSION_INACTIVIDAD_SEGUNDOS + SESSION_ACTIVIDAD_UMBRAL
+SESSION_SAVE_EVERY_REQUEST = False
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SECURE = not DEBUG
@@ -167,6 +240,123 @@ LOGOUT_REDIRECT_URL = 'core:login'
 # Configuración de Intentos de Login
 MAX_LOGIN_ATTEMPTS = 3
 LOGIN_ATTEMPT_TIMEOUT = 900  # 15 minutos en segundos
+# Límite de logins fallidos por IP en una ventana deslizante
+LOGIN_IP_MAX_INTENTOS = config('LOGIN_IP_MAX_INTENTOS', default=20, cast=int)
+LOGIN_IP_VENTANA = config('LOGIN_IP_VENTANA', default=300, cast=int)  # segundos
+
+# APIs de RENIEC y SUNAT
+RENIEC_API_URL = config('RENIEC_API_URL',
+                        default='https://dniruc.apisperu.com/api/v1/dni')
+RENIEC_TOKEN = config('RENIEC_TOKEN', default='')
+SUNAT_API_URL = config('SUNAT_API_URL',
+                       default='https://dniruc.apisperu.com/api/v1/ruc')
+SUNAT_TOKEN = config('SUNAT_TOKEN', default='')
+REGISTRO_API_TIMEOUT = config('REGISTRO_API_TIMEOUT', default=10, cast=float)
+REGISTRO_API_MAX_CONEXIONES = 20
+# Reintentos ante errores de conexión o 5xx, nunca ante timeouts (backoff
+# exponencial con jitter)
+REGISTRO_API_REINTENTOS = config('REGISTRO_API_REINTENTOS', default=2, cast=int)
+REGISTRO_API_BACKOFF = 0.2  # segundos
+# Circuit breaker: intentos fallidos consecutivos para abrirlo y segundos que
+# permanece abierto
+REGISTRO_CIRCUITO_UMBRAL = config('REGISTRO_CIRCUITO_UMBRAL', default=5, cast=int)
+REGISTRO_CIRCUITO_APERTURA = config('REGISTRO_CIRCUITO_APERTURA', default=30,
+                                    cast=int)
+# Caché de consultas (memoria del proceso y tabla consultas_registro): días
+# que un resultado se considera vigente y documentos que se guardan en memoria
+REGISTRO_CACHE_TTL_DIAS = config('REGISTRO_CACHE_TTL_DIAS', default=30, cast=int)
+REGISTRO_CACHE_TAMANO = 5000
+# Con True se usan datos de prueba en lugar de las APIs reales
+REGISTRO_USAR_MOCK = config('REGISTRO_USAR_MOCK', default=True, cast=bool)
+
+# Importación masiva de clientes: consultas simultáneas a RENIEC/SUNAT y
+# directorio privado de los archivos subidos y sus errores
+CLIENTES_IMPORTACION_HILOS = config('CLIENTES_IMPORTACION_HILOS', default=8, cast=int)
+CLIENTES_IMPORTACION_DIR = BASE_DIR / 'var' / 'importaciones'
 
 # Límite de depósito para autorización
-DEPOSITO_LIMITE_AUTORIZACION = 2000
\ No newline at end of file
+DEPOSITO_LIMITE_AUTORIZACION = 2000
+
+# Configuración de Auditoría (escritura por lotes en segundo plano)
+AUDITORIA_ASINCRONA = config('AUDITORIA_ASINCRONA', default=True, cast=bool)
+AUDITORIA_LOTE_TAMANO = 100
+AUDITORIA_LOTE_INTERVALO = 2  # segundos
+AUDITORIA_COLA_CAPACIDAD = 10000
+AUDITORIA_RESPALDO_DIR = BASE_DIR / 'var' / 'auditoria'
+# Retención: los eventos más antiguos se archivan con purgar_auditoria en un
+# directorio privado
+AUDITORIA_RETENCION_DIAS = config('AUDITORIA_RETENCION_DIAS', default=365, cast=int)
+AUDITORIA_ARCHIVO_DIR = BASE_DIR / 'var' / 'archivo_auditoria'
+
+# Las pruebas escriben la auditoría en línea y usan directorios temporales
+# en lugar de var/ (ver core.pruebas)
+TEST_RUNNER = 'core.pruebas.EjecutorPruebas'
+
+# Perfilador de solicitudes (ver core.perfilador). Con PERFILADOR_ACTIVO se
+# perfilan los usuarios y rutas (expresiones regulares sobre el path)
+# indicados, una fracción de las demás solicitudes y las de administradores
+# con ?perfilar=1. Modo 'cprofile' (CPU, archivos .prof para snakeviz) o
+# 'muestreo' (tiempo real, pilas colapsadas para flamegraph/speedscope)
+PERFILADOR_ACTIVO = config('PERFILADOR_ACTIVO', default=False, cast=bool)
+PERFILADOR_USUARIOS = config('PERFILADOR_USUARIOS', default='', cast=Csv())
+PERFILADOR_RUTAS = config('PERFILADOR_RUTAS', default='', cast=Csv())
+PERFILADOR_MUESTREO = config('PERFILADOR_MUESTREO', default=0.0, cast=float)
+PERFILADOR_MODO = config('PERFILADOR_MODO', default='cprofile')
+PERFILADOR_INTERVALO_MS = 5
+# Solo se guardan las solicitudes más lentas que el umbral
+PERFILADOR_UMBRAL_MS = config('PERFILADOR_UMBRAL_MS', default=500, cast=int)
+PERFILADOR_MAXIMO = 200  # perfiles conservados
+PERFILADOR_DIR = BASE_DIR / 'var' / 'perfiles'
+
+# Métricas Prometheus en /metrics (ver core.metricas). Con varios workers
+# PROMETHEUS_MULTIPROC_DIR debe ser un directorio vacío al arrancar, que los
+# workers comparten para sumar sus métricas
+METRICAS_MULTIPROCESO_DIR = config('PROMETHEUS_MULTIPROC_DIR', default='')
+if METRICAS_MULTIPROCESO_DIR:
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', METRICAS_MULTIPROCESO_DIR)
+# Con token se exige "Authorization: Bearer <token>"; sin token solo se
+# responde a las IPs indicadas
+METRICAS_TOKEN = config('METRICAS_TOKEN', default='')
+METRICAS_IPS = config('METRICAS_IPS', default='127.0.0.1,::1', cast=Csv())
+
+# Huellas SQL (ver core.huellas_sql): cada worker agrega sus consultas por
+# sentencia normalizada y vuelca el resumen en SQL_HUELLAS_DIR cada
+# SQL_HUELLAS_INTERVALO segundos; el comando huellas_sql combina los workers.
+# Las consultas más lentas que el umbral se registran con su vista y pila
+SQL_HUELLAS_ACTIVAS = config('SQL_HUELLAS_ACTIVAS', default=True, cast=bool)
+SQL_LENTAS_UMBRAL_MS = config('SQL_LENTAS_UMBRAL_MS', default=200, cast=int)
+SQL_LENTAS_PROFUNDIDAD_PILA = 8
+SQL_HUELLAS_INTERVALO = 60  # segundos
+SQL_HUELLAS_DIR = BASE_DIR / 'var' / 'sql'
+
+# API JSON de operaciones (operaciones/api/): vigencia de las claves de
+# idempotencia antes de purgarlas con ClaveIdempotencia.purgar_vencidas()
+API_IDEMPOTENCIA_HORAS = 24
+# Transferencias por API en una sola transacción (ver services.transferir_lote)
+TRANSFERENCIAS_LOTE_MAXIMO = 1000
+# Pago de planillas (ver operaciones.planillas): líneas abonadas por
+# transacción; un bloque fallido se revierte completo y se reintenta
+PLANILLA_TAMANO_BLOQUE = config('PLANILLA_TAMANO_BLOQUE', default=500, cast=int)
+
+# Trabajos en segundo plano (ver core.trabajos): cola en la base de datos
+# atendida por `manage.py trabajador`. Cada trabajo se arrienda por
+# TRABAJOS_ARRIENDO segundos (renovados mientras corre); si el trabajador
+# muere, otro lo retoma al vencer. Los fallos se reintentan con espera
+# exponencial desde TRABAJOS_REINTENTO_BASE hasta TRABAJOS_REINTENTO_MAXIMO
+TRABAJOS_INTERVALO = config('TRABAJOS_INTERVALO', default=5, cast=float)
+TRABAJOS_ARRIENDO = config('TRABAJOS_ARRIENDO', default=300, cast=int)
+TRABAJOS_MAX_INTENTOS = 5
+TRABAJOS_REINTENTO_BASE = 30  # segundos
+TRABAJOS_REINTENTO_MAXIMO = 3600  # segundos
+TRABAJOS_RETENCION_DIAS = 30
+# Tareas recurrentes: 'cada' en segundos o 'hora' diaria ('HH:MM', TIME_ZONE)
+TRABAJOS_PROGRAMADOS = {
+    'limpiar_sesiones': {'tarea': 'limpiar_sesiones', 'hora': '03:00'},
+    'purgar_auditoria': {'tarea': 'purgar_auditoria', 'hora': '03:30'},
+    'verificar_saldo_disponible': {'tarea': 'verificar_saldo_disponible',
+                                   'hora': '04:00'},
+    'purgar_trabajos': {'tarea': 'purgar_trabajos', 'hora': '04:30'},
+    'inactivar_cuentas': {'tarea': 'inactivar_cuentas', 'hora': '05:00'},
+    'purgar_claves_idempotencia': {'tarea': 'purgar_claves_idempotencia',
+                                   'cada': 3600},
+}
@@ -0,0 +1,251 @@
+import asyncio
+import threading
+import weakref
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+
+
+class _Vuelo:
+  """Consulta en curso de un documento, compartida por hilos concurrentes"""
+
+  def __init__(self):
+    self.evento = threading.Event()
+    self.datos = None
+    self.error = None
+
+
+class CacheRegistro:
+  """
+  Caché de consultas a RENIEC/SUNAT por número de documento
+
+  Se consulta en tres niveles: un LRU en memoria del proceso, la tabla
+  ConsultaRegistro y por último la API. Un resultado es vigente mientras
+  su fecha de consulta tenga menos de ttl. Las consultas simultáneas del
+  mismo documento en un proceso se agrupan en una sola llamada (hilos con
+  consultar, corutinas de un mismo event loop con consultar_async).
+  """
+
+  def __init__(self, tamano=5000, ttl=timedelta(days=30), espera_maxima=30.0):
+    self.tamano = tamano
+    self.ttl = ttl
+    self.espera_maxima = espera_maxima
+
+    self._lock = threading.Lock()
+    self._memoria = OrderedDict()
+    self._en_vuelo = {}
+    self._en_vuelo_async = weakref.WeakKeyDictionary()
+
+    self.aciertos_memoria = 0
+    self.aciertos_bd = 0
+    self.llamadas_api = 0
+    self.coalescidas = 0
+
+  @classmethod
+  def desde_settings(cls):
+    """Crea la caché con la configuración REGISTRO_CACHE_* de settings"""
+    return cls(
+        tamano=getattr(settings, 'REGISTRO_CACHE_TAMANO', 5000),
+        ttl=timedelta(days=getattr(settings, 'REGISTRO_CACHE_TTL_DIAS', 30)),
+        espera_maxima=getattr(settings, 'REGISTRO_API_TIMEOUT', 10) * 3,
+    )
+
+  def consultar(self, tipo_documento: str, numero_documento: str,
+      obtener: Callable[[], Dict]) -> Dict:
+    """
+    Retorna los datos del documento desde la caché o desde la API
+
+    Args:
+        tipo_documento: DNI o RUC
+        numero_documento: Número de documento
+        obtener: Función que consulta la API y retorna los datos
+
+    Raises:
+        ValidationError: Si la API falla (se propaga a todas las consultas
+            agrupadas)
+    """
+    datos = self._de_memoria(numero_documento)
+    if datos is not None:
+      return datos
+
+    with self._lock:
+      vuelo = self._en_vuelo.get(numero_documento)
+      es_lider = vuelo is None
+      if es_lider:
+        vuelo = _Vuelo()
+        self._en_vuelo[numero_documento] = vuelo
+
+    if not es_lider:
+      if not vuelo.evento.wait(self.espera_maxima):
+        # La consulta original no terminó a tiempo: se consulta directamente
+        return self._resolver(tipo_documento, numero_documento, obtener)
+      with self._lock:
+        self.coalescidas += 1
+      if vuelo.error is not None:
+        raise vuelo.error
+      return dict(vuelo.datos)
+
+    try:
+      vuelo.datos = self._resolver(tipo_documento, numero_documento, obtener)
+      return dict(vuelo.datos)
+    except Exception as e:
+      vuelo.error = e
+      raise
+    finally:
+      with self._lock:
+        self._en_vuelo.pop(numero_documento, None)
+      vuelo.evento.set()
+
+  async def consultar_async(self, tipo_documento: str, numero_documento: str,
+      obtener) -> Dict:
+    """Versión asíncrona de consultar; obtener es una corutina sin argumentos"""
+    datos = self._de_memoria(numero_documento)
+    if datos is not None:
+      return datos
+
+    loop = asyncio.get_running_loop()
+    with self._lock:
+      vuelos = self._en_vuelo_async.setdefault(loop, {})
+    futuro = vuelos.get(numero_documento)
+
+    if futuro is not None:
+      datos = await asyncio.shield(futuro)
+      with self._lock:
+        self.coalescidas += 1
+      return dict(datos)
+
+    futuro = loop.create_future()
+    vuelos[numero_documento] = futuro
+    try:
+      fila = await sync_to_async(self._de_bd)(numero_documento)
+      if fila is not None:
+        datos = fila
+      else:
+        datos = await obtener()
+        with self._lock:
+          self.llamadas_api += 1
+        await sync_to_async(self._guardar_bd)(
+            tipo_documento, numero_documento, datos)
+        self._guardar_memoria(numero_documento, datos, timezone.now())
+      futuro.set_result(datos)
+      return dict(datos)
+    except Exception as e:
+      futuro.set_exception(e)
+      # Marca la excepción como recuperada si ninguna corutina esperaba
+      futuro.exception()
+      raise
+    finally:
+      vuelos.pop(numero_documento, None)
+      if not futuro.done():
+        futuro.cancel()
+
+  def invalidar(self, numero_documento: str) -> None:
+    """Elimina un documento de la memoria del proceso"""
+    with self._lock:
+      self._memoria.pop(numero_documento, None)
+
+  def estadisticas(self) -> Dict:
+    """Aciertos por nivel y tasa de aciertos de la caché"""
+    with self._lock:
+      aciertos = self.aciertos_memoria + self.aciertos_bd + self.coalescidas
+      total = aciertos + self.llamadas_api
+      return {
+        'consultas': total,
+        'aciertos_memoria': self.aciertos_memoria,
+        'aciertos_bd': self.aciertos_bd,
+        'coalescidas': self.coalescidas,
+        'llamadas_api': self.llamadas_api,
+        'tasa_aciertos': round(aciertos / total, 4) if total else None,
+        'documentos_en_memoria': len(self._memoria),
+        'ttl_dias': self.ttl.days,
+      }
+
+  def _vigente(self, fecha_consulta) -> bool:
+    return timezone.now() - fecha_consulta <= self.ttl
+
+  def _de_memoria(self, numero_documento: str) -> Optional[Dict]:
+    with self._lock:
+      entrada = self._memoria.get(numero_documento)
+      if entrada is None:
+        return None
+      datos, fecha_consulta = entrada
+      if not self._vigente(fecha_consulta):
+        del self._memoria[numero_documento]
+        return None
+      self._memoria.move_to_end(numero_documento)
+      self.aciertos_memoria += 1
+      return dict(datos)
+
+  def _guardar_memoria(self, numero_documento: str, datos: Dict,
+      fecha_consulta) -> None:
+    with self._lock:
+      self._memoria[numero_documento] = (datos, fecha_consulta)
+      self._memoria.move_to_end(numero_documento)
+      while len(self._memoria) > self.tamano:
+        self._memoria.popitem(last=False)
+
+  def _de_bd(self, numero_documento: str) -> Optional[Dict]:
+    from .models import ConsultaRegistro
+
+    fila = ConsultaRegistro.objects.filter(
+        numero_documento=numero_documento,
+        fecha_consulta__gte=timezone.now() - self.ttl
+    ).values_list('datos', 'fecha_consulta').first()
+    if fila is None:
+      return None
+
+    datos, fecha_consulta = fila
+    with self._lock:
+      self.aciertos_bd += 1
+    self._guardar_memoria(numero_documento, datos, fecha_consulta)
+    return datos
+
+  def _guardar_bd(self, tipo_documento: str, numero_documento: str,
+      datos: Dict) -> None:
+    from .models import ConsultaRegistro
+
+    try:
+      ConsultaRegistro.objects.update_or_create(
+          numero_documento=numero_documento,
+          defaults={
+            'tipo_documento': tipo_documento,
+            'datos': datos,
+            'fecha_consulta': timezone.now(),
+          }
+      )
+    except IntegrityError:
+      # Otro proceso guardó el mismo documento al mismo tiempo
+      pass
+
+  def _resolver(self, tipo_documento: str, numero_documento: str,
+      obtener: Callable[[], Dict]) -> Dict:
+    """Consulta la tabla y, si no hay un resultado vigente, la API"""
+    datos = self._de_bd(numero_documento)
+    if datos is not None:
+      return datos
+
+    datos = obtener()
+    with self._lock:
+      self.llamadas_api += 1
+    self._guardar_bd(tipo_documento, numero_documento, datos)
+    self._guardar_memoria(numero_documento, datos, timezone.now())
+    return datos
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache() -> CacheRegistro:
+  """Retorna la caché de consultas RENIEC/SUNAT del proceso"""
+  global _cache
+  if _cache is None:
+    with _cache_lock:
+      if _cache is None:
+        _cache = CacheRegistro.desde_settings()
+  return _cache
@@ -154,4 +154,20 @@ class BuscarClienteForm(forms.Form):
     self.helper = FormHelper()
     self.helper.form_method = 'get'
     self.helper.add_input(
-      Submit('submit', 'Buscar', css_class='btn btn-primary'))
\ No newline at end of file
+      Submit('submit', 'Buscar', css_class='btn btn-primary'))
+
+class ImportarClientesForm(forms.Form):
+  """Formulario para importar clientes desde un archivo CSV"""
+  archivo = forms.FileField(
+      label='Archivo CSV',
+      widget=forms.ClearableFileInput(attrs={
+        'class': 'form-control',
+        'accept': '.csv,text/csv',
+      })
+  )
+
+  def clean_archivo(self):
+    archivo = self.cleaned_data['archivo']
+    if not archivo.name.lower().endswith('.csv'):
+      raise ValidationError('El archivo debe tener extensión .csv')
+    return archivo
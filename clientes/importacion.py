@@ -0,0 +1,363 @@
+import csv
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_date
+
+from core.db_pool import EjecutorBD
+
+from .models import Cliente, DatosReniec, DatosSunat
+from .services import obtener_datos_reniec, obtener_datos_sunat
+
+
+COLUMNAS = [
+  'numero_documento', 'tipo_documento', 'nombres', 'apellido_paterno',
+  'apellido_materno', 'fecha_nacimiento', 'razon_social', 'nombre_comercial',
+  'representante_legal', 'direccion', 'telefono', 'email',
+]
+
+COLUMNAS_ERRORES = ['fila', 'numero_documento', 'motivo']
+
+INTENTOS_LOTE = 3
+
+
+def directorio_importaciones() -> Path:
+  """Directorio donde se guardan los archivos subidos y sus errores"""
+  return Path(getattr(settings, 'CLIENTES_IMPORTACION_DIR',
+                      Path(settings.BASE_DIR) / 'var' / 'importaciones'))
+
+
+def _normalizar(fila: Dict) -> Dict:
+  """Limpia los valores de una fila del CSV (columnas desconocidas se ignoran)"""
+  datos = {columna: (fila.get(columna) or '').strip() for columna in COLUMNAS}
+  datos['numero_documento'] = datos['numero_documento'].replace(' ', '')
+  datos['tipo_documento'] = datos['tipo_documento'].upper()
+  if not datos['tipo_documento']:
+    # Sin columna tipo_documento se deduce por la longitud
+    datos['tipo_documento'] = {8: 'DNI', 11: 'RUC'}.get(
+        len(datos['numero_documento']), '')
+  return datos
+
+
+def _validar_documento(datos: Dict) -> None:
+  numero = datos['numero_documento']
+  if datos['tipo_documento'] == 'DNI':
+    if len(numero) != 8 or not numero.isdigit():
+      raise ValidationError('El DNI debe tener 8 dígitos')
+  elif datos['tipo_documento'] == 'RUC':
+    if len(numero) != 11 or not numero.isdigit():
+      raise ValidationError('El RUC debe tener 11 dígitos')
+  else:
+    raise ValidationError('Tipo de documento no reconocido (DNI o RUC)')
+
+
+def _consultar_registro(datos: Dict, usar_mock: bool) -> Tuple[Optional[Dict], str]:
+  """Consulta RENIEC o SUNAT; retorna (datos, mensaje de error)"""
+  try:
+    if datos['tipo_documento'] == 'DNI':
+      return obtener_datos_reniec(datos['numero_documento'], usar_mock), ''
+    return obtener_datos_sunat(datos['numero_documento'], usar_mock), ''
+  except ValidationError as e:
+    return None, ' '.join(e.messages)
+
+
+def _construir_cliente(datos: Dict, registro: Optional[Dict]) -> Cliente:
+  """Arma el cliente con los datos del CSV completados con los del registro"""
+  cliente = Cliente(
+      tipo_cliente='NATURAL' if datos['tipo_documento'] == 'DNI' else 'JURIDICA',
+      tipo_documento=datos['tipo_documento'],
+      numero_documento=datos['numero_documento'],
+      nombres=datos['nombres'] or None,
+      apellido_paterno=datos['apellido_paterno'] or None,
+      apellido_materno=datos['apellido_materno'] or None,
+      razon_social=datos['razon_social'] or None,
+      nombre_comercial=datos['nombre_comercial'] or None,
+      representante_legal=datos['representante_legal'] or None,
+      direccion=datos['direccion'],
+      telefono=datos['telefono'] or None,
+      email=datos['email'] or None,
+  )
+  if datos['fecha_nacimiento']:
+    cliente.fecha_nacimiento = parse_date(datos['fecha_nacimiento'])
+    if cliente.fecha_nacimiento is None:
+      raise ValidationError('Fecha de nacimiento inválida (use AAAA-MM-DD)')
+
+  # Igual que crear_cliente: el registro oficial prevalece sobre lo ingresado
+  if registro and datos['tipo_documento'] == 'DNI':
+    cliente.nombres = registro['nombres']
+    cliente.apellido_paterno = registro['apellido_paterno']
+    cliente.apellido_materno = registro['apellido_materno']
+  elif registro:
+    cliente.razon_social = registro['razon_social']
+    cliente.nombre_comercial = registro.get('nombre_comercial')
+  if not cliente.direccion:
+    cliente.direccion = (registro or {}).get('direccion') or 'No especificado'
+
+  cliente.full_clean(exclude=['codigo'], validate_unique=False)
+  return cliente
+
+
+def _datos_registro(cliente_id: int, tipo_documento: str, registro: Dict):
+  """Crea el DatosReniec/DatosSunat del cliente (None si faltan datos)"""
+  if tipo_documento == 'DNI':
+    fecha_nacimiento = parse_date(registro.get('fecha_nacimiento') or '')
+    if fecha_nacimiento is None:
+      return None
+    return DatosReniec(
+        cliente_id=cliente_id,
+        dni=registro['dni'],
+        nombres=registro['nombres'],
+        apellido_paterno=registro['apellido_paterno'],
+        apellido_materno=registro['apellido_materno'],
+        fecha_nacimiento=fecha_nacimiento,
+        ubigeo=registro.get('ubigeo'),
+        direccion=registro.get('direccion')
+    )
+  return DatosSunat(
+      cliente_id=cliente_id,
+      ruc=registro['ruc'],
+      razon_social=registro['razon_social'],
+      nombre_comercial=registro.get('nombre_comercial'),
+      tipo_contribuyente=registro.get('tipo_contribuyente'),
+      estado=registro.get('estado'),
+      condicion=registro.get('condicion'),
+      direccion=registro.get('direccion'),
+      departamento=registro.get('departamento'),
+      provincia=registro.get('provincia'),
+      distrito=registro.get('distrito')
+  )
+
+
+def _insertar(candidatos: List[Tuple[int, Cliente, Optional[Dict]]],
+    tamano_insercion: int) -> Tuple[int, List[Tuple[int, str]]]:
+  """
+  Inserta los clientes de un lote y sus datos de registro en una transacción
+
+  Los códigos se reservan en bloque dentro de la misma transacción. Si otro
+  proceso registra un cliente a la vez y el código o el documento chocan,
+  se vuelve a intentar descartando los documentos que ya existan.
+
+  Returns:
+      (clientes creados, [(fila, documento)] descartados por estar ya
+      registrados)
+  """
+  for intento in range(INTENTOS_LOTE):
+    existentes = set(Cliente.objects.filter(
+        numero_documento__in=[c.numero_documento for _, c, _ in candidatos]
+    ).values_list('numero_documento', flat=True))
+    duplicadas = [(fila, c.numero_documento) for fila, c, _ in candidatos
+                  if c.numero_documento in existentes]
+    nuevos = [(fila, c, r) for fila, c, r in candidatos
+              if c.numero_documento not in existentes]
+    if not nuevos:
+      return 0, duplicadas
+
+    try:
+      with transaction.atomic():
+        codigos = Cliente.generar_codigos(len(nuevos))
+        for (_, cliente, _), codigo in zip(nuevos, codigos):
+          cliente.codigo = codigo
+        Cliente.objects.bulk_create([c for _, c, _ in nuevos],
+                                    batch_size=tamano_insercion)
+
+        # MySQL no retorna los ids de bulk_create: se leen por documento
+        ids = dict(Cliente.objects.filter(
+            numero_documento__in=[c.numero_documento for _, c, _ in nuevos]
+        ).values_list('numero_documento', 'id'))
+
+        reniec, sunat = [], []
+        for _, cliente, registro in nuevos:
+          if not registro:
+            continue
+          datos = _datos_registro(ids[cliente.numero_documento],
+                                  cliente.tipo_documento, registro)
+          if isinstance(datos, DatosReniec):
+            reniec.append(datos)
+          elif datos is not None:
+            sunat.append(datos)
+        DatosReniec.objects.bulk_create(reniec, batch_size=tamano_insercion)
+        DatosSunat.objects.bulk_create(sunat, batch_size=tamano_insercion)
+      return len(nuevos), duplicadas
+    except IntegrityError:
+      if intento == INTENTOS_LOTE - 1:
+        raise
+      for _, cliente, _ in nuevos:
+        cliente.codigo = ''
+
+
+def _leer_progreso(ruta: Path) -> Dict:
+  try:
+    with open(ruta, encoding='utf-8') as contenido:
+      return json.load(contenido)
+  except (OSError, ValueError):
+    return {}
+
+
+def _guardar_progreso(ruta: Path, progreso: Dict) -> None:
+  """Escribe el progreso de forma atómica (archivo temporal + rename)"""
+  temporal = ruta.with_name(ruta.name + '.tmp')
+  with open(temporal, 'w', encoding='utf-8') as destino:
+    json.dump(progreso, destino)
+    destino.flush()
+    os.fsync(destino.fileno())
+  os.replace(temporal, ruta)
+
+
+def _procesar_lote(pendientes, vistos, ejecutor, usar_mock, tamano_insercion,
+    errores, resumen) -> None:
+  """Valida, consulta e inserta un lote de filas y actualiza el resumen"""
+  resumen['filas'] += len(pendientes)
+
+  validas = []
+  for numero_fila, fila in pendientes:
+    datos = _normalizar(fila)
+    try:
+      _validar_documento(datos)
+    except ValidationError as e:
+      errores.writerow([numero_fila, datos['numero_documento'], ' '.join(e.messages)])
+      resumen['errores'] += 1
+      continue
+    if datos['numero_documento'] in vistos:
+      errores.writerow([numero_fila, datos['numero_documento'],
+                        'Documento repetido en el archivo'])
+      resumen['duplicados'] += 1
+      continue
+    vistos.add(datos['numero_documento'])
+    validas.append((numero_fila, datos))
+
+  # Los ya registrados se descartan antes de consultar el registro
+  existentes = set(Cliente.objects.filter(
+      numero_documento__in=[d['numero_documento'] for _, d in validas]
+  ).values_list('numero_documento', flat=True))
+  por_consultar = []
+  for numero_fila, datos in validas:
+    if datos['numero_documento'] in existentes:
+      errores.writerow([numero_fila, datos['numero_documento'],
+                        'Cliente ya registrado'])
+      resumen['duplicados'] += 1
+    else:
+      por_consultar.append((numero_fila, datos))
+
+  consultas = ejecutor.mapear(
+      lambda item: _consultar_registro(item[1], usar_mock), por_consultar)
+
+  candidatos = []
+  for (numero_fila, datos), (registro, error_consulta) in zip(por_consultar,
+                                                            consultas):
+    if error_consulta:
+      resumen['consultas_fallidas'] += 1
+    try:
+      cliente = _construir_cliente(datos, registro)
+    except ValidationError as e:
+      motivo = '; '.join(e.messages)
+      if error_consulta:
+        motivo = f'{error_consulta}. {motivo}'
+      errores.writerow([numero_fila, datos['numero_documento'], motivo])
+      resumen['errores'] += 1
+      continue
+    candidatos.append((numero_fila, cliente, registro))
+
+  if not candidatos:
+    return
+  creados, duplicadas = _insertar(candidatos, tamano_insercion)
+  resumen['creados'] += creados
+  for numero_fila, documento in duplicadas:
+    errores.writerow([numero_fila, documento, 'Cliente ya registrado'])
+    resumen['duplicados'] += 1
+
+
+def importar_clientes(ruta, lote: int = 500, hilos: int = None,
+    usar_mock: bool = None, reanudar: bool = False,
+    archivo_errores=None, archivo_progreso=None,
+    al_avanzar: Callable[[Dict], None] = None) -> Dict:
+  """
+  Registra en bloque los clientes de un archivo CSV
+
+  El archivo se lee por streaming y se procesa en lotes. Por lote: se
+  descartan los documentos repetidos en el archivo o ya registrados (una
+  consulta con IN), se consultan RENIEC/SUNAT en paralelo con un pool
+  acotado de hilos y se insertan los clientes y sus datos de registro con
+  bulk_create en una transacción. Si la consulta falla, el cliente se
+  registra con los datos del CSV, como en crear_cliente.
+
+  Tras cada lote se guarda el número de filas procesadas en el archivo de
+  progreso; con reanudar=True se continúa desde ahí. Las filas rechazadas
+  u omitidas se escriben en el CSV de errores con su número de fila.
+
+  Args:
+      ruta: Archivo CSV con encabezado (ver COLUMNAS; solo
+          numero_documento es obligatoria)
+      lote: Filas por lote y transacción
+      hilos: Consultas simultáneas a RENIEC/SUNAT
+      usar_mock: Usar datos de prueba (por defecto REGISTRO_USAR_MOCK)
+      reanudar: Continuar una importación interrumpida
+      archivo_errores: CSV de errores (por defecto <ruta>.errores.csv)
+      archivo_progreso: Progreso (por defecto <ruta>.progreso.json)
+      al_avanzar: Función llamada con el resumen tras cada lote
+
+  Returns:
+      Diccionario con filas leídas, creados, duplicados, errores y
+      consultas fallidas
+  """
+  ruta = Path(ruta)
+  archivo_errores = Path(archivo_errores or f'{ruta}.errores.csv')
+  archivo_progreso = Path(archivo_progreso or f'{ruta}.progreso.json')
+  hilos = hilos or getattr(settings, 'CLIENTES_IMPORTACION_HILOS', 8)
+  if usar_mock is None:
+    usar_mock = settings.REGISTRO_USAR_MOCK
+  tamano_insercion = min(lote, 500)
+
+  resumen = {'filas': 0, 'creados': 0, 'duplicados': 0, 'errores': 0,
+             'consultas_fallidas': 0}
+  progreso = _leer_progreso(archivo_progreso) if reanudar else {}
+  if progreso.get('archivo') == ruta.name:
+    resumen.update(progreso['resumen'])
+  saltar = resumen['filas']
+
+  inicio = time.perf_counter()
+  nuevo_archivo_errores = not (saltar and archivo_errores.exists())
+  with open(ruta, newline='', encoding='utf-8-sig') as origen, \
+      open(archivo_errores, 'w' if nuevo_archivo_errores else 'a',
+           newline='', encoding='utf-8') as destino_errores, \
+      EjecutorBD(max_hilos=hilos) as ejecutor:
+    errores = csv.writer(destino_errores)
+    if nuevo_archivo_errores:
+      errores.writerow(COLUMNAS_ERRORES)
+
+    lector = csv.DictReader(origen)
+    vistos = set()
+    pendientes = []
+    # La fila 1 es el encabezado
+    for numero_fila, fila in enumerate(lector, start=2):
+      if numero_fila - 2 < saltar:
+        # Documentos ya procesados en la corrida anterior
+        vistos.add(_normalizar(fila)['numero_documento'])
+        continue
+      pendientes.append((numero_fila, fila))
+      if len(pendientes) >= lote:
+        _procesar_lote(pendientes, vistos, ejecutor, usar_mock,
+                       tamano_insercion, errores, resumen)
+        pendientes = []
+        destino_errores.flush()
+        _guardar_progreso(archivo_progreso,
+                          {'archivo': ruta.name, 'resumen': resumen})
+        if al_avanzar:
+          al_avanzar(dict(resumen))
+
+    if pendientes:
+      _procesar_lote(pendientes, vistos, ejecutor, usar_mock,
+                     tamano_insercion, errores, resumen)
+      _guardar_progreso(archivo_progreso,
+                        {'archivo': ruta.name, 'resumen': resumen})
+      if al_avanzar:
+        al_avanzar(dict(resumen))
+
+  resumen['segundos'] = round(time.perf_counter() - inicio, 2)
+  resumen['archivo_errores'] = str(archivo_errores)
+  return resumen
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from clientes.importacion import COLUMNAS, importar_clientes
+
+
+class Command(BaseCommand):
+  help = ('Registra en bloque los clientes de un archivo CSV consultando '
+          'RENIEC/SUNAT en paralelo. Columnas: ' + ', '.join(COLUMNAS))
+
+  def add_arguments(self, parser):
+    parser.add_argument('archivo', help='Archivo CSV con encabezado')
+    parser.add_argument('--lote', type=int, default=500,
+                        help='Filas por lote y transacción')
+    parser.add_argument('--hilos', type=int,
+                        default=getattr(settings, 'CLIENTES_IMPORTACION_HILOS', 8),
+                        help='Consultas simultáneas a RENIEC/SUNAT')
+    parser.add_argument('--reanudar', action='store_true',
+                        help='Continuar desde el progreso guardado')
+    parser.add_argument('--errores', default=None,
+                        help='CSV de filas rechazadas (por defecto <archivo>.errores.csv)')
+    parser.add_argument('--mock', action='store_true',
+                        help='Usar datos de prueba en lugar de las APIs')
+
+  def handle(self, *args, **options):
+    def al_avanzar(resumen):
+      self.stdout.write(
+          f'  {resumen["filas"]} fila(s): {resumen["creados"]} creados, '
+          f'{resumen["duplicados"]} duplicados, {resumen["errores"]} errores')
+
+    try:
+      resultado = importar_clientes(
+          options['archivo'],
+          lote=options['lote'],
+          hilos=options['hilos'],
+          usar_mock=True if options['mock'] else None,
+          reanudar=options['reanudar'],
+          archivo_errores=options['errores'],
+          al_avanzar=al_avanzar
+      )
+    except OSError as e:
+      raise CommandError(f'No se pudo leer el archivo: {e}')
+
+    self.stdout.write(self.style.SUCCESS(
+        f'{resultado["creados"]} cliente(s) registrados de {resultado["filas"]} '
+        f'fila(s) en {resultado["segundos"]} s'))
+    if resultado['consultas_fallidas']:
+      self.stdout.write(self.style.WARNING(
+          f'{resultado["consultas_fallidas"]} consulta(s) a RENIEC/SUNAT fallaron; '
+          'se usaron los datos del archivo'))
+    if resultado['duplicados'] or resultado['errores']:
+      self.stdout.write(
+          f'{resultado["duplicados"]} duplicado(s) y {resultado["errores"]} '
+          f'error(es) en {resultado["archivo_errores"]}')
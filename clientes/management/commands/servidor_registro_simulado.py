@@ -0,0 +1,119 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+class ManejadorRegistro(BaseHTTPRequestHandler):
+  """Responde /dni/<dni> y /ruc/<ruc> con el formato de apisperu"""
+
+  latencia = 0.0
+  variacion = 0.0
+  tasa_error = 0.0
+  aleatorio = random.Random()
+  lock = threading.Lock()
+
+  def do_GET(self):
+    with self.lock:
+      espera = max(0.0, self.latencia + self.aleatorio.uniform(
+          -self.variacion, self.variacion))
+      falla = self.aleatorio.random() < self.tasa_error
+    time.sleep(espera)
+
+    partes = self.path.strip('/').split('/')
+    if falla:
+      self._responder(503, {'message': 'Servicio no disponible'})
+    elif len(partes) == 2 and partes[0] == 'dni' and len(partes[1]) == 8:
+      self._responder(200, self._persona(partes[1]))
+    elif len(partes) == 2 and partes[0] == 'ruc' and len(partes[1]) == 11:
+      self._responder(200, self._empresa(partes[1]))
+    else:
+      self._responder(404, {'message': 'No encontrado'})
+
+  def _persona(self, dni):
+    # Los DNI que terminan en 0 simulan documentos inexistentes
+    if dni.endswith('0'):
+      return None
+    return {
+      'dni': dni,
+      'nombres': f'PERSONA {dni[-4:]}',
+      'apellidoPaterno': 'SIMULADO',
+      'apellidoMaterno': 'PRUEBA',
+      'fechaNacimiento': '1990-01-15',
+      'ubigeo': '150101',
+      'direccion': 'AV. SIMULADA 123, LIMA',
+    }
+
+  def _empresa(self, ruc):
+    if ruc.endswith('0'):
+      return None
+    return {
+      'ruc': ruc,
+      'razonSocial': f'EMPRESA SIMULADA {ruc[-4:]} S.A.C.',
+      'nombreComercial': 'SIMULADA',
+      'tipoContribuyente': 'SOCIEDAD ANONIMA CERRADA',
+      'estado': 'ACTIVO',
+      'condicion': 'HABIDO',
+      'direccion': 'AV. EMPRESARIAL 456',
+      'departamento': 'LIMA',
+      'provincia': 'LIMA',
+      'distrito': 'MIRAFLORES',
+    }
+
+  def _responder(self, estado, datos):
+    if datos is None:
+      estado, datos = 404, {'message': 'No encontrado'}
+    cuerpo = json.dumps(datos).encode('utf-8')
+    self.send_response(estado)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(cuerpo)))
+    self.end_headers()
+    self.wfile.write(cuerpo)
+
+  def log_message(self, formato, *args):
+    pass
+
+
+class ServidorRegistro(ThreadingHTTPServer):
+  # Cola de conexiones amplia para pruebas con muchas consultas simultáneas
+  request_queue_size = 128
+  daemon_threads = True
+
+
+class Command(BaseCommand):
+  help = ('Inicia un servidor local que simula las APIs de RENIEC y SUNAT '
+          'con latencia y errores configurables')
+
+  def add_arguments(self, parser):
+    parser.add_argument('--puerto', type=int, default=8089)
+    parser.add_argument('--latencia-ms', type=float, default=200,
+                        help='Latencia media de cada respuesta')
+    parser.add_argument('--variacion-ms', type=float, default=50,
+                        help='Variación aleatoria de la latencia (+/-)')
+    parser.add_argument('--tasa-error', type=float, default=0.0,
+                        help='Fracción de respuestas 503 (0 a 1)')
+    parser.add_argument('--semilla', type=int, default=None)
+
+  def handle(self, *args, **options):
+    ManejadorRegistro.latencia = options['latencia_ms'] / 1000
+    ManejadorRegistro.variacion = options['variacion_ms'] / 1000
+    ManejadorRegistro.tasa_error = options['tasa_error']
+    ManejadorRegistro.aleatorio = random.Random(options['semilla'])
+
+    servidor = ServidorRegistro(('127.0.0.1', options['puerto']),
+                                ManejadorRegistro)
+    base = f'http://127.0.0.1:{options["puerto"]}'
+    self.stdout.write(self.style.SUCCESS(f'Servidor simulado en {base}'))
+    self.stdout.write(f'  RENIEC_API_URL={base}/dni')
+    self.stdout.write(f'  SUNAT_API_URL={base}/ruc')
+    self.stdout.write('  REGISTRO_USAR_MOCK=False')
+
+    try:
+      servidor.serve_forever()
+    except KeyboardInterrupt:
+      pass
+    finally:
+      servidor.server_close()
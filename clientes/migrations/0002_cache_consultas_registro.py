@@ -0,0 +1,76 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:13
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+CAMPOS_RENIEC = ['dni', 'nombres', 'apellido_paterno', 'apellido_materno',
+                 'fecha_nacimiento', 'ubigeo', 'direccion']
+CAMPOS_SUNAT = ['ruc', 'razon_social', 'nombre_comercial', 'tipo_contribuyente',
+                'estado', 'condicion', 'direccion', 'departamento', 'provincia',
+                'distrito']
+
+
+def cargar_consultas_existentes(apps, schema_editor):
+    """Carga en la caché los datos de RENIEC/SUNAT ya guardados por cliente"""
+    ConsultaRegistro = apps.get_model('clientes', 'ConsultaRegistro')
+    DatosReniec = apps.get_model('clientes', 'DatosReniec')
+    DatosSunat = apps.get_model('clientes', 'DatosSunat')
+
+    consultas = {}
+    for modelo, tipo, campos, clave in [
+        (DatosReniec, 'DNI', CAMPOS_RENIEC, 'dni'),
+        (DatosSunat, 'RUC', CAMPOS_SUNAT, 'ruc'),
+    ]:
+        # En orden de consulta: la más reciente de cada documento prevalece
+        for fila in modelo.objects.order_by('fecha_consulta').values(
+                *campos, 'fecha_consulta').iterator():
+            fecha_consulta = fila.pop('fecha_consulta')
+            datos = {
+                campo: valor.isoformat() if hasattr(valor, 'isoformat') else (valor or '')
+                for campo, valor in fila.items()
+            }
+            consultas[fila[clave]] = ConsultaRegistro(
+                numero_documento=fila[clave],
+                tipo_documento=tipo,
+                datos=datos,
+                fecha_consulta=fecha_consulta,
+            )
+
+    ConsultaRegistro.objects.bulk_create(consultas.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsultaRegistro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero_documento', models.CharField(max_length=11, unique=True)),
+                ('tipo_documento', models.CharField(choices=[('DNI', 'DNI'), ('RUC', 'RUC')], max_length=3)),
+                ('datos', models.JSONField()),
+                ('fecha_consulta', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Consulta RENIEC/SUNAT',
+                'verbose_name_plural': 'Consultas RENIEC/SUNAT',
+                'db_table': 'consultas_registro',
+            },
+        ),
+        migrations.AlterField(
+            model_name='datosreniec',
+            name='dni',
+            field=models.CharField(db_index=True, max_length=8),
+        ),
+        migrations.AlterField(
+            model_name='datossunat',
+            name='ruc',
+            field=models.CharField(db_index=True, max_length=11),
+        ),
+        migrations.RunPython(cargar_consultas_existentes, migrations.RunPython.noop),
+    ]
@@ -97,21 +97,27 @@ class Cliente(models.Model):
 
   def generar_codigo(self):
     """Genera código único para el cliente"""
+    return self.generar_codigos(1)[0]
+
+  @classmethod
+  def generar_codigos(cls, cantidad):
+    """Genera un bloque de códigos consecutivos con una sola consulta"""
     prefijo = 'CLI'
     fecha_actual = timezone.now()
     anio = fecha_actual.strftime('%Y')
 
-    ultimo_cliente = Cliente.objects.filter(
+    ultimo_codigo = cls.objects.filter(
         codigo__startswith=f"{prefijo}{anio}"
-    ).order_by('-codigo').first()
+    ).order_by('-codigo').values_list('codigo', flat=True).first()
 
-    if ultimo_cliente:
-      ultimo_numero = int(ultimo_cliente.codigo[-6:])
+    if ultimo_codigo:
+      ultimo_numero = int(ultimo_codigo[-6:])
       nuevo_numero = ultimo_numero + 1
     else:
       nuevo_numero = 1
 
-    return f"{prefijo}{anio}{nuevo_numero:06d}"
+    return [f"{prefijo}{anio}{numero:06d}"
+            for numero in range(nuevo_numero, nuevo_numero + cantidad)]
 
   def get_nombre_completo(self):
     """Retorna el nombre completo del cliente"""
@@ -135,7 +141,7 @@ class DatosReniec(models.Model):
       on_delete=models.CASCADE,
       related_name='datos_reniec'
   )
-  dni = models.CharField(max_length=8)
+  dni = models.CharField(max_length=8, db_index=True)
   nombres = models.CharField(max_length=100)
   apellido_paterno = models.CharField(max_length=100)
   apellido_materno = models.CharField(max_length=100)
@@ -160,7 +166,7 @@ class DatosSunat(models.Model):
       on_delete=models.CASCADE,
       related_name='datos_sunat'
   )
-  ruc = models.CharField(max_length=11)
+  ruc = models.CharField(max_length=11, db_index=True)
   razon_social = models.CharField(max_length=200)
   nombre_comercial = models.CharField(max_length=200, null=True, blank=True)
   tipo_contribuyente = models.CharField(max_length=100, null=True, blank=True)
@@ -178,4 +184,26 @@ class DatosSunat(models.Model):
     verbose_name_plural = 'Datos SUNAT'
 
   def __str__(self):
-    return f"SUNAT - {self.ruc}"
\ No newline at end of file
+    return f"SUNAT - {self.ruc}"
+
+
+class ConsultaRegistro(models.Model):
+  """
+  Caché persistente de consultas a RENIEC y SUNAT por número de documento
+
+  Guarda la última respuesta de cada documento consultado, tenga o no un
+  cliente registrado (p. ej. representantes legales o registros repetidos).
+  """
+  numero_documento = models.CharField(max_length=11, unique=True)
+  tipo_documento = models.CharField(max_length=3,
+                                    choices=Cliente.TIPO_DOCUMENTO_CHOICES)
+  datos = models.JSONField()
+  fecha_consulta = models.DateTimeField(default=timezone.now)
+
+  class Meta:
+    db_table = 'consultas_registro'
+    verbose_name = 'Consulta RENIEC/SUNAT'
+    verbose_name_plural = 'Consultas RENIEC/SUNAT'
+
+  def __str__(self):
+    return f"{self.tipo_documento} - {self.numero_documento}"
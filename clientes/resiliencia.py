@@ -0,0 +1,340 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Dict
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+
+class CircuitoAbierto(Exception):
+  """El servicio externo está marcado como caído y no se consulta"""
+
+
+class InterruptorCircuito:
+  """
+  Circuit breaker para un servicio externo
+
+  CERRADO: las consultas pasan. Tras umbral_fallos fallos consecutivos pasa
+  a ABIERTO y rechaza de inmediato durante tiempo_apertura segundos. Luego
+  pasa a SEMI_ABIERTO y deja pasar una sola consulta de prueba: si responde
+  vuelve a CERRADO, si falla vuelve a ABIERTO.
+  """
+
+  CERRADO = 'CERRADO'
+  ABIERTO = 'ABIERTO'
+  SEMI_ABIERTO = 'SEMI_ABIERTO'
+
+  def __init__(self, umbral_fallos=5, tiempo_apertura=30.0):
+    self.umbral_fallos = umbral_fallos
+    self.tiempo_apertura = tiempo_apertura
+    self._lock = threading.Lock()
+    self._estado = self.CERRADO
+    self._fallos_consecutivos = 0
+    self._abierto_hasta = 0.0
+    self._prueba_en_curso = False
+    self.aperturas = 0
+
+  @property
+  def estado(self) -> str:
+    with self._lock:
+      return self._estado_actual()
+
+  def _estado_actual(self) -> str:
+    if self._estado == self.ABIERTO and time.monotonic() >= self._abierto_hasta:
+      self._estado = self.SEMI_ABIERTO
+      self._prueba_en_curso = False
+    return self._estado
+
+  def permitir(self) -> bool:
+    """Indica si se puede consultar el servicio en este momento"""
+    with self._lock:
+      estado = self._estado_actual()
+      if estado == self.CERRADO:
+        return True
+      if estado == self.SEMI_ABIERTO and not self._prueba_en_curso:
+        self._prueba_en_curso = True
+        return True
+      return False
+
+  def registrar_exito(self) -> None:
+    with self._lock:
+      self._estado = self.CERRADO
+      self._fallos_consecutivos = 0
+      self._prueba_en_curso = False
+
+  def registrar_fallo(self) -> None:
+    with self._lock:
+      self._fallos_consecutivos += 1
+      if (self._estado == self.SEMI_ABIERTO or
+          self._fallos_consecutivos >= self.umbral_fallos):
+        self._estado = self.ABIERTO
+        self._abierto_hasta = time.monotonic() + self.tiempo_apertura
+        self._prueba_en_curso = False
+        self.aperturas += 1
+
+  def resumen(self) -> Dict:
+    with self._lock:
+      estado = self._estado_actual()
+      return {
+        'circuito': estado,
+        'fallos_consecutivos': self._fallos_consecutivos,
+        'segundos_para_reintentar': (
+          round(max(0.0, self._abierto_hasta - time.monotonic()), 1)
+          if estado == self.ABIERTO else 0
+        ),
+        'aperturas': self.aperturas,
+      }
+
+
+class MetricasServicio:
+  """Contadores y latencias de un servicio externo (por proceso)"""
+
+  def __init__(self, muestras=500):
+    self._lock = threading.Lock()
+    self._latencias = deque(maxlen=muestras)
+    self.llamadas = 0
+    self.errores = 0
+    self.reintentos = 0
+    self.rechazadas = 0
+
+  def registrar_llamada(self, segundos: float, error: bool) -> None:
+    with self._lock:
+      self.llamadas += 1
+      self.errores += int(error)
+      self._latencias.append(segundos * 1000)
+
+  def registrar_reintento(self) -> None:
+    with self._lock:
+      self.reintentos += 1
+
+  def registrar_rechazo(self) -> None:
+    with self._lock:
+      self.rechazadas += 1
+
+  def resumen(self) -> Dict:
+    with self._lock:
+      latencias = sorted(self._latencias)
+      llamadas, errores = self.llamadas, self.errores
+      reintentos, rechazadas = self.reintentos, self.rechazadas
+
+    def percentil(p):
+      if not latencias:
+        return None
+      return round(latencias[min(len(latencias) - 1, int(len(latencias) * p))], 2)
+
+    return {
+      'llamadas': llamadas,
+      'errores': errores,
+      'reintentos': reintentos,
+      'rechazadas_por_circuito': rechazadas,
+      'latencia_ms': {
+        'ultima': round(latencias[-1], 2) if latencias else None,
+        'p50': percentil(0.50),
+        'p95': percentil(0.95),
+      },
+    }
+
+
+_interruptores = {}
+_metricas = {}
+_registro_lock = threading.Lock()
+
+
+def obtener_interruptor(servicio: str) -> InterruptorCircuito:
+  """Retorna el circuit breaker del servicio (uno por proceso)"""
+  with _registro_lock:
+    if servicio not in _interruptores:
+      _interruptores[servicio] = InterruptorCircuito(
+          umbral_fallos=getattr(settings, 'REGISTRO_CIRCUITO_UMBRAL', 5),
+          tiempo_apertura=getattr(settings, 'REGISTRO_CIRCUITO_APERTURA', 30)
+      )
+    return _interruptores[servicio]
+
+
+def obtener_metricas(servicio: str) -> MetricasServicio:
+  """Retorna las métricas del servicio (una instancia por proceso)"""
+  with _registro_lock:
+    if servicio not in _metricas:
+      _metricas[servicio] = MetricasServicio()
+    return _metricas[servicio]
+
+
+def estado_servicios() -> Dict:
+  """Estado del circuito y métricas de cada servicio externo consultado"""
+  with _registro_lock:
+    servicios = sorted(set(_interruptores) | set(_metricas))
+  return {
+    servicio: {
+      **obtener_interruptor(servicio).resumen(),
+      **obtener_metricas(servicio).resumen(),
+    }
+    for servicio in servicios
+  }
+
+
+_sesion = None
+_sesion_pid = None
+
+
+def obtener_sesion() -> requests.Session:
+  """
+  Retorna la sesión HTTP compartida del proceso
+
+  Mantiene conexiones keep-alive por host; se crea de nuevo tras un fork
+  para no compartir sockets entre workers.
+  """
+  global _sesion, _sesion_pid
+  if _sesion is None or _sesion_pid != os.getpid():
+    with _registro_lock:
+      if _sesion is None or _sesion_pid != os.getpid():
+        tamano = getattr(settings, 'REGISTRO_API_MAX_CONEXIONES', 20)
+        sesion = requests.Session()
+        # Los reintentos se manejan en ejecutar() para aplicar jitter y
+        # registrarlos en las métricas
+        adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=tamano,
+                                max_retries=0)
+        sesion.mount('https://', adaptador)
+        sesion.mount('http://', adaptador)
+        _sesion, _sesion_pid = sesion, os.getpid()
+  return _sesion
+
+
+# Un cliente HTTP asíncrono por event loop: comparte el pool de conexiones
+# entre consultas y no se reutiliza en otro loop (httpx lo prohíbe)
+_clientes_async = weakref.WeakKeyDictionary()
+
+
+def obtener_cliente_async() -> httpx.AsyncClient:
+  """Retorna el cliente HTTP asíncrono compartido del event loop actual"""
+  loop = asyncio.get_running_loop()
+  cliente = _clientes_async.get(loop)
+  if cliente is None or cliente.is_closed:
+    tamano = getattr(settings, 'REGISTRO_API_MAX_CONEXIONES', 20)
+    cliente = httpx.AsyncClient(
+        timeout=httpx.Timeout(getattr(settings, 'REGISTRO_API_TIMEOUT', 10)),
+        limits=httpx.Limits(max_connections=tamano,
+                            max_keepalive_connections=tamano)
+    )
+    _clientes_async[loop] = cliente
+  return cliente
+
+
+def _espera_reintento(intento: int) -> float:
+  """Backoff exponencial con jitter completo"""
+  base = getattr(settings, 'REGISTRO_API_BACKOFF', 0.2)
+  return random.uniform(0, base * (2 ** intento))
+
+
+def _reintentable(error, respuesta) -> bool:
+  """
+  Indica si un intento fallido se puede reintentar
+
+  Solo errores de conexión y respuestas 5xx. Un timeout no se reintenta:
+  el servicio ya tuvo REGISTRO_API_TIMEOUT segundos para responder.
+  """
+  if error is None:
+    return respuesta.status_code >= 500
+  if isinstance(error, (requests.Timeout, httpx.TimeoutException)):
+    return False
+  return isinstance(error, (requests.ConnectionError, httpx.NetworkError))
+
+
+def ejecutar(servicio: str, solicitud):
+  """
+  Ejecuta una solicitud HTTP con circuit breaker y reintentos
+
+  Reintenta errores de conexión y respuestas 5xx hasta
+  REGISTRO_API_REINTENTOS veces con backoff exponencial y jitter; los
+  timeouts fallan de inmediato. Cada intento fallido cuenta para el
+  circuito, y si este se abre no se sigue reintentando. Las respuestas 4xx
+  se consideran éxito del servicio y se retornan.
+
+  Args:
+      servicio: Nombre del servicio (RENIEC, SUNAT)
+      solicitud: Función sin argumentos que retorna un requests.Response
+
+  Raises:
+      CircuitoAbierto: Si el servicio está marcado como caído
+      requests.RequestException: Si el último intento falla sin respuesta
+  """
+  interruptor = obtener_interruptor(servicio)
+  metricas = obtener_metricas(servicio)
+  if not interruptor.permitir():
+    metricas.registrar_rechazo()
+    raise CircuitoAbierto(servicio)
+
+  reintentos = getattr(settings, 'REGISTRO_API_REINTENTOS', 2)
+  for intento in range(reintentos + 1):
+    inicio = time.perf_counter()
+    error = None
+    respuesta = None
+    try:
+      respuesta = solicitud()
+    except requests.RequestException as e:
+      error = e
+    except Exception:
+      # Un error inesperado no debe dejar la prueba del circuito en curso
+      interruptor.registrar_fallo()
+      raise
+    fallida = error is not None or respuesta.status_code >= 500
+    metricas.registrar_llamada(time.perf_counter() - inicio, fallida)
+
+    if not fallida:
+      interruptor.registrar_exito()
+      return respuesta
+    interruptor.registrar_fallo()
+    if (intento == reintentos or not _reintentable(error, respuesta) or
+        interruptor.estado != InterruptorCircuito.CERRADO):
+      break
+    metricas.registrar_reintento()
+    time.sleep(_espera_reintento(intento))
+
+  if error is not None:
+    raise error
+  return respuesta
+
+
+async def ejecutar_async(servicio: str, solicitud):
+  """Versión asíncrona de ejecutar; solicitud retorna un awaitable de httpx"""
+  interruptor = obtener_interruptor(servicio)
+  metricas = obtener_metricas(servicio)
+  if not interruptor.permitir():
+    metricas.registrar_rechazo()
+    raise CircuitoAbierto(servicio)
+
+  reintentos = getattr(settings, 'REGISTRO_API_REINTENTOS', 2)
+  for intento in range(reintentos + 1):
+    inicio = time.perf_counter()
+    error = None
+    respuesta = None
+    try:
+      respuesta = await solicitud()
+    except httpx.HTTPError as e:
+      error = e
+    except Exception:
+      # Un error inesperado no debe dejar la prueba del circuito en curso
+      interruptor.registrar_fallo()
+      raise
+    fallida = error is not None or respuesta.status_code >= 500
+    metricas.registrar_llamada(time.perf_counter() - inicio, fallida)
+
+    if not fallida:
+      interruptor.registrar_exito()
+      return respuesta
+    interruptor.registrar_fallo()
+    if (intento == reintentos or not _reintentable(error, respuesta) or
+        interruptor.estado != InterruptorCircuito.CERRADO):
+      break
+    metricas.registrar_reintento()
+    await asyncio.sleep(_espera_reintento(intento))
+
+  if error is not None:
+    raise error
+  return respuesta
@@ -1,15 +1,44 @@
+import httpx
 import requests
 from typing import Dict, Optional
+from django.conf import settings
 from django.core.exceptions import ValidationError
 
+from .cache_registro import obtener_cache
+from .resiliencia import (
+  CircuitoAbierto, ejecutar, ejecutar_async, obtener_cliente_async,
+  obtener_sesion,
+)
+
 
 class ReniecService:
   """Servicio para consultar datos de RENIEC"""
 
   def __init__(self):
-    # En producción, estas URLs y tokens deben venir de variables de entorno
-    self.base_url = "https://dniruc.apisperu.com/api/v1/dni"
-    self.token = "TU_TOKEN_AQUI"  # Debe configurarse en .env
+    self.base_url = settings.RENIEC_API_URL
+    self.token = settings.RENIEC_TOKEN
+    self.timeout = getattr(settings, 'REGISTRO_API_TIMEOUT', 10)
+
+  def _validar_dni(self, dni: str) -> None:
+    if not dni or len(dni) != 8 or not dni.isdigit():
+      raise ValidationError("El DNI debe tener 8 dígitos numéricos",
+                            code='formato')
+
+  def _headers(self) -> Dict:
+    headers = {'Content-Type': 'application/json'}
+    if self.token:
+      headers['Authorization'] = f'Bearer {self.token}'
+    return headers
+
+  def _interpretar_respuesta(self, status_code: int, obtener_json) -> Dict:
+    """Convierte la respuesta HTTP en datos o en ValidationError"""
+    if status_code == 200:
+      return self._procesar_respuesta_reniec(obtener_json())
+    elif status_code == 404:
+      raise ValidationError("DNI no encontrado en RENIEC", code='no_encontrado')
+    else:
+      raise ValidationError(
+        f"Error al consultar RENIEC: {status_code}", code='servicio')
 
   def consultar_dni(self, dni: str) -> Optional[Dict]:
     """
@@ -24,34 +53,48 @@ class ReniecService:
     Raises:
         ValidationError: Si hay un error en la consulta
     """
-    try:
-      # Validar formato de DNI
-      if not dni or len(dni) != 8 or not dni.isdigit():
-        raise ValidationError("El DNI debe tener 8 dígitos numéricos")
-
-      # Realizar consulta a la API
-      url = f"{self.base_url}/{dni}"
-      headers = {
-        'Authorization': f'Bearer {self.token}',
-        'Content-Type': 'application/json'
-      }
-
-      response = requests.get(url, headers=headers, timeout=10)
-
-      if response.status_code == 200:
-        data = response.json()
-        return self._procesar_respuesta_reniec(data)
-      elif response.status_code == 404:
-        raise ValidationError("DNI no encontrado en RENIEC")
-      else:
-        raise ValidationError(
-          f"Error al consultar RENIEC: {response.status_code}")
+    self._validar_dni(dni)
 
+    try:
+      # Realizar consulta a la API con la sesión compartida del proceso
+      response = ejecutar('RENIEC', lambda: obtener_sesion().get(
+          f"{self.base_url}/{dni}", headers=self._headers(),
+          timeout=self.timeout))
+      return self._interpretar_respuesta(response.status_code, response.json)
+
+    except ValidationError:
+      raise
+    except CircuitoAbierto:
+      raise ValidationError(
+        "RENIEC no responde; se omite la consulta temporalmente",
+        code='servicio')
     except requests.RequestException as e:
       # En caso de error de conexión, permitir registro manual
-      raise ValidationError(f"Error de conexión con RENIEC: {str(e)}")
+      raise ValidationError(f"Error de conexión con RENIEC: {str(e)}",
+                            code='servicio')
+    except Exception as e:
+      raise ValidationError(f"Error inesperado: {str(e)}", code='servicio')
+
+  async def consultar_dni_async(self, dni: str) -> Optional[Dict]:
+    """Versión asíncrona de consultar_dni sobre el cliente HTTP compartido"""
+    self._validar_dni(dni)
+
+    try:
+      response = await ejecutar_async('RENIEC', lambda: obtener_cliente_async().get(
+          f"{self.base_url}/{dni}", headers=self._headers()))
+      return self._interpretar_respuesta(response.status_code, response.json)
+
+    except ValidationError:
+      raise
+    except CircuitoAbierto:
+      raise ValidationError(
+        "RENIEC no responde; se omite la consulta temporalmente",
+        code='servicio')
+    except httpx.HTTPError as e:
+      raise ValidationError(f"Error de conexión con RENIEC: {str(e)}",
+                            code='servicio')
     except Exception as e:
-      raise ValidationError(f"Error inesperado: {str(e)}")
+      raise ValidationError(f"Error inesperado: {str(e)}", code='servicio')
 
   def _procesar_respuesta_reniec(self, data: Dict) -> Dict:
     """Procesa la respuesta de RENIEC y retorna datos estructurados"""
@@ -71,7 +114,8 @@ class ReniecService:
     Úsalo en desarrollo cuando no tengas acceso a la API real
     """
     if not dni or len(dni) != 8 or not dni.isdigit():
-      raise ValidationError("El DNI debe tener 8 dígitos numéricos")
+      raise ValidationError("El DNI debe tener 8 dígitos numéricos",
+                            code='formato')
 
     # Datos de prueba
     return {
@@ -89,9 +133,30 @@ class SunatService:
   """Servicio para consultar datos de SUNAT"""
 
   def __init__(self):
-    # En producción, estas URLs y tokens deben venir de variables de entorno
-    self.base_url = "https://dniruc.apisperu.com/api/v1/ruc"
-    self.token = "TU_TOKEN_AQUI"  # Debe configurarse en .env
+    self.base_url = settings.SUNAT_API_URL
+    self.token = settings.SUNAT_TOKEN
+    self.timeout = getattr(settings, 'REGISTRO_API_TIMEOUT', 10)
+
+  def _validar_ruc(self, ruc: str) -> None:
+    if not ruc or len(ruc) != 11 or not ruc.isdigit():
+      raise ValidationError("El RUC debe tener 11 dígitos numéricos",
+                            code='formato')
+
+  def _headers(self) -> Dict:
+    headers = {'Content-Type': 'application/json'}
+    if self.token:
+      headers['Authorization'] = f'Bearer {self.token}'
+    return headers
+
+  def _interpretar_respuesta(self, status_code: int, obtener_json) -> Dict:
+    """Convierte la respuesta HTTP en datos o en ValidationError"""
+    if status_code == 200:
+      return self._procesar_respuesta_sunat(obtener_json())
+    elif status_code == 404:
+      raise ValidationError("RUC no encontrado en SUNAT", code='no_encontrado')
+    else:
+      raise ValidationError(
+        f"Error al consultar SUNAT: {status_code}", code='servicio')
 
   def consultar_ruc(self, ruc: str) -> Optional[Dict]:
     """
@@ -106,34 +171,48 @@ class SunatService:
     Raises:
         ValidationError: Si hay un error en la consulta
     """
-    try:
-      # Validar formato de RUC
-      if not ruc or len(ruc) != 11 or not ruc.isdigit():
-        raise ValidationError("El RUC debe tener 11 dígitos numéricos")
-
-      # Realizar consulta a la API
-      url = f"{self.base_url}/{ruc}"
-      headers = {
-        'Authorization': f'Bearer {self.token}',
-        'Content-Type': 'application/json'
-      }
-
-      response = requests.get(url, headers=headers, timeout=10)
-
-      if response.status_code == 200:
-        data = response.json()
-        return self._procesar_respuesta_sunat(data)
-      elif response.status_code == 404:
-        raise ValidationError("RUC no encontrado en SUNAT")
-      else:
-        raise ValidationError(
-          f"Error al consultar SUNAT: {response.status_code}")
+    self._validar_ruc(ruc)
 
+    try:
+      # Realizar consulta a la API con la sesión compartida del proceso
+      response = ejecutar('SUNAT', lambda: obtener_sesion().get(
+          f"{self.base_url}/{ruc}", headers=self._headers(),
+          timeout=self.timeout))
+      return self._interpretar_respuesta(response.status_code, response.json)
+
+    except ValidationError:
+      raise
+    except CircuitoAbierto:
+      raise ValidationError(
+        "SUNAT no responde; se omite la consulta temporalmente",
+        code='servicio')
     except requests.RequestException as e:
       # En caso de error de conexión, permitir registro manual
-      raise ValidationError(f"Error de conexión con SUNAT: {str(e)}")
+      raise ValidationError(f"Error de conexión con SUNAT: {str(e)}",
+                            code='servicio')
     except Exception as e:
-      raise ValidationError(f"Error inesperado: {str(e)}")
+      raise ValidationError(f"Error inesperado: {str(e)}", code='servicio')
+
+  async def consultar_ruc_async(self, ruc: str) -> Optional[Dict]:
+    """Versión asíncrona de consultar_ruc sobre el cliente HTTP compartido"""
+    self._validar_ruc(ruc)
+
+    try:
+      response = await ejecutar_async('SUNAT', lambda: obtener_cliente_async().get(
+          f"{self.base_url}/{ruc}", headers=self._headers()))
+      return self._interpretar_respuesta(response.status_code, response.json)
+
+    except ValidationError:
+      raise
+    except CircuitoAbierto:
+      raise ValidationError(
+        "SUNAT no responde; se omite la consulta temporalmente",
+        code='servicio')
+    except httpx.HTTPError as e:
+      raise ValidationError(f"Error de conexión con SUNAT: {str(e)}",
+                            code='servicio')
+    except Exception as e:
+      raise ValidationError(f"Error inesperado: {str(e)}", code='servicio')
 
   def _procesar_respuesta_sunat(self, data: Dict) -> Dict:
     """Procesa la respuesta de SUNAT y retorna datos estructurados"""
@@ -156,7 +235,8 @@ class SunatService:
     Úsalo en desarrollo cuando no tengas acceso a la API real
     """
     if not ruc or len(ruc) != 11 or not ruc.isdigit():
-      raise ValidationError("El RUC debe tener 11 dígitos numéricos")
+      raise ValidationError("El RUC debe tener 11 dígitos numéricos",
+                            code='formato')
 
     # Datos de prueba
     return {
@@ -183,12 +263,15 @@ def obtener_datos_reniec(dni: str, usar_mock: bool = False) -> Dict:
       usar_mock: Si True, usa datos de prueba en lugar de la API real
 
   Returns:
-      Diccionario con los datos de la persona
+      Diccionario con los datos de la persona (desde la caché de consultas
+      si hay un resultado vigente)
   """
   service = ReniecService()
   if usar_mock:
     return service.consultar_dni_mock(dni)
-  return service.consultar_dni(dni)
+  service._validar_dni(dni)
+  return obtener_cache().consultar(
+      'DNI', dni, lambda: service.consultar_dni(dni))
 
 
 def obtener_datos_sunat(ruc: str, usar_mock: bool = False) -> Dict:
@@ -200,9 +283,32 @@ def obtener_datos_sunat(ruc: str, usar_mock: bool = False) -> Dict:
       usar_mock: Si True, usa datos de prueba en lugar de la API real
 
   Returns:
-      Diccionario con los datos de la empresa
+      Diccionario con los datos de la empresa (desde la caché de consultas
+      si hay un resultado vigente)
   """
   service = SunatService()
   if usar_mock:
     return service.consultar_ruc_mock(ruc)
-  return service.consultar_ruc(ruc)
\ No newline at end of file
+  service._validar_ruc(ruc)
+  return obtener_cache().consultar(
+      'RUC', ruc, lambda: service.consultar_ruc(ruc))
+
+
+async def obtener_datos_reniec_async(dni: str, usar_mock: bool = False) -> Dict:
+  """Versión asíncrona de obtener_datos_reniec"""
+  service = ReniecService()
+  if usar_mock:
+    return service.consultar_dni_mock(dni)
+  service._validar_dni(dni)
+  return await obtener_cache().consultar_async(
+      'DNI', dni, lambda: service.consultar_dni_async(dni))
+
+
+async def obtener_datos_sunat_async(ruc: str, usar_mock: bool = False) -> Dict:
+  """Versión asíncrona de obtener_datos_sunat"""
+  service = SunatService()
+  if usar_mock:
+    return service.consultar_ruc_mock(ruc)
+  service._validar_ruc(ruc)
+  return await obtener_cache().consultar_async(
+      'RUC', ruc, lambda: service.consultar_ruc_async(ruc))
@@ -0,0 +1,17 @@
+from core.trabajos import tarea
+
+from .importacion import directorio_importaciones, importar_clientes
+
+
+@tarea('importar_clientes', max_intentos=3)
+def importar_clientes_archivo(archivo: str):
+  """
+  Registra los clientes de un CSV subido en CLIENTES_IMPORTACION_DIR
+
+  Siempre se reanuda desde el archivo de progreso, así que un reintento no
+  vuelve a procesar los lotes ya insertados.
+  """
+  resultado = importar_clientes(directorio_importaciones() / archivo,
+                                reanudar=True)
+  resultado['archivo'] = archivo
+  return resultado
@@ -1,3 +1,329 @@
-from django.test import TestCase
+import asyncio
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import requests
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import (
+  SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Trabajo, Usuario
+from core.trabajos import Trabajador
+
+from . import resiliencia
+from .cache_registro import CacheRegistro
+from .models import Cliente, ConsultaRegistro
+from .resiliencia import (
+  CircuitoAbierto, InterruptorCircuito, ejecutar, ejecutar_async,
+)
+
+
+class ImportarClientesVistaTests(TestCase):
+
+  def setUp(self):
+    directorio = tempfile.TemporaryDirectory()
+    self.addCleanup(directorio.cleanup)
+    ajustes = override_settings(CLIENTES_IMPORTACION_DIR=directorio.name,
+                                REGISTRO_USAR_MOCK=True)
+    ajustes.enable()
+    self.addCleanup(ajustes.disable)
+    self.usuario = Usuario.objects.create_user(
+        username='admin', password='x', tipo_usuario='ADMINISTRADOR')
+    self.client.force_login(self.usuario)
+
+  def test_la_subida_se_importa_en_segundo_plano(self):
+    url = reverse('clientes:importar_clientes')
+    archivo = SimpleUploadedFile(
+        'clientes.csv', b'numero_documento,direccion\n12345678,Av. Lima 1\n1234\n')
+
+    respuesta = self.client.post(url, {'archivo': archivo})
+
+    trabajo = Trabajo.objects.get(tarea='importar_clientes')
+    self.assertRedirects(respuesta, f'{url}?trabajo={trabajo.pk}')
+    self.assertFalse(Cliente.objects.exists())
+
+    Trabajador('prueba').ejecutar(una_vez=True)
+
+    trabajo.refresh_from_db()
+    self.assertEqual(trabajo.estado, 'COMPLETADO')
+    self.assertEqual((trabajo.resultado['creados'], trabajo.resultado['errores']),
+                     (1, 1))
+    self.assertTrue(Cliente.objects.filter(numero_documento='12345678').exists())
+
+    pagina = self.client.get(url, {'trabajo': trabajo.pk})
+    self.assertEqual(pagina.context['resultado']['archivo'],
+                     trabajo.argumentos['archivo'])
+
+
+@override_settings(REGISTRO_USAR_MOCK=True)
+class ConsultarDocumentoVistaTests(TestCase):
+  """La vista asíncrona se sirve por ASGI detrás de los middlewares síncronos"""
+
+  url = reverse('clientes:consultar_documento_ajax')
+
+  def setUp(self):
+    self.async_client.force_login(
+        Usuario.objects.create_user(username='cajero', password='x'))
+
+  async def test_consulta_dni(self):
+    respuesta = await self.async_client.get(
+        self.url, {'tipo': 'DNI', 'numero': '12345678'})
+
+    self.assertEqual(respuesta.status_code, 200)
+    self.assertEqual(respuesta.json()['datos']['dni'], '12345678')
+
+  async def test_documento_con_formato_invalido(self):
+    respuesta = await self.async_client.get(
+        self.url, {'tipo': 'RUC', 'numero': '123'})
+
+    self.assertEqual(respuesta.status_code, 400)
+
+  async def test_requiere_sesion(self):
+    await self.async_client.alogout()
+
+    respuesta = await self.async_client.get(
+        self.url, {'tipo': 'DNI', 'numero': '12345678'})
+
+    self.assertEqual(respuesta.status_code, 302)
+
+
+class InterruptorCircuitoTests(SimpleTestCase):
+
+  def setUp(self):
+    self.ahora = 1000.0
+    reloj = mock.patch.object(resiliencia, 'time')
+    reloj.start().monotonic.side_effect = lambda: self.ahora
+    self.addCleanup(reloj.stop)
+    self.interruptor = InterruptorCircuito(umbral_fallos=2, tiempo_apertura=30)
+
+  def abrir(self):
+    self.interruptor.registrar_fallo()
+    self.interruptor.registrar_fallo()
+
+  def test_se_abre_tras_el_umbral_de_fallos_consecutivos(self):
+    self.interruptor.registrar_fallo()
+    self.interruptor.registrar_exito()
+    self.interruptor.registrar_fallo()
+    self.assertEqual(self.interruptor.estado, InterruptorCircuito.CERRADO)
+
+    self.interruptor.registrar_fallo()
+
+    self.assertEqual(self.interruptor.estado, InterruptorCircuito.ABIERTO)
+    self.assertFalse(self.interruptor.permitir())
+
+  def test_semi_abierto_deja_pasar_una_sola_prueba(self):
+    self.abrir()
+    self.ahora += 30
+
+    self.assertEqual(self.interruptor.estado, InterruptorCircuito.SEMI_ABIERTO)
+    self.assertTrue(self.interruptor.permitir())
+    self.assertFalse(self.interruptor.permitir())
+
+  def test_la_prueba_exitosa_cierra_el_circuito(self):
+    self.abrir()
+    self.ahora += 30
+    self.interruptor.permitir()
+
+    self.interruptor.registrar_exito()
+
+    self.assertEqual(self.interruptor.estado, InterruptorCircuito.CERRADO)
+    self.assertTrue(self.interruptor.permitir())
+
+  def test_la_prueba_fallida_vuelve_a_abrirlo(self):
+    self.abrir()
+    self.ahora += 30
+    self.interruptor.permitir()
+
+    self.interruptor.registrar_fallo()
+
+    self.assertEqual(self.interruptor.estado, InterruptorCircuito.ABIERTO)
+    self.assertEqual(self.interruptor.aperturas, 2)
+
+
+@override_settings(REGISTRO_API_REINTENTOS=2, REGISTRO_API_BACKOFF=0,
+                   REGISTRO_CIRCUITO_UMBRAL=5)
+class PoliticaReintentosTests(SimpleTestCase):
+
+  def setUp(self):
+    for registro in (resiliencia._interruptores, resiliencia._metricas):
+      limpio = mock.patch.dict(registro, clear=True)
+      limpio.start()
+      self.addCleanup(limpio.stop)
+
+  def solicitud(self, *resultados):
+    """Función que en cada llamada retorna o lanza el siguiente resultado"""
+    return mock.Mock(side_effect=list(resultados))
+
+  def test_reintenta_errores_de_conexion_y_respuestas_5xx(self):
+    solicitud = self.solicitud(requests.ConnectionError(),
+                               mock.Mock(status_code=503),
+                               mock.Mock(status_code=200))
+
+    self.assertEqual(ejecutar('RENIEC', solicitud).status_code, 200)
+    self.assertEqual(solicitud.call_count, 3)
+    self.assertEqual(resiliencia.obtener_metricas('RENIEC').reintentos, 2)
+
+  def test_no_reintenta_timeouts_ni_respuestas_4xx(self):
+    timeout = self.solicitud(requests.ReadTimeout())
+    with self.assertRaises(requests.ReadTimeout):
+      ejecutar('RENIEC', timeout)
+    self.assertEqual(timeout.call_count, 1)
+
+    no_encontrado = self.solicitud(mock.Mock(status_code=404))
+    self.assertEqual(ejecutar('SUNAT', no_encontrado).status_code, 404)
+    self.assertEqual(no_encontrado.call_count, 1)
+
+  @override_settings(REGISTRO_API_REINTENTOS=5, REGISTRO_CIRCUITO_UMBRAL=3)
+  def test_cada_intento_fallido_cuenta_para_el_circuito(self):
+    solicitud = self.solicitud(*[requests.ConnectionError()] * 6)
+
+    with self.assertRaises(requests.ConnectionError):
+      ejecutar('RENIEC', solicitud)
+
+    self.assertEqual(solicitud.call_count, 3)
+    self.assertEqual(resiliencia.obtener_interruptor('RENIEC').estado,
+                     InterruptorCircuito.ABIERTO)
+    with self.assertRaises(CircuitoAbierto):
+      ejecutar('RENIEC', solicitud)
+
+  async def test_version_asincrona_no_reintenta_timeouts(self):
+    solicitud = mock.AsyncMock(side_effect=[httpx.ReadTimeout('lento')])
+
+    with self.assertRaises(httpx.ReadTimeout):
+      await ejecutar_async('SUNAT', solicitud)
+
+    self.assertEqual(solicitud.call_count, 1)
+    self.assertEqual(
+        resiliencia.obtener_interruptor('SUNAT').resumen()['fallos_consecutivos'], 1)
+
+  async def test_version_asincrona_reintenta_errores_de_conexion(self):
+    solicitud = mock.AsyncMock(side_effect=[httpx.ConnectError('caído'),
+                                            mock.Mock(status_code=200)])
+
+    respuesta = await ejecutar_async('SUNAT', solicitud)
+
+    self.assertEqual(respuesta.status_code, 200)
+    self.assertEqual(solicitud.call_count, 2)
+
+
+class CacheRegistroTests(TestCase):
+
+  def setUp(self):
+    self.datos = {'dni': '12345678', 'nombres': 'ANA'}
+    self.obtener = mock.Mock(return_value=self.datos)
+
+  def test_consulta_memoria_luego_tabla_y_por_ultimo_la_api(self):
+    cache = CacheRegistro()
+    self.assertEqual(cache.consultar('DNI', '12345678', self.obtener), self.datos)
+    self.assertEqual(cache.consultar('DNI', '12345678', self.obtener), self.datos)
+    self.assertEqual((cache.llamadas_api, cache.aciertos_memoria), (1, 1))
+
+    # Otro proceso (memoria vacía) lee la tabla
+    otro = CacheRegistro()
+    self.assertEqual(otro.consultar('DNI', '12345678', self.obtener), self.datos)
+    self.assertEqual((otro.llamadas_api, otro.aciertos_bd), (0, 1))
+    self.assertEqual(self.obtener.call_count, 1)
+
+  def test_un_resultado_vencido_se_vuelve_a_consultar(self):
+    ConsultaRegistro.objects.create(
+        numero_documento='12345678', tipo_documento='DNI', datos={'viejo': 1},
+        fecha_consulta=timezone.now() - timedelta(days=31))
+
+    cache = CacheRegistro(ttl=timedelta(days=30))
+    self.assertEqual(cache.consultar('DNI', '12345678', self.obtener), self.datos)
+    self.assertEqual(self.obtener.call_count, 1)
+    self.assertEqual(ConsultaRegistro.objects.get().datos, self.datos)
+
+
+class CoalescenciaRegistroTests(TransactionTestCase):
+
+  HILOS = 5
+
+  def consultar_en_hilos(self, cache, obtener):
+    barrera = threading.Barrier(self.HILOS)
+    resultados = [None] * self.HILOS
+
+    def consultar(indice):
+      try:
+        barrera.wait()
+        resultados[indice] = cache.consultar('DNI', '12345678', obtener)
+      except Exception as e:
+        resultados[indice] = e
+      finally:
+        connection.close()
+
+    hilos = [threading.Thread(target=consultar, args=(i,))
+             for i in range(self.HILOS)]
+    for hilo in hilos:
+      hilo.start()
+    for hilo in hilos:
+      hilo.join(10)
+    return resultados
+
+  def lenta(self, resultado):
+    """API simulada que tarda lo suficiente para que lleguen los demás hilos"""
+    def obtener():
+      time.sleep(0.3)
+      if isinstance(resultado, Exception):
+        raise resultado
+      return resultado
+    return mock.Mock(side_effect=obtener)
+
+  def test_hilos_simultaneos_del_mismo_documento_llaman_una_vez_a_la_api(self):
+    cache = CacheRegistro()
+    obtener = self.lenta({'dni': '12345678'})
+
+    resultados = self.consultar_en_hilos(cache, obtener)
+
+    self.assertEqual(obtener.call_count, 1)
+    self.assertEqual(resultados, [{'dni': '12345678'}] * self.HILOS)
+    self.assertEqual(cache.coalescidas, self.HILOS - 1)
+
+  def test_el_error_del_lider_llega_a_los_que_esperan(self):
+    cache = CacheRegistro()
+    error = ValidationError('RENIEC no responde', code='servicio')
+    obtener = self.lenta(error)
+
+    resultados = self.consultar_en_hilos(cache, obtener)
+
+    self.assertEqual(obtener.call_count, 1)
+    self.assertEqual(resultados, [error] * self.HILOS)
+    self.assertFalse(ConsultaRegistro.objects.exists())
+
+  async def test_corutinas_simultaneas_comparten_la_consulta(self):
+    cache = CacheRegistro()
+    llamadas = []
+
+    async def obtener():
+      llamadas.append(1)
+      await asyncio.sleep(0.05)
+      return {'ruc': '20123456789'}
+
+    resultados = await asyncio.gather(*[
+      cache.consultar_async('RUC', '20123456789', obtener) for _ in range(5)])
+
+    self.assertEqual(len(llamadas), 1)
+    self.assertEqual(resultados, [{'ruc': '20123456789'}] * 5)
+
+  async def test_corutinas_que_esperan_reciben_el_error_del_lider(self):
+    cache = CacheRegistro()
+
+    async def obtener():
+      await asyncio.sleep(0.05)
+      raise ValidationError('SUNAT no responde', code='servicio')
+
+    resultados = await asyncio.gather(*[
+      cache.consultar_async('RUC', '20123456789', obtener) for _ in range(3)],
+      return_exceptions=True)
+
+    self.assertEqual(len({id(error) for error in resultados}), 1)
+    self.assertIsInstance(resultados[0], ValidationError)
@@ -9,4 +9,11 @@ urlpatterns = [
     path('<int:cliente_id>/', views.detalle_cliente, name='detalle_cliente'),
     path('<int:cliente_id>/editar/', views.editar_cliente, name='editar_cliente'),
     path('buscar/', views.buscar_cliente_ajax, name='buscar_cliente_ajax'),
+    path('consultar-documento/', views.consultar_documento_ajax,
+         name='consultar_documento_ajax'),
+    path('importar/', views.importar_clientes_csv, name='importar_clientes'),
+    path('importar/<str:archivo>/errores/', views.descargar_errores_importacion,
+         name='descargar_errores_importacion'),
+    path('servicios-externos/estado/', views.estado_servicios_externos,
+         name='estado_servicios_externos'),
 ]
\ No newline at end of file
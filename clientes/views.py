@@ -2,15 +2,23 @@ from django.shortcuts import render
 
 # Create your views here.
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
+from django.conf import settings
 from django.db import transaction
 from django.core.exceptions import ValidationError
 from django.db.models import Q
 
 from .models import Cliente, DatosReniec, DatosSunat
-from .forms import ClienteForm, BuscarClienteForm
-from .services import obtener_datos_reniec, obtener_datos_sunat
+from .forms import ClienteForm, BuscarClienteForm, ImportarClientesForm
+from core.views import es_administrador
+from .cache_registro import obtener_cache
+from .importacion import COLUMNAS, directorio_importaciones
+from .resiliencia import estado_servicios
+from .services import (
+  obtener_datos_reniec, obtener_datos_sunat,
+  obtener_datos_reniec_async, obtener_datos_sunat_async,
+)
 
 
 @login_required
@@ -52,91 +60,93 @@ def crear_cliente(request):
     form = ClienteForm(request.POST)
     if form.is_valid():
       try:
+        cliente = form.save(commit=False)
+        tipo_documento = form.cleaned_data['tipo_documento']
+        numero_documento = form.cleaned_data['numero_documento']
+
+        # Consultar API según tipo de documento, fuera de la transacción para
+        # no mantenerla abierta mientras responde el servicio externo
+        usar_mock = settings.REGISTRO_USAR_MOCK
+        datos_reniec = None
+        datos_sunat = None
+
+        if tipo_documento == 'DNI':
+          try:
+            datos_reniec = obtener_datos_reniec(numero_documento, usar_mock)
+          except ValidationError as e:
+            messages.warning(
+                request,
+                f'No se pudo consultar RENIEC: {str(e)}. Cliente registrado con datos manuales.'
+            )
+
+        elif tipo_documento == 'RUC':
+          try:
+            datos_sunat = obtener_datos_sunat(numero_documento, usar_mock)
+          except ValidationError as e:
+            messages.warning(
+                request,
+                f'No se pudo consultar SUNAT: {str(e)}. Cliente registrado con datos manuales.'
+            )
+
         with transaction.atomic():
-          cliente = form.save(commit=False)
-          tipo_documento = form.cleaned_data['tipo_documento']
-          numero_documento = form.cleaned_data['numero_documento']
-
-          # Consultar API según tipo de documento
-          usar_mock = True  # Cambiar a False cuando tengas acceso a las APIs reales
-
-          if tipo_documento == 'DNI':
-            # Consultar RENIEC
-            try:
-              datos_reniec = obtener_datos_reniec(numero_documento, usar_mock)
-
-              # Asignar datos de RENIEC al cliente
-              cliente.nombres = datos_reniec['nombres']
-              cliente.apellido_paterno = datos_reniec['apellido_paterno']
-              cliente.apellido_materno = datos_reniec['apellido_materno']
-
-              if not cliente.direccion:
-                cliente.direccion = datos_reniec.get('direccion',
-                                                     'No especificado')
-
-              cliente.save()
-
-              # Guardar datos de RENIEC
-              DatosReniec.objects.create(
-                  cliente=cliente,
-                  dni=datos_reniec['dni'],
-                  nombres=datos_reniec['nombres'],
-                  apellido_paterno=datos_reniec['apellido_paterno'],
-                  apellido_materno=datos_reniec['apellido_materno'],
-                  fecha_nacimiento=datos_reniec.get('fecha_nacimiento'),
-                  ubigeo=datos_reniec.get('ubigeo'),
-                  direccion=datos_reniec.get('direccion')
-              )
-
-            except ValidationError as e:
-              messages.warning(
-                  request,
-                  f'No se pudo consultar RENIEC: {str(e)}. Cliente registrado con datos manuales.'
-              )
-              cliente.save()
-
-          elif tipo_documento == 'RUC':
-            # Consultar SUNAT
-            try:
-              datos_sunat = obtener_datos_sunat(numero_documento, usar_mock)
-
-              # Asignar datos de SUNAT al cliente
-              cliente.razon_social = datos_sunat['razon_social']
-              cliente.nombre_comercial = datos_sunat.get('nombre_comercial')
-
-              if not cliente.direccion:
-                cliente.direccion = datos_sunat.get('direccion',
-                                                    'No especificado')
-
-              cliente.save()
-
-              # Guardar datos de SUNAT
-              DatosSunat.objects.create(
-                  cliente=cliente,
-                  ruc=datos_sunat['ruc'],
-                  razon_social=datos_sunat['razon_social'],
-                  nombre_comercial=datos_sunat.get('nombre_comercial'),
-                  tipo_contribuyente=datos_sunat.get('tipo_contribuyente'),
-                  estado=datos_sunat.get('estado'),
-                  condicion=datos_sunat.get('condicion'),
-                  direccion=datos_sunat.get('direccion'),
-                  departamento=datos_sunat.get('departamento'),
-                  provincia=datos_sunat.get('provincia'),
-                  distrito=datos_sunat.get('distrito')
-              )
-
-            except ValidationError as e:
-              messages.warning(
-                  request,
-                  f'No se pudo consultar SUNAT: {str(e)}. Cliente registrado con datos manuales.'
-              )
-              cliente.save()
-
-          messages.success(
-              request,
-              f'Cliente {cliente.get_nombre_completo()} registrado exitosamente con código {cliente.codigo}'
-          )
-          return redirect('clientes:detalle_cliente', cliente_id=cliente.id)
+          if datos_reniec:
+            # Asignar datos de RENIEC al cliente
+            cliente.nombres = datos_reniec['nombres']
+            cliente.apellido_paterno = datos_reniec['apellido_paterno']
+            cliente.apellido_materno = datos_reniec['apellido_materno']
+
+            if not cliente.direccion:
+              cliente.direccion = datos_reniec.get('direccion',
+                                                   'No especificado')
+
+            cliente.save()
+
+            # Guardar datos de RENIEC
+            DatosReniec.objects.create(
+                cliente=cliente,
+                dni=datos_reniec['dni'],
+                nombres=datos_reniec['nombres'],
+                apellido_paterno=datos_reniec['apellido_paterno'],
+                apellido_materno=datos_reniec['apellido_materno'],
+                fecha_nacimiento=datos_reniec.get('fecha_nacimiento'),
+                ubigeo=datos_reniec.get('ubigeo'),
+                direccion=datos_reniec.get('direccion')
+            )
+
+          elif datos_sunat:
+            # Asignar datos de SUNAT al cliente
+            cliente.razon_social = datos_sunat['razon_social']
+            cliente.nombre_comercial = datos_sunat.get('nombre_comercial')
+
+            if not cliente.direccion:
+              cliente.direccion = datos_sunat.get('direccion',
+                                                  'No especificado')
+
+            cliente.save()
+
+            # Guardar datos de SUNAT
+            DatosSunat.objects.create(
+                cliente=cliente,
+                ruc=datos_sunat['ruc'],
+                razon_social=datos_sunat['razon_social'],
+                nombre_comercial=datos_sunat.get('nombre_comercial'),
+                tipo_contribuyente=datos_sunat.get('tipo_contribuyente'),
+                estado=datos_sunat.get('estado'),
+                condicion=datos_sunat.get('condicion'),
+                direccion=datos_sunat.get('direccion'),
+                departamento=datos_sunat.get('departamento'),
+                provincia=datos_sunat.get('provincia'),
+                distrito=datos_sunat.get('distrito')
+            )
+
+          else:
+            cliente.save()
+
+        messages.success(
+            request,
+            f'Cliente {cliente.get_nombre_completo()} registrado exitosamente con código {cliente.codigo}'
+        )
+        return redirect('clientes:detalle_cliente', cliente_id=cliente.id)
 
       except ValidationError as e:
         messages.error(request, f'Error al registrar cliente: {str(e)}')
@@ -242,4 +252,108 @@ def buscar_cliente_ajax(request):
       'documento': f"{cliente.get_tipo_documento_display()}: {cliente.numero_documento}",
     })
 
-  return JsonResponse({'clientes': resultados})
\ No newline at end of file
+  return JsonResponse({'clientes': resultados})
+
+
+@login_required
+async def consultar_documento_ajax(request):
+  """
+  Vista AJAX asíncrona para consultar un DNI en RENIEC o un RUC en SUNAT
+
+  Servida por banca/asgi.py espera al servicio externo en el loop de eventos
+  y no abre transacciones.
+  """
+  from django.http import JsonResponse
+
+  tipo_documento = request.GET.get('tipo', '').upper()
+  numero_documento = request.GET.get('numero', '').strip()
+  usar_mock = settings.REGISTRO_USAR_MOCK
+
+  try:
+    if tipo_documento == 'DNI':
+      datos = await obtener_datos_reniec_async(numero_documento, usar_mock)
+    elif tipo_documento == 'RUC':
+      datos = await obtener_datos_sunat_async(numero_documento, usar_mock)
+    else:
+      return JsonResponse({'error': 'El tipo de documento debe ser DNI o RUC'},
+                          status=400)
+  except ValidationError as e:
+    estados = {'formato': 400, 'no_encontrado': 404}
+    return JsonResponse({'error': e.messages[0]},
+                        status=estados.get(e.code, 502))
+
+  return JsonResponse({'datos': datos})
+
+
+@login_required
+@user_passes_test(es_administrador, login_url='core:dashboard')
+def estado_servicios_externos(request):
+  """Vista JSON con el estado de RENIEC/SUNAT y de la caché de consultas"""
+  from django.http import JsonResponse
+
+  return JsonResponse({
+    'servicios': estado_servicios(),
+    'cache': obtener_cache().estadisticas(),
+  })
+
+
+@login_required
+@user_passes_test(es_administrador, login_url='core:dashboard')
+def importar_clientes_csv(request):
+  """
+  Vista para registrar clientes en bloque desde un archivo CSV
+
+  El archivo se guarda y lo importa un trabajador en segundo plano; la
+  página muestra el estado del trabajo indicado en ?trabajo=.
+  """
+  import uuid
+  from django.utils import timezone
+  from core.models import Trabajo
+  from core.trabajos import encolar
+
+  if request.method == 'POST':
+    form = ImportarClientesForm(request.POST, request.FILES)
+    if form.is_valid():
+      directorio = directorio_importaciones()
+      directorio.mkdir(parents=True, exist_ok=True)
+      ruta = directorio / f'{timezone.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}.csv'
+      with open(ruta, 'wb') as destino:
+        for bloque in form.cleaned_data['archivo'].chunks():
+          destino.write(bloque)
+
+      trabajo = encolar('importar_clientes', {'archivo': ruta.name})
+      messages.success(request,
+                       f'Importación encolada en el trabajo {trabajo.pk}.')
+      return redirect(f'{request.path}?trabajo={trabajo.pk}')
+    else:
+      messages.error(request, 'Por favor corrija los errores en el formulario.')
+  else:
+    form = ImportarClientesForm()
+
+  trabajo = None
+  if request.GET.get('trabajo', '').isdigit():
+    trabajo = Trabajo.objects.filter(pk=request.GET['trabajo'],
+                                     tarea='importar_clientes').first()
+
+  context = {
+    'form': form,
+    'trabajo': trabajo,
+    'resultado': trabajo.resultado if trabajo and trabajo.estado == 'COMPLETADO' else None,
+    'columnas': COLUMNAS,
+  }
+
+  return render(request, 'clientes/importar.html', context)
+
+
+@login_required
+@user_passes_test(es_administrador, login_url='core:dashboard')
+def descargar_errores_importacion(request, archivo):
+  """Vista para descargar el CSV de filas rechazadas de una importación"""
+  from django.http import FileResponse, Http404
+
+  ruta = directorio_importaciones() / f'{archivo}.errores.csv'
+  if ruta.parent != directorio_importaciones() or not ruta.is_file():
+    raise Http404('Archivo de errores no encontrado')
+
+  return FileResponse(open(ruta, 'rb'), as_attachment=True,
+                      filename=f'errores-{archivo}')
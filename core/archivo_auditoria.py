@@ -0,0 +1,182 @@
+import gzip
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AuditoriaAcceso
+
+
+CAMPOS_ARCHIVO = [
+  'id', 'usuario_id', 'usuario__username', 'fecha_hora', 'tipo_evento',
+  'ip_address', 'user_agent', 'exitoso', 'detalle',
+]
+
+
+def directorio_archivo() -> Path:
+  """Directorio raíz de los archivos de auditoría"""
+  return Path(getattr(settings, 'AUDITORIA_ARCHIVO_DIR',
+                      Path(settings.BASE_DIR) / 'var' / 'archivo_auditoria'))
+
+
+def ruta_particion(fecha: date, directorio: Path = None) -> Path:
+  """Ruta del archivo de un día: <dir>/AAAA/MM/auditoria-AAAA-MM-DD.jsonl.gz"""
+  directorio = directorio or directorio_archivo()
+  return (directorio / f'{fecha:%Y}' / f'{fecha:%m}' /
+          f'auditoria-{fecha:%Y-%m-%d}.jsonl.gz')
+
+
+def _a_registro(fila: Dict) -> Dict:
+  """Convierte una fila de values() en el registro que se archiva"""
+  registro = dict(fila)
+  registro['usuario'] = registro.pop('usuario__username')
+  registro['fecha_hora'] = registro['fecha_hora'].isoformat()
+  return registro
+
+
+def _escribir_particiones(filas: List[Dict], directorio: Path) -> None:
+  """
+  Agrega las filas a los archivos de sus días y los sincroniza a disco
+
+  Cada escritura agrega un miembro gzip nuevo al final del archivo; gzip
+  lee los miembros concatenados como un solo flujo.
+  """
+  por_dia = {}
+  for fila in filas:
+    dia = timezone.localtime(fila['fecha_hora']).date()
+    por_dia.setdefault(dia, []).append(_a_registro(fila))
+
+  for dia, registros in por_dia.items():
+    ruta = ruta_particion(dia, directorio)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta, 'ab') as destino:
+      with gzip.GzipFile(fileobj=destino, mode='ab') as comprimido:
+        for registro in registros:
+          comprimido.write(
+              (json.dumps(registro, ensure_ascii=False) + '\n').encode('utf-8'))
+      destino.flush()
+      os.fsync(destino.fileno())
+
+
+def archivar_auditoria(dias: int, lote: int = 1000, pausa: float = 0,
+    simular: bool = False, directorio: Path = None) -> Dict:
+  """
+  Archiva y elimina los eventos de auditoría anteriores a la retención
+
+  Procesa lotes pequeños en orden (fecha_hora, id), cada uno en su propia
+  transacción: primero se agrega el lote a los archivos comprimidos del día
+  y se sincroniza a disco, y luego se eliminan las filas por id. Así nunca
+  se borra un evento que no esté archivado y los bloqueos duran poco.
+  Si el proceso se interrumpe entre ambos pasos, el lote puede quedar
+  archivado dos veces; buscar_en_archivo descarta los ids repetidos.
+
+  Args:
+      dias: Días de retención en la base de datos
+      lote: Cantidad de filas por transacción
+      pausa: Segundos de espera entre lotes para ceder a los escritores
+      simular: Si True, solo cuenta las filas que se archivarían
+      directorio: Directorio de archivo (por defecto AUDITORIA_ARCHIVO_DIR)
+
+  Returns:
+      Diccionario con el límite, filas archivadas y lotes procesados
+  """
+  directorio = Path(directorio) if directorio else directorio_archivo()
+  limite = timezone.now() - timedelta(days=dias)
+  antiguos = AuditoriaAcceso.objects.filter(fecha_hora__lt=limite)
+
+  if simular:
+    return {'limite': limite, 'archivados': antiguos.count(), 'lotes': 0}
+
+  archivados = 0
+  lotes = 0
+  while True:
+    with transaction.atomic():
+      filas = list(antiguos.order_by('fecha_hora', 'id').values(
+          *CAMPOS_ARCHIVO)[:lote])
+      if not filas:
+        break
+
+      _escribir_particiones(filas, directorio)
+      AuditoriaAcceso.objects.filter(
+          id__in=[fila['id'] for fila in filas]).delete()
+
+    archivados += len(filas)
+    lotes += 1
+    if len(filas) < lote:
+      break
+    if pausa:
+      time.sleep(pausa)
+
+  return {'limite': limite, 'archivados': archivados, 'lotes': lotes}
+
+
+def _fecha_de_ruta(ruta: Path):
+  try:
+    return datetime.strptime(
+        ruta.name[len('auditoria-'):-len('.jsonl.gz')], '%Y-%m-%d').date()
+  except ValueError:
+    return None
+
+
+def buscar_en_archivo(desde: datetime = None, hasta: datetime = None,
+    usuario: str = None, tipo_evento: str = None, ip_address: str = None,
+    texto: str = None, directorio: Path = None) -> Iterator[Dict]:
+  """
+  Busca eventos en los archivos comprimidos sin restaurarlos
+
+  Solo abre las particiones de los días dentro del rango y las lee por
+  streaming. El texto se busca en la línea cruda antes de decodificarla.
+
+  Returns:
+      Iterador de eventos en orden cronológico
+  """
+  directorio = Path(directorio) if directorio else directorio_archivo()
+  if not directorio.exists():
+    return
+
+  dia_desde = timezone.localtime(desde).date() if desde else None
+  dia_hasta = timezone.localtime(hasta).date() if hasta else None
+
+  rutas = []
+  for ruta in directorio.glob('*/*/auditoria-*.jsonl.gz'):
+    dia = _fecha_de_ruta(ruta)
+    if dia is None:
+      continue
+    if (dia_desde and dia < dia_desde) or (dia_hasta and dia > dia_hasta):
+      continue
+    rutas.append((dia, ruta))
+
+  for _, ruta in sorted(rutas):
+    vistos = set()
+    eventos = []
+    with gzip.open(ruta, 'rt', encoding='utf-8') as contenido:
+      for linea in contenido:
+        if texto and texto not in linea:
+          continue
+
+        evento = json.loads(linea)
+        if evento['id'] in vistos:
+          continue
+        vistos.add(evento['id'])
+
+        if usuario and evento['usuario'] != usuario:
+          continue
+        if tipo_evento and evento['tipo_evento'] != tipo_evento:
+          continue
+        if ip_address and evento['ip_address'] != ip_address:
+          continue
+
+        fecha_hora = datetime.fromisoformat(evento['fecha_hora'])
+        if (desde and fecha_hora < desde) or (hasta and fecha_hora > hasta):
+          continue
+        eventos.append(evento)
+
+    # Un día puede tener varios miembros agregados en corridas distintas
+    eventos.sort(key=lambda e: (e['fecha_hora'], e['id']))
+    yield from eventos
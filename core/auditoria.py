@@ -0,0 +1,327 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class EscritorAuditoria:
+  """
+  Escritor de auditoría en segundo plano
+
+  Los eventos se encolan en memoria y un hilo los inserta con bulk_create
+  cuando el lote alcanza tamano_lote o cuando pasan intervalo segundos.
+  Si la inserción falla, o la cola está llena, los eventos se agregan a un
+  archivo de respaldo JSONL que se reprocesa al iniciar el escritor o con
+  el comando reprocesar_auditoria. Al terminar el proceso se vacía la cola.
+
+  Los archivos de respaldo llevan la etiqueta de la base de datos en la que
+  debían escribirse (ver etiqueta()); el reproceso ignora los de otra base,
+  como los que deja una corrida de pruebas en el mismo directorio.
+  """
+
+  # Segundos tras los que se retoma un respaldo reclamado y no terminado
+  RECLAMO_VENCIDO = 3600
+
+  def __init__(self, tamano_lote=100, intervalo=2.0, capacidad=10000,
+      directorio_respaldo=None, asincrono=True):
+    self.tamano_lote = tamano_lote
+    self.intervalo = intervalo
+    self.capacidad = capacidad
+    self.directorio_respaldo = Path(directorio_respaldo) if directorio_respaldo else None
+    self.asincrono = asincrono
+
+    self._lock = threading.Lock()
+    self._pid = None
+    self._cola = None
+    self._hilo = None
+
+    self.eventos_escritos = 0
+    self.eventos_respaldados = 0
+    self.lotes_escritos = 0
+    self.lotes_fallidos = 0
+    self.ultima_latencia_ms = 0.0
+    self.max_latencia_ms = 0.0
+
+  @classmethod
+  def desde_settings(cls):
+    """Crea el escritor con la configuración AUDITORIA_* de settings"""
+    return cls(
+        tamano_lote=getattr(settings, 'AUDITORIA_LOTE_TAMANO', 100),
+        intervalo=getattr(settings, 'AUDITORIA_LOTE_INTERVALO', 2.0),
+        capacidad=getattr(settings, 'AUDITORIA_COLA_CAPACIDAD', 10000),
+        directorio_respaldo=getattr(settings, 'AUDITORIA_RESPALDO_DIR', None),
+        asincrono=getattr(settings, 'AUDITORIA_ASINCRONA', True),
+    )
+
+  def registrar(self, evento: Dict) -> None:
+    """Encola un evento (diccionario con los campos de AuditoriaAcceso)"""
+    if not self.asincrono:
+      self._escribir([evento])
+      return
+
+    self._iniciar()
+    try:
+      self._cola.put_nowait(evento)
+    except queue.Full:
+      logger.warning('Cola de auditoría llena; el evento se envía al respaldo')
+      self._respaldar([evento])
+
+  def etiqueta(self) -> str:
+    """Identificador de la base de datos de destino de los eventos"""
+    from django.db import connection
+
+    datos = connection.settings_dict
+    clave = '|'.join(str(datos.get(campo) or '')
+                     for campo in ('ENGINE', 'HOST', 'PORT', 'NAME'))
+    return hashlib.sha1(clave.encode('utf-8')).hexdigest()[:12]
+
+  def profundidad_cola(self) -> int:
+    """Cantidad de eventos pendientes de escribir"""
+    return self._cola.qsize() if self._cola is not None else 0
+
+  def estado(self) -> Dict:
+    """Retorna las métricas del escritor"""
+    return {
+      'asincrono': self.asincrono,
+      'hilo_activo': bool(self._hilo and self._hilo.is_alive()),
+      'profundidad_cola': self.profundidad_cola(),
+      'capacidad_cola': self.capacidad,
+      'eventos_escritos': self.eventos_escritos,
+      'eventos_respaldados': self.eventos_respaldados,
+      'lotes_escritos': self.lotes_escritos,
+      'lotes_fallidos': self.lotes_fallidos,
+      'ultima_latencia_ms': round(self.ultima_latencia_ms, 2),
+      'max_latencia_ms': round(self.max_latencia_ms, 2),
+    }
+
+  def detener(self, tiempo_espera=5.0) -> None:
+    """Detiene el hilo escritor y escribe los eventos pendientes"""
+    if self._cola is None or self._pid != os.getpid():
+      return
+
+    if self._hilo and self._hilo.is_alive():
+      try:
+        self._cola.put(None, timeout=tiempo_espera)
+        self._hilo.join(tiempo_espera)
+      except queue.Full:
+        pass
+
+    self.vaciar()
+
+  def vaciar(self) -> None:
+    """Escribe de inmediato todos los eventos pendientes"""
+    if self._cola is None or self._pid != os.getpid():
+      return
+
+    lote = []
+    while True:
+      try:
+        evento = self._cola.get_nowait()
+      except queue.Empty:
+        break
+      if evento is not None:
+        lote.append(evento)
+      if len(lote) >= self.tamano_lote:
+        self._escribir(lote)
+        lote = []
+
+    if lote:
+      self._escribir(lote)
+
+  def reprocesar_respaldo(self, antiguedad_minima=0) -> int:
+    """
+    Inserta los eventos guardados en los archivos de respaldo
+
+    Cada archivo se reclama renombrándolo, de modo que varios procesos
+    pueden intentarlo a la vez sin duplicar eventos. Los eventos de un
+    archivo se insertan en una sola transacción: si falla, el archivo
+    vuelve a quedar pendiente sin eventos a medio insertar. Un archivo
+    reclamado por un proceso que terminó sin procesarlo se vuelve a tomar
+    después de RECLAMO_VENCIDO segundos.
+
+    Args:
+        antiguedad_minima: Segundos sin modificar que debe tener un archivo
+            para reprocesarlo (evita tomar el de un proceso que aún escribe)
+
+    Returns:
+        Cantidad de eventos reinsertados
+    """
+    if not self.directorio_respaldo or not self.directorio_respaldo.exists():
+      return 0
+
+    from .models import AuditoriaAcceso
+
+    total = 0
+    prefijo = f'auditoria-{self.etiqueta()}-'
+    limite = time.time() - antiguedad_minima
+    vencido = time.time() - self.RECLAMO_VENCIDO
+    pendientes = [(archivo, limite) for archivo in
+                  self.directorio_respaldo.glob(f'{prefijo}*.jsonl')]
+    # El renombrado actualiza st_ctime, que marca cuándo se reclamó
+    pendientes += [(archivo, vencido) for archivo in
+                   self.directorio_respaldo.glob(f'{prefijo}*.procesando')]
+
+    for archivo, limite_archivo in sorted(pendientes):
+      try:
+        estado = archivo.stat()
+        if max(estado.st_mtime, estado.st_ctime) > limite_archivo:
+          continue
+        reclamado = archivo.with_name(
+            f'{archivo.name.split(".", 1)[0]}.jsonl.{os.getpid()}.procesando')
+        archivo.rename(reclamado)
+      except OSError:
+        continue
+
+      try:
+        with open(reclamado, encoding='utf-8') as contenido:
+          eventos = [self._desde_json(linea) for linea in contenido if linea.strip()]
+
+        with transaction.atomic():
+          for inicio in range(0, len(eventos), self.tamano_lote):
+            AuditoriaAcceso.objects.bulk_create(
+                [AuditoriaAcceso(**e) for e in eventos[inicio:inicio + self.tamano_lote]])
+      except Exception:
+        # Nombre propio para no pisar el respaldo que el proceso original
+        # pudo volver a crear mientras tanto
+        reclamado.rename(reclamado.with_name(
+            f'{prefijo}{os.getpid()}-{time.time_ns()}.jsonl'))
+        raise
+
+      reclamado.unlink()
+      total += len(eventos)
+
+    if total:
+      logger.info('Se reprocesaron %s eventos de auditoría del respaldo', total)
+    return total
+
+  def _iniciar(self) -> None:
+    """Inicia el hilo escritor (una vez por proceso, también tras un fork)"""
+    if self._pid == os.getpid() and self._hilo and self._hilo.is_alive():
+      return
+
+    with self._lock:
+      if self._pid == os.getpid() and self._hilo and self._hilo.is_alive():
+        return
+      if self._pid != os.getpid():
+        self._cola = queue.Queue(maxsize=self.capacidad)
+        atexit.register(self.detener)
+      self._pid = os.getpid()
+      self._hilo = threading.Thread(
+          target=self._ejecutar, name='escritor-auditoria', daemon=True)
+      self._hilo.start()
+
+  def _ejecutar(self) -> None:
+    """Bucle del hilo escritor"""
+    try:
+      self.reprocesar_respaldo(antiguedad_minima=60)
+    except Exception:
+      logger.exception('No se pudo reprocesar el respaldo de auditoría')
+
+    # None en la cola indica que el proceso está terminando
+    while True:
+      evento = self._cola.get()
+      if evento is None:
+        return
+
+      lote = [evento]
+      limite = time.monotonic() + self.intervalo
+      detener = False
+
+      while len(lote) < self.tamano_lote:
+        restante = limite - time.monotonic()
+        if restante <= 0:
+          break
+        try:
+          evento = self._cola.get(timeout=restante)
+        except queue.Empty:
+          break
+        if evento is None:
+          detener = True
+          break
+        lote.append(evento)
+
+      # El hilo conserva su conexión; se descarta si caducó o falló
+      close_old_connections()
+      self._escribir(lote)
+      if detener:
+        return
+
+  def _escribir(self, lote: List[Dict]) -> None:
+    """Inserta un lote; si falla lo envía al respaldo"""
+    from .models import AuditoriaAcceso
+
+    inicio = time.perf_counter()
+    try:
+      AuditoriaAcceso.objects.bulk_create([AuditoriaAcceso(**e) for e in lote])
+    except Exception:
+      self.lotes_fallidos += 1
+      logger.exception('No se pudo escribir un lote de %s eventos de auditoría',
+                       len(lote))
+      self._respaldar(lote)
+      return
+
+    self.ultima_latencia_ms = (time.perf_counter() - inicio) * 1000
+    self.max_latencia_ms = max(self.max_latencia_ms, self.ultima_latencia_ms)
+    self.eventos_escritos += len(lote)
+    self.lotes_escritos += 1
+
+  def _respaldar(self, lote: List[Dict]) -> None:
+    """Agrega los eventos al archivo de respaldo del proceso"""
+    if not self.directorio_respaldo:
+      logger.error('Se perdieron %s eventos de auditoría: no hay directorio de respaldo',
+                   len(lote))
+      return
+
+    try:
+      self.directorio_respaldo.mkdir(parents=True, exist_ok=True)
+      archivo = (self.directorio_respaldo /
+                 f'auditoria-{self.etiqueta()}-{os.getpid()}.jsonl')
+      with open(archivo, 'a', encoding='utf-8') as destino:
+        for evento in lote:
+          destino.write(self._a_json(evento) + '\n')
+        destino.flush()
+        os.fsync(destino.fileno())
+      self.eventos_respaldados += len(lote)
+    except OSError:
+      logger.exception('Se perdieron %s eventos de auditoría al escribir el respaldo',
+                       len(lote))
+
+  @staticmethod
+  def _a_json(evento: Dict) -> str:
+    datos = dict(evento)
+    if isinstance(datos.get('fecha_hora'), datetime):
+      datos['fecha_hora'] = datos['fecha_hora'].isoformat()
+    return json.dumps(datos, ensure_ascii=False)
+
+  @staticmethod
+  def _desde_json(linea: str) -> Dict:
+    datos = json.loads(linea)
+    if datos.get('fecha_hora'):
+      datos['fecha_hora'] = datetime.fromisoformat(datos['fecha_hora'])
+    return datos
+
+
+_escritor = None
+_escritor_lock = threading.Lock()
+
+
+def obtener_escritor() -> EscritorAuditoria:
+  """Retorna el escritor de auditoría del proceso"""
+  global _escritor
+  if _escritor is None:
+    with _escritor_lock:
+      if _escritor is None:
+        _escritor = EscritorAuditoria.desde_settings()
+  return _escritor
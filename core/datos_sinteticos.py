@@ -0,0 +1,514 @@
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, List
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from clientes.models import Cliente
+from cuentas.models import Cuenta, Embargo
+from operaciones.models import Deposito, Movimiento, Retiro, Transferencia
+
+from .models import TipoCambio
+
+
+NOMBRES = [
+  'JUAN', 'MARIA', 'JOSE', 'ROSA', 'CARLOS', 'ANA', 'LUIS', 'CARMEN', 'JORGE',
+  'LUCIA', 'MIGUEL', 'ELENA', 'PEDRO', 'SOFIA', 'DIEGO', 'VALERIA', 'CESAR',
+  'PATRICIA', 'RAUL', 'GABRIELA', 'VICTOR', 'ISABEL', 'MANUEL', 'CAROLINA',
+]
+APELLIDOS = [
+  'QUISPE', 'FLORES', 'SANCHEZ', 'RODRIGUEZ', 'GARCIA', 'ROJAS', 'HUAMAN',
+  'MENDOZA', 'TORRES', 'CHAVEZ', 'RAMIREZ', 'CASTILLO', 'VARGAS', 'MAMANI',
+  'DIAZ', 'ESPINOZA', 'LOPEZ', 'GUTIERREZ', 'PEREZ', 'SALAZAR', 'CRUZ',
+]
+RUBROS = [
+  'INVERSIONES', 'COMERCIAL', 'TRANSPORTES', 'CONSTRUCTORA', 'AGROINDUSTRIAS',
+  'SERVICIOS GENERALES', 'DISTRIBUIDORA', 'CONSULTORES', 'TEXTIL', 'MINERA',
+]
+SOCIEDADES = ['S.A.C.', 'S.A.', 'E.I.R.L.', 'S.R.L.']
+DISTRITOS = [
+  'MIRAFLORES', 'SAN ISIDRO', 'SURCO', 'LA MOLINA', 'LOS OLIVOS', 'ATE',
+  'SAN MIGUEL', 'CHORRILLOS', 'COMAS', 'BREÑA', 'LINCE', 'SURQUILLO',
+]
+VIAS = ['AV.', 'JR.', 'CALLE', 'PSJE.']
+JUZGADOS = [
+  '1er Juzgado Civil de Lima', '3er Juzgado Laboral de Lima',
+  '2do Juzgado de Paz Letrado de Surco', '5to Juzgado Comercial de Lima',
+]
+
+# Multiplicador primo para repartir los documentos generados a partir del id
+# (es coprimo con 9*10^7 y 10^8, así que no se repiten)
+_DISPERSION = 7919
+
+PESOS_RUC = [5, 4, 3, 2, 7, 6, 5, 4, 3, 2]
+
+
+def digito_verificador_ruc(base: str) -> str:
+  """Dígito verificador (módulo 11) de los 10 primeros dígitos de un RUC"""
+  resto = 11 - sum(int(d) * p for d, p in zip(base, PESOS_RUC)) % 11
+  return str({10: 0, 11: 1}.get(resto, resto))
+
+
+def generar_ruc(numero: int, prefijo: str = '20') -> str:
+  """RUC válido y único para cada numero menor a 10^8"""
+  base = f'{prefijo}{(numero * _DISPERSION) % 10 ** 8:08d}'
+  return base + digito_verificador_ruc(base)
+
+
+def generar_dni(numero: int) -> str:
+  """DNI de 8 dígitos (10000000 a 99999999) único para cada numero menor a 9*10^7"""
+  return f'{10 ** 7 + (numero * _DISPERSION) % (9 * 10 ** 7):08d}'
+
+
+@contextmanager
+def sin_fechas_automaticas(*modelos):
+  """
+  Desactiva auto_now y auto_now_add en los modelos indicados
+
+  Permite guardar con bulk_create fechas históricas asignadas a mano. Solo
+  afecta al proceso actual y se restablece al salir del bloque.
+  """
+  campos = []
+  for modelo in modelos:
+    for campo in modelo._meta.concrete_fields:
+      if getattr(campo, 'auto_now', False) or getattr(campo, 'auto_now_add', False):
+        campos.append((campo, campo.auto_now, campo.auto_now_add))
+        campo.auto_now = campo.auto_now_add = False
+  try:
+    yield
+  finally:
+    for campo, auto_now, auto_now_add in campos:
+      campo.auto_now = auto_now
+      campo.auto_now_add = auto_now_add
+
+
+def _decimal(centimos: int) -> Decimal:
+  return Decimal(centimos).scaleb(-2)
+
+
+def _centimos(monto: Decimal) -> int:
+  return int(monto.scaleb(2))
+
+
+class GeneradorBanco:
+  """
+  Genera clientes, cuentas e historial de movimientos sintéticos
+
+  Todo sale de un random.Random con semilla fija y de fechas relativas a
+  hasta, de modo que dos corridas sobre una base vacía producen los mismos
+  datos. Los ids se asignan explícitamente a partir del máximo existente,
+  así bulk_create no necesita leerlos de vuelta y las relaciones se arman
+  en memoria.
+
+  Los clientes se procesan por bloques, cada uno en su propia transacción.
+  Dentro de un bloque los movimientos de todas sus cuentas se simulan en
+  orden cronológico sobre los saldos en memoria (las transferencias son
+  entre cuentas del bloque), por lo que cada cadena saldo_anterior ->
+  saldo_nuevo es consistente, y se insertan en lotes a medida que se
+  generan: la memoria usada depende del bloque, no del total.
+  """
+
+  MODELOS = [Cliente, Cuenta, Movimiento, Deposito, Retiro, Transferencia,
+             Embargo, TipoCambio]
+
+  def __init__(self, usuario, semilla=42, clientes=1000, cuentas_por_cliente=2,
+      movimientos_por_cuenta=100, anios=3, tasa_juridicas=0.15,
+      tasa_embargos=0.02, lote=5000, eventos_por_bloque=200000, hasta=None):
+    self.usuario = usuario
+    self.aleatorio = random.Random(semilla)
+    self.clientes = clientes
+    self.cuentas_por_cliente = cuentas_por_cliente
+    self.movimientos_por_cuenta = movimientos_por_cuenta
+    self.tasa_juridicas = tasa_juridicas
+    self.tasa_embargos = tasa_embargos
+    self.lote = lote
+
+    hasta = hasta or timezone.localdate()
+    self.fin = timezone.make_aware(datetime.combine(hasta, time.min))
+    self.inicio = self.fin - relativedelta(years=anios)
+
+    eventos_por_cliente = max(1, cuentas_por_cliente * (movimientos_por_cuenta + 1))
+    self.clientes_por_bloque = max(1, eventos_por_bloque // eventos_por_cliente)
+    self.limite_autorizacion = _centimos(
+        Decimal(str(settings.DEPOSITO_LIMITE_AUTORIZACION)))
+
+    self._siguiente_id = {}
+    self._tipos_cambio = {}
+    self._pendientes = {modelo: [] for modelo in self.MODELOS}
+    self.resumen = {modelo._meta.model_name: 0 for modelo in self.MODELOS}
+
+  def generar(self, al_avanzar: Callable[[Dict], None] = None) -> Dict:
+    """Genera todos los datos y retorna la cantidad de filas por modelo"""
+    for modelo in self.MODELOS:
+      ultimo = modelo.objects.aggregate(ultimo=Max('pk'))['ultimo'] or 0
+      self._siguiente_id[modelo] = ultimo + 1
+
+    with sin_fechas_automaticas(*self.MODELOS):
+      with transaction.atomic():
+        self._generar_tipos_cambio()
+        self._vaciar()
+
+      generados = 0
+      while generados < self.clientes:
+        cantidad = min(self.clientes_por_bloque, self.clientes - generados)
+        with transaction.atomic():
+          self._generar_bloque(cantidad)
+        generados += cantidad
+        if al_avanzar:
+          al_avanzar(dict(self.resumen))
+
+    return dict(self.resumen)
+
+  # Identificadores y escritura por lotes
+
+  def _nuevo_id(self, modelo) -> int:
+    pk = self._siguiente_id[modelo]
+    self._siguiente_id[modelo] = pk + 1
+    return pk
+
+  def _agregar(self, objeto) -> None:
+    self._pendientes[type(objeto)].append(objeto)
+    if len(self._pendientes[Movimiento]) >= self.lote:
+      self._vaciar()
+
+  def _vaciar(self, *modelos) -> None:
+    """Inserta los objetos pendientes respetando el orden de las relaciones"""
+    for modelo in modelos or self.MODELOS:
+      pendientes = self._pendientes[modelo]
+      if pendientes:
+        modelo.objects.bulk_create(pendientes, batch_size=self.lote)
+        self.resumen[modelo._meta.model_name] += len(pendientes)
+        self._pendientes[modelo] = []
+
+  # Datos de referencia
+
+  def _generar_tipos_cambio(self) -> None:
+    """Historial diario de tipo de cambio (caminata aleatoria alrededor de 3.75)"""
+    existentes = dict(
+        (fecha, (compra, venta)) for fecha, compra, venta in
+        TipoCambio.objects.filter(
+            fecha__gte=self.inicio.date(), fecha__lte=self.fin.date()
+        ).values_list('fecha', 'compra', 'venta')
+    )
+
+    compra = Decimal('3.750')
+    fecha = self.inicio.date()
+    while fecha <= self.fin.date():
+      compra += Decimal(self.aleatorio.randint(-15, 15)).scaleb(-3)
+      compra = min(max(compra, Decimal('3.300')), Decimal('4.100'))
+      venta = compra + Decimal(self.aleatorio.randint(3, 20)).scaleb(-3)
+
+      if fecha in existentes:
+        self._tipos_cambio[fecha] = existentes[fecha]
+      else:
+        self._tipos_cambio[fecha] = (compra, venta)
+        self._agregar(TipoCambio(
+            id=self._nuevo_id(TipoCambio),
+            fecha=fecha,
+            compra=compra,
+            venta=venta,
+            usuario_registro_id=self.usuario.pk,
+            fecha_registro=timezone.make_aware(datetime.combine(fecha, time(9)))
+        ))
+      fecha += timedelta(days=1)
+
+  def _fecha_aleatoria(self, desde: datetime, hasta: datetime) -> datetime:
+    segundos = max(0.0, (hasta - desde).total_seconds())
+    return desde + timedelta(seconds=self.aleatorio.uniform(0, segundos))
+
+  # Clientes y cuentas
+
+  def _nuevo_cliente(self) -> Cliente:
+    pk = self._nuevo_id(Cliente)
+    a = self.aleatorio
+    fecha_registro = self._fecha_aleatoria(self.inicio,
+                                           self.fin - timedelta(days=30))
+    distrito = a.choice(DISTRITOS)
+    cliente = Cliente(
+        id=pk,
+        # Prefijo propio: no consume la secuencia CLI<año> de generar_codigo
+        codigo=f'SIM{pk:010d}',
+        direccion=f'{a.choice(VIAS)} {a.choice(APELLIDOS)} {a.randint(100, 2999)}, {distrito}',
+        telefono=f'9{a.randint(0, 99999999):08d}',
+        email=f'cliente{pk}@ejemplo.pe',
+        fecha_registro=fecha_registro,
+        fecha_actualizacion=fecha_registro,
+    )
+
+    if a.random() < self.tasa_juridicas:
+      cliente.tipo_cliente = 'JURIDICA'
+      cliente.tipo_documento = 'RUC'
+      cliente.numero_documento = generar_ruc(pk)
+      cliente.razon_social = (f'{a.choice(RUBROS)} {a.choice(APELLIDOS)} '
+                              f'{a.choice(SOCIEDADES)}')
+      cliente.nombre_comercial = f'{a.choice(RUBROS)} {a.choice(DISTRITOS)}'
+      cliente.representante_legal = (f'{a.choice(NOMBRES)} {a.choice(APELLIDOS)} '
+                                     f'{a.choice(APELLIDOS)}')
+    else:
+      cliente.tipo_cliente = 'NATURAL'
+      cliente.tipo_documento = 'DNI'
+      cliente.numero_documento = generar_dni(pk)
+      cliente.nombres = a.choice(NOMBRES)
+      cliente.apellido_paterno = a.choice(APELLIDOS)
+      cliente.apellido_materno = a.choice(APELLIDOS)
+      cliente.fecha_nacimiento = (self.inicio - timedelta(
+          days=a.randint(18 * 365, 75 * 365))).date()
+    return cliente
+
+  def _nueva_cuenta(self, cliente: Cliente) -> Cuenta:
+    a = self.aleatorio
+    if cliente.tipo_cliente == 'JURIDICA':
+      tipo_cuenta = a.choices(['CORRIENTE', 'AHORRO', 'PLAZO'], [70, 20, 10])[0]
+    else:
+      tipo_cuenta = a.choices(['AHORRO', 'CORRIENTE', 'PLAZO'], [70, 15, 15])[0]
+    moneda = a.choices(['SOLES', 'DOLARES'], [75, 25])[0]
+    fecha_apertura = self._fecha_aleatoria(cliente.fecha_registro,
+                                           self.fin - timedelta(days=1))
+
+    pk = self._nuevo_id(Cuenta)
+    prefijo = {'AHORRO': '001', 'CORRIENTE': '002', 'PLAZO': '003'}[tipo_cuenta]
+    prefijo += {'SOLES': '1', 'DOLARES': '2'}[moneda]
+    cuenta = Cuenta(
+        id=pk,
+        numero_cuenta=f'{prefijo}{pk:010d}',
+        cliente_id=cliente.pk,
+        tipo_cuenta=tipo_cuenta,
+        moneda=moneda,
+        fecha_apertura=fecha_apertura,
+        fecha_ultimo_movimiento=fecha_apertura,
+        usuario_apertura_id=self.usuario.pk,
+    )
+
+    if tipo_cuenta == 'PLAZO':
+      cuenta.plazo_meses = a.choice([3, 6, 12, 24])
+      cuenta.tasa_interes_mensual = Decimal(a.randint(20, 90)).scaleb(-2)
+      cuenta.monto_inicial = _decimal(a.randint(10, 500) * 10000)
+      cuenta.saldo = cuenta.monto_inicial
+      cuenta.fecha_vencimiento = (fecha_apertura + relativedelta(
+          months=cuenta.plazo_meses)).date()
+    else:
+      cuenta.saldo = _decimal(a.randint(0, 2000) * 100)
+      if tipo_cuenta == 'CORRIENTE':
+        cuenta.monto_sobregiro = _decimal(a.choice([0, 100000, 500000]))
+
+    cuenta.saldo_disponible = cuenta.get_saldo_disponible()
+    return cuenta
+
+  def _movimiento(self, cuenta: Cuenta, tipo: str, monto: int, anterior: int,
+      nuevo: int, fecha_hora: datetime, descripcion: str, **extra) -> Movimiento:
+    movimiento = Movimiento(
+        id=self._nuevo_id(Movimiento),
+        cuenta_id=cuenta.pk,
+        tipo_movimiento=tipo,
+        monto=_decimal(monto),
+        saldo_anterior=_decimal(anterior),
+        saldo_nuevo=_decimal(nuevo),
+        descripcion=descripcion,
+        fecha_hora=fecha_hora,
+        usuario_id=self.usuario.pk,
+        **extra
+    )
+    self._agregar(movimiento)
+    return movimiento
+
+  # Simulación
+
+  def _generar_bloque(self, cantidad: int) -> None:
+    clientes = [self._nuevo_cliente() for _ in range(cantidad)]
+    # En una base con datos, se omiten los documentos que ya estén registrados
+    existentes = set(Cliente.objects.filter(
+        numero_documento__in=[c.numero_documento for c in clientes]
+    ).values_list('numero_documento', flat=True))
+    clientes = [c for c in clientes if c.numero_documento not in existentes]
+
+    cuentas = []
+    for cliente in clientes:
+      maximo = max(1, 2 * self.cuentas_por_cliente - 1)
+      cuentas.extend(self._nueva_cuenta(cliente)
+                     for _ in range(self.aleatorio.randint(1, maximo)))
+
+    self._pendientes[Cliente].extend(clientes)
+    self._pendientes[Cuenta].extend(cuentas)
+    self._vaciar(Cliente, Cuenta)
+
+    saldos = [_centimos(cuenta.saldo) for cuenta in cuentas]
+    eventos = []
+    for indice, cuenta in enumerate(cuentas):
+      self._movimiento(cuenta, 'APERTURA', saldos[indice], 0, saldos[indice],
+                       cuenta.fecha_apertura,
+                       f'Apertura de {cuenta.get_tipo_cuenta_display()}')
+      if cuenta.tipo_cuenta == 'PLAZO':
+        continue
+      media = self.movimientos_por_cuenta
+      for _ in range(self.aleatorio.randint(media // 2, media + media // 2)):
+        eventos.append((self._fecha_aleatoria(cuenta.fecha_apertura, self.fin),
+                        indice))
+    eventos.sort()
+
+    for fecha_hora, indice in eventos:
+      self._simular_evento(cuentas, saldos, indice, fecha_hora)
+
+    for indice, cuenta in enumerate(cuentas):
+      cuenta.saldo = _decimal(saldos[indice])
+    self._generar_embargos(cuentas)
+
+    for cuenta in cuentas:
+      cuenta.saldo_disponible = cuenta.get_saldo_disponible()
+    self._vaciar()
+    Cuenta.objects.bulk_update(
+        cuentas,
+        ['saldo', 'saldo_disponible', 'fecha_ultimo_movimiento', 'estado',
+         'monto_embargado', 'embargo_total', 'embargos_vigentes',
+         'embargos_totales_vigentes'],
+        batch_size=min(self.lote, 1000)
+    )
+
+  def _simular_evento(self, cuentas: List[Cuenta], saldos: List[int],
+      indice: int, fecha_hora: datetime) -> None:
+    """Aplica un depósito, retiro o transferencia sobre los saldos en memoria"""
+    a = self.aleatorio
+    cuenta = cuentas[indice]
+    monto = max(100, int(a.lognormvariate(10.5, 1.1)))
+    tipo = a.choices(['DEPOSITO', 'RETIRO', 'TRANSFERENCIA'], [45, 35, 20])[0]
+
+    destino = None
+    if tipo == 'TRANSFERENCIA':
+      for _ in range(3):
+        candidato = a.randrange(len(cuentas))
+        otra = cuentas[candidato]
+        if (candidato != indice and otra.tipo_cuenta != 'PLAZO' and
+            otra.fecha_apertura < fecha_hora):
+          destino = candidato
+          break
+    if tipo != 'DEPOSITO' and (monto > saldos[indice] or
+                               (tipo == 'TRANSFERENCIA' and destino is None)):
+      # Sin saldo o sin cuenta destino: el cliente deposita en su lugar
+      tipo = 'DEPOSITO'
+
+    anterior = saldos[indice]
+    cuenta.fecha_ultimo_movimiento = fecha_hora
+
+    if tipo == 'DEPOSITO':
+      saldos[indice] += monto
+      monto_soles = monto
+      if cuenta.moneda == 'DOLARES':
+        monto_soles = _centimos(_decimal(monto) * self._tipo_cambio(fecha_hora)[1])
+      autorizado = {}
+      if monto_soles > self.limite_autorizacion:
+        autorizado = {
+          'requiere_autorizacion': True,
+          'clave_autorizacion': f'SIM-{a.randint(100000, 999999)}',
+          'origen_fondos': a.choice(['Venta de inmueble', 'Ahorros',
+                                     'Actividad comercial', 'Herencia']),
+        }
+      movimiento = self._movimiento(
+          cuenta, 'DEPOSITO', monto, anterior, saldos[indice], fecha_hora,
+          f'Depósito en {cuenta.get_tipo_cuenta_display()}', **autorizado)
+      self._agregar(Deposito(
+          id=self._nuevo_id(Deposito), cuenta_id=cuenta.pk, monto=movimiento.monto,
+          fecha_hora=fecha_hora, usuario_id=self.usuario.pk,
+          movimiento_id=movimiento.pk, **autorizado))
+
+    elif tipo == 'RETIRO':
+      saldos[indice] -= monto
+      movimiento = self._movimiento(
+          cuenta, 'RETIRO', monto, anterior, saldos[indice], fecha_hora,
+          f'Retiro de {cuenta.get_tipo_cuenta_display()}')
+      self._agregar(Retiro(
+          id=self._nuevo_id(Retiro), cuenta_id=cuenta.pk, monto=movimiento.monto,
+          fecha_hora=fecha_hora, usuario_id=self.usuario.pk,
+          movimiento_id=movimiento.pk))
+
+    else:
+      otra = cuentas[destino]
+      monto_origen = _decimal(monto)
+      tipo_cambio = None
+      if cuenta.moneda == otra.moneda:
+        monto_destino = monto_origen
+      else:
+        # Misma conversión que la vista de transferencias
+        compra, venta = self._tipo_cambio(fecha_hora)
+        if cuenta.moneda == 'SOLES':
+          tipo_cambio = venta
+          monto_destino = (monto_origen / venta).quantize(Decimal('0.01'))
+        else:
+          tipo_cambio = compra
+          monto_destino = (monto_origen * compra).quantize(Decimal('0.01'))
+
+      saldos[indice] -= monto
+      anterior_destino = saldos[destino]
+      saldos[destino] += _centimos(monto_destino)
+      otra.fecha_ultimo_movimiento = fecha_hora
+
+      origen = self._movimiento(
+          cuenta, 'TRANSFERENCIA_ENVIADA', monto, anterior, saldos[indice],
+          fecha_hora, f'Transferencia a cuenta {otra.numero_cuenta}',
+          cuenta_destino_id=otra.pk)
+      recibido = self._movimiento(
+          otra, 'TRANSFERENCIA_RECIBIDA', _centimos(monto_destino),
+          anterior_destino, saldos[destino], fecha_hora,
+          f'Transferencia desde cuenta {cuenta.numero_cuenta}')
+      self._agregar(Transferencia(
+          id=self._nuevo_id(Transferencia), cuenta_origen_id=cuenta.pk,
+          cuenta_destino_id=otra.pk, monto_origen=monto_origen,
+          monto_destino=monto_destino, tipo_cambio=tipo_cambio,
+          fecha_hora=fecha_hora, usuario_id=self.usuario.pk,
+          movimiento_origen_id=origen.pk, movimiento_destino_id=recibido.pk))
+
+  def _tipo_cambio(self, fecha_hora: datetime):
+    fecha = timezone.localtime(fecha_hora).date()
+    return self._tipos_cambio.get(fecha) or self._tipos_cambio[self.fin.date()]
+
+  def _generar_embargos(self, cuentas: List[Cuenta]) -> None:
+    """
+    Embargos posteriores al último movimiento de cada cuenta elegida
+
+    Los vigentes actualizan los contadores y el monto embargado de la cuenta
+    como aplicar_embargo; una parte se registra ya levantada.
+    """
+    a = self.aleatorio
+    for cuenta in cuentas:
+      if (cuenta.tipo_cuenta == 'PLAZO' or cuenta.saldo <= 0 or
+          a.random() >= self.tasa_embargos):
+        continue
+
+      pk = self._nuevo_id(Embargo)
+      es_total = a.random() < 0.2
+      monto = cuenta.saldo if es_total else max(Decimal('0.01'), (
+          cuenta.saldo * Decimal(a.randint(10, 90)).scaleb(-2)).quantize(Decimal('0.01')))
+      fecha_embargo = self._fecha_aleatoria(cuenta.fecha_ultimo_movimiento, self.fin)
+      levantado = a.random() < 0.3
+      fecha_levantamiento = (self._fecha_aleatoria(fecha_embargo, self.fin)
+                             if levantado else None)
+      oficio = f'SIM-{pk:08d}'
+
+      self._agregar(Embargo(
+          id=pk, cuenta_id=cuenta.pk, numero_oficio=oficio,
+          juzgado=a.choice(JUZGADOS), monto_embargado=monto, es_total=es_total,
+          fecha_embargo=fecha_embargo, fecha_levantamiento=fecha_levantamiento,
+          esta_vigente=not levantado, usuario_registro_id=self.usuario.pk,
+          observaciones='Generado por seed_bank'))
+      saldo = _centimos(cuenta.saldo)
+      self._movimiento(cuenta, 'EMBARGO', _centimos(monto), saldo, saldo,
+                       fecha_embargo, f'Embargo judicial - Oficio: {oficio}')
+
+      if levantado:
+        self._movimiento(cuenta, 'DESEMBARGO', _centimos(monto), saldo, saldo,
+                         fecha_levantamiento,
+                         f'Levantamiento de embargo - Oficio: {oficio}')
+        continue
+
+      # monto_embargado suma solo los parciales (ver Cuenta.aplicar_embargo)
+      if es_total:
+        cuenta.embargo_total = True
+        cuenta.embargos_totales_vigentes += 1
+      else:
+        cuenta.monto_embargado += monto
+      cuenta.embargos_vigentes += 1
+      cuenta.estado = 'EMBARGADA'
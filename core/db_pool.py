@@ -0,0 +1,62 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.db import close_old_connections, connections
+
+
+class EjecutorBD:
+  """
+  Pool de hilos para comandos que consultan la base de datos en paralelo
+
+  Django mantiene una conexión por hilo; este pool limita la cantidad de
+  hilos (y por lo tanto de conexiones) y hace que cada hilo reutilice su
+  conexión entre tareas. Antes de cada tarea se descartan las conexiones
+  caducadas o que no pasan la verificación de salud, y al cerrar el pool
+  cada hilo cierra la suya.
+
+  Uso:
+      with EjecutorBD(max_hilos=4) as ejecutor:
+          resultados = ejecutor.mapear(procesar, lotes)
+  """
+
+  def __init__(self, max_hilos=4):
+    self.max_hilos = max_hilos
+    self._ejecutor = ThreadPoolExecutor(max_workers=max_hilos,
+                                        thread_name_prefix='bd')
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.cerrar()
+
+  def enviar(self, funcion, *args, **kwargs):
+    """Envía una tarea al pool y retorna su Future"""
+    return self._ejecutor.submit(self._ejecutar, funcion, args, kwargs)
+
+  def mapear(self, funcion, elementos):
+    """Ejecuta funcion sobre cada elemento y retorna los resultados en orden"""
+    futuros = [self.enviar(funcion, elemento) for elemento in elementos]
+    return [futuro.result() for futuro in futuros]
+
+  def cerrar(self, tiempo_espera=30):
+    """Cierra la conexión de cada hilo y detiene el pool"""
+    # Una tarea por hilo: la barrera impide que un hilo tome dos y deje
+    # otra conexión sin cerrar
+    barrera = threading.Barrier(self.max_hilos, timeout=tiempo_espera)
+
+    def cerrar_conexiones():
+      connections.close_all()
+      try:
+        barrera.wait()
+      except threading.BrokenBarrierError:
+        pass
+
+    wait([self._ejecutor.submit(cerrar_conexiones)
+          for _ in range(self.max_hilos)])
+    self._ejecutor.shutdown(wait=True)
+
+  @staticmethod
+  def _ejecutar(funcion, args, kwargs):
+    close_old_connections()
+    return funcion(*args, **kwargs)
@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+
+ALIAS_REPLICA = 'replica'
+
+_lectura_en_replica = ContextVar('lectura_en_replica', default=False)
+
+
+def replica_configurada() -> bool:
+  """Verifica si existe el alias de base de datos de la réplica"""
+  return ALIAS_REPLICA in settings.DATABASES
+
+
+def activar_replica():
+  """Envía las lecturas del contexto actual a la réplica; retorna el token"""
+  return _lectura_en_replica.set(True)
+
+
+def desactivar_replica(token) -> None:
+  """Restaura el enrutamiento previo a activar_replica"""
+  try:
+    _lectura_en_replica.reset(token)
+  except ValueError:
+    # Bajo ASGI process_view corre con sync_to_async, que copia el valor al
+    # contexto de la solicitud pero no el token
+    anterior = token.old_value
+    _lectura_en_replica.set(False if anterior is token.MISSING else anterior)
+
+
+@contextmanager
+def lecturas_en_replica():
+  """Contexto para ejecutar consultas de solo lectura en la réplica"""
+  token = activar_replica()
+  try:
+    yield
+  finally:
+    desactivar_replica(token)
+
+
+class RouterReplica:
+  """
+  Router de lecturas hacia la réplica
+
+  Las lecturas van a la réplica solo cuando el contexto lo activó
+  (ReplicaLecturaMiddleware o lecturas_en_replica) y no hay una transacción
+  abierta en el primario. Las escrituras, las migraciones, las sesiones y el
+  modelo de usuario siempre usan el primario.
+  """
+
+  modelos_primario = {'sessions.session', settings.AUTH_USER_MODEL.lower()}
+
+  def db_for_read(self, model, **hints):
+    if not _lectura_en_replica.get() or not replica_configurada():
+      return None
+    if model._meta.label_lower in self.modelos_primario:
+      return None
+    # Dentro de una transacción se lee lo que la misma transacción escribió
+    if connections['default'].in_atomic_block:
+      return None
+    return ALIAS_REPLICA
+
+  def db_for_write(self, model, **hints):
+    return 'default'
+
+  def allow_relation(self, obj1, obj2, **hints):
+    # Ambos alias contienen los mismos datos
+    return True
+
+  def allow_migrate(self, db, app_label, model_name=None, **hints):
+    return db != ALIAS_REPLICA
@@ -2,7 +2,7 @@ from django import forms
 from django.core.exceptions import ValidationError
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Submit, Div, Field
-from .models import Usuario, TipoCambio
+from .models import Usuario, TipoCambio, AuditoriaAcceso
 
 
 class LoginForm(forms.Form):
@@ -196,4 +196,63 @@ class UsuarioForm(forms.ModelForm):
         if Usuario.objects.filter(email=email).exists():
           raise ValidationError('Este correo electrónico ya está registrado')
 
-    return email
\ No newline at end of file
+    return email
+
+
+class FiltroAuditoriaForm(forms.Form):
+  """Formulario de filtros del explorador de auditoría"""
+  usuario = forms.ModelChoiceField(
+      required=False,
+      queryset=Usuario.objects.order_by('username'),
+      empty_label='Todos los usuarios',
+      widget=forms.Select(attrs={
+        'class': 'form-select',
+      })
+  )
+  tipo_evento = forms.ChoiceField(
+      required=False,
+      choices=[('', 'Todos los eventos')] + AuditoriaAcceso.TIPO_EVENTO_CHOICES,
+      widget=forms.Select(attrs={
+        'class': 'form-select',
+      })
+  )
+  ip_address = forms.GenericIPAddressField(
+      required=False,
+      widget=forms.TextInput(attrs={
+        'class': 'form-control',
+        'placeholder': 'Dirección IP',
+      })
+  )
+  exitoso = forms.ChoiceField(
+      required=False,
+      choices=[('', 'Todos'), ('1', 'Exitosos'), ('0', 'Fallidos')],
+      widget=forms.Select(attrs={
+        'class': 'form-select',
+      })
+  )
+  desde = forms.DateTimeField(
+      required=False,
+      input_formats=['%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M', '%Y-%m-%d'],
+      widget=forms.DateTimeInput(format='%Y-%m-%dT%H:%M', attrs={
+        'class': 'form-control',
+        'type': 'datetime-local',
+      })
+  )
+  hasta = forms.DateTimeField(
+      required=False,
+      input_formats=['%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M', '%Y-%m-%d'],
+      widget=forms.DateTimeInput(format='%Y-%m-%dT%H:%M', attrs={
+        'class': 'form-control',
+        'type': 'datetime-local',
+      })
+  )
+
+  def clean(self):
+    cleaned_data = super().clean()
+    desde = cleaned_data.get('desde')
+    hasta = cleaned_data.get('hasta')
+
+    if desde and hasta and desde > hasta:
+      raise ValidationError('La fecha inicial no puede ser posterior a la final')
+
+    return cleaned_data
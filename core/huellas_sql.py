@@ -0,0 +1,232 @@
+import atexit
+import functools
+import json
+import logging
+import os
+import re
+import socket
+import threading
+import time
+import traceback
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Vista de la solicitud en curso, para atribuir las consultas lentas
+vista_actual = ContextVar('vista_sql', default=None)
+
+_LITERAL_TEXTO = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAMETRO = re.compile(r'%s|\?')
+_LISTA_IN = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_FILAS_VALUES = re.compile(r'\bVALUES\s*(\([^()]*\))(?:\s*,\s*\([^()]*\))+',
+                           re.IGNORECASE)
+_ESPACIOS = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=4096)
+def huella(sql: str) -> str:
+  """
+  Normaliza una sentencia SQL para agrupar las que solo difieren en valores
+
+  Reemplaza literales y parámetros por ?, colapsa las listas IN (...) y las
+  filas de un INSERT múltiple, y unifica los espacios.
+  """
+  normalizada = _LITERAL_TEXTO.sub('?', sql)
+  normalizada = _NUMERO.sub('?', normalizada)
+  normalizada = _PARAMETRO.sub('?', normalizada)
+  normalizada = _LISTA_IN.sub('IN (...)', normalizada)
+  normalizada = _FILAS_VALUES.sub(r'VALUES \1, ...', normalizada)
+  return _ESPACIOS.sub(' ', normalizada).strip()
+
+
+# Middlewares y envoltorios de medición, omitidos en las pilas
+_MODULOS_MEDICION = ('huellas_sql.py', 'metricas.py', 'perfilador.py',
+                     'middleware.py')
+
+
+def _pila_recortada(profundidad: int) -> List[str]:
+  """Últimos marcos de la pila que pertenecen al proyecto"""
+  base = str(settings.BASE_DIR)
+  marcos = [
+    f'{os.path.relpath(marco.filename, base)}:{marco.lineno} en {marco.name}'
+    for marco in traceback.extract_stack()
+    if marco.filename.startswith(base) and 'site-packages' not in marco.filename
+    and not marco.filename.endswith(_MODULOS_MEDICION)
+  ]
+  return marcos[-profundidad:]
+
+
+class RecolectorSQL:
+  """
+  execute_wrapper que agrega las consultas del proceso por huella
+
+  Por cada huella acumula cantidad, tiempo total y tiempo máximo. Las
+  consultas más lentas que umbral_ms se registran en el log con la vista y
+  una pila recortada. Cada cierto intervalo, y al terminar el proceso, el
+  resumen se vuelca a un archivo JSON por worker; el comando huellas_sql
+  combina los archivos de todos los workers.
+  """
+
+  def __init__(self, directorio=None, umbral_ms=200.0, intervalo=60.0,
+      profundidad_pila=8, max_lentas=100):
+    self.directorio = Path(directorio) if directorio else None
+    self.umbral = umbral_ms / 1000
+    self.intervalo = intervalo
+    self.profundidad_pila = profundidad_pila
+    self.max_lentas = max_lentas
+
+    self._lock = threading.Lock()
+    self._pid = None
+    self._reiniciar()
+
+  @classmethod
+  def desde_settings(cls):
+    """Crea el recolector con la configuración SQL_HUELLAS_* de settings"""
+    return cls(
+        directorio=getattr(settings, 'SQL_HUELLAS_DIR', None),
+        umbral_ms=getattr(settings, 'SQL_LENTAS_UMBRAL_MS', 200),
+        intervalo=getattr(settings, 'SQL_HUELLAS_INTERVALO', 60),
+        profundidad_pila=getattr(settings, 'SQL_LENTAS_PROFUNDIDAD_PILA', 8),
+    )
+
+  def _reiniciar(self) -> None:
+    self._huellas = {}
+    self._lentas = deque(maxlen=self.max_lentas)
+    self._inicio = timezone.now()
+    self._ultimo_volcado = time.monotonic()
+
+  def __call__(self, execute, sql, params, many, context):
+    inicio = time.perf_counter()
+    try:
+      return execute(sql, params, many, context)
+    finally:
+      self.registrar(sql, time.perf_counter() - inicio,
+                     context['connection'].alias)
+
+  def registrar(self, sql: str, segundos: float, alias: str = 'default') -> None:
+    clave = huella(sql)
+    lenta = segundos >= self.umbral
+
+    with self._lock:
+      if self._pid != os.getpid():
+        # Primer uso en este proceso (o hijo de un fork): empieza de cero
+        if self._pid is None and self.directorio:
+          atexit.register(self.volcar)
+        self._pid = os.getpid()
+        self._reiniciar()
+
+      datos = self._huellas.get(clave)
+      if datos is None:
+        datos = self._huellas[clave] = {
+          'cantidad': 0, 'total': 0.0, 'maximo': 0.0, 'alias': alias}
+      datos['cantidad'] += 1
+      datos['total'] += segundos
+      if segundos > datos['maximo']:
+        datos['maximo'] = segundos
+
+      volcar = (self.directorio is not None and
+                time.monotonic() - self._ultimo_volcado >= self.intervalo)
+      if volcar:
+        self._ultimo_volcado = time.monotonic()
+
+    if lenta:
+      self._registrar_lenta(sql, clave, segundos, alias)
+    if volcar:
+      self.volcar()
+
+  def _registrar_lenta(self, sql, clave, segundos, alias) -> None:
+    pila = _pila_recortada(self.profundidad_pila)
+    vista = vista_actual.get()
+    logger.warning('Consulta lenta (%.0f ms) en %s [%s]: %s\n  %s',
+                   segundos * 1000, vista or '-', alias, sql[:1000],
+                   '\n  '.join(pila))
+    with self._lock:
+      self._lentas.append({
+        'fecha': timezone.now().isoformat(),
+        'ms': round(segundos * 1000, 2),
+        'vista': vista,
+        'alias': alias,
+        'huella': clave,
+        'sql': sql[:2000],
+        'pila': pila,
+      })
+
+  def resumen(self) -> Dict:
+    """Copia del estado del proceso, en el formato de los archivos de volcado"""
+    with self._lock:
+      return {
+        'worker': f'{socket.gethostname()}-{os.getpid()}',
+        'desde': self._inicio.isoformat(),
+        'hasta': timezone.now().isoformat(),
+        'huellas': {clave: dict(datos) for clave, datos in self._huellas.items()},
+        'lentas': list(self._lentas),
+      }
+
+  def volcar(self) -> None:
+    """Escribe el resumen del proceso en su archivo (temporal + rename)"""
+    if self.directorio is None or self._pid != os.getpid():
+      return
+    resumen = self.resumen()
+    try:
+      self.directorio.mkdir(parents=True, exist_ok=True)
+      ruta = self.directorio / f'huellas-{resumen["worker"]}.json'
+      temporal = ruta.with_name(ruta.name + '.tmp')
+      with open(temporal, 'w', encoding='utf-8') as destino:
+        json.dump(resumen, destino, ensure_ascii=False)
+      os.replace(temporal, ruta)
+    except OSError:
+      logger.exception('No se pudo volcar el resumen de consultas SQL')
+
+
+_recolector = None
+_recolector_lock = threading.Lock()
+
+
+def obtener_recolector() -> RecolectorSQL:
+  """Retorna el recolector de consultas del proceso"""
+  global _recolector
+  if _recolector is None:
+    with _recolector_lock:
+      if _recolector is None:
+        _recolector = RecolectorSQL.desde_settings()
+  return _recolector
+
+
+def combinar_volcados(rutas: Iterable[Path]) -> Dict:
+  """
+  Combina los archivos de volcado de varios workers
+
+  Returns:
+      {'workers': [...], 'huellas': {huella: datos}, 'lentas': [...]}
+      con cantidad y total sumados y el máximo de los máximos
+  """
+  workers = []
+  huellas = {}
+  lentas = []
+  for ruta in rutas:
+    try:
+      with open(ruta, encoding='utf-8') as archivo:
+        volcado = json.load(archivo)
+    except (OSError, ValueError):
+      logger.warning('Se omite el volcado ilegible %s', ruta)
+      continue
+
+    workers.append(volcado['worker'])
+    lentas.extend(volcado.get('lentas', []))
+    for clave, datos in volcado['huellas'].items():
+      total = huellas.setdefault(
+          clave, {'cantidad': 0, 'total': 0.0, 'maximo': 0.0,
+                  'alias': datos.get('alias')})
+      total['cantidad'] += datos['cantidad']
+      total['total'] += datos['total']
+      total['maximo'] = max(total['maximo'], datos['maximo'])
+
+  lentas.sort(key=lambda lenta: lenta['ms'], reverse=True)
+  return {'workers': workers, 'huellas': huellas, 'lentas': lentas}
@@ -0,0 +1,85 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+
+from core.db_pool import EjecutorBD
+from core.models import TipoCambio
+from cuentas.models import Cuenta
+
+
+class Command(BaseCommand):
+  help = ('Mide la latencia por solicitud con una conexión nueva por '
+          'solicitud y con conexiones persistentes')
+
+  def add_arguments(self, parser):
+    parser.add_argument('--iteraciones', type=int, default=200,
+                        help='Solicitudes simuladas por perfil')
+    parser.add_argument('--hilos', type=int, default=4,
+                        help='Hilos del pool en la medición concurrente')
+    parser.add_argument('--max-age', type=int, default=60,
+                        help='CONN_MAX_AGE del perfil persistente')
+
+  def handle(self, *args, **options):
+    configuracion = connections['default'].settings_dict
+    original = (configuracion.get('CONN_MAX_AGE', 0),
+                configuracion.get('CONN_HEALTH_CHECKS', False))
+
+    self._abiertas = 0
+    self._lock = threading.Lock()
+    connection_created.connect(self._contar_conexion)
+
+    try:
+      for nombre, max_age, salud in [
+        ('Conexión por solicitud', 0, False),
+        ('Persistente', options['max_age'], True),
+      ]:
+        configuracion['CONN_MAX_AGE'] = max_age
+        configuracion['CONN_HEALTH_CHECKS'] = salud
+        connections.close_all()
+
+        self._medir(f'{nombre} (secuencial)', options['iteraciones'],
+                    lambda: [self._solicitud() for _ in range(options['iteraciones'])])
+
+        def concurrente():
+          with EjecutorBD(max_hilos=options['hilos']) as ejecutor:
+            return ejecutor.mapear(lambda _: self._solicitud(),
+                                   range(options['iteraciones']))
+
+        self._medir(f'{nombre} ({options["hilos"]} hilos)',
+                    options['iteraciones'], concurrente)
+    finally:
+      connection_created.disconnect(self._contar_conexion)
+      configuracion['CONN_MAX_AGE'], configuracion['CONN_HEALTH_CHECKS'] = original
+      connections.close_all()
+
+  def _contar_conexion(self, sender, connection, **kwargs):
+    with self._lock:
+      self._abiertas += 1
+
+  def _solicitud(self):
+    """Simula el ciclo de una solicitud: inicio, consultas típicas y fin"""
+    inicio = time.perf_counter()
+    close_old_connections()
+    list(Cuenta.objects.order_by('-id').values_list('id', 'saldo')[:20])
+    TipoCambio.obtener_actual()
+    close_old_connections()
+    return time.perf_counter() - inicio
+
+  def _medir(self, nombre, iteraciones, ejecutar):
+    self._abiertas = 0
+    inicio = time.perf_counter()
+    tiempos = ejecutar()
+    total = time.perf_counter() - inicio
+
+    tiempos_ms = sorted(t * 1000 for t in tiempos)
+    p95 = tiempos_ms[int(len(tiempos_ms) * 0.95) - 1] if len(
+      tiempos_ms) >= 20 else tiempos_ms[-1]
+    self.stdout.write(
+        f'{nombre}: p50 {statistics.median(tiempos_ms):.2f} ms, '
+        f'p95 {p95:.2f} ms, {iteraciones / total:.0f} solicitudes/s, '
+        f'{self._abiertas} conexión(es) abiertas'
+    )
@@ -0,0 +1,228 @@
+import json
+import platform
+import random
+import statistics
+import time
+from contextlib import ExitStack
+from decimal import Decimal
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import F
+from django.test import Client
+from django.test.utils import (
+  CaptureQueriesContext, setup_databases, setup_test_environment,
+  teardown_databases, teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from core.datos_sinteticos import GeneradorBanco
+from core.models import TipoCambio, Usuario
+from cuentas.models import Cuenta, expresion_saldo_disponible
+
+
+def percentil(valores, p):
+  """Percentil por rango más cercano de una lista no vacía"""
+  ordenados = sorted(valores)
+  return ordenados[min(len(ordenados) - 1, max(0, round(p * len(ordenados)) - 1))]
+
+
+class Command(BaseCommand):
+  help = ('Mide la latencia y la cantidad de consultas de las vistas '
+          'principales con distintos volúmenes de datos, sobre una base de '
+          'datos de prueba, y las compara con una línea base')
+
+  def add_arguments(self, parser):
+    parser.add_argument('--tamanos', default='100,1000',
+                        help='Cantidades de clientes separadas por coma (crecientes)')
+    parser.add_argument('--movimientos-por-cuenta', type=int, default=50)
+    parser.add_argument('--repeticiones', type=int, default=20,
+                        help='Solicitudes medidas por vista y tamaño')
+    parser.add_argument('--calentamiento', type=int, default=2,
+                        help='Solicitudes descartadas antes de medir')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', default='var/benchmark_vistas.json',
+                        help='Archivo JSON con los resultados')
+    parser.add_argument('--linea-base', default=None,
+                        help='Resultados previos con los que comparar')
+    parser.add_argument('--tolerancia', type=float, default=0.25,
+                        help='Aumento relativo de p95 aceptado frente a la línea base')
+    parser.add_argument('--fallar-si-regresion', action='store_true',
+                        help='Termina con error si hay regresiones')
+
+  def handle(self, *args, **options):
+    try:
+      tamanos = sorted(int(t) for t in options['tamanos'].split(','))
+    except ValueError:
+      raise CommandError('--tamanos debe ser una lista de enteros separados por coma')
+
+    linea_base = None
+    if options['linea_base']:
+      try:
+        with open(options['linea_base'], encoding='utf-8') as archivo:
+          linea_base = json.load(archivo)
+      except (OSError, ValueError) as e:
+        raise CommandError(f'No se pudo leer la línea base: {e}')
+
+    self.aleatorio = random.Random(options['semilla'])
+    self.repeticiones = options['repeticiones']
+    self.calentamiento = options['calentamiento']
+
+    # Base de datos de prueba: nunca se escribe en la base configurada
+    setup_test_environment()
+    configuracion_bd = setup_databases(verbosity=0, interactive=False,
+                                       aliases=set(connections))
+    try:
+      resultados = self._medir(tamanos, options)
+    finally:
+      teardown_databases(configuracion_bd, verbosity=0)
+      teardown_test_environment()
+
+    informe = {
+      'fecha': timezone.now().isoformat(),
+      'entorno': {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'base_de_datos': connections['default'].vendor,
+      },
+      'parametros': {
+        'movimientos_por_cuenta': options['movimientos_por_cuenta'],
+        'repeticiones': self.repeticiones,
+        'semilla': options['semilla'],
+      },
+      'resultados': resultados,
+    }
+
+    ruta = Path(options['salida'])
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+      json.dump(informe, archivo, indent=2, ensure_ascii=False)
+    self.stdout.write(self.style.SUCCESS(f'Resultados guardados en {ruta}'))
+
+    if linea_base:
+      regresiones = self._comparar(resultados, linea_base['resultados'],
+                                   options['tolerancia'])
+      if regresiones and options['fallar_si_regresion']:
+        raise CommandError(f'{regresiones} regresión(es) frente a la línea base')
+
+  def _medir(self, tamanos, options):
+    usuario = Usuario.objects.create(
+        username='benchmark', tipo_usuario='ADMINISTRADOR', is_staff=True)
+    TipoCambio.objects.create(fecha=timezone.localdate(), compra=Decimal('3.750'),
+                              venta=Decimal('3.760'), usuario_registro=usuario)
+
+    resultados = {}
+    generados = 0
+    for indice, tamano in enumerate(tamanos):
+      self.stdout.write(f'Generando datos: {tamano} clientes...')
+      GeneradorBanco(
+          usuario,
+          semilla=options['semilla'] + indice,
+          clientes=tamano - generados,
+          movimientos_por_cuenta=options['movimientos_por_cuenta'],
+      ).generar()
+      generados = tamano
+
+      cliente = Client()
+      cliente.force_login(usuario)
+      resultados[str(tamano)] = {}
+      for nombre, solicitud in self._escenarios(cliente):
+        medicion = self._medir_vista(solicitud)
+        resultados[str(tamano)][nombre] = medicion
+        self.stdout.write(
+            f'  {nombre:<28} p50 {medicion["p50_ms"]:>8.2f} ms  '
+            f'p95 {medicion["p95_ms"]:>8.2f} ms  {medicion["consultas"]:>4} consulta(s)')
+    return resultados
+
+  def _escenarios(self, cliente):
+    """Pares (nombre, función que hace una solicitud y retorna la respuesta)"""
+    cuentas = list(Cuenta.objects.filter(
+        tipo_cuenta='AHORRO', moneda='SOLES', esta_activa=True,
+        embargo_total=False, embargos_vigentes=0
+    ).order_by('pk').values_list('pk', 'numero_cuenta'))
+    if len(cuentas) < 2:
+      raise CommandError('No hay suficientes cuentas de ahorro en soles para medir')
+    muestra = self.aleatorio.sample(cuentas, min(20, len(cuentas)))
+
+    # Saldo suficiente para que las transferencias medidas nunca se rechacen
+    # saldo_disponible va primero (ver expresion_saldo_disponible)
+    Cuenta.objects.filter(pk__in=[pk for pk, _ in muestra]).update(
+        saldo_disponible=expresion_saldo_disponible(saldo=F('saldo') + 100000),
+        saldo=F('saldo') + 100000)
+
+    def elegir():
+      return self.aleatorio.choice(muestra)
+
+    def transferir():
+      (origen, _), (destino, _) = self.aleatorio.sample(muestra, 2)
+      return cliente.post(reverse('operaciones:realizar_transferencia'), {
+        'cuenta_origen': origen, 'cuenta_destino': destino,
+        'monto_origen': '10.00', 'descripcion': 'benchmark',
+      })
+
+    return [
+      ('dashboard', lambda: cliente.get(reverse('core:dashboard'))),
+      ('lista_cuentas', lambda: cliente.get(reverse('cuentas:lista_cuentas'))),
+      ('detalle_cuenta', lambda: cliente.get(
+          reverse('cuentas:detalle_cuenta', args=[elegir()[0]]))),
+      ('movimientos_cuenta', lambda: cliente.get(
+          reverse('cuentas:movimientos_cuenta', args=[elegir()[0]]))),
+      ('resumen_operaciones_dia', lambda: cliente.get(
+          reverse('reportes:resumen_operaciones_dia'))),
+      ('buscar_cuenta_ajax', lambda: cliente.get(
+          reverse('cuentas:buscar_cuenta_ajax'), {'q': elegir()[1][-6:]})),
+      ('deposito_post', lambda: cliente.post(
+          reverse('operaciones:realizar_deposito'),
+          {'cuenta': elegir()[0], 'monto': '50.00'})),
+      ('transferencia_post', transferir),
+    ]
+
+  def _medir_vista(self, solicitud):
+    tiempos = []
+    consultas = []
+    for repeticion in range(self.calentamiento + self.repeticiones):
+      with ExitStack() as pila:
+        capturas = [pila.enter_context(CaptureQueriesContext(conexion))
+                    for conexion in connections.all()]
+        inicio = time.perf_counter()
+        respuesta = solicitud()
+        duracion = time.perf_counter() - inicio
+
+      if respuesta.status_code >= 400:
+        raise CommandError(f'La vista respondió {respuesta.status_code}')
+      if repeticion >= self.calentamiento:
+        tiempos.append(duracion * 1000)
+        consultas.append(sum(len(captura) for captura in capturas))
+
+    return {
+      'p50_ms': round(statistics.median(tiempos), 2),
+      'p95_ms': round(percentil(tiempos, 0.95), 2),
+      'media_ms': round(statistics.fmean(tiempos), 2),
+      'consultas': max(consultas),
+    }
+
+  def _comparar(self, resultados, base, tolerancia):
+    """Muestra las diferencias con la línea base y retorna las regresiones"""
+    self.stdout.write('Comparación con la línea base:')
+    regresiones = 0
+    for tamano, vistas in resultados.items():
+      for nombre, actual in vistas.items():
+        previo = base.get(tamano, {}).get(nombre)
+        if previo is None:
+          continue
+
+        variacion = (actual['p95_ms'] - previo['p95_ms']) / max(previo['p95_ms'], 0.01)
+        lenta = variacion > tolerancia
+        mas_consultas = actual['consultas'] > previo['consultas']
+        linea = (f'  [{tamano}] {nombre:<28} p95 {previo["p95_ms"]:.2f} -> '
+                 f'{actual["p95_ms"]:.2f} ms ({variacion:+.0%}), consultas '
+                 f'{previo["consultas"]} -> {actual["consultas"]}')
+        if lenta or mas_consultas:
+          regresiones += 1
+          self.stdout.write(self.style.ERROR(linea))
+        else:
+          self.stdout.write(linea)
+    return regresiones
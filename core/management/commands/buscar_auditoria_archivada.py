@@ -0,0 +1,64 @@
+import csv
+import json
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from core.archivo_auditoria import buscar_en_archivo
+
+
+class Command(BaseCommand):
+  help = 'Busca eventos en los archivos de auditoría comprimidos sin restaurarlos'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--desde', help='Fecha u hora inicial (AAAA-MM-DD[THH:MM])')
+    parser.add_argument('--hasta', help='Fecha u hora final (AAAA-MM-DD[THH:MM])')
+    parser.add_argument('--usuario', help='Nombre de usuario')
+    parser.add_argument('--tipo-evento', help='Tipo de evento, p. ej. LOGIN_FALLIDO')
+    parser.add_argument('--ip', help='Dirección IP')
+    parser.add_argument('--texto', help='Texto a buscar en cualquier campo')
+    parser.add_argument('--formato', choices=['jsonl', 'csv'], default='jsonl')
+
+  def _fecha(self, valor, fin_de_dia=False):
+    if not valor:
+      return None
+
+    fecha = parse_date(valor)
+    if fecha:
+      fecha_hora = datetime.combine(fecha, time.max if fin_de_dia else time.min)
+    else:
+      fecha_hora = parse_datetime(valor)
+    if fecha_hora is None:
+      raise CommandError(f'Fecha inválida: {valor}')
+
+    if timezone.is_naive(fecha_hora):
+      fecha_hora = timezone.make_aware(fecha_hora)
+    return fecha_hora
+
+  def handle(self, *args, **options):
+    eventos = buscar_en_archivo(
+        desde=self._fecha(options['desde']),
+        hasta=self._fecha(options['hasta'], fin_de_dia=True),
+        usuario=options['usuario'],
+        tipo_evento=options['tipo_evento'],
+        ip_address=options['ip'],
+        texto=options['texto']
+    )
+
+    total = 0
+    if options['formato'] == 'csv':
+      escritor = None
+      for evento in eventos:
+        if escritor is None:
+          escritor = csv.DictWriter(self.stdout, fieldnames=list(evento))
+          escritor.writeheader()
+        escritor.writerow(evento)
+        total += 1
+    else:
+      for evento in eventos:
+        self.stdout.write(json.dumps(evento, ensure_ascii=False))
+        total += 1
+
+    self.stderr.write(f'{total} evento(s) encontrados')
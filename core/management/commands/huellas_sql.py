@@ -0,0 +1,81 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.huellas_sql import combinar_volcados
+
+
+ORDENES = {
+  'total': lambda datos: datos['total'],
+  'cantidad': lambda datos: datos['cantidad'],
+  'maximo': lambda datos: datos['maximo'],
+  'promedio': lambda datos: datos['total'] / datos['cantidad'],
+}
+
+
+class Command(BaseCommand):
+  help = ('Combina las huellas SQL volcadas por los workers y muestra las '
+          'sentencias que más tiempo consumen y las consultas lentas')
+
+  def add_arguments(self, parser):
+    parser.add_argument('--directorio',
+                        default=getattr(settings, 'SQL_HUELLAS_DIR', None),
+                        help='Directorio con los archivos huellas-*.json')
+    parser.add_argument('--orden', choices=sorted(ORDENES), default='total',
+                        help='Criterio para ordenar las huellas')
+    parser.add_argument('--limite', type=int, default=20,
+                        help='Cantidad de huellas mostradas')
+    parser.add_argument('--lentas', type=int, default=10,
+                        help='Cantidad de consultas lentas mostradas (0 para omitirlas)')
+    parser.add_argument('--json', action='store_true',
+                        help='Escribe el resultado combinado en JSON')
+    parser.add_argument('--limpiar', action='store_true',
+                        help='Elimina los volcados después de combinarlos')
+
+  def handle(self, *args, **options):
+    if not options['directorio']:
+      raise CommandError('SQL_HUELLAS_DIR no está configurado')
+    directorio = Path(options['directorio'])
+    rutas = sorted(directorio.glob('huellas-*.json'))
+    if not rutas:
+      raise CommandError(f'No hay volcados de huellas en {directorio}')
+
+    combinado = combinar_volcados(rutas)
+    huellas = sorted(combinado['huellas'].items(),
+                     key=lambda item: ORDENES[options['orden']](item[1]),
+                     reverse=True)[:options['limite']]
+    lentas = combinado['lentas'][:options['lentas']]
+
+    if options['json']:
+      self.stdout.write(json.dumps({
+        'workers': combinado['workers'],
+        'huellas': [{'huella': clave, **datos} for clave, datos in huellas],
+        'lentas': lentas,
+      }, ensure_ascii=False, indent=2))
+    else:
+      self._mostrar(combinado['workers'], huellas, lentas)
+
+    if options['limpiar']:
+      for ruta in rutas:
+        ruta.unlink(missing_ok=True)
+
+  def _mostrar(self, workers, huellas, lentas):
+    self.stdout.write(f'{len(workers)} worker(s): {", ".join(workers)}\n')
+    self.stdout.write(f'{"cantidad":>9} {"total ms":>11} {"prom ms":>9} '
+                      f'{"máx ms":>9}  huella')
+    for clave, datos in huellas:
+      self.stdout.write(
+          f'{datos["cantidad"]:>9} {datos["total"] * 1000:>11.1f} '
+          f'{datos["total"] * 1000 / datos["cantidad"]:>9.2f} '
+          f'{datos["maximo"] * 1000:>9.2f}  {clave[:300]}')
+
+    if not lentas:
+      return
+    self.stdout.write(self.style.WARNING(f'\nConsultas lentas ({len(lentas)}):'))
+    for lenta in lentas:
+      self.stdout.write(f'{lenta["ms"]:.0f} ms  {lenta["fecha"]}  '
+                        f'{lenta["vista"] or "-"}  {lenta["sql"][:300]}')
+      for marco in lenta['pila']:
+        self.stdout.write(f'    {marco}')
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.archivo_auditoria import archivar_auditoria, directorio_archivo
+
+
+class Command(BaseCommand):
+  help = ('Archiva en JSONL comprimido por día los eventos de auditoría '
+          'anteriores a la retención y los elimina de la base de datos')
+
+  def add_arguments(self, parser):
+    parser.add_argument('--dias', type=int,
+                        default=getattr(settings, 'AUDITORIA_RETENCION_DIAS', 365),
+                        help='Días de auditoría que se conservan en la base de datos')
+    parser.add_argument('--lote', type=int, default=1000,
+                        help='Filas archivadas y eliminadas por transacción')
+    parser.add_argument('--pausa', type=float, default=0.05,
+                        help='Segundos de espera entre lotes')
+    parser.add_argument('--simular', action='store_true',
+                        help='Solo cuenta los eventos que se archivarían')
+
+  def handle(self, *args, **options):
+    resultado = archivar_auditoria(
+        dias=options['dias'],
+        lote=options['lote'],
+        pausa=options['pausa'],
+        simular=options['simular']
+    )
+
+    if options['simular']:
+      self.stdout.write(
+          f'{resultado["archivados"]} evento(s) anteriores a '
+          f'{resultado["limite"]:%d/%m/%Y %H:%M} se archivarían')
+      return
+
+    self.stdout.write(self.style.SUCCESS(
+        f'{resultado["archivados"]} evento(s) archivados en {resultado["lotes"]} '
+        f'lote(s) en {directorio_archivo()}'))
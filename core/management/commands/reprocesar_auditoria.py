@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.auditoria import obtener_escritor
+
+
+class Command(BaseCommand):
+  help = 'Inserta los eventos de auditoría pendientes en los archivos de respaldo'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--antiguedad-minima', type=int, default=60,
+                        help='Segundos sin modificar que debe tener un archivo '
+                             'para reprocesarlo')
+
+  def handle(self, *args, **options):
+    escritor = obtener_escritor()
+    total = escritor.reprocesar_respaldo(
+        antiguedad_minima=options['antiguedad_minima'])
+    self.stdout.write(self.style.SUCCESS(
+        f'{total} evento(s) de auditoría reprocesados desde '
+        f'{escritor.directorio_respaldo}'))
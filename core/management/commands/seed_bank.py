@@ -0,0 +1,76 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.datos_sinteticos import GeneradorBanco
+from core.models import Usuario
+
+
+class Command(BaseCommand):
+  help = ('Genera clientes, cuentas, movimientos, embargos y tipos de cambio '
+          'sintéticos y reproducibles para pruebas de rendimiento')
+
+  def add_arguments(self, parser):
+    parser.add_argument('--clientes', type=int, default=1000)
+    parser.add_argument('--cuentas-por-cliente', type=int, default=2,
+                        help='Promedio de cuentas por cliente')
+    parser.add_argument('--movimientos-por-cuenta', type=int, default=100,
+                        help='Promedio de movimientos por cuenta (sin plazo fijo)')
+    parser.add_argument('--anios', type=int, default=3,
+                        help='Años de historial')
+    parser.add_argument('--hasta', type=date.fromisoformat, default=None,
+                        help='Fecha final del historial AAAA-MM-DD (por defecto hoy)')
+    parser.add_argument('--tasa-juridicas', type=float, default=0.15,
+                        help='Fracción de clientes que son personas jurídicas')
+    parser.add_argument('--tasa-embargos', type=float, default=0.02,
+                        help='Fracción de cuentas con embargo')
+    parser.add_argument('--lote', type=int, default=5000,
+                        help='Filas por bulk_create')
+    parser.add_argument('--eventos-por-bloque', type=int, default=200000,
+                        help='Movimientos simulados en memoria por transacción')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--usuario', default=None,
+                        help='Usuario que registra los datos (por defecto el '
+                             'primer administrador)')
+
+  def handle(self, *args, **options):
+    if options['usuario']:
+      usuario = Usuario.objects.filter(username=options['usuario']).first()
+    else:
+      usuario = Usuario.objects.filter(
+          tipo_usuario='ADMINISTRADOR').order_by('pk').first()
+    if usuario is None:
+      raise CommandError('No hay un usuario para registrar los datos; '
+                         'cree un administrador o use --usuario')
+
+    generador = GeneradorBanco(
+        usuario,
+        semilla=options['semilla'],
+        clientes=options['clientes'],
+        cuentas_por_cliente=options['cuentas_por_cliente'],
+        movimientos_por_cuenta=options['movimientos_por_cuenta'],
+        anios=options['anios'],
+        tasa_juridicas=options['tasa_juridicas'],
+        tasa_embargos=options['tasa_embargos'],
+        lote=options['lote'],
+        eventos_por_bloque=options['eventos_por_bloque'],
+        hasta=options['hasta'],
+    )
+
+    inicio = time.perf_counter()
+
+    def al_avanzar(resumen):
+      segundos = time.perf_counter() - inicio
+      self.stdout.write(
+          f'  {resumen["cliente"]} clientes, {resumen["cuenta"]} cuentas, '
+          f'{resumen["movimiento"]} movimientos '
+          f'({resumen["movimiento"] / max(segundos, 0.001):.0f} mov/s)')
+
+    resumen = generador.generar(al_avanzar=al_avanzar)
+
+    self.stdout.write(self.style.SUCCESS(
+        f'Datos generados en {time.perf_counter() - inicio:.1f} s '
+        f'(semilla {options["semilla"]}):'))
+    for modelo, cantidad in resumen.items():
+      self.stdout.write(f'  {modelo}: {cantidad}')
@@ -0,0 +1,64 @@
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.trabajos import Trabajador
+
+
+class Command(BaseCommand):
+  help = ('Ejecuta los trabajos en segundo plano de la cola en la base de '
+          'datos y encola las tareas programadas. Se pueden correr varios '
+          'trabajadores en uno o más nodos')
+
+  def add_arguments(self, parser):
+    parser.add_argument('--nombre',
+                        help='Identificador del trabajador (por defecto host-pid)')
+    parser.add_argument('--intervalo', type=float,
+                        help='Segundos de espera cuando la cola está vacía '
+                             '(por defecto TRABAJOS_INTERVALO)')
+    parser.add_argument('--arriendo', type=int,
+                        help='Segundos de arriendo de cada trabajo '
+                             '(por defecto TRABAJOS_ARRIENDO)')
+    parser.add_argument('--sin-programador', action='store_true',
+                        help='No encola las tareas programadas')
+    parser.add_argument('--una-vez', action='store_true',
+                        help='Termina cuando no quedan trabajos listos')
+    parser.add_argument('--maximo', type=int,
+                        help='Termina después de procesar esta cantidad de trabajos')
+
+  def handle(self, *args, **options):
+    if options['arriendo'] is not None and options['arriendo'] < 3:
+      raise CommandError('--arriendo debe ser de al menos 3 segundos')
+
+    trabajador = Trabajador.desde_settings(
+        nombre=options['nombre'],
+        intervalo=options['intervalo'],
+        arriendo=options['arriendo'],
+        programador=not options['sin_programador']
+    )
+
+    def detener(numero, marco):
+      self.stdout.write('Deteniendo al terminar el trabajo en curso...')
+      trabajador.detener()
+
+    signal.signal(signal.SIGTERM, detener)
+    signal.signal(signal.SIGINT, detener)
+
+    self.stdout.write(f'Trabajador {trabajador.nombre} iniciado')
+    procesados = trabajador.ejecutar(una_vez=options['una_vez'],
+                                     maximo=options['maximo'],
+                                     al_terminar=self._reportar)
+    self.stdout.write(self.style.SUCCESS(
+        f'{procesados} trabajo(s) procesados: {trabajador.completados} '
+        f'completado(s), {trabajador.fallidos} fallido(s)'))
+
+  def _reportar(self, trabajo):
+    mensaje = (f'Trabajo {trabajo.pk} {trabajo.tarea}: {trabajo.estado} '
+               f'en {trabajo.duracion_ms} ms (intento {trabajo.intentos})')
+    if trabajo.estado == 'COMPLETADO':
+      self.stdout.write(mensaje)
+    elif trabajo.estado == 'PENDIENTE':
+      self.stdout.write(self.style.WARNING(
+          f'{mensaje}; se reintenta desde {trabajo.ejecutar_desde:%H:%M:%S}'))
+    else:
+      self.stdout.write(self.style.ERROR(mensaje))
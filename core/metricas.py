@@ -0,0 +1,163 @@
+import os
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from prometheus_client import (
+  CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+  generate_latest,
+)
+from prometheus_client import multiprocess
+
+
+BUCKETS_DURACION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+BUCKETS_ESPERA = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+SIN_VISTA = '<sin_vista>'
+
+SOLICITUDES = Counter(
+    'banca_http_solicitudes_total', 'Solicitudes atendidas',
+    ['vista', 'metodo', 'estado'])
+DURACION = Histogram(
+    'banca_http_duracion_segundos', 'Duración de las solicitudes por vista',
+    ['vista', 'metodo'], buckets=BUCKETS_DURACION)
+EN_CURSO = Gauge(
+    'banca_http_solicitudes_en_curso', 'Solicitudes en curso',
+    multiprocess_mode='livesum')
+CONSULTAS = Histogram(
+    'banca_db_consultas_por_solicitud', 'Consultas SQL por solicitud',
+    ['vista'], buckets=BUCKETS_CONSULTAS)
+TIEMPO_BD = Histogram(
+    'banca_db_tiempo_por_solicitud_segundos', 'Tiempo en SQL por solicitud',
+    ['vista'], buckets=BUCKETS_DURACION)
+CONEXIONES_CREADAS = Counter(
+    'banca_db_conexiones_creadas_total', 'Conexiones abiertas a la base de datos',
+    ['alias'])
+CONEXIONES_SOLICITUD = Counter(
+    'banca_db_conexiones_solicitud_total',
+    'Solicitudes que abrieron una conexión nueva o encontraron una persistente',
+    ['alias', 'tipo'])
+
+OPERACIONES = Counter(
+    'banca_operaciones_total', 'Operaciones registradas',
+    ['tipo', 'moneda'])
+MONTO_OPERACIONES = Counter(
+    'banca_operaciones_monto_total', 'Monto de las operaciones registradas',
+    ['tipo', 'moneda'])
+OPERACIONES_FALLIDAS = Counter(
+    'banca_operaciones_fallidas_total', 'Operaciones rechazadas o fallidas',
+    ['tipo', 'motivo'])
+REINTENTOS = Counter(
+    'banca_operaciones_reintentos_total',
+    'Operaciones repetidas por interbloqueo o espera de bloqueo agotada',
+    ['motivo'])
+ESPERA_BLOQUEO = Histogram(
+    'banca_operaciones_espera_bloqueo_segundos',
+    'Tiempo de espera para bloquear las cuentas de una operación',
+    ['tipo'], buckets=BUCKETS_ESPERA)
+
+
+def _al_crear_conexion(sender, connection, **kwargs):
+  CONEXIONES_CREADAS.labels(connection.alias).inc()
+
+
+connection_created.connect(_al_crear_conexion,
+                           dispatch_uid='metricas_conexion_creada')
+
+
+def multiproceso() -> bool:
+  """
+  Indica si las métricas se agregan entre procesos
+
+  Con varios workers (gunicorn) PROMETHEUS_MULTIPROC_DIR debe apuntar a un
+  directorio vacío al arrancar: cada proceso escribe sus valores en archivos
+  de ese directorio y /metrics los suma.
+  """
+  return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def exponer():
+  """Retorna (contenido, content_type) con todas las métricas"""
+  if multiproceso():
+    registro = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registro)
+  else:
+    registro = REGISTRY
+  return generate_latest(registro), CONTENT_TYPE_LATEST
+
+
+def marcar_proceso_terminado(pid: int) -> None:
+  """Descarta los valores 'live' de un worker terminado (hook child_exit)"""
+  if multiproceso():
+    multiprocess.mark_process_dead(pid)
+
+
+class MedicionSolicitud:
+  """
+  Mide una solicitud: duración, consultas SQL y uso de conexiones
+
+  Las consultas se cuentan con un execute_wrapper en cada conexión, que
+  solo suma un contador y un perf_counter por consulta.
+  """
+
+  def __init__(self):
+    self.consultas = 0
+    self.segundos_bd = 0.0
+    self._abiertas = {}
+    self._pila = ExitStack()
+    self._inicio = None
+
+  def _medir_consulta(self, execute, sql, params, many, context):
+    inicio = time.perf_counter()
+    try:
+      return execute(sql, params, many, context)
+    finally:
+      self.segundos_bd += time.perf_counter() - inicio
+      self.consultas += 1
+
+  def __enter__(self):
+    for conexion in connections.all():
+      self._abiertas[conexion.alias] = conexion.connection is not None
+      self._pila.enter_context(conexion.execute_wrapper(self._medir_consulta))
+    EN_CURSO.inc()
+    self._inicio = time.perf_counter()
+    return self
+
+  def __exit__(self, *exc_info):
+    self.segundos = time.perf_counter() - self._inicio
+    EN_CURSO.dec()
+    self._pila.close()
+    return False
+
+  def registrar(self, vista: str, metodo: str, estado: int) -> None:
+    vista = vista or SIN_VISTA
+    SOLICITUDES.labels(vista, metodo, str(estado)).inc()
+    DURACION.labels(vista, metodo).observe(self.segundos)
+    CONSULTAS.labels(vista).observe(self.consultas)
+    TIEMPO_BD.labels(vista).observe(self.segundos_bd)
+
+    for alias, abierta_antes in self._abiertas.items():
+      abierta = connections[alias].connection is not None
+      if abierta_antes:
+        CONEXIONES_SOLICITUD.labels(alias, 'reutilizada').inc()
+      elif abierta:
+        CONEXIONES_SOLICITUD.labels(alias, 'nueva').inc()
+
+
+def registrar_operacion(tipo: str, moneda: str, monto) -> None:
+  OPERACIONES.labels(tipo, moneda).inc()
+  MONTO_OPERACIONES.labels(tipo, moneda).inc(float(monto))
+
+
+def registrar_fallo(tipo: str, motivo: str) -> None:
+  OPERACIONES_FALLIDAS.labels(tipo, motivo).inc()
+
+
+def registrar_reintento(motivo: str) -> None:
+  REINTENTOS.labels(motivo).inc()
+
+
+def registrar_espera_bloqueo(tipo: str, segundos: float) -> None:
+  ESPERA_BLOQUEO.labels(tipo).observe(segundos)
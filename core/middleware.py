@@ -1,3 +1,8 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core import signing
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.utils import timezone
@@ -6,40 +11,239 @@ from django.contrib import messages
 from datetime import timedelta
 
 
+logger = logging.getLogger(__name__)
+
+
 class SessionTimeoutMiddleware:
-  """Middleware para manejar el timeout de sesión por inactividad"""
+  """
+  Middleware para manejar el timeout de sesión por inactividad
+
+  last_activity solo se escribe en la sesión cuando avanzó más de
+  SESSION_ACTIVIDAD_UMBRAL segundos, de modo que la mayoría de solicitudes
+  no modifican la sesión ni generan escrituras en el almacén de sesiones.
+  """
 
   def __init__(self, get_response):
     self.get_response = get_response
+    self.inactividad = getattr(settings, 'SESSION_INACTIVIDAD_SEGUNDOS', 60)
+    self.umbral = getattr(settings, 'SESSION_ACTIVIDAD_UMBRAL', 0)
+    self._rutas_excluidas = None
 
-  def __call__(self, request):
-    if request.user.is_authenticated:
-      # Rutas excluidas del timeout
-      excluded_paths = [
+  @property
+  def rutas_excluidas(self):
+    """Rutas excluidas del timeout, resueltas una sola vez"""
+    if self._rutas_excluidas is None:
+      self._rutas_excluidas = frozenset([
         reverse('core:logout'),
-      ]
+      ])
+    return self._rutas_excluidas
 
-      if request.path not in excluded_paths:
-        last_activity = request.session.get('last_activity')
+  def __call__(self, request):
+    if request.user.is_authenticated and request.path not in self.rutas_excluidas:
+      now = timezone.now().timestamp()
+      last_activity = request.session.get('last_activity')
 
-        if last_activity:
-          now = timezone.now().timestamp()
-          # 60 segundos de inactividad (1 minuto)
-          if now - last_activity > 60:
-            logout(request)
-            messages.warning(
-                request,
-                'Su sesión ha expirado por inactividad. Por favor, inicie sesión nuevamente.'
-            )
-            return redirect('core:login')
+      if last_activity:
+        if now - last_activity > self.inactividad:
+          logout(request)
+          messages.warning(
+              request,
+              'Su sesión ha expirado por inactividad. Por favor, inicie sesión nuevamente.'
+          )
+          return redirect('core:login')
 
-        # Actualizar última actividad
-        request.session['last_activity'] = timezone.now().timestamp()
+      # Actualizar última actividad solo si avanzó más que el umbral
+      if not last_activity or now - last_activity >= self.umbral:
+        request.session['last_activity'] = now
 
     response = self.get_response(request)
     return response
 
 
+class ReplicaLecturaMiddleware:
+  """
+  Middleware que envía a la réplica las lecturas de reportes y listados
+
+  Solo aplica a solicitudes GET/HEAD de las vistas en DB_REPLICA_VISTAS
+  (se admite 'app:*' para todo un namespace). Tras una solicitud que
+  modifica datos se deja una cookie firmada que mantiene al usuario en el
+  primario durante DB_REPLICA_VENTANA_PRIMARIO segundos, para que vea sus
+  propias escrituras aunque la réplica tenga retraso.
+  """
+
+  COOKIE = 'db_primario_hasta'
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    self.vistas = set(getattr(settings, 'DB_REPLICA_VISTAS', []))
+    self.ventana = getattr(settings, 'DB_REPLICA_VENTANA_PRIMARIO', 10)
+
+  def __call__(self, request):
+    from core.db_router import desactivar_replica, replica_configurada
+
+    try:
+      response = self.get_response(request)
+    finally:
+      token = getattr(request, '_token_replica', None)
+      if token is not None:
+        desactivar_replica(token)
+
+    if (replica_configurada() and request.method not in ('GET', 'HEAD', 'OPTIONS')
+        and response.status_code < 400):
+      response.set_signed_cookie(
+          self.COOKIE,
+          str(time.time() + self.ventana),
+          max_age=self.ventana,
+          httponly=True,
+          secure=settings.SESSION_COOKIE_SECURE,
+          samesite='Lax'
+      )
+
+    return response
+
+  def process_view(self, request, view_func, view_args, view_kwargs):
+    from core.db_router import activar_replica, replica_configurada
+
+    if not replica_configurada() or request.method not in ('GET', 'HEAD'):
+      return None
+
+    coincidencia = request.resolver_match
+    if (coincidencia.view_name not in self.vistas and
+        f'{coincidencia.namespace}:*' not in self.vistas):
+      return None
+
+    if self._en_ventana_primario(request):
+      return None
+
+    request._token_replica = activar_replica()
+    return None
+
+  def _en_ventana_primario(self, request):
+    """Verifica si el usuario escribió hace menos de la ventana"""
+    try:
+      hasta = float(request.get_signed_cookie(self.COOKIE, max_age=self.ventana))
+    except (KeyError, ValueError, signing.BadSignature):
+      return False
+    return time.time() < hasta
+
+
+class MetricasMiddleware:
+  """
+  Middleware que registra las métricas Prometheus de cada solicitud
+
+  Duración y estado por vista, consultas SQL y tiempo en la base de datos
+  y uso de conexiones persistentes (ver core.metricas). Debe ir primero en
+  MIDDLEWARE para medir también a los demás middlewares.
+  """
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+
+  def __call__(self, request):
+    from core.metricas import MedicionSolicitud
+
+    with MedicionSolicitud() as medicion:
+      response = self.get_response(request)
+
+    coincidencia = request.resolver_match
+    medicion.registrar(coincidencia.view_name if coincidencia else None,
+                       request.method, response.status_code)
+    return response
+
+
+class HuellasSQLMiddleware:
+  """
+  Middleware que agrega las consultas SQL de cada solicitud por huella
+
+  Instala el recolector de core.huellas_sql en todas las conexiones; las
+  consultas más lentas que SQL_LENTAS_UMBRAL_MS se registran con la vista
+  que las originó. El resumen por worker se combina con el comando
+  huellas_sql.
+  """
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    self.activo = getattr(settings, 'SQL_HUELLAS_ACTIVAS', False)
+
+  def __call__(self, request):
+    from contextlib import ExitStack
+
+    from django.db import connections
+
+    from core.huellas_sql import obtener_recolector, vista_actual
+
+    if not self.activo:
+      return self.get_response(request)
+
+    recolector = obtener_recolector()
+    token = vista_actual.set(None)
+    try:
+      with ExitStack() as pila:
+        for conexion in connections.all():
+          pila.enter_context(conexion.execute_wrapper(recolector))
+        return self.get_response(request)
+    finally:
+      vista_actual.reset(token)
+
+  def process_view(self, request, view_func, view_args, view_kwargs):
+    from core.huellas_sql import vista_actual
+
+    if self.activo:
+      vista_actual.set(request.resolver_match.view_name)
+    return None
+
+
+class PerfiladorMiddleware:
+  """
+  Middleware que perfila solicitudes seleccionadas y guarda el resultado
+
+  Con PERFILADOR_ACTIVO se perfilan las solicitudes de los usuarios en
+  PERFILADOR_USUARIOS, las rutas que coinciden con PERFILADOR_RUTAS y una
+  fracción PERFILADOR_MUESTREO del resto; un administrador puede además
+  perfilar una solicitud agregando ?perfilar=1. Solo se guardan las que
+  superan PERFILADOR_UMBRAL_MS (las forzadas siempre). Ver core.perfilador.
+  """
+
+  PARAMETRO = 'perfilar'
+
+  def __init__(self, get_response):
+    from core.perfilador import ConfiguracionPerfilador
+
+    self.get_response = get_response
+    self.configuracion = ConfiguracionPerfilador.desde_settings()
+
+  def __call__(self, request):
+    from core.perfilador import PerfilSolicitud
+
+    if not self.configuracion.activo:
+      return self.get_response(request)
+
+    forzado = (request.GET.get(self.PARAMETRO) == '1'
+               and request.user.is_authenticated
+               and request.user.es_administrador())
+    if not forzado and not self.configuracion.debe_perfilar(request):
+      return self.get_response(request)
+
+    with PerfilSolicitud(self.configuracion) as perfil:
+      response = self.get_response(request)
+
+    if forzado or perfil.duracion_ms >= self.configuracion.umbral_ms:
+      coincidencia = request.resolver_match
+      try:
+        perfil.guardar({
+          'vista': coincidencia.view_name if coincidencia else None,
+          'metodo': request.method,
+          'ruta': request.get_full_path()[:500],
+          'estado': response.status_code,
+          'usuario': (request.user.get_username()
+                      if request.user.is_authenticated else None),
+        })
+      except OSError:
+        logger.exception('No se pudo guardar el perfil de %s', request.path)
+
+    return response
+
+
 class LoginAttemptMiddleware:
   """Middleware para verificar intentos de login fallidos"""
 
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditoriaacceso',
+            name='fecha_hora',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_auditoria_fecha_evento'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='auditoriaacceso',
+            options={'ordering': ['-fecha_hora', '-id'], 'verbose_name': 'Auditoría de Acceso', 'verbose_name_plural': 'Auditorías de Accesos'},
+        ),
+        migrations.AlterField(
+            model_name='auditoriaacceso',
+            name='tipo_evento',
+            field=models.CharField(choices=[('LOGIN_EXITOSO', 'Login exitoso'), ('LOGIN_FALLIDO', 'Login fallido'), ('LOGIN_BLOQUEADO', 'Login de usuario bloqueado'), ('LOGIN_INACTIVO', 'Login de usuario inactivo'), ('LOGOUT', 'Cierre de sesión'), ('CREAR_USUARIO', 'Creación de usuario'), ('EDITAR_USUARIO', 'Edición de usuario'), ('CAMBIAR_ESTADO_USUARIO', 'Cambio de estado de usuario'), ('DESBLOQUEAR_USUARIO', 'Desbloqueo de usuario'), ('EXPORTAR_AUDITORIA', 'Exportación de auditoría')], max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='auditoriaacceso',
+            index=models.Index(fields=['-fecha_hora'], name='auditoria_a_fecha_h_98c462_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditoriaacceso',
+            index=models.Index(fields=['usuario', '-fecha_hora'], name='auditoria_a_usuario_9a8dd3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditoriaacceso',
+            index=models.Index(fields=['tipo_evento', '-fecha_hora'], name='auditoria_a_tipo_ev_585acd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditoriaacceso',
+            index=models.Index(fields=['ip_address', '-fecha_hora'], name='auditoria_a_ip_addr_22728d_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_indices_auditoria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TareaProgramada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('tarea', models.CharField(max_length=100)),
+                ('argumentos', models.JSONField(blank=True, default=dict)),
+                ('intervalo_segundos', models.PositiveIntegerField(blank=True, null=True)),
+                ('hora', models.TimeField(blank=True, null=True)),
+                ('activa', models.BooleanField(default=True)),
+                ('proxima_ejecucion', models.DateTimeField()),
+                ('ultima_ejecucion', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Tarea Programada',
+                'verbose_name_plural': 'Tareas Programadas',
+                'db_table': 'tareas_programadas',
+                'ordering': ['nombre'],
+                'indexes': [models.Index(fields=['activa', 'proxima_ejecucion'], name='tareas_prog_activa_c41979_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Trabajo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tarea', models.CharField(max_length=100)),
+                ('argumentos', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_EJECUCION', 'En ejecución'), ('COMPLETADO', 'Completado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=15)),
+                ('prioridad', models.SmallIntegerField(default=0)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('max_intentos', models.PositiveSmallIntegerField(default=5)),
+                ('ejecutar_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('bloqueado_por', models.CharField(blank=True, max_length=100)),
+                ('bloqueado_hasta', models.DateTimeField(blank=True, null=True)),
+                ('resultado', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('espera_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('duracion_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('programacion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos', to='core.tareaprogramada')),
+            ],
+            options={
+                'verbose_name': 'Trabajo',
+                'verbose_name_plural': 'Trabajos',
+                'db_table': 'trabajos',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['estado', '-prioridad', 'ejecutar_desde'], name='trabajos_estado_b38edc_idx'), models.Index(fields=['estado', 'bloqueado_hasta'], name='trabajos_estado_c8155f_idx'), models.Index(fields=['tarea', '-fecha_fin'], name='trabajos_tarea_5533b5_idx')],
+            },
+        ),
+    ]
@@ -1,7 +1,11 @@
 from django.db import models
 
 # Create your models here.
+from datetime import datetime, timedelta
+
 from django.db import models
+from django.db.models import Case, F, Q, Value, When
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -48,21 +52,44 @@ class Usuario(AbstractUser):
     return self.esta_activo and not self.bloqueado and self.is_active
 
   def incrementar_intentos_fallidos(self):
-    """Incrementa los intentos fallidos de login"""
-    self.intentos_fallidos += 1
-    self.ultimo_intento_fallido = timezone.now()
+    """
+    Incrementa los intentos fallidos de login
 
-    if self.intentos_fallidos >= 3:
-      self.bloqueado = True
-      self.fecha_bloqueo = timezone.now()
+    Usa un UPDATE con expresiones F sobre las columnas de bloqueo, de modo
+    que intentos concurrentes no se pierden y no se modifica el resto de la
+    fila. Las columnas que dependen del contador van primero (MySQL evalúa
+    el SET en orden).
+    """
+    maximo = getattr(settings, 'MAX_LOGIN_ATTEMPTS', 3)
+    ahora = timezone.now()
+    alcanza_maximo = Q(intentos_fallidos__gte=maximo - 1)
 
-    self.save()
+    Usuario.objects.filter(pk=self.pk).update(
+        fecha_bloqueo=Case(
+            When(alcanza_maximo & Q(bloqueado=False), then=Value(ahora)),
+            default=F('fecha_bloqueo')
+        ),
+        bloqueado=Case(
+            When(alcanza_maximo, then=Value(True)),
+            default=F('bloqueado')
+        ),
+        intentos_fallidos=F('intentos_fallidos') + 1,
+        ultimo_intento_fallido=ahora
+    )
+    self.refresh_from_db(fields=['intentos_fallidos', 'ultimo_intento_fallido',
+                                 'bloqueado', 'fecha_bloqueo'])
 
   def resetear_intentos_fallidos(self):
     """Resetea los intentos fallidos después de login exitoso"""
+    if not self.intentos_fallidos and self.ultimo_intento_fallido is None:
+      return
+
+    Usuario.objects.filter(pk=self.pk).update(
+        intentos_fallidos=0,
+        ultimo_intento_fallido=None
+    )
     self.intentos_fallidos = 0
     self.ultimo_intento_fallido = None
-    self.save()
 
   def desbloquear(self):
     """Desbloquea el usuario (solo administrador)"""
@@ -123,13 +150,27 @@ class TipoCambio(models.Model):
 
 class AuditoriaAcceso(models.Model):
   """Modelo para auditar accesos al sistema"""
+  TIPO_EVENTO_CHOICES = [
+    ('LOGIN_EXITOSO', 'Login exitoso'),
+    ('LOGIN_FALLIDO', 'Login fallido'),
+    ('LOGIN_BLOQUEADO', 'Login de usuario bloqueado'),
+    ('LOGIN_INACTIVO', 'Login de usuario inactivo'),
+    ('LOGOUT', 'Cierre de sesión'),
+    ('CREAR_USUARIO', 'Creación de usuario'),
+    ('EDITAR_USUARIO', 'Edición de usuario'),
+    ('CAMBIAR_ESTADO_USUARIO', 'Cambio de estado de usuario'),
+    ('DESBLOQUEAR_USUARIO', 'Desbloqueo de usuario'),
+    ('EXPORTAR_AUDITORIA', 'Exportación de auditoría'),
+  ]
+
   usuario = models.ForeignKey(
       Usuario,
       on_delete=models.CASCADE,
       related_name='auditorias_acceso'
   )
-  fecha_hora = models.DateTimeField(auto_now_add=True)
-  tipo_evento = models.CharField(max_length=50)
+  # Se asigna al ocurrir el evento, no al insertarlo (la escritura es diferida)
+  fecha_hora = models.DateTimeField(default=timezone.now, editable=False)
+  tipo_evento = models.CharField(max_length=50, choices=TIPO_EVENTO_CHOICES)
   ip_address = models.GenericIPAddressField(null=True, blank=True)
   user_agent = models.TextField(null=True, blank=True)
   exitoso = models.BooleanField(default=True)
@@ -139,7 +180,129 @@ class AuditoriaAcceso(models.Model):
     db_table = 'auditoria_accesos'
     verbose_name = 'Auditoría de Acceso'
     verbose_name_plural = 'Auditorías de Accesos'
-    ordering = ['-fecha_hora']
+    ordering = ['-fecha_hora', '-id']
+    # Cada filtro del explorador de auditoría tiene un índice que termina en
+    # fecha_hora; InnoDB agrega el id al final, lo que cubre el orden
+    # (-fecha_hora, -id) que usa la paginación por cursor
+    indexes = [
+      models.Index(fields=['-fecha_hora']),
+      models.Index(fields=['usuario', '-fecha_hora']),
+      models.Index(fields=['tipo_evento', '-fecha_hora']),
+      models.Index(fields=['ip_address', '-fecha_hora']),
+    ]
+
+  def __str__(self):
+    return f"{self.usuario.username} - {self.tipo_evento} - {self.fecha_hora}"
+
+class TareaProgramada(models.Model):
+  """
+  Programación recurrente de una tarea en segundo plano
+
+  Se sincroniza desde TRABAJOS_PROGRAMADOS (ver core.trabajos). Una tarea
+  se repite cada `intervalo_segundos` o una vez al día a la `hora` local.
+  """
+  nombre = models.CharField(max_length=100, unique=True)
+  tarea = models.CharField(max_length=100)
+  argumentos = models.JSONField(default=dict, blank=True)
+  intervalo_segundos = models.PositiveIntegerField(null=True, blank=True)
+  hora = models.TimeField(null=True, blank=True)
+  activa = models.BooleanField(default=True)
+  proxima_ejecucion = models.DateTimeField()
+  ultima_ejecucion = models.DateTimeField(null=True, blank=True)
+
+  class Meta:
+    db_table = 'tareas_programadas'
+    verbose_name = 'Tarea Programada'
+    verbose_name_plural = 'Tareas Programadas'
+    ordering = ['nombre']
+    indexes = [
+      models.Index(fields=['activa', 'proxima_ejecucion']),
+    ]
 
   def __str__(self):
-    return f"{self.usuario.username} - {self.tipo_evento} - {self.fecha_hora}"
\ No newline at end of file
+    return f"{self.nombre} ({self.tarea})"
+
+  @property
+  def frecuencia(self):
+    if self.hora is not None:
+      return f"Diaria a las {self.hora:%H:%M}"
+    return f"Cada {self.intervalo_segundos} s"
+
+  def calcular_proxima(self, desde=None):
+    """Siguiente ejecución posterior a `desde` (por defecto ahora)"""
+    desde = desde or timezone.now()
+    if self.hora is None:
+      return desde + timedelta(seconds=self.intervalo_segundos)
+
+    local = timezone.localtime(desde)
+    proxima = local.replace(hour=self.hora.hour, minute=self.hora.minute,
+                            second=0, microsecond=0)
+    if proxima <= local:
+      proxima = timezone.make_aware(
+          datetime.combine(local.date() + timedelta(days=1), self.hora))
+    return proxima
+
+
+class Trabajo(models.Model):
+  """
+  Trabajo en la cola de segundo plano
+
+  Un trabajador lo toma con SELECT ... FOR UPDATE SKIP LOCKED y lo marca
+  EN_EJECUCION con un arriendo (bloqueado_hasta) que renueva mientras lo
+  ejecuta; si el trabajador muere, el arriendo vence y otro lo retoma.
+  """
+  ESTADO_CHOICES = [
+    ('PENDIENTE', 'Pendiente'),
+    ('EN_EJECUCION', 'En ejecución'),
+    ('COMPLETADO', 'Completado'),
+    ('FALLIDO', 'Fallido'),
+  ]
+
+  tarea = models.CharField(max_length=100)
+  argumentos = models.JSONField(default=dict, blank=True)
+  estado = models.CharField(max_length=15, choices=ESTADO_CHOICES,
+                            default='PENDIENTE')
+  prioridad = models.SmallIntegerField(default=0)
+  intentos = models.PositiveSmallIntegerField(default=0)
+  max_intentos = models.PositiveSmallIntegerField(default=5)
+  ejecutar_desde = models.DateTimeField(default=timezone.now)
+  programacion = models.ForeignKey(
+      TareaProgramada,
+      on_delete=models.SET_NULL,
+      null=True,
+      blank=True,
+      related_name='trabajos'
+  )
+  # Arriendo del trabajador que lo ejecuta
+  bloqueado_por = models.CharField(max_length=100, blank=True)
+  bloqueado_hasta = models.DateTimeField(null=True, blank=True)
+  resultado = models.JSONField(null=True, blank=True)
+  error = models.TextField(blank=True)
+  # Espera desde que pudo ejecutarse hasta que un trabajador lo tomó
+  espera_ms = models.PositiveIntegerField(null=True, blank=True)
+  duracion_ms = models.PositiveIntegerField(null=True, blank=True)
+  fecha_creacion = models.DateTimeField(auto_now_add=True)
+  fecha_inicio = models.DateTimeField(null=True, blank=True)
+  fecha_fin = models.DateTimeField(null=True, blank=True)
+
+  class Meta:
+    db_table = 'trabajos'
+    verbose_name = 'Trabajo'
+    verbose_name_plural = 'Trabajos'
+    ordering = ['-id']
+    # La toma de trabajos recorre los pendientes listos por prioridad; los
+    # arriendos vencidos se buscan por (estado, bloqueado_hasta)
+    indexes = [
+      models.Index(fields=['estado', '-prioridad', 'ejecutar_desde']),
+      models.Index(fields=['estado', 'bloqueado_hasta']),
+      models.Index(fields=['tarea', '-fecha_fin']),
+    ]
+
+  def __str__(self):
+    return f"Trabajo {self.pk} - {self.tarea} - {self.estado}"
+
+  @property
+  def resumen_error(self):
+    """Última línea del error (la excepción, sin la traza)"""
+    lineas = self.error.strip().splitlines()
+    return lineas[-1] if lineas else ''
@@ -0,0 +1,243 @@
+import cProfile
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+
+# Nombres de los archivos de perfil: sin separadores de ruta
+NOMBRE_PERFIL = re.compile(r'^[\w.-]+\.(prof|txt)$')
+
+
+def directorio_perfiles() -> Path:
+  """Directorio donde se guardan los perfiles de solicitudes"""
+  return Path(getattr(settings, 'PERFILADOR_DIR',
+                      Path(settings.BASE_DIR) / 'var' / 'perfiles'))
+
+
+@dataclass
+class ConfiguracionPerfilador:
+  """Qué solicitudes se perfilan y cómo"""
+  activo: bool = False
+  usuarios: frozenset = frozenset()
+  rutas: tuple = ()
+  muestreo: float = 0.0
+  modo: str = 'cprofile'
+  intervalo: float = 0.005
+  umbral_ms: float = 500.0
+  maximo: int = 200
+
+  @classmethod
+  def desde_settings(cls) -> 'ConfiguracionPerfilador':
+    return cls(
+        activo=getattr(settings, 'PERFILADOR_ACTIVO', False),
+        usuarios=frozenset(getattr(settings, 'PERFILADOR_USUARIOS', ())),
+        rutas=tuple(re.compile(patron)
+                    for patron in getattr(settings, 'PERFILADOR_RUTAS', ())),
+        muestreo=getattr(settings, 'PERFILADOR_MUESTREO', 0.0),
+        modo=getattr(settings, 'PERFILADOR_MODO', 'cprofile'),
+        intervalo=getattr(settings, 'PERFILADOR_INTERVALO_MS', 5) / 1000,
+        umbral_ms=getattr(settings, 'PERFILADOR_UMBRAL_MS', 500),
+        maximo=getattr(settings, 'PERFILADOR_MAXIMO', 200),
+    )
+
+  def debe_perfilar(self, request) -> bool:
+    """Decide si la solicitud se perfila según usuario, ruta o muestreo"""
+    if not self.activo:
+      return False
+    if request.user.is_authenticated and request.user.get_username() in self.usuarios:
+      return True
+    if any(patron.search(request.path) for patron in self.rutas):
+      return True
+    return self.muestreo > 0 and random.random() < self.muestreo
+
+
+class MedidorSQL:
+  """execute_wrapper que acumula la cantidad y el tiempo de las consultas"""
+
+  def __init__(self):
+    self.consultas = 0
+    self.segundos = 0.0
+
+  def __call__(self, execute, sql, params, many, context):
+    inicio = time.perf_counter()
+    try:
+      return execute(sql, params, many, context)
+    finally:
+      self.segundos += time.perf_counter() - inicio
+      self.consultas += 1
+
+
+class MuestreadorPila:
+  """
+  Perfil por muestreo de tiempo real de un hilo
+
+  Un hilo auxiliar lee la pila del hilo perfilado cada `intervalo` segundos
+  con sys._current_frames(), así que el tiempo de espera (consultas, APIs)
+  también aparece. El resultado se guarda en formato de pilas colapsadas
+  ("folded"), que leen flamegraph.pl y speedscope.
+  """
+
+  def __init__(self, intervalo: float = 0.005):
+    self.intervalo = intervalo
+    self.pilas = Counter()
+    self._hilo_objetivo = None
+    self._detener = threading.Event()
+    self._hilo = None
+
+  def iniciar(self) -> None:
+    self._hilo_objetivo = threading.get_ident()
+    self._hilo = threading.Thread(target=self._muestrear, daemon=True,
+                                  name='perfilador-muestreo')
+    self._hilo.start()
+
+  def detener(self) -> None:
+    self._detener.set()
+    self._hilo.join()
+
+  def _muestrear(self) -> None:
+    while not self._detener.wait(self.intervalo):
+      marco = sys._current_frames().get(self._hilo_objetivo)
+      if marco is None:
+        continue
+      pila = []
+      while marco is not None:
+        codigo = marco.f_code
+        pila.append(f'{codigo.co_name} ({os.path.basename(codigo.co_filename)}'
+                    f':{codigo.co_firstlineno})')
+        marco = marco.f_back
+      self.pilas[';'.join(reversed(pila))] += 1
+
+  def volcar(self, ruta: Path) -> None:
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+      for pila, cantidad in self.pilas.most_common():
+        archivo.write(f'{pila} {cantidad}\n')
+
+
+# cProfile admite un solo perfilador activo por proceso desde Python 3.12;
+# mientras una solicitud usa cProfile las demás se perfilan por muestreo
+_bloqueo_cprofile = threading.Lock()
+
+
+class PerfilSolicitud:
+  """Perfil de CPU o de muestreo de una solicitud, con sus consultas SQL"""
+
+  def __init__(self, configuracion: ConfiguracionPerfilador):
+    self.configuracion = configuracion
+    self.modo = configuracion.modo
+    self.medidor = MedidorSQL()
+    self._perfilador = None
+    self._pila = ExitStack()
+    self._inicio = None
+    self.duracion_ms = None
+
+  def __enter__(self):
+    for conexion in connections.all():
+      self._pila.enter_context(conexion.execute_wrapper(self.medidor))
+
+    if self.modo == 'cprofile' and _bloqueo_cprofile.acquire(blocking=False):
+      self._pila.callback(_bloqueo_cprofile.release)
+      self._perfilador = cProfile.Profile()
+      self._perfilador.enable()
+      self._pila.callback(self._perfilador.disable)
+    else:
+      self.modo = 'muestreo'
+      self._perfilador = MuestreadorPila(self.configuracion.intervalo)
+      self._perfilador.iniciar()
+      self._pila.callback(self._perfilador.detener)
+
+    self._inicio = time.perf_counter()
+    return self
+
+  def __exit__(self, *exc_info):
+    self.duracion_ms = (time.perf_counter() - self._inicio) * 1000
+    self._pila.close()
+    return False
+
+  def guardar(self, metadatos: Dict, directorio: Path = None) -> Path:
+    """
+    Escribe el perfil y un archivo .json con sus metadatos
+
+    Returns:
+        Ruta del perfil (.prof para cProfile, .txt para muestreo)
+    """
+    directorio = directorio or directorio_perfiles()
+    directorio.mkdir(parents=True, exist_ok=True)
+
+    vista = re.sub(r'[^\w-]+', '-', metadatos.get('vista') or 'sin-vista')
+    base = f'{timezone.now():%Y%m%d-%H%M%S-%f}-{vista}'[:150]
+    ruta = directorio / f'{base}.{"prof" if self.modo == "cprofile" else "txt"}'
+
+    if self.modo == 'cprofile':
+      self._perfilador.dump_stats(ruta)
+    else:
+      self._perfilador.volcar(ruta)
+
+    metadatos = {
+      **metadatos,
+      'archivo': ruta.name,
+      'modo': self.modo,
+      'duracion_ms': round(self.duracion_ms, 2),
+      'sql_ms': round(self.medidor.segundos * 1000, 2),
+      'consultas': self.medidor.consultas,
+      'fecha': timezone.now().isoformat(),
+    }
+    with open(ruta.with_suffix('.json'), 'w', encoding='utf-8') as archivo:
+      json.dump(metadatos, archivo, ensure_ascii=False)
+
+    _rotar(directorio, self.configuracion.maximo)
+    return ruta
+
+
+def _rotar(directorio: Path, maximo: int) -> None:
+  """Elimina los perfiles más antiguos cuando se supera el máximo"""
+  indices = sorted(directorio.glob('*.json'))
+  for indice in indices[:max(0, len(indices) - maximo)]:
+    for ruta in (indice, indice.with_suffix('.prof'), indice.with_suffix('.txt')):
+      try:
+        ruta.unlink()
+      except FileNotFoundError:
+        pass
+
+
+def listar_perfiles(minimo_ms: float = 0, limite: int = 100,
+    directorio: Path = None) -> List[Dict]:
+  """Metadatos de los perfiles guardados, del más reciente al más antiguo"""
+  directorio = directorio or directorio_perfiles()
+  perfiles = []
+  for indice in sorted(directorio.glob('*.json'), reverse=True):
+    try:
+      with open(indice, encoding='utf-8') as archivo:
+        metadatos = json.load(archivo)
+    except (OSError, ValueError):
+      continue
+    if 'fecha' not in metadatos:
+      continue
+    if metadatos.get('duracion_ms', 0) >= minimo_ms:
+      metadatos['fecha'] = datetime.fromisoformat(metadatos['fecha'])
+      perfiles.append(metadatos)
+      if len(perfiles) >= limite:
+        break
+  return perfiles
+
+
+def ruta_perfil(nombre: str, directorio: Path = None) -> Optional[Path]:
+  """Ruta de un perfil guardado o None si el nombre no es válido"""
+  directorio = directorio or directorio_perfiles()
+  if not NOMBRE_PERFIL.match(nombre):
+    return None
+  ruta = directorio / nombre
+  return ruta if ruta.is_file() else None
@@ -0,0 +1,70 @@
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+from . import auditoria, huellas_sql
+
+
+class EjecutorPruebas(DiscoverRunner):
+  """
+  Ejecutor de pruebas que no escribe en los directorios de var/
+
+  La auditoría se escribe en línea (sin hilo escritor) y los directorios de
+  trabajo se reemplazan por uno temporal, para que una corrida de pruebas no
+  deje archivos que el sistema reprocese o mezcle con los de producción.
+  """
+
+  def directorios(self, base: Path):
+    """Ajustes de directorio que se redirigen a base"""
+    return {
+      'AUDITORIA_RESPALDO_DIR': base / 'auditoria',
+      'SQL_HUELLAS_DIR': base / 'sql',
+    }
+
+  def setup_test_environment(self, **kwargs):
+    super().setup_test_environment(**kwargs)
+    self._temporal = tempfile.TemporaryDirectory(prefix='banca-pruebas-')
+    self._ajustes = override_settings(
+        AUDITORIA_ASINCRONA=False,
+        **self.directorios(Path(self._temporal.name)))
+    self._ajustes.enable()
+    # El escritor y el recolector toman la configuración al crearse
+    auditoria._escritor = None
+    huellas_sql._recolector = None
+
+  def teardown_test_environment(self, **kwargs):
+    # Sin directorio, el volcado registrado con atexit no recrea el temporal
+    if huellas_sql._recolector is not None:
+      huellas_sql._recolector.directorio = None
+    auditoria._escritor = None
+    huellas_sql._recolector = None
+    self._ajustes.disable()
+    self._temporal.cleanup()
+    super().teardown_test_environment(**kwargs)
+
+
+class DatosBancariosMixin:
+  """Usuario administrador y cliente de prueba, con cuentas a pedido"""
+
+  def setUp(self):
+    from clientes.models import Cliente
+    from .models import Usuario
+
+    super().setUp()
+    self.usuario = Usuario.objects.create_user(
+        username='operador', password='x', tipo_usuario='ADMINISTRADOR')
+    self.cliente = Cliente.objects.create(
+        tipo_cliente='NATURAL', tipo_documento='DNI',
+        numero_documento='12345678', nombres='Ana', apellido_paterno='Pérez',
+        apellido_materno='Ruiz', direccion='Av. Lima 123')
+
+  def crear_cuenta(self, saldo='100.00', moneda='SOLES', tipo_cuenta='AHORRO',
+      **campos):
+    from cuentas.models import Cuenta
+
+    return Cuenta.objects.create(
+        cliente=self.cliente, tipo_cuenta=tipo_cuenta, moneda=moneda,
+        saldo=Decimal(saldo), usuario_apertura=self.usuario, **campos)
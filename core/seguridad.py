@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _clave(ip: str, ventana: int) -> str:
+  return f'login:ip:{ip}:{ventana}'
+
+
+def _ventana(ip: str):
+  """Clave de la ventana actual, clave de la anterior y fracción transcurrida"""
+  duracion = getattr(settings, 'LOGIN_IP_VENTANA', 300)
+  ahora = time.time()
+  ventana = int(ahora // duracion)
+  return (_clave(ip, ventana), _clave(ip, ventana - 1),
+          (ahora % duracion) / duracion)
+
+
+def ip_bloqueada(ip: str) -> bool:
+  """
+  Indica si una IP alcanzó el límite de logins fallidos
+
+  Usa una ventana deslizante aproximada con dos contadores de ventana fija:
+  el de la ventana actual más el de la anterior ponderado por la fracción
+  que aún se solapa. Solo lee los contadores; los logins exitosos no
+  consumen el límite, así que los usuarios detrás de una misma IP (NAT de
+  una agencia) no se bloquean entre sí.
+
+  Args:
+      ip: Dirección IP del cliente
+
+  Returns:
+      True si la IP excedió LOGIN_IP_MAX_INTENTOS
+  """
+  if not ip:
+    return False
+
+  maximo = getattr(settings, 'LOGIN_IP_MAX_INTENTOS', 20)
+  actual, anterior, transcurrido = _ventana(ip)
+  valores = cache.get_many([actual, anterior])
+  estimado = (valores.get(actual, 0) +
+              valores.get(anterior, 0) * (1 - transcurrido))
+  return estimado >= maximo
+
+
+def registrar_fallo_ip(ip: str) -> None:
+  """
+  Cuenta un login fallido de una IP en la ventana actual
+
+  cache.incr es atómico en Redis y en la caché local, así que los fallos
+  simultáneos no se pierden.
+  """
+  if not ip:
+    return
+
+  duracion = getattr(settings, 'LOGIN_IP_VENTANA', 300)
+  clave = _ventana(ip)[0]
+  # add no sobrescribe un contador existente; expira tras dos ventanas
+  cache.add(clave, 0, timeout=duracion * 2)
+  try:
+    cache.incr(clave)
+  except ValueError:
+    # La clave expiró entre add e incr
+    cache.set(clave, 1, timeout=duracion * 2)
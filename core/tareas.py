@@ -0,0 +1,20 @@
+from .trabajos import ejecutar_comando, purgar_trabajos as _purgar_trabajos, tarea
+
+
+@tarea('limpiar_sesiones')
+def limpiar_sesiones():
+  """Elimina las sesiones expiradas"""
+  return ejecutar_comando('clearsessions')
+
+
+@tarea('purgar_auditoria', max_intentos=3)
+def purgar_auditoria(dias: int = None):
+  """Archiva y elimina la auditoría anterior a AUDITORIA_RETENCION_DIAS"""
+  opciones = {'dias': dias} if dias else {}
+  return ejecutar_comando('purgar_auditoria', **opciones)
+
+
+@tarea('purgar_trabajos')
+def purgar_trabajos(dias: int = None):
+  """Elimina los trabajos terminados anteriores a TRABAJOS_RETENCION_DIAS"""
+  return {'eliminados': _purgar_trabajos(dias)}
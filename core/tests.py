@@ -1,3 +1,441 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.http import HttpResponse
+from django.test import (
+  RequestFactory, SimpleTestCase, TestCase, override_settings,
+)
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from cuentas.models import Cuenta
+
+from .auditoria import EscritorAuditoria
+from .db_router import ALIAS_REPLICA, RouterReplica, lecturas_en_replica
+from .huellas_sql import RecolectorSQL, combinar_volcados, huella
+from .middleware import ReplicaLecturaMiddleware
+from .models import AuditoriaAcceso, Trabajo, Usuario
+from .trabajos import (
+  Trabajador, encolar, recuperar_vencidos, tarea, tomar_trabajo,
+)
+
+
+@tarea('prueba_sumar', max_intentos=2)
+def sumar(a, b):
+  return a + b
+
+
+class ArriendoTrabajosTests(TestCase):
+
+  def vencer_arriendo(self, trabajo):
+    Trabajo.objects.filter(pk=trabajo.pk).update(
+        bloqueado_hasta=timezone.now() - timedelta(seconds=1))
+
+  def test_un_trabajo_arrendado_no_se_entrega_a_otro_trabajador(self):
+    encolar('prueba_sumar', {'a': 1, 'b': 2})
+
+    trabajo = tomar_trabajo('trabajador-a', arriendo=60)
+
+    self.assertEqual(trabajo.estado, 'EN_EJECUCION')
+    self.assertEqual(trabajo.bloqueado_por, 'trabajador-a')
+    self.assertEqual(trabajo.intentos, 1)
+    self.assertIsNone(tomar_trabajo('trabajador-b', arriendo=60))
+
+  def test_arriendo_vencido_vuelve_a_la_cola(self):
+    encolar('prueba_sumar', {'a': 1, 'b': 2})
+    trabajo = tomar_trabajo('trabajador-a', arriendo=60)
+    self.vencer_arriendo(trabajo)
+
+    self.assertEqual(recuperar_vencidos(), 1)
+
+    retomado = tomar_trabajo('trabajador-b', arriendo=60)
+    self.assertEqual(retomado.pk, trabajo.pk)
+    self.assertEqual(retomado.intentos, 2)
+
+  def test_arriendo_vencido_en_el_ultimo_intento_falla_el_trabajo(self):
+    encolar('prueba_sumar', {'a': 1, 'b': 2}, max_intentos=1)
+    trabajo = tomar_trabajo('trabajador-a', arriendo=60)
+    self.vencer_arriendo(trabajo)
+
+    recuperar_vencidos()
+
+    trabajo.refresh_from_db()
+    self.assertEqual(trabajo.estado, 'FALLIDO')
+    self.assertIsNone(tomar_trabajo('trabajador-b', arriendo=60))
+
+  def test_trabajador_sin_arriendo_no_pisa_el_resultado_del_nuevo_dueno(self):
+    encolar('prueba_sumar', {'a': 1, 'b': 2})
+    trabajo_a = tomar_trabajo('trabajador-a', arriendo=60)
+    self.vencer_arriendo(trabajo_a)
+    recuperar_vencidos()
+    trabajo_b = tomar_trabajo('trabajador-b', arriendo=60)
+
+    Trabajador('trabajador-a').procesar(trabajo_a)
+
+    trabajo_b.refresh_from_db()
+    self.assertEqual(trabajo_b.estado, 'EN_EJECUCION')
+    self.assertEqual(trabajo_b.bloqueado_por, 'trabajador-b')
+
+    Trabajador('trabajador-b').procesar(trabajo_b)
+
+    trabajo_b.refresh_from_db()
+    self.assertEqual(trabajo_b.estado, 'COMPLETADO')
+    self.assertEqual(trabajo_b.resultado, 3)
+
+
+class ReplicaMixin:
+  """
+  Agrega el alias de la réplica mientras dura la prueba
+
+  Las pruebas solo inspeccionan a qué alias irían las consultas
+  (QuerySet.db), sin abrir conexiones. Son SimpleTestCase porque dentro de
+  la transacción de un TestCase el router siempre elige el primario.
+  """
+
+  def setUp(self):
+    super().setUp()
+    replica = mock.patch.dict(settings.DATABASES, {
+      ALIAS_REPLICA: {**settings.DATABASES['default'],
+                      'TEST': {'MIRROR': 'default'}}})
+    replica.start()
+    self.addCleanup(replica.stop)
+
+
+class RouterReplicaTests(ReplicaMixin, SimpleTestCase):
+
+  def test_lecturas_en_replica_solo_dentro_del_contexto(self):
+    self.assertEqual(Cuenta.objects.all().db, 'default')
+    with lecturas_en_replica():
+      self.assertEqual(Cuenta.objects.all().db, ALIAS_REPLICA)
+    self.assertEqual(Cuenta.objects.all().db, 'default')
+
+  def test_escrituras_y_select_for_update_van_al_primario(self):
+    with lecturas_en_replica():
+      self.assertEqual(Cuenta.objects.select_for_update().db, 'default')
+      self.assertEqual(RouterReplica().db_for_write(Cuenta), 'default')
+
+  def test_usuarios_leen_del_primario(self):
+    with lecturas_en_replica():
+      self.assertEqual(Usuario.objects.all().db, 'default')
+
+  def test_sin_alias_de_replica_todo_va_al_primario(self):
+    with mock.patch.dict(settings.DATABASES):
+      del settings.DATABASES[ALIAS_REPLICA]
+      with lecturas_en_replica():
+        self.assertEqual(Cuenta.objects.all().db, 'default')
+
+
+class RouterReplicaTransaccionTests(ReplicaMixin, TestCase):
+
+  def test_dentro_de_una_transaccion_se_lee_del_primario(self):
+    with lecturas_en_replica(), transaction.atomic():
+      self.assertEqual(Cuenta.objects.all().db, 'default')
+
+
+@mock.patch.object(settings, 'DB_REPLICA_VISTAS', ['cuentas:lista_cuentas'])
+class ReplicaLecturaMiddlewareTests(ReplicaMixin, SimpleTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.fabrica = RequestFactory()
+    self.alias_en_vista = None
+
+  def vista(self, request):
+    self.alias_en_vista = Cuenta.objects.all().db
+    return HttpResponse()
+
+  def solicitar(self, metodo, ruta, middleware=None, **cookies):
+    request = getattr(self.fabrica, metodo)(ruta)
+    request.COOKIES.update(cookies)
+    request.resolver_match = resolve(ruta)
+    middleware = middleware or ReplicaLecturaMiddleware(self.vista)
+    middleware.process_view(request, None, (), {})
+    return request, middleware(request)
+
+  def test_get_de_vista_de_reporte_lee_de_la_replica(self):
+    self.solicitar('get', '/cuentas/')
+
+    self.assertEqual(self.alias_en_vista, ALIAS_REPLICA)
+    self.assertEqual(Cuenta.objects.all().db, 'default')
+
+  def test_vista_no_listada_lee_del_primario(self):
+    self.solicitar('get', '/dashboard/')
+
+    self.assertEqual(self.alias_en_vista, 'default')
+
+  def test_escritura_abre_la_ventana_en_el_primario(self):
+    _, response = self.solicitar('post', '/cuentas/')
+    cookie = response.cookies[ReplicaLecturaMiddleware.COOKIE]
+
+    self.solicitar('get', '/cuentas/', **{cookie.key: cookie.value})
+
+    self.assertEqual(self.alias_en_vista, 'default')
+
+  def test_ventana_vencida_vuelve_a_la_replica(self):
+    _, response = self.solicitar('post', '/cuentas/')
+    cookie = response.cookies[ReplicaLecturaMiddleware.COOKIE]
+
+    ventana = settings.DB_REPLICA_VENTANA_PRIMARIO
+    with mock.patch('core.middleware.time.time',
+                    return_value=time.time() + ventana + 1):
+      self.solicitar('get', '/cuentas/', **{cookie.key: cookie.value})
+
+    self.assertEqual(self.alias_en_vista, ALIAS_REPLICA)
+
+  def test_cookie_adulterada_se_ignora(self):
+    self.solicitar('get', '/cuentas/', **{
+      ReplicaLecturaMiddleware.COOKIE: str(time.time() + 60)})
+
+    self.assertEqual(self.alias_en_vista, ALIAS_REPLICA)
+
+  async def test_modo_asincrono_restaura_el_enrutamiento(self):
+    # Bajo ASGI process_view y el middleware corren en contextos copiados
+    middleware = ReplicaLecturaMiddleware(self.vista)
+    request = self.fabrica.get('/cuentas/')
+    request.resolver_match = resolve('/cuentas/')
+    await sync_to_async(middleware.process_view)(request, None, (), {})
+
+    await sync_to_async(middleware)(request)
+
+    self.assertEqual(self.alias_en_vista, ALIAS_REPLICA)
+    self.assertEqual(Cuenta.objects.all().db, 'default')
+
+
+class ExportarAuditoriaTests(TestCase):
+
+  def test_celdas_con_formulas_se_exportan_como_texto(self):
+    usuario = Usuario.objects.create_user(
+        username='auditor', password='x', tipo_usuario='ADMINISTRADOR')
+    AuditoriaAcceso.objects.create(
+        usuario=usuario, tipo_evento='LOGIN_FALLIDO', exitoso=False,
+        detalle='-2+3', user_agent='=HYPERLINK("http://x","y")')
+    self.client.force_login(usuario)
+
+    respuesta = self.client.get(reverse('core:exportar_auditoria'))
+    contenido = b''.join(respuesta.streaming_content).decode('utf-8-sig')
+
+    self.assertIn("'-2+3", contenido)
+    self.assertIn('"\'=HYPERLINK(""http://x"",""y"")"', contenido)
+    self.assertNotIn(',=HYPERLINK', contenido)
+
+
+@override_settings(LOGIN_IP_MAX_INTENTOS=2)
+class LimiteLoginIPTests(TestCase):
+
+  def setUp(self):
+    cache.clear()
+    self.addCleanup(cache.clear)
+    Usuario.objects.create_user(username='cajero', password='clave-correcta')
+
+  def ingresar(self, password, username='cajero'):
+    respuesta = self.client.post(reverse('core:login'), {
+      'username': username, 'password': password})
+    self.client.logout()
+    return respuesta.status_code
+
+  def test_los_logins_exitosos_no_consumen_el_limite(self):
+    for _ in range(5):
+      self.assertEqual(self.ingresar('clave-correcta'), 302)
+
+  def test_los_fallos_bloquean_la_ip(self):
+    self.assertEqual(self.ingresar('otra', username='nadie'), 200)
+    self.assertEqual(self.ingresar('otra', username='nadie'), 200)
+
+    self.assertEqual(self.ingresar('clave-correcta'), 429)
+
+
+class EscritorAuditoriaTests(TestCase):
+
+  def setUp(self):
+    self.usuario = Usuario.objects.create_user(username='auditor', password='x')
+    directorio = tempfile.TemporaryDirectory()
+    self.addCleanup(directorio.cleanup)
+    self.directorio = Path(directorio.name)
+
+  def evento(self, detalle='prueba'):
+    return {'usuario_id': self.usuario.pk, 'tipo_evento': 'LOGIN_EXITOSO',
+            'ip_address': '10.0.0.1', 'user_agent': '', 'exitoso': True,
+            'detalle': detalle, 'fecha_hora': timezone.now()}
+
+  def escritor(self, **opciones):
+    return EscritorAuditoria(directorio_respaldo=self.directorio, **opciones)
+
+  def respaldar_con_la_base_caida(self, escritor, eventos):
+    with mock.patch.object(AuditoriaAcceso.objects, 'bulk_create',
+                           side_effect=DatabaseError('sin conexión')), \
+        self.assertLogs('core.auditoria', 'ERROR'):
+      for evento in eventos:
+        escritor.registrar(evento)
+
+  def test_el_hilo_agrupa_los_eventos_en_lotes(self):
+    escritor = self.escritor(tamano_lote=2, intervalo=10)
+    lotes = []
+    with mock.patch.object(escritor, '_escribir',
+                           side_effect=lambda lote: lotes.append(len(lote))):
+      for i in range(5):
+        escritor.registrar(self.evento(str(i)))
+      escritor.detener()
+
+    self.assertEqual(lotes, [2, 2, 1])
+
+  def test_el_hilo_escribe_un_lote_incompleto_al_pasar_el_intervalo(self):
+    escritor = self.escritor(tamano_lote=100, intervalo=0.05)
+    lotes = []
+    with mock.patch.object(escritor, '_escribir',
+                           side_effect=lambda lote: lotes.append(len(lote))):
+      for i in range(3):
+        escritor.registrar(self.evento(str(i)))
+      limite = time.monotonic() + 5
+      while not lotes and time.monotonic() < limite:
+        time.sleep(0.01)
+      self.assertEqual(lotes, [3])
+      escritor.detener()
+
+  def test_si_la_base_falla_el_lote_va_al_respaldo(self):
+    escritor = self.escritor(asincrono=False)
+
+    self.respaldar_con_la_base_caida(escritor, [self.evento()])
+
+    archivo = (self.directorio /
+               f'auditoria-{escritor.etiqueta()}-{os.getpid()}.jsonl')
+    self.assertEqual(len(archivo.read_text().splitlines()), 1)
+    self.assertEqual((escritor.lotes_fallidos, escritor.eventos_respaldados),
+                     (1, 1))
+    self.assertFalse(AuditoriaAcceso.objects.exists())
+
+  def test_reprocesa_solo_los_respaldos_de_esta_base(self):
+    escritor = self.escritor(asincrono=False)
+    self.respaldar_con_la_base_caida(
+        escritor, [self.evento('a'), self.evento('b')])
+    ajeno = self.directorio / 'auditoria-0123456789ab-1.jsonl'
+    ajeno.write_text(escritor._a_json(self.evento('ajeno')) + '\n')
+
+    self.assertEqual(escritor.reprocesar_respaldo(), 2)
+
+    self.assertEqual(sorted(AuditoriaAcceso.objects.values_list(
+        'detalle', flat=True)), ['a', 'b'])
+    self.assertEqual(list(self.directorio.iterdir()), [ajeno])
+
+  def test_un_reproceso_fallido_no_inserta_nada_y_deja_el_archivo(self):
+    escritor = self.escritor(asincrono=False, tamano_lote=1)
+    self.respaldar_con_la_base_caida(
+        escritor, [self.evento('a'), self.evento('b')])
+    bulk_create = AuditoriaAcceso.objects.bulk_create
+    llamadas = []
+
+    def falla_en_el_segundo_lote(objetos):
+      llamadas.append(1)
+      if len(llamadas) == 2:
+        raise DatabaseError('conexión perdida')
+      return bulk_create(objetos)
+
+    with mock.patch.object(AuditoriaAcceso.objects, 'bulk_create',
+                           side_effect=falla_en_el_segundo_lote), \
+        self.assertRaises(DatabaseError):
+      escritor.reprocesar_respaldo()
+
+    self.assertFalse(AuditoriaAcceso.objects.exists())
+    pendientes = list(self.directorio.glob(f'auditoria-{escritor.etiqueta()}-*.jsonl'))
+    self.assertEqual(len(pendientes), 1)
+    self.assertEqual(escritor.reprocesar_respaldo(), 2)
+
+
+class HuellasSQLTests(SimpleTestCase):
+
+  def test_sentencias_que_solo_difieren_en_valores_comparten_huella(self):
+    self.assertEqual(
+        huella("SELECT * FROM cuentas WHERE id = 15 AND estado = 'ACTIVA'"),
+        'SELECT * FROM cuentas WHERE id = ? AND estado = ?')
+    self.assertEqual(
+        huella('SELECT * FROM cuentas WHERE id IN (%s, %s, %s)'),
+        huella('SELECT  *  FROM cuentas\nWHERE id IN (%s)'))
+    self.assertEqual(
+        huella('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)'),
+        'INSERT INTO t (a, b) VALUES (?, ?), ...')
+    self.assertEqual(huella("SELECT 'it''s'"), 'SELECT ?')
+
+  def test_agrega_por_huella_y_combina_los_volcados(self):
+    directorio = tempfile.TemporaryDirectory()
+    self.addCleanup(directorio.cleanup)
+    recolector = RecolectorSQL(directorio=directorio.name, umbral_ms=1000)
+    self.addCleanup(setattr, recolector, 'directorio', None)
+    recolector.registrar('SELECT * FROM t WHERE id = 1', 0.010)
+    recolector.registrar('SELECT * FROM t WHERE id = 2', 0.030)
+    with self.assertLogs('core.huellas_sql', 'WARNING'):
+      recolector.registrar('UPDATE t SET a = 1', 2.0)
+
+    recolector.volcar()
+    otro = Path(directorio.name) / 'huellas-otro-1.json'
+    otro.write_text(json.dumps({
+      'worker': 'otro-1', 'lentas': [],
+      'huellas': {'SELECT * FROM t WHERE id = ?': {
+        'cantidad': 1, 'total': 0.05, 'maximo': 0.05, 'alias': 'default'}},
+    }))
+    combinado = combinar_volcados(sorted(Path(directorio.name).glob('huellas-*.json')))
+
+    select = combinado['huellas']['SELECT * FROM t WHERE id = ?']
+    self.assertEqual(select['cantidad'], 3)
+    self.assertAlmostEqual(select['total'], 0.09)
+    self.assertEqual(select['maximo'], 0.05)
+    self.assertEqual(len(combinado['workers']), 2)
+    self.assertEqual([lenta['huella'] for lenta in combinado['lentas']],
+                     ['UPDATE t SET a = ?'])
+
+
+class SesionInactividadTests(TestCase):
+
+  def setUp(self):
+    self.client.force_login(
+        Usuario.objects.create_user(username='cajero', password='x'))
+    self.inicio = timezone.now()
+    sesion = self.client.session
+    sesion['last_activity'] = self.inicio.timestamp()
+    sesion.save()
+
+  def solicitar(self, segundos):
+    with mock.patch('core.middleware.timezone') as reloj:
+      reloj.now.return_value = self.inicio + timedelta(seconds=segundos)
+      return self.client.get(reverse('core:dashboard'))
+
+  def ultima_actividad(self):
+    return self.client.session['last_activity'] - self.inicio.timestamp()
+
+  def test_no_escribe_la_sesion_antes_del_umbral(self):
+    respuesta = self.solicitar(settings.SESSION_ACTIVIDAD_UMBRAL - 1)
+
+    self.assertNotIn(settings.SESSION_COOKIE_NAME, respuesta.cookies)
+    self.assertEqual(self.ultima_actividad(), 0)
+
+  def test_escribe_la_sesion_al_pasar_el_umbral(self):
+    respuesta = self.solicitar(settings.SESSION_ACTIVIDAD_UMBRAL)
+
+    self.assertIn(settings.SESSION_COOKIE_NAME, respuesta.cookies)
+    self.assertAlmostEqual(self.ultima_actividad(),
+                           settings.SESSION_ACTIVIDAD_UMBRAL, places=3)
+
+  def test_la_actividad_no_escrita_no_extiende_la_sesion(self):
+    self.solicitar(settings.SESSION_ACTIVIDAD_UMBRAL - 1)
+
+    respuesta = self.solicitar(settings.SESSION_INACTIVIDAD_SEGUNDOS + 1)
+
+    self.assertRedirects(respuesta, reverse('core:login'),
+                         fetch_redirect_response=False)
+    self.assertNotIn('_auth_user_id', self.client.session)
+
+  def test_el_almacen_no_descarta_una_sesion_activa(self):
+    # La última actividad guardada puede atrasarse hasta el umbral
+    self.assertGreaterEqual(
+        settings.SESSION_COOKIE_AGE,
+        settings.SESSION_INACTIVIDAD_SEGUNDOS + settings.SESSION_ACTIVIDAD_UMBRAL)
+    self.solicitar(settings.SESSION_ACTIVIDAD_UMBRAL)
+    self.assertEqual(self.client.session.get_expiry_age(),
+                     settings.SESSION_COOKIE_AGE)
@@ -0,0 +1,434 @@
+import io
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Avg, Count, F, Max, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import TareaProgramada, Trabajo
+
+logger = logging.getLogger(__name__)
+
+
+ESTADOS_ACTIVOS = ('PENDIENTE', 'EN_EJECUCION')
+LONGITUD_ERROR = 4000
+
+# Tareas registradas con @tarea: {nombre: {'funcion', 'max_intentos'}}
+_tareas: Dict[str, Dict] = {}
+_descubiertas = False
+_descubrir_lock = threading.Lock()
+
+
+def tarea(nombre: str, max_intentos: int = None):
+  """
+  Registra una función como tarea de segundo plano
+
+  Las tareas se declaran en el módulo tareas.py de cada app, que el
+  trabajador importa al iniciar. Los argumentos del trabajo se pasan como
+  argumentos con nombre y deben ser serializables a JSON; el valor
+  retornado se guarda como resultado.
+  """
+  def decorador(funcion):
+    _tareas[nombre] = {'funcion': funcion, 'max_intentos': max_intentos}
+    return funcion
+  return decorador
+
+
+def descubrir_tareas() -> Dict[str, Dict]:
+  """Importa los módulos tareas.py de las apps instaladas una sola vez"""
+  global _descubiertas
+  if not _descubiertas:
+    with _descubrir_lock:
+      if not _descubiertas:
+        autodiscover_modules('tareas')
+        _descubiertas = True
+  return _tareas
+
+
+def ejecutar_comando(nombre: str, *args, **opciones) -> str:
+  """Ejecuta un comando de manage.py y retorna el final de su salida"""
+  salida = io.StringIO()
+  call_command(nombre, *args, stdout=salida, stderr=salida, **opciones)
+  return salida.getvalue()[-LONGITUD_ERROR:]
+
+
+def encolar(nombre: str, argumentos: Dict = None, prioridad: int = 0,
+    ejecutar_desde: datetime = None, max_intentos: int = None,
+    programacion: TareaProgramada = None) -> Trabajo:
+  """
+  Agrega un trabajo a la cola
+
+  Args:
+      nombre: Tarea registrada con @tarea
+      argumentos: Argumentos con nombre de la tarea
+      prioridad: Los de mayor prioridad se toman primero
+      ejecutar_desde: No se ejecuta antes de este momento
+      max_intentos: Intentos antes de marcarlo FALLIDO (por defecto el de
+          la tarea o TRABAJOS_MAX_INTENTOS)
+
+  Raises:
+      ValueError: Si la tarea no está registrada
+  """
+  tareas = descubrir_tareas()
+  if nombre not in tareas:
+    raise ValueError(f'La tarea {nombre} no está registrada')
+
+  return Trabajo.objects.create(
+      tarea=nombre,
+      argumentos=argumentos or {},
+      prioridad=prioridad,
+      ejecutar_desde=ejecutar_desde or timezone.now(),
+      max_intentos=(max_intentos or tareas[nombre]['max_intentos'] or
+                    getattr(settings, 'TRABAJOS_MAX_INTENTOS', 5)),
+      programacion=programacion
+  )
+
+
+def espera_reintento(intentos: int) -> float:
+  """
+  Segundos de espera antes del siguiente intento
+
+  Crece exponencialmente desde TRABAJOS_REINTENTO_BASE hasta
+  TRABAJOS_REINTENTO_MAXIMO, con ±25% aleatorio para que los trabajos que
+  fallaron juntos no se reintenten juntos.
+  """
+  base = getattr(settings, 'TRABAJOS_REINTENTO_BASE', 30)
+  maximo = getattr(settings, 'TRABAJOS_REINTENTO_MAXIMO', 3600)
+  return min(base * 2 ** (intentos - 1), maximo) * random.uniform(0.75, 1.25)
+
+
+def tomar_trabajo(trabajador: str, arriendo: int) -> Optional[Trabajo]:
+  """
+  Toma el siguiente trabajo listo y lo arrienda al trabajador
+
+  SKIP LOCKED hace que varios trabajadores tomen trabajos distintos sin
+  esperarse; la transacción solo dura lo que tarda marcar el trabajo, que
+  luego se ejecuta fuera de ella.
+  """
+  ahora = timezone.now()
+  with transaction.atomic():
+    trabajo = (Trabajo.objects.select_for_update(skip_locked=True)
+               .filter(estado='PENDIENTE', ejecutar_desde__lte=ahora)
+               .order_by('-prioridad', 'ejecutar_desde', 'pk').first())
+    if trabajo is None:
+      return None
+
+    trabajo.estado = 'EN_EJECUCION'
+    trabajo.intentos += 1
+    trabajo.bloqueado_por = trabajador
+    trabajo.bloqueado_hasta = ahora + timedelta(seconds=arriendo)
+    trabajo.fecha_inicio = ahora
+    trabajo.espera_ms = max(0, int(
+        (ahora - trabajo.ejecutar_desde).total_seconds() * 1000))
+    trabajo.save(update_fields=['estado', 'intentos', 'bloqueado_por',
+                                'bloqueado_hasta', 'fecha_inicio', 'espera_ms'])
+  return trabajo
+
+
+def recuperar_vencidos() -> int:
+  """
+  Devuelve a la cola los trabajos cuyo arriendo venció
+
+  El trabajador que los tenía murió o perdió la conexión; el intento
+  cuenta, y si era el último el trabajo queda FALLIDO.
+  """
+  ahora = timezone.now()
+  vencidos = Trabajo.objects.filter(estado='EN_EJECUCION',
+                                    bloqueado_hasta__lt=ahora)
+  fallidos = vencidos.filter(intentos__gte=F('max_intentos')).update(
+      estado='FALLIDO', bloqueado_hasta=None, fecha_fin=ahora,
+      error='El arriendo del trabajador venció en el último intento')
+  reintentados = vencidos.update(
+      estado='PENDIENTE', bloqueado_por='', bloqueado_hasta=None,
+      ejecutar_desde=ahora, error='El arriendo del trabajador venció')
+  if fallidos or reintentados:
+    logger.warning('Trabajos con arriendo vencido: %d reintentados, %d fallidos',
+                   reintentados, fallidos)
+  return fallidos + reintentados
+
+
+def sincronizar_programaciones(configuracion: Dict = None) -> None:
+  """
+  Crea o actualiza las TareaProgramada según TRABAJOS_PROGRAMADOS
+
+  Cada entrada es {nombre: {'tarea', 'cada' (segundos) o 'hora' ('HH:MM'),
+  'argumentos'?, 'activa'?}}; las que ya no están en la configuración se
+  desactivan.
+  """
+  if configuracion is None:
+    configuracion = getattr(settings, 'TRABAJOS_PROGRAMADOS', {})
+
+  for nombre, datos in configuracion.items():
+    valores = {
+      'tarea': datos['tarea'],
+      'argumentos': datos.get('argumentos', {}),
+      'intervalo_segundos': datos.get('cada'),
+      'hora': (datetime.strptime(datos['hora'], '%H:%M').time()
+               if datos.get('hora') else None),
+      'activa': datos.get('activa', True),
+    }
+    programacion = TareaProgramada.objects.filter(nombre=nombre).first()
+    if programacion is None:
+      programacion = TareaProgramada(nombre=nombre, **valores)
+      programacion.proxima_ejecucion = programacion.calcular_proxima()
+      TareaProgramada.objects.bulk_create([programacion], ignore_conflicts=True)
+      continue
+
+    cambios = [campo for campo, valor in valores.items()
+               if getattr(programacion, campo) != valor]
+    if not cambios:
+      continue
+    for campo in cambios:
+      setattr(programacion, campo, valores[campo])
+    if {'intervalo_segundos', 'hora'} & set(cambios):
+      programacion.proxima_ejecucion = programacion.calcular_proxima()
+      cambios.append('proxima_ejecucion')
+    programacion.save(update_fields=cambios)
+
+  TareaProgramada.objects.exclude(nombre__in=list(configuracion)).update(
+      activa=False)
+
+
+def programar_pendientes() -> int:
+  """
+  Encola las tareas programadas cuya próxima ejecución ya llegó
+
+  La programación se bloquea con SKIP LOCKED y se avanza en la misma
+  transacción que encola el trabajo, así que aunque varios nodos corran el
+  programador cada ejecución se encola una sola vez. Si el trabajo anterior
+  de la misma programación sigue pendiente o en ejecución no se encola otro.
+
+  Returns:
+      Cantidad de trabajos encolados
+  """
+  ahora = timezone.now()
+  encolados = 0
+  with transaction.atomic():
+    programaciones = (TareaProgramada.objects.select_for_update(skip_locked=True)
+                      .filter(activa=True, proxima_ejecucion__lte=ahora))
+    for programacion in programaciones:
+      campos = ['proxima_ejecucion']
+      if not programacion.trabajos.filter(estado__in=ESTADOS_ACTIVOS).exists():
+        encolar(programacion.tarea, programacion.argumentos,
+                programacion=programacion)
+        programacion.ultima_ejecucion = ahora
+        campos.append('ultima_ejecucion')
+        encolados += 1
+      programacion.proxima_ejecucion = programacion.calcular_proxima(ahora)
+      programacion.save(update_fields=campos)
+  return encolados
+
+
+def purgar_trabajos(dias: int = None) -> int:
+  """Elimina por lotes los trabajos terminados hace más de `dias` días"""
+  dias = dias or getattr(settings, 'TRABAJOS_RETENCION_DIAS', 30)
+  limite = timezone.now() - timedelta(days=dias)
+  eliminados = 0
+  while True:
+    ids = list(Trabajo.objects.filter(
+        estado__in=['COMPLETADO', 'FALLIDO'], fecha_fin__lt=limite
+    ).values_list('pk', flat=True)[:1000])
+    if not ids:
+      return eliminados
+    eliminados += Trabajo.objects.filter(pk__in=ids).delete()[0]
+
+
+def estado_cola(horas: int = 24) -> Dict:
+  """
+  Profundidad de la cola y latencia de los trabajos
+
+  Returns:
+      Conteo por estado, trabajos listos y su antigüedad, trabajos en
+      ejecución y, por tarea, espera y duración de los terminados en las
+      últimas `horas`.
+  """
+  ahora = timezone.now()
+  por_estado = dict(Trabajo.objects.values_list('estado')
+                    .annotate(cantidad=Count('id')).order_by())
+  listos = Trabajo.objects.filter(estado='PENDIENTE', ejecutar_desde__lte=ahora)
+  mas_antiguo = listos.aggregate(desde=Min('ejecutar_desde'))['desde']
+
+  por_tarea = list(
+      Trabajo.objects.filter(fecha_fin__gte=ahora - timedelta(hours=horas))
+      .values('tarea')
+      .annotate(
+          completados=Count('id', filter=Q(estado='COMPLETADO')),
+          fallidos=Count('id', filter=Q(estado='FALLIDO')),
+          espera_promedio_ms=Avg('espera_ms'),
+          espera_maxima_ms=Max('espera_ms'),
+          duracion_promedio_ms=Avg('duracion_ms'),
+          duracion_maxima_ms=Max('duracion_ms'),
+      ).order_by('tarea'))
+
+  return {
+    'por_estado': {estado: por_estado.get(estado, 0)
+                   for estado, _ in Trabajo.ESTADO_CHOICES},
+    'listos': listos.count(),
+    'programados': por_estado.get('PENDIENTE', 0) - listos.count(),
+    'espera_actual_s': ((ahora - mas_antiguo).total_seconds()
+                        if mas_antiguo else 0),
+    'en_ejecucion': list(Trabajo.objects.filter(estado='EN_EJECUCION')
+                         .order_by('fecha_inicio')
+                         .values('id', 'tarea', 'bloqueado_por', 'intentos',
+                                 'fecha_inicio', 'bloqueado_hasta')),
+    'por_tarea': por_tarea,
+    'horas': horas,
+  }
+
+
+class Trabajador:
+  """
+  Trabajador que ejecuta los trabajos de la cola
+
+  Toma un trabajo a la vez con tomar_trabajo y lo ejecuta fuera de la
+  transacción; mientras tanto un hilo renueva el arriendo cada tercio de
+  su duración. El resultado solo se guarda si el arriendo sigue siendo
+  suyo, de modo que un trabajador que se quedó sin arriendo no pisa al que
+  retomó el trabajo. Con `programador` también encola las tareas
+  programadas.
+  """
+
+  def __init__(self, nombre: str = None, arriendo: int = 300,
+      intervalo: float = 5.0, programador: bool = True):
+    self.nombre = nombre or f'{socket.gethostname()}-{os.getpid()}'
+    self.arriendo = arriendo
+    self.intervalo = intervalo
+    self.programador = programador
+    self._detenido = threading.Event()
+
+    self.completados = 0
+    self.fallidos = 0
+
+  @classmethod
+  def desde_settings(cls, **opciones):
+    """Crea el trabajador con la configuración TRABAJOS_* de settings"""
+    valores = {
+      'arriendo': getattr(settings, 'TRABAJOS_ARRIENDO', 300),
+      'intervalo': getattr(settings, 'TRABAJOS_INTERVALO', 5.0),
+    }
+    valores.update({k: v for k, v in opciones.items() if v is not None})
+    return cls(**valores)
+
+  def detener(self) -> None:
+    """Termina el ciclo al acabar el trabajo en curso"""
+    self._detenido.set()
+
+  def ejecutar(self, una_vez: bool = False, maximo: int = None,
+      al_terminar: Callable[[Trabajo], None] = None) -> int:
+    """
+    Procesa trabajos hasta que se llame a detener()
+
+    Args:
+        una_vez: Termina cuando no quedan trabajos listos
+        maximo: Termina después de procesar esta cantidad de trabajos
+        al_terminar: Función llamada con cada trabajo procesado
+
+    Returns:
+        Cantidad de trabajos procesados
+    """
+    descubrir_tareas()
+    if self.programador:
+      sincronizar_programaciones()
+
+    procesados = 0
+    ultima_revision = 0.0
+    while not self._detenido.is_set():
+      close_old_connections()
+      if time.monotonic() - ultima_revision >= self.intervalo:
+        recuperar_vencidos()
+        if self.programador:
+          programar_pendientes()
+        ultima_revision = time.monotonic()
+
+      trabajo = tomar_trabajo(self.nombre, self.arriendo)
+      if trabajo is None:
+        if una_vez:
+          break
+        self._detenido.wait(self.intervalo)
+        continue
+
+      self.procesar(trabajo)
+      procesados += 1
+      if al_terminar:
+        al_terminar(trabajo)
+      if maximo and procesados >= maximo:
+        break
+    close_old_connections()
+    return procesados
+
+  def procesar(self, trabajo: Trabajo) -> None:
+    """Ejecuta un trabajo ya arrendado y guarda su resultado o su error"""
+    registro = descubrir_tareas().get(trabajo.tarea)
+    trabajo.resultado = None
+    trabajo.error = ''
+    fin = threading.Event()
+    renovador = threading.Thread(target=self._renovar, args=(trabajo.pk, fin),
+                                 name=f'arriendo-{trabajo.pk}', daemon=True)
+    renovador.start()
+    inicio = time.perf_counter()
+    try:
+      if registro is None:
+        raise LookupError(f'La tarea {trabajo.tarea} no está registrada')
+      resultado = registro['funcion'](**trabajo.argumentos)
+      trabajo.resultado = json.loads(json.dumps(resultado, cls=DjangoJSONEncoder))
+    except Exception:
+      trabajo.error = traceback.format_exc()[-LONGITUD_ERROR:]
+      logger.exception('Falló el trabajo %s (%s), intento %d de %d',
+                       trabajo.pk, trabajo.tarea, trabajo.intentos,
+                       trabajo.max_intentos)
+    finally:
+      fin.set()
+      renovador.join()
+    trabajo.duracion_ms = int((time.perf_counter() - inicio) * 1000)
+    trabajo.fecha_fin = timezone.now()
+
+    if not trabajo.error:
+      trabajo.estado = 'COMPLETADO'
+      self.completados += 1
+    elif trabajo.intentos < trabajo.max_intentos and registro is not None:
+      trabajo.estado = 'PENDIENTE'
+      trabajo.ejecutar_desde = trabajo.fecha_fin + timedelta(
+          seconds=espera_reintento(trabajo.intentos))
+    else:
+      trabajo.estado = 'FALLIDO'
+      self.fallidos += 1
+
+    actualizados = Trabajo.objects.filter(
+        pk=trabajo.pk, estado='EN_EJECUCION', bloqueado_por=self.nombre
+    ).update(
+        estado=trabajo.estado, resultado=trabajo.resultado, error=trabajo.error,
+        ejecutar_desde=trabajo.ejecutar_desde, duracion_ms=trabajo.duracion_ms,
+        fecha_fin=trabajo.fecha_fin, bloqueado_hasta=None
+    )
+    if not actualizados:
+      logger.warning('El trabajo %s perdió el arriendo; no se guarda su resultado',
+                     trabajo.pk)
+
+  def _renovar(self, trabajo_id: int, fin: threading.Event) -> None:
+    """Extiende el arriendo del trabajo hasta que termine"""
+    try:
+      while not fin.wait(self.arriendo / 3):
+        renovado = Trabajo.objects.filter(
+            pk=trabajo_id, estado='EN_EJECUCION', bloqueado_por=self.nombre
+        ).update(bloqueado_hasta=timezone.now() + timedelta(seconds=self.arriendo))
+        if not renovado:
+          logger.warning('No se pudo renovar el arriendo del trabajo %s',
+                         trabajo_id)
+          return
+    except Exception:
+      logger.exception('Error al renovar el arriendo del trabajo %s', trabajo_id)
+    finally:
+      connection.close()
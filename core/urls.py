@@ -25,4 +25,26 @@ urlpatterns = [
        name='inactivar_usuario'),
   path('usuarios/<int:usuario_id>/desbloquear/', views.desbloquear_usuario,
        name='desbloquear_usuario'),
+
+  # Auditoría (solo administradores)
+  path('auditoria/', views.explorar_auditoria, name='explorar_auditoria'),
+  path('auditoria/exportar/', views.exportar_auditoria,
+       name='exportar_auditoria'),
+  path('auditoria/estado/', views.estado_auditoria, name='estado_auditoria'),
+
+  # Perfiles de solicitudes lentas (solo administradores)
+  path('perfiles/', views.lista_perfiles, name='lista_perfiles'),
+  path('perfiles/<str:archivo>/', views.descargar_perfil,
+       name='descargar_perfil'),
+
+  # Trabajos en segundo plano (solo administradores)
+  path('trabajos/', views.trabajos, name='trabajos'),
+  path('trabajos/estado/', views.estado_trabajos, name='estado_trabajos'),
+  path('trabajos/<int:trabajo_id>/reintentar/', views.reintentar_trabajo,
+       name='reintentar_trabajo'),
+  path('trabajos/programadas/<int:programacion_id>/ejecutar/',
+       views.ejecutar_programacion, name='ejecutar_programacion'),
+
+  # Métricas Prometheus
+  path('metrics', views.metricas, name='metricas'),
 ]
\ No newline at end of file
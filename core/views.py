@@ -1,6 +1,7 @@
 from django.shortcuts import render
 
 from django.shortcuts import render, redirect
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
@@ -8,11 +9,15 @@ from django.utils import timezone
 from django.db.models import Sum, Count, Q
 from django.views.decorators.http import require_http_methods
 from django.core.exceptions import ValidationError
+import base64
+import csv
 from decimal import Decimal
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 from .models import Usuario, TipoCambio, AuditoriaAcceso
-from .forms import LoginForm, TipoCambioForm, UsuarioForm
+from .forms import LoginForm, TipoCambioForm, UsuarioForm, FiltroAuditoriaForm
+from .auditoria import obtener_escritor
+from .seguridad import ip_bloqueada, registrar_fallo_ip
 from cuentas.models import Cuenta
 from operaciones.models import Movimiento
 
@@ -25,21 +30,21 @@ def es_administrador(user):
 
 def registrar_auditoria(request, usuario, tipo_evento, exitoso=True,
     detalle=None):
-  """Registra eventos de auditoría"""
-  try:
-    ip_address = request.META.get('REMOTE_ADDR')
-    user_agent = request.META.get('HTTP_USER_AGENT', '')[:500]
-
-    AuditoriaAcceso.objects.create(
-        usuario=usuario,
-        tipo_evento=tipo_evento,
-        ip_address=ip_address,
-        user_agent=user_agent,
-        exitoso=exitoso,
-        detalle=detalle
-    )
-  except Exception as e:
-    pass  # No fallar si falla la auditoría
+  """
+  Registra eventos de auditoría
+
+  El evento se encola en el escritor de auditoría, que lo inserta por lotes
+  en segundo plano (ver core.auditoria).
+  """
+  obtener_escritor().registrar({
+    'usuario_id': usuario.pk,
+    'tipo_evento': tipo_evento,
+    'ip_address': request.META.get('REMOTE_ADDR'),
+    'user_agent': request.META.get('HTTP_USER_AGENT', '')[:500],
+    'exitoso': exitoso,
+    'detalle': detalle,
+    'fecha_hora': timezone.now(),
+  })
 
 
 @require_http_methods(["GET", "POST"])
@@ -55,6 +60,16 @@ def login_view(request):
       username = form.cleaned_data['username']
       password = form.cleaned_data['password']
 
+      # Con demasiados fallos desde la IP no se consultan usuarios ni claves
+      ip = request.META.get('REMOTE_ADDR')
+      if ip_bloqueada(ip):
+        messages.error(
+            request,
+            'Demasiados intentos de inicio de sesión desde su red. '
+            'Intente nuevamente en unos minutos.'
+        )
+        return render(request, 'core/login.html', {'form': form}, status=429)
+
       try:
         usuario = Usuario.objects.get(username=username)
 
@@ -90,8 +105,9 @@ def login_view(request):
           return redirect('core:dashboard')
         else:
           # Credenciales incorrectas
+          registrar_fallo_ip(ip)
           usuario.incrementar_intentos_fallidos()
-          intentos_restantes = 3 - usuario.intentos_fallidos
+          intentos_restantes = settings.MAX_LOGIN_ATTEMPTS - usuario.intentos_fallidos
 
           if usuario.bloqueado:
             messages.error(
@@ -107,6 +123,7 @@ def login_view(request):
           registrar_auditoria(request, usuario, 'LOGIN_FALLIDO', False)
 
       except Usuario.DoesNotExist:
+        registrar_fallo_ip(ip)
         messages.error(request, 'Credenciales incorrectas.')
     else:
       messages.error(request, 'Por favor corrija los errores en el formulario.')
@@ -397,4 +414,318 @@ def desbloquear_usuario(request, usuario_id):
   except Usuario.DoesNotExist:
     messages.error(request, 'Usuario no encontrado.')
 
-  return redirect('core:lista_usuarios')
\ No newline at end of file
+  return redirect('core:lista_usuarios')
+
+
+@login_required
+@user_passes_test(es_administrador, login_url='core:dashboard')
+def estado_auditoria(request):
+  """Vista JSON con la profundidad de cola y latencia del escritor de auditoría"""
+  from django.http import JsonResponse
+
+  return JsonResponse(obtener_escritor().estado())
+
+
+AUDITORIA_POR_PAGINA = 50
+AUDITORIA_LOTE_EXPORTACION = 2000
+
+
+def _filtrar_auditoria(datos):
+  """Aplica los filtros del explorador sobre AuditoriaAcceso"""
+  registros = AuditoriaAcceso.objects.all()
+
+  if datos.get('usuario'):
+    registros = registros.filter(usuario=datos['usuario'])
+  if datos.get('tipo_evento'):
+    registros = registros.filter(tipo_evento=datos['tipo_evento'])
+  if datos.get('ip_address'):
+    registros = registros.filter(ip_address=datos['ip_address'])
+  if datos.get('exitoso'):
+    registros = registros.filter(exitoso=datos['exitoso'] == '1')
+  if datos.get('desde'):
+    registros = registros.filter(fecha_hora__gte=datos['desde'])
+  if datos.get('hasta'):
+    registros = registros.filter(fecha_hora__lte=datos['hasta'])
+
+  return registros
+
+
+def _anteriores_a(registros, fecha_hora, pk):
+  """
+  Registros posteriores al cursor en el orden (-fecha_hora, -id)
+
+  La condición fecha_hora <= cursor acota el rango del índice; la
+  disyunción solo descarta los empates ya mostrados.
+  """
+  return registros.filter(
+      Q(fecha_hora__lte=fecha_hora) &
+      (Q(fecha_hora__lt=fecha_hora) | Q(id__lt=pk))
+  )
+
+
+def _posteriores_a(registros, fecha_hora, pk):
+  """Registros previos al cursor en el orden (-fecha_hora, -id)"""
+  return registros.filter(
+      Q(fecha_hora__gte=fecha_hora) &
+      (Q(fecha_hora__gt=fecha_hora) | Q(id__gt=pk))
+  )
+
+
+def _codificar_cursor(registro):
+  valor = f'{registro.fecha_hora.isoformat()}|{registro.pk}'
+  return base64.urlsafe_b64encode(valor.encode()).decode()
+
+
+def _decodificar_cursor(valor):
+  """Retorna (fecha_hora, id) del cursor o None si no es válido"""
+  try:
+    fecha_hora, pk = base64.urlsafe_b64decode(valor.encode()).decode().split('|')
+    return datetime.fromisoformat(fecha_hora), int(pk)
+  except (ValueError, UnicodeError):
+    return None
+
+
+@login_required
+@user_passes_test(es_administrador, login_url='core:dashboard')
+def explorar_auditoria(request):
+  """Vista para explorar la auditoría de accesos con paginación por cursor"""
+  form = FiltroAuditoriaForm(request.GET or None)
+  pagina = []
+  cursor_siguiente = None
+  cursor_anterior = None
+
+  if form.is_bound and not form.is_valid():
+    messages.error(request, 'Por favor corrija los filtros de búsqueda.')
+  else:
+    registros = _filtrar_auditoria(
+        form.cleaned_data if form.is_bound else {}
+    ).select_related('usuario')
+
+    despues = _decodificar_cursor(request.GET.get('despues', ''))
+    antes = _decodificar_cursor(request.GET.get('antes', ''))
+
+    if antes:
+      # Página anterior: se recorre en orden ascendente y se invierte
+      pagina = list(_posteriores_a(registros, *antes).order_by(
+          'fecha_hora', 'id')[:AUDITORIA_POR_PAGINA + 1])
+      hay_mas_recientes = len(pagina) > AUDITORIA_POR_PAGINA
+      pagina = pagina[:AUDITORIA_POR_PAGINA][::-1]
+      hay_mas_antiguos = True
+    else:
+      if despues:
+        registros = _anteriores_a(registros, *despues)
+      pagina = list(registros.order_by(
+          '-fecha_hora', '-id')[:AUDITORIA_POR_PAGINA + 1])
+      hay_mas_antiguos = len(pagina) > AUDITORIA_POR_PAGINA
+      pagina = pagina[:AUDITORIA_POR_PAGINA]
+      hay_mas_recientes = despues is not None
+
+    if pagina:
+      if hay_mas_antiguos:
+        cursor_siguiente = _codificar_cursor(pagina[-1])
+      if hay_mas_recientes:
+        cursor_anterior = _codificar_cursor(pagina[0])
+
+  context = {
+    'form': form,
+    'registros': pagina,
+    'cursor_siguiente': cursor_siguiente,
+    'cursor_anterior': cursor_anterior,
+  }
+
+  return render(request, 'core/auditoria/explorar.html', context)
+
+
+class _Eco:
+  """Pseudo-archivo que retorna lo escrito, para generar CSV por partes"""
+
+  def write(self, valor):
+    return valor
+
+
+# Caracteres con los que Excel/LibreOffice interpretan una celda como fórmula
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _celda_csv(valor) -> str:
+  """Texto de una celda CSV, neutralizando fórmulas con un apóstrofo inicial"""
+  valor = valor or ''
+  return f"'{valor}" if valor.startswith(_INICIO_FORMULA) else valor
+
+
+@login_required
+@user_passes_test(es_administrador, login_url='core:dashboard')
+def exportar_auditoria(request):
+  """Vista para exportar la auditoría filtrada en CSV por streaming"""
+  from django.http import StreamingHttpResponse
+
+  form = FiltroAuditoriaForm(request.GET or None)
+  if form.is_bound and not form.is_valid():
+    messages.error(request, 'Por favor corrija los filtros de búsqueda.')
+    return redirect('core:explorar_auditoria')
+
+  registros = _filtrar_auditoria(form.cleaned_data if form.is_bound else {})
+
+  registrar_auditoria(
+      request,
+      request.user,
+      'EXPORTAR_AUDITORIA',
+      True,
+      f'Filtros: {request.GET.urlencode() or "ninguno"}'
+  )
+
+  def filas():
+    escritor = csv.writer(_Eco())
+    # BOM para que Excel reconozca UTF-8
+    yield '\ufeff' + escritor.writerow([
+      'id', 'fecha_hora', 'usuario', 'tipo_evento', 'ip_address', 'exitoso',
+      'detalle', 'user_agent',
+    ])
+
+    # Se recorre por lotes con el mismo cursor (-fecha_hora, -id) para no
+    # mantener abierta una consulta sobre toda la tabla
+    lote_registros = registros
+    while True:
+      lote = list(lote_registros.order_by('-fecha_hora', '-id').values_list(
+          'id', 'fecha_hora', 'usuario__username', 'tipo_evento',
+          'ip_address', 'exitoso', 'detalle', 'user_agent'
+      )[:AUDITORIA_LOTE_EXPORTACION])
+
+      for fila in lote:
+        # user_agent y detalle provienen del cliente
+        yield escritor.writerow([
+          fila[0], fila[1].isoformat(), _celda_csv(fila[2]),
+          _celda_csv(fila[3]), fila[4] or '', 'SI' if fila[5] else 'NO',
+          _celda_csv(fila[6]), _celda_csv(fila[7]),
+        ])
+
+      if len(lote) < AUDITORIA_LOTE_EXPORTACION:
+        return
+      lote_registros = _anteriores_a(registros, lote[-1][1], lote[-1][0])
+
+  nombre = f'auditoria_{timezone.now():%Y%m%d_%H%M%S}.csv'
+  response = StreamingHttpResponse(filas(), content_type='text/csv; charset=utf-8')
+  response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+  return response
+
+
+@login_required
+@user_passes_test(es_administrador, login_url='core:dashboard')
+def lista_perfiles(request):
+  """Vista con los perfiles de solicitudes lentas más recientes"""
+  from .perfilador import listar_perfiles
+
+  try:
+    minimo_ms = float(request.GET.get('minimo_ms') or 0)
+  except ValueError:
+    minimo_ms = 0
+
+  context = {
+    'perfiles': listar_perfiles(minimo_ms=minimo_ms),
+    'minimo_ms': minimo_ms,
+    'activo': settings.PERFILADOR_ACTIVO,
+    'umbral_ms': settings.PERFILADOR_UMBRAL_MS,
+  }
+  return render(request, 'core/perfiles.html', context)
+
+
+@login_required
+@user_passes_test(es_administrador, login_url='core:dashboard')
+def descargar_perfil(request, archivo):
+  """Vista para descargar un perfil (.prof para snakeviz, .txt para flamegraph)"""
+  from django.http import FileResponse, Http404
+  from .perfilador import ruta_perfil
+
+  ruta = ruta_perfil(archivo)
+  if ruta is None:
+    raise Http404('Perfil no encontrado')
+
+  return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=ruta.name)
+
+
+@login_required
+@user_passes_test(es_administrador, login_url='core:dashboard')
+def trabajos(request):
+  """Vista con la cola de trabajos en segundo plano y las tareas programadas"""
+  from .models import TareaProgramada, Trabajo
+  from .trabajos import estado_cola
+
+  estado = request.GET.get('estado', '')
+  recientes = Trabajo.objects.defer('argumentos', 'resultado')
+  if estado in dict(Trabajo.ESTADO_CHOICES):
+    recientes = recientes.filter(estado=estado)
+
+  context = {
+    'cola': estado_cola(),
+    'programaciones': TareaProgramada.objects.all(),
+    'trabajos': recientes[:50],
+    'estados': Trabajo.ESTADO_CHOICES,
+    'estado': estado,
+  }
+  return render(request, 'core/trabajos.html', context)
+
+
+@login_required
+@user_passes_test(es_administrador, login_url='core:dashboard')
+def estado_trabajos(request):
+  """Vista JSON con la profundidad y latencia de la cola de trabajos"""
+  from django.http import JsonResponse
+  from .trabajos import estado_cola
+
+  return JsonResponse(estado_cola())
+
+
+@login_required
+@user_passes_test(es_administrador, login_url='core:dashboard')
+@require_http_methods(['POST'])
+def reintentar_trabajo(request, trabajo_id):
+  """Vuelve a encolar un trabajo fallido"""
+  from .models import Trabajo
+
+  actualizados = Trabajo.objects.filter(pk=trabajo_id, estado='FALLIDO').update(
+      estado='PENDIENTE', intentos=0, ejecutar_desde=timezone.now(),
+      bloqueado_por='', fecha_fin=None)
+  if actualizados:
+    messages.success(request, f'Trabajo {trabajo_id} encolado nuevamente.')
+  else:
+    messages.error(request, 'Solo se pueden reintentar trabajos fallidos.')
+  return redirect('core:trabajos')
+
+
+@login_required
+@user_passes_test(es_administrador, login_url='core:dashboard')
+@require_http_methods(['POST'])
+def ejecutar_programacion(request, programacion_id):
+  """Adelanta una tarea programada para que el siguiente ciclo la encole"""
+  from .models import TareaProgramada
+
+  actualizadas = TareaProgramada.objects.filter(
+      pk=programacion_id, activa=True).update(proxima_ejecucion=timezone.now())
+  if actualizadas:
+    messages.success(request, 'La tarea se encolará en el siguiente ciclo del trabajador.')
+  else:
+    messages.error(request, 'Tarea programada no encontrada o inactiva.')
+  return redirect('core:trabajos')
+
+
+def metricas(request):
+  """
+  Vista con las métricas en formato Prometheus
+
+  Requiere el token de METRICAS_TOKEN o, sin token, una IP de METRICAS_IPS.
+  """
+  import hmac
+  from django.http import HttpResponse, HttpResponseForbidden
+  from .metricas import exponer
+
+  if settings.METRICAS_TOKEN:
+    autorizacion = request.META.get('HTTP_AUTHORIZATION', '')
+    permitido = hmac.compare_digest(
+        autorizacion.encode(), f'Bearer {settings.METRICAS_TOKEN}'.encode())
+  else:
+    permitido = request.META.get('REMOTE_ADDR') in settings.METRICAS_IPS
+  if not permitido:
+    return HttpResponseForbidden()
+
+  contenido, content_type = exponer()
+  return HttpResponse(contenido, content_type=content_type)
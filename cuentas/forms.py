@@ -172,6 +172,32 @@ class EmbargoForm(forms.ModelForm):
     return numero_oficio
 
 
+class ImportarEmbargosForm(forms.Form):
+  """Formulario para cargar un archivo de oficios judiciales"""
+  archivo = forms.FileField(
+      label='Archivo de oficios (CSV)',
+      help_text='Columnas: numero_oficio, juzgado, cuenta, monto, es_total',
+      widget=forms.ClearableFileInput(attrs={
+        'class': 'form-control',
+        'accept': '.csv,.txt',
+      })
+  )
+  simular = forms.BooleanField(
+      required=False,
+      label='Solo validar (no registrar embargos)',
+      widget=forms.CheckboxInput(attrs={
+        'class': 'form-check-input',
+      })
+  )
+
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.helper = FormHelper()
+    self.helper.form_method = 'post'
+    self.helper.add_input(
+      Submit('submit', 'Procesar Archivo', css_class='btn btn-danger'))
+
+
 class BuscarCuentaForm(forms.Form):
   """Formulario para buscar cuentas"""
   busqueda = forms.CharField(
@@ -195,6 +221,27 @@ class BuscarCuentaForm(forms.Form):
         'class': 'form-select',
       })
   )
+  saldo_disponible_minimo = forms.DecimalField(
+      required=False,
+      max_digits=15,
+      decimal_places=2,
+      widget=forms.NumberInput(attrs={
+        'class': 'form-control',
+        'placeholder': 'Saldo disponible mínimo',
+        'step': '0.01',
+      })
+  )
+  orden = forms.ChoiceField(
+      required=False,
+      choices=[
+        ('', 'Más recientes'),
+        ('-saldo_disponible', 'Mayor saldo disponible'),
+        ('saldo_disponible', 'Menor saldo disponible'),
+      ],
+      widget=forms.Select(attrs={
+        'class': 'form-select',
+      })
+  )
 
   def __init__(self, *args, **kwargs):
     super().__init__(*args, **kwargs)
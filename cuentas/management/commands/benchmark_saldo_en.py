@@ -0,0 +1,104 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cuentas.models import Cuenta
+
+
+def saldo_en_recorrido(cuenta, fecha_hora):
+  """Implementación ingenua: recorre todos los movimientos de la cuenta"""
+  saldo = Decimal('0.00')
+  for movimiento in cuenta.movimientos.order_by('fecha_hora', 'id'):
+    if movimiento.fecha_hora > fecha_hora:
+      break
+    saldo = movimiento.saldo_nuevo
+  return saldo
+
+
+class Command(BaseCommand):
+  help = ('Compara Cuenta.saldo_en() y Cuenta.saldos_en() contra el recorrido '
+          'completo de movimientos')
+
+  def add_arguments(self, parser):
+    parser.add_argument('--cuentas', type=int, default=50,
+                        help='Cantidad de cuentas a muestrear')
+    parser.add_argument('--repeticiones', type=int, default=3,
+                        help='Repeticiones por cuenta')
+    parser.add_argument('--dias-atras', type=int, default=30,
+                        help='Antigüedad del instante consultado')
+    parser.add_argument('--semilla', type=int, default=42)
+
+  def handle(self, *args, **options):
+    aleatorio = random.Random(options['semilla'])
+    fecha_hora = timezone.now() - timezone.timedelta(days=options['dias_atras'])
+
+    ids = list(Cuenta.objects.values_list('pk', flat=True))
+    if not ids:
+      raise CommandError('No hay cuentas registradas para medir')
+
+    muestra = aleatorio.sample(ids, min(options['cuentas'], len(ids)))
+    cuentas = list(Cuenta.objects.filter(pk__in=muestra))
+
+    tiempos_recorrido = []
+    tiempos_indexado = []
+    consultas_recorrido = 0
+    consultas_indexado = 0
+    diferencias = 0
+
+    for cuenta in cuentas:
+      for _ in range(options['repeticiones']):
+        with CaptureQueriesContext(connection) as capturadas:
+          inicio = time.perf_counter()
+          esperado = saldo_en_recorrido(cuenta, fecha_hora)
+          tiempos_recorrido.append(time.perf_counter() - inicio)
+        consultas_recorrido += len(capturadas)
+
+        with CaptureQueriesContext(connection) as capturadas:
+          inicio = time.perf_counter()
+          obtenido = cuenta.saldo_en(fecha_hora)
+          tiempos_indexado.append(time.perf_counter() - inicio)
+        consultas_indexado += len(capturadas)
+
+        if esperado != obtenido:
+          diferencias += 1
+
+    with CaptureQueriesContext(connection) as capturadas:
+      inicio = time.perf_counter()
+      saldos = Cuenta.saldos_en([c.pk for c in cuentas], fecha_hora)
+      tiempo_masivo = time.perf_counter() - inicio
+    consultas_masivo = len(capturadas)
+
+    for cuenta in cuentas:
+      if saldos[cuenta.pk] != cuenta.saldo_en(fecha_hora):
+        diferencias += 1
+
+    self.stdout.write(f'Instante consultado: {fecha_hora.isoformat()}')
+    self.stdout.write(f'Cuentas muestreadas: {len(cuentas)}')
+    self._reportar('Recorrido completo', tiempos_recorrido, consultas_recorrido)
+    self._reportar('saldo_en (indexado)', tiempos_indexado, consultas_indexado)
+    self.stdout.write(
+        f'saldos_en (masivo): {tiempo_masivo * 1000:.2f} ms total, '
+        f'{consultas_masivo} consulta(s) para {len(cuentas)} cuentas'
+    )
+
+    if diferencias:
+      self.stdout.write(self.style.ERROR(
+          f'{diferencias} resultado(s) no coinciden con el recorrido completo'))
+    else:
+      self.stdout.write(self.style.SUCCESS(
+          'Todos los resultados coinciden con el recorrido completo'))
+
+  def _reportar(self, nombre, tiempos, consultas):
+    tiempos_ms = sorted(t * 1000 for t in tiempos)
+    p95 = tiempos_ms[int(len(tiempos_ms) * 0.95) - 1] if len(
+      tiempos_ms) >= 20 else tiempos_ms[-1]
+    self.stdout.write(
+        f'{nombre}: p50 {statistics.median(tiempos_ms):.2f} ms, '
+        f'p95 {p95:.2f} ms, {consultas} consulta(s)'
+    )
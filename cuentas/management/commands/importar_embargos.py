@@ -0,0 +1,51 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Usuario
+from cuentas.services import (leer_archivo_embargos,
+                              registrar_embargos_masivos,
+                              escribir_reporte_errores)
+
+
+class Command(BaseCommand):
+  help = 'Registra en bloque los embargos de un archivo CSV de oficios judiciales'
+
+  def add_arguments(self, parser):
+    parser.add_argument('archivo', help='Ruta del archivo CSV de oficios')
+    parser.add_argument('--usuario', required=True,
+                        help='Usuario que registra los embargos')
+    parser.add_argument('--reporte',
+                        help='Ruta del CSV de errores por fila (por defecto stdout)')
+    parser.add_argument('--simular', action='store_true',
+                        help='Valida el archivo sin registrar los embargos')
+
+  def handle(self, *args, **options):
+    try:
+      usuario = Usuario.objects.get(username=options['usuario'])
+    except Usuario.DoesNotExist:
+      raise CommandError(f'No existe el usuario {options["usuario"]}')
+
+    try:
+      with open(options['archivo'], 'rb') as archivo:
+        filas = leer_archivo_embargos(archivo)
+    except OSError as e:
+      raise CommandError(f'No se pudo leer el archivo: {e}')
+    except ValueError as e:
+      raise CommandError(str(e))
+
+    registrados, errores = registrar_embargos_masivos(
+        filas, usuario, simular=options['simular'])
+
+    prefijo = '[SIMULACIÓN] ' if options['simular'] else ''
+    self.stdout.write(self.style.SUCCESS(
+        f'{prefijo}{len(registrados)} embargo(s) registrados de {len(filas)} fila(s)'))
+
+    if errores:
+      self.stdout.write(self.style.WARNING(f'{len(errores)} fila(s) con errores'))
+      if options['reporte']:
+        with open(options['reporte'], 'w', newline='', encoding='utf-8') as destino:
+          escribir_reporte_errores(errores, destino)
+        self.stdout.write(f'Reporte de errores: {options["reporte"]}')
+      else:
+        escribir_reporte_errores(errores, sys.stdout)
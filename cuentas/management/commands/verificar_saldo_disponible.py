@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from cuentas.models import Cuenta, expresion_saldo_disponible
+
+
+class Command(BaseCommand):
+  help = ('Verifica la columna saldo_disponible contra la fórmula '
+          'Cuenta.get_saldo_disponible()')
+
+  def add_arguments(self, parser):
+    parser.add_argument('--corregir', action='store_true',
+                        help='Recalcula saldo_disponible en las cuentas inconsistentes')
+    parser.add_argument('--lote', type=int, default=2000,
+                        help='Cantidad de cuentas leídas por lote')
+
+  def handle(self, *args, **options):
+    cuentas = Cuenta.objects.only(
+        'pk', 'numero_cuenta', 'saldo', 'monto_embargado', 'embargo_total',
+        'saldo_disponible'
+    ).order_by('pk')
+
+    revisadas = 0
+    inconsistentes = []
+    for cuenta in cuentas.iterator(chunk_size=options['lote']):
+      revisadas += 1
+      esperado = cuenta.get_saldo_disponible()
+      if cuenta.saldo_disponible != esperado:
+        inconsistentes.append(cuenta.pk)
+        self.stdout.write(
+            f'{cuenta.numero_cuenta}: columna {cuenta.saldo_disponible}, '
+            f'fórmula {esperado}'
+        )
+
+    self.stdout.write(f'Cuentas revisadas: {revisadas}')
+
+    if not inconsistentes:
+      self.stdout.write(self.style.SUCCESS('Todas las cuentas son consistentes'))
+      return
+
+    self.stdout.write(self.style.WARNING(
+        f'{len(inconsistentes)} cuenta(s) inconsistentes'))
+
+    if options['corregir']:
+      corregidas = Cuenta.objects.filter(pk__in=inconsistentes).update(
+          saldo_disponible=expresion_saldo_disponible())
+      self.stdout.write(self.style.SUCCESS(f'{corregidas} cuenta(s) corregidas'))
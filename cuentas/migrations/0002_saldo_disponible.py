@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:59
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.math
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+def calcular_saldo_disponible(apps, schema_editor):
+    Cuenta = apps.get_model('cuentas', 'Cuenta')
+    campo = models.DecimalField(max_digits=15, decimal_places=2)
+    Cuenta.objects.update(saldo_disponible=models.Case(
+        models.When(embargo_total=True, then=models.Value(Decimal('0.00'))),
+        default=django.db.models.functions.comparison.Greatest(
+            django.db.models.functions.math.Round(
+                models.F('saldo') - models.F('monto_embargado'), 2),
+            models.Value(Decimal('0.00')),
+            output_field=campo,
+        ),
+        output_field=campo,
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+        ('cuentas', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cuenta',
+            name='saldo_disponible',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Saldo libre de embargos, mantenido al guardar la cuenta', max_digits=15),
+        ),
+        migrations.RunPython(calcular_saldo_disponible, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cuenta',
+            index=models.Index(fields=['saldo_disponible'], name='cuentas_saldo_d_10c0ec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cuenta',
+            index=models.Index(fields=['tipo_cuenta', 'saldo_disponible'], name='cuentas_tipo_cu_23bb4a_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cuenta',
+            constraint=models.CheckConstraint(condition=models.Q(('saldo_disponible', models.Case(models.When(models.Q(('embargo_total', True)), then=models.Value(Decimal('0.00'))), default=django.db.models.functions.comparison.Greatest(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('saldo'), '-', models.F('monto_embargado')), 2), models.Value(Decimal('0.00')), output_field=models.DecimalField(decimal_places=2, max_digits=15)), output_field=models.DecimalField(decimal_places=2, max_digits=15)))), name='cuentas_saldo_disponible_consistente'),
+        ),
+    ]
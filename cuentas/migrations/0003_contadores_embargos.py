@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:00
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def contar_embargos_vigentes(apps, schema_editor):
+    Cuenta = apps.get_model('cuentas', 'Cuenta')
+    Embargo = apps.get_model('cuentas', 'Embargo')
+
+    def conteo(**filtros):
+        return Coalesce(models.Subquery(
+            Embargo.objects.filter(
+                cuenta=models.OuterRef('pk'), esta_vigente=True, **filtros
+            ).values('cuenta').annotate(
+                total=models.Count('pk')
+            ).values('total')[:1],
+            output_field=models.PositiveIntegerField(),
+        ), 0)
+
+    Cuenta.objects.update(
+        embargos_vigentes=conteo(),
+        embargos_totales_vigentes=conteo(es_total=True),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuentas', '0002_saldo_disponible'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cuenta',
+            name='embargos_totales_vigentes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cuenta',
+            name='embargos_vigentes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(contar_embargos_vigentes, migrations.RunPython.noop),
+    ]
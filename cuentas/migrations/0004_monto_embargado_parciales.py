@@ -0,0 +1,31 @@
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def sumar_embargos_parciales(apps, schema_editor):
+    """monto_embargado pasa a ser la suma de los embargos parciales vigentes"""
+    Cuenta = apps.get_model('cuentas', 'Cuenta')
+    Embargo = apps.get_model('cuentas', 'Embargo')
+
+    campo = models.DecimalField(max_digits=15, decimal_places=2)
+    Cuenta.objects.filter(embargo_total=True).update(
+        monto_embargado=Coalesce(models.Subquery(
+            Embargo.objects.filter(
+                cuenta=models.OuterRef('pk'), esta_vigente=True, es_total=False
+            ).values('cuenta').annotate(
+                total=models.Sum('monto_embargado')
+            ).values('total')[:1],
+            output_field=campo,
+        ), models.Value(0), output_field=campo),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuentas', '0003_contadores_embargos'),
+    ]
+
+    operations = [
+        migrations.RunPython(sumar_embargos_parciales, migrations.RunPython.noop),
+    ]
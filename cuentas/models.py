@@ -2,6 +2,8 @@ from django.db import models
 
 # Create your models here.
 from django.db import models
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest, Round
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from decimal import Decimal
@@ -9,6 +11,38 @@ from clientes.models import Cliente
 from core.models import Usuario
 
 
+# Días sin movimientos tras los que una cuenta sin saldo se inactiva
+DIAS_INACTIVIDAD = 90
+
+
+def expresion_saldo_disponible(saldo=None, monto_embargado=None,
+    embargo_total=None):
+  """
+  Expresión SQL equivalente a Cuenta.get_saldo_disponible()
+
+  Por defecto usa las columnas actuales de la cuenta. Los parámetros permiten
+  calcular el saldo disponible resultante de un UPDATE a partir de los valores
+  previos (por ejemplo F('saldo') - monto). En ese caso saldo_disponible debe
+  asignarse antes que las demás columnas, porque MySQL evalúa las asignaciones
+  de un UPDATE en orden y vería los valores ya modificados.
+  """
+  saldo = F('saldo') if saldo is None else saldo
+  monto_embargado = F(
+    'monto_embargado') if monto_embargado is None else monto_embargado
+  embargo_total = Q(embargo_total=True) if embargo_total is None else embargo_total
+
+  campo = models.DecimalField(max_digits=15, decimal_places=2)
+  return Case(
+      When(embargo_total, then=Value(Decimal('0.00'))),
+      default=Greatest(
+          Round(saldo - monto_embargado, 2),
+          Value(Decimal('0.00')),
+          output_field=campo
+      ),
+      output_field=campo
+  )
+
+
 class Cuenta(models.Model):
   """Modelo base para cuentas bancarias"""
   TIPO_CUENTA_CHOICES = [
@@ -74,6 +108,18 @@ class Cuenta(models.Model):
   monto_embargado = models.DecimalField(max_digits=15, decimal_places=2,
                                         default=0)
   embargo_total = models.BooleanField(default=False)
+  embargos_vigentes = models.PositiveIntegerField(default=0, editable=False)
+  embargos_totales_vigentes = models.PositiveIntegerField(default=0,
+                                                          editable=False)
+
+  # Saldo disponible desnormalizado (ver get_saldo_disponible)
+  saldo_disponible = models.DecimalField(
+      max_digits=15,
+      decimal_places=2,
+      default=0,
+      editable=False,
+      help_text='Saldo libre de embargos, mantenido al guardar la cuenta'
+  )
 
   # Control
   fecha_apertura = models.DateTimeField(auto_now_add=True)
@@ -91,6 +137,16 @@ class Cuenta(models.Model):
     verbose_name = 'Cuenta'
     verbose_name_plural = 'Cuentas'
     ordering = ['-fecha_apertura']
+    indexes = [
+      models.Index(fields=['saldo_disponible']),
+      models.Index(fields=['tipo_cuenta', 'saldo_disponible']),
+    ]
+    constraints = [
+      models.CheckConstraint(
+          condition=Q(saldo_disponible=expresion_saldo_disponible()),
+          name='cuentas_saldo_disponible_consistente'
+      ),
+    ]
 
   def __str__(self):
     return f"{self.numero_cuenta} - {self.get_tipo_cuenta_display()} - {self.cliente.get_nombre_completo()}"
@@ -129,7 +185,14 @@ class Cuenta(models.Model):
     if self.tipo_cuenta == 'PLAZO' and self.monto_inicial and self.saldo == 0:
       self.saldo = self.monto_inicial
 
-    self.full_clean()
+    self.saldo_disponible = self.get_saldo_disponible()
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and {'saldo', 'monto_embargado',
+                                      'embargo_total'} & set(update_fields):
+      kwargs['update_fields'] = set(update_fields) | {'saldo_disponible'}
+
+    # La restricción de saldo disponible la garantiza la base de datos
+    self.full_clean(validate_constraints=False)
     super().save(*args, **kwargs)
 
   def generar_numero_cuenta(self):
@@ -159,11 +222,59 @@ class Cuenta(models.Model):
     return f"{prefijo}{nuevo_numero:010d}"
 
   def get_saldo_disponible(self):
-    """Retorna el saldo disponible considerando embargos"""
+    """
+    Retorna el saldo disponible considerando embargos
+
+    Es la fórmula de referencia de la columna saldo_disponible; las consultas
+    deben filtrar u ordenar por la columna.
+    """
     if self.embargo_total:
       return Decimal('0.00')
     return max(self.saldo - self.monto_embargado, Decimal('0.00'))
 
+  def saldo_en(self, fecha_hora):
+    """
+    Retorna el saldo de la cuenta en un instante dado.
+
+    Lee el último saldo_nuevo registrado hasta fecha_hora usando el índice
+    (cuenta, -fecha_hora) de movimientos, sin recorrer el historial.
+    Si no hay movimientos hasta ese instante el saldo es 0.
+    """
+    saldo = self.movimientos.filter(
+        fecha_hora__lte=fecha_hora
+    ).order_by('-fecha_hora', '-id').values_list(
+      'saldo_nuevo', flat=True).first()
+
+    return saldo if saldo is not None else Decimal('0.00')
+
+  @classmethod
+  def saldos_en(cls, cuenta_ids, fecha_hora):
+    """
+    Retorna {cuenta_id: saldo} al instante fecha_hora para varias cuentas.
+
+    Resuelve todas las cuentas en una sola consulta con una subconsulta
+    correlacionada que hace una búsqueda indexada por cuenta.
+    """
+    from django.db.models import OuterRef, Subquery
+    from operaciones.models import Movimiento
+
+    ultimo_saldo = Movimiento.objects.filter(
+        cuenta=OuterRef('pk'),
+        fecha_hora__lte=fecha_hora
+    ).order_by('-fecha_hora', '-id').values('saldo_nuevo')[:1]
+
+    filas = cls.objects.filter(pk__in=cuenta_ids).annotate(
+        saldo_historico=Subquery(
+            ultimo_saldo,
+            output_field=models.DecimalField(max_digits=15, decimal_places=2)
+        )
+    ).values_list('pk', 'saldo_historico')
+
+    return {
+      pk: saldo if saldo is not None else Decimal('0.00')
+      for pk, saldo in filas
+    }
+
   def puede_retirar(self, monto):
     """Verifica si se puede retirar el monto solicitado"""
     if self.tipo_cuenta == 'PLAZO':
@@ -182,6 +293,35 @@ class Cuenta(models.Model):
 
     return False
 
+  def aplicar_embargo(self, embargo):
+    """
+    Registra en la cuenta un embargo ya guardado
+
+    Actualiza el monto embargado, los contadores de embargos vigentes y el
+    estado con un único UPDATE basado en expresiones F, sin leer la cuenta.
+    monto_embargado es la suma de los embargos parciales vigentes; un
+    embargo total no la modifica y solo lleva saldo_disponible a 0 mediante
+    embargo_total, de modo que al levantarlo vuelven a regir los parciales.
+    Los valores de esta instancia no se recargan.
+    """
+    if embargo.es_total:
+      campos = {'saldo_disponible': Value(Decimal('0.00')),
+                'embargo_total': Value(True)}
+    else:
+      monto_embargado = F('monto_embargado') + embargo.monto_embargado
+      campos = {'saldo_disponible': expresion_saldo_disponible(
+                    monto_embargado=monto_embargado),
+                'monto_embargado': monto_embargado}
+
+    # saldo_disponible va primero (ver expresion_saldo_disponible)
+    Cuenta.objects.filter(pk=self.pk).update(
+        **campos,
+        estado=Value('EMBARGADA'),
+        embargos_vigentes=F('embargos_vigentes') + 1,
+        embargos_totales_vigentes=F('embargos_totales_vigentes') + (
+          1 if embargo.es_total else 0),
+    )
+
   def actualizar_ultimo_movimiento(self):
     """Actualiza la fecha del último movimiento"""
     self.fecha_ultimo_movimiento = timezone.now()
@@ -189,7 +329,8 @@ class Cuenta(models.Model):
 
   def puede_cerrarse(self):
     """Verifica si la cuenta puede cerrarse"""
-    return self.saldo == 0 and self.monto_embargado == 0
+    return (self.saldo == 0 and self.monto_embargado == 0 and
+            not self.embargo_total)
 
   def debe_inactivarse_automaticamente(self):
     """Verifica si la cuenta debe inactivarse por inactividad"""
@@ -199,9 +340,26 @@ class Cuenta(models.Model):
     if self.saldo != 0:
       return False
 
-    tres_meses_atras = timezone.now() - timezone.timedelta(days=90)
+    tres_meses_atras = timezone.now() - timezone.timedelta(days=DIAS_INACTIVIDAD)
     return self.fecha_ultimo_movimiento < tres_meses_atras
 
+  @classmethod
+  def inactivar_automaticamente(cls):
+    """
+    Inactiva con un solo UPDATE las cuentas activas que cumplen
+    debe_inactivarse_automaticamente
+
+    Las cuentas embargadas conservan su estado.
+
+    Returns:
+        Cantidad de cuentas inactivadas
+    """
+    tres_meses_atras = timezone.now() - timezone.timedelta(days=DIAS_INACTIVIDAD)
+    return cls.objects.filter(
+        estado='ACTIVA', esta_activa=True, saldo=0,
+        fecha_ultimo_movimiento__lt=tres_meses_atras
+    ).exclude(tipo_cuenta='PLAZO').update(estado='INACTIVA', esta_activa=False)
+
   def calcular_interes_generado(self):
     """Calcula el interés generado hasta la fecha actual para cuentas a plazo"""
     if self.tipo_cuenta != 'PLAZO':
@@ -273,18 +431,52 @@ class Embargo(models.Model):
     return f"Embargo {self.numero_oficio} - Cuenta {self.cuenta.numero_cuenta}"
 
   def levantar_embargo(self):
-    """Levanta el embargo"""
-    self.esta_vigente = False
-    self.fecha_levantamiento = timezone.now()
-    self.save()
-
-    # Actualizar cuenta
-    self.cuenta.monto_embargado -= self.monto_embargado
-    if self.es_total:
-      self.cuenta.embargo_total = False
+    """
+    Levanta el embargo
+
+    Ejecuta un UPDATE sobre el embargo y otro sobre la cuenta. El estado de
+    embargo de la cuenta se deriva de sus contadores de embargos vigentes,
+    sin consultar los demás embargos. La instancia self.cuenta no se recarga.
+    """
+    from django.db import transaction
+
+    ahora = timezone.now()
+    totales = 1 if self.es_total else 0
+
+    with transaction.atomic():
+      levantados = Embargo.objects.filter(
+          pk=self.pk, esta_vigente=True
+      ).update(esta_vigente=False, fecha_levantamiento=ahora)
+
+      if not levantados:
+        raise ValidationError('El embargo ya fue levantado')
+
+      quedan_totales = Q(embargos_totales_vigentes__gt=totales)
+      # Un embargo total no suma a monto_embargado (ver Cuenta.aplicar_embargo)
+      parcial = Decimal('0.00') if self.es_total else self.monto_embargado
+      monto_embargado = Case(
+          When(embargos_vigentes__lte=1, then=Value(Decimal('0.00'))),
+          default=Greatest(F('monto_embargado') - parcial,
+                           Value(Decimal('0.00'))),
+          output_field=models.DecimalField(max_digits=15, decimal_places=2)
+      )
+
+      # saldo_disponible y los campos derivados van antes que los contadores
+      # (ver expresion_saldo_disponible)
+      Cuenta.objects.filter(pk=self.cuenta_id).update(
+          saldo_disponible=expresion_saldo_disponible(
+              monto_embargado=monto_embargado, embargo_total=quedan_totales),
+          embargo_total=Case(When(quedan_totales, then=Value(True)),
+                             default=Value(False)),
+          estado=Case(
+              When(embargos_vigentes__lte=1, estado='EMBARGADA',
+                   then=Value('ACTIVA')),
+              default=F('estado')
+          ),
+          monto_embargado=monto_embargado,
+          embargos_vigentes=F('embargos_vigentes') - 1,
+          embargos_totales_vigentes=F('embargos_totales_vigentes') - totales,
+      )
 
-    # Verificar si hay otros embargos totales
-    if self.cuenta.embargos.filter(esta_vigente=True, es_total=True).exists():
-      self.cuenta.embargo_total = True
-
-    self.cuenta.save()
\ No newline at end of file
+    self.esta_vigente = False
+    self.fecha_levantamiento = ahora
\ No newline at end of file
@@ -0,0 +1,373 @@
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .models import Cuenta, Embargo
+
+
+COLUMNAS_EMBARGO = ['numero_oficio', 'juzgado', 'cuenta', 'monto', 'es_total']
+
+VALORES_VERDADEROS = {'1', 'SI', 'SÍ', 'S', 'TRUE', 'T', 'X', 'TOTAL'}
+
+CENTIMO = Decimal('0.01')
+# Mayor monto que admiten las columnas DecimalField(15, 2)
+MONTO_MAXIMO = Decimal('9999999999999.99')
+
+
+def leer_archivo_csv(archivo, columnas: List[str],
+    opcionales: List[str] = ()) -> List[Dict]:
+  """
+  Lee un archivo CSV con cabecera y retorna sus filas normalizadas
+
+  Se aceptan separadores coma, punto y coma, barra vertical o tabulador y
+  los nombres de columna no distinguen mayúsculas.
+
+  Args:
+      archivo: Archivo abierto en modo binario o texto
+      columnas: Columnas requeridas
+      opcionales: Columnas que pueden faltar (se leen como '')
+
+  Returns:
+      Lista de diccionarios con el número de fila y los valores leídos
+
+  Raises:
+      ValueError: Si faltan columnas requeridas
+  """
+  if isinstance(archivo, io.TextIOBase):
+    texto = archivo
+  else:
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+
+  muestra = texto.read(4096)
+  texto.seek(0)
+
+  try:
+    dialecto = csv.Sniffer().sniff(muestra, delimiters=',;|\t')
+  except csv.Error:
+    dialecto = csv.excel
+
+  lector = csv.DictReader(texto, dialect=dialecto)
+  lector.fieldnames = [
+    (nombre or '').strip().lower() for nombre in (lector.fieldnames or [])
+  ]
+
+  faltantes = [c for c in columnas if c not in lector.fieldnames]
+  if faltantes:
+    raise ValueError(
+        f'El archivo no tiene las columnas requeridas: {", ".join(faltantes)}')
+
+  filas = []
+  # La fila 1 es la cabecera
+  for numero_fila, registro in enumerate(lector, start=2):
+    filas.append({
+      'fila': numero_fila,
+      **{c: (registro.get(c) or '').strip() for c in [*columnas, *opcionales]},
+    })
+
+  return filas
+
+
+def leer_monto(texto: str) -> Decimal:
+  """
+  Convierte el monto de una celda CSV ('1,250.50') a Decimal con 2 decimales
+
+  Raises:
+      ValueError: Si no es un número finito, tiene más de 2 decimales o
+          excede MONTO_MAXIMO
+  """
+  try:
+    monto = Decimal(texto.replace(',', ''))
+  except InvalidOperation:
+    raise ValueError(f'Monto inválido: {texto}')
+  if not monto.is_finite():
+    raise ValueError(f'Monto inválido: {texto}')
+  if abs(monto) > MONTO_MAXIMO:
+    raise ValueError(f'Monto fuera de rango: {texto}')
+  if monto != monto.quantize(CENTIMO):
+    raise ValueError(f'El monto no puede tener más de 2 decimales: {texto}')
+  return monto.quantize(CENTIMO)
+
+
+def leer_archivo_embargos(archivo) -> List[Dict]:
+  """
+  Lee un archivo CSV de oficios judiciales
+
+  El archivo debe tener cabecera con las columnas numero_oficio, juzgado,
+  cuenta (número de cuenta o documento del titular), monto y es_total.
+  Se aceptan separadores coma, punto y coma, barra vertical o tabulador.
+
+  Args:
+      archivo: Archivo abierto en modo binario o texto
+
+  Returns:
+      Lista de diccionarios con el número de fila y los valores leídos
+  """
+  return leer_archivo_csv(archivo, COLUMNAS_EMBARGO)
+
+
+def _validar_fila(fila: Dict) -> Tuple[Dict, str]:
+  """Valida el formato de una fila y retorna los datos normalizados"""
+  if not fila['numero_oficio']:
+    return None, 'Falta el número de oficio'
+  if len(fila['numero_oficio']) > 50:
+    return None, 'El número de oficio excede 50 caracteres'
+  if not fila['juzgado']:
+    return None, 'Falta el juzgado'
+  if not fila['cuenta']:
+    return None, 'Falta el número de cuenta o documento del titular'
+
+  es_total = fila['es_total'].upper() in VALORES_VERDADEROS
+
+  monto = None
+  if fila['monto']:
+    try:
+      monto = leer_monto(fila['monto'])
+    except ValueError as e:
+      return None, str(e)
+    if monto <= 0:
+      return None, 'El monto del embargo debe ser mayor a 0'
+  elif not es_total:
+    return None, 'Falta el monto del embargo parcial'
+
+  return {
+    'numero_oficio': fila['numero_oficio'],
+    'juzgado': fila['juzgado'][:200],
+    'identificador': fila['cuenta'],
+    'monto': monto,
+    'es_total': es_total,
+  }, None
+
+
+def _resolver_cuentas(identificadores) -> Tuple[Dict, Dict, Dict]:
+  """
+  Bloquea y resuelve las cuentas por número de cuenta o documento del titular
+
+  Debe llamarse dentro de una transacción. Las cuentas se bloquean en orden
+  de id y el estado CERRADA se revisa sobre las filas ya bloqueadas, de modo
+  que una cuenta cerrada mientras se procesa el lote no recibe embargos.
+
+  Returns:
+      (cuenta bloqueada por id, cuenta_id por identificador,
+       mensaje de error por identificador)
+  """
+  from clientes.models import Cliente
+
+  # Los titulares se leen aparte para bloquear solo filas de cuentas
+  documentos = dict(Cliente.objects.filter(
+      numero_documento__in=identificadores
+  ).values_list('pk', 'numero_documento'))
+  candidatas = Cuenta.objects.select_for_update().filter(
+      Q(numero_cuenta__in=identificadores) | Q(cliente_id__in=list(documentos))
+  ).order_by('pk')
+
+  cuentas = {}
+  por_numero = {}
+  por_documento = {}
+  for cuenta in candidatas:
+    if cuenta.estado == 'CERRADA':
+      continue
+    cuentas[cuenta.pk] = cuenta
+    por_numero[cuenta.numero_cuenta] = cuenta.pk
+    if cuenta.cliente_id in documentos:
+      por_documento.setdefault(
+          documentos[cuenta.cliente_id], []).append(cuenta.pk)
+
+  resueltas = {}
+  errores = {}
+  for identificador in identificadores:
+    if identificador in por_numero:
+      resueltas[identificador] = por_numero[identificador]
+    elif len(por_documento.get(identificador, [])) == 1:
+      resueltas[identificador] = por_documento[identificador][0]
+    elif identificador in por_documento:
+      errores[identificador] = (
+        'El titular tiene varias cuentas; indique el número de cuenta')
+    else:
+      errores[identificador] = 'Cuenta no encontrada o cerrada'
+
+  return cuentas, resueltas, errores
+
+
+def registrar_embargos_masivos(filas: List[Dict], usuario,
+    simular: bool = False) -> Tuple[List[Dict], List[Dict]]:
+  """
+  Registra en bloque los embargos de un lote de oficios judiciales
+
+  Bloquea las cuentas afectadas en orden de id, valida los oficios contra
+  los existentes con una sola consulta dentro de la misma transacción,
+  aplica los cambios de embargo con un UPDATE masivo y crea los Embargo y
+  movimientos EMBARGO con bulk_create. Las filas con errores no impiden
+  registrar las demás; si otro proceso registra a la vez un mismo oficio,
+  esa fila se reporta como duplicada y el resto del lote se registra.
+
+  Args:
+      filas: Filas leídas con leer_archivo_embargos
+      usuario: Usuario que registra los embargos
+      simular: Si True, valida y calcula todo pero revierte la transacción
+
+  Returns:
+      (embargos registrados, errores por fila)
+  """
+  errores_formato = []
+  validas = []
+
+  for fila in filas:
+    datos, error = _validar_fila(fila)
+    if error:
+      errores_formato.append({'fila': fila['fila'],
+                              'numero_oficio': fila['numero_oficio'],
+                              'error': error})
+    else:
+      validas.append((fila['fila'], datos))
+
+  oficios = [datos['numero_oficio'] for _, datos in validas]
+  identificadores = {datos['identificador'] for _, datos in validas}
+
+  with transaction.atomic():
+    existentes = set()
+    while True:
+      cuentas, resueltas, errores_cuenta = _resolver_cuentas(identificadores)
+      # Lectura con bloqueo: ve los oficios que otra carga confirmó después
+      # de iniciar la transacción y reserva los que aún no existen
+      existentes |= set(Embargo.objects.select_for_update().filter(
+          numero_oficio__in=oficios
+      ).values_list('numero_oficio', flat=True))
+
+      registrados, errores, embargos, movimientos, modificadas = (
+          _preparar_embargos(validas, existentes, cuentas, resueltas,
+                             errores_cuenta, usuario))
+      try:
+        with transaction.atomic():
+          _guardar_embargos(embargos, movimientos, modificadas)
+        break
+      except IntegrityError:
+        # Un oficio del lote se confirmó en otra transacción después de la
+        # lectura: se vuelve a preparar el lote marcándolo como duplicado
+        confirmados = set(Embargo.objects.select_for_update().filter(
+            numero_oficio__in=oficios
+        ).values_list('numero_oficio', flat=True))
+        if confirmados <= existentes:
+          raise
+        existentes |= confirmados
+
+    if simular:
+      transaction.set_rollback(True)
+
+  errores = sorted(errores_formato + errores, key=lambda error: error['fila'])
+  return registrados, errores
+
+
+def _preparar_embargos(validas, existentes, cuentas, resueltas,
+    errores_cuenta, usuario):
+  """
+  Aplica en memoria los embargos del lote sobre las cuentas bloqueadas
+
+  Returns:
+      (registrados, errores, Embargo sin guardar, Movimiento sin guardar,
+       cuentas modificadas por id)
+  """
+  from operaciones.models import Movimiento
+
+  registrados = []
+  errores = []
+  vistos = set()
+  embargos = []
+  movimientos = []
+  modificadas = {}
+
+  for numero_fila, datos in validas:
+    oficio = datos['numero_oficio']
+
+    if oficio in existentes:
+      error = 'Ya existe un embargo con este número de oficio'
+    elif oficio in vistos:
+      error = 'Número de oficio repetido en el archivo'
+    elif datos['identificador'] in errores_cuenta:
+      error = errores_cuenta[datos['identificador']]
+    else:
+      error = None
+
+    cuenta = cuentas.get(resueltas.get(datos['identificador']))
+    if error is None and cuenta is None:
+      error = 'Cuenta no encontrada o cerrada'
+
+    monto = datos['monto']
+    if error is None:
+      if datos['es_total']:
+        monto = monto or cuenta.saldo
+      elif monto > cuenta.saldo:
+        error = 'El monto del embargo no puede exceder el saldo de la cuenta'
+
+    if error:
+      errores.append({'fila': numero_fila, 'numero_oficio': oficio,
+                      'error': error})
+      continue
+
+    vistos.add(oficio)
+
+    # monto_embargado suma solo los parciales (ver Cuenta.aplicar_embargo)
+    if datos['es_total']:
+      cuenta.embargo_total = True
+      cuenta.embargos_totales_vigentes += 1
+    else:
+      cuenta.monto_embargado += monto
+    cuenta.embargos_vigentes += 1
+    cuenta.estado = 'EMBARGADA'
+    cuenta.saldo_disponible = cuenta.get_saldo_disponible()
+    modificadas[cuenta.pk] = cuenta
+
+    embargos.append(Embargo(
+        cuenta=cuenta,
+        numero_oficio=oficio,
+        juzgado=datos['juzgado'],
+        monto_embargado=monto,
+        es_total=datos['es_total'],
+        observaciones='Registrado por carga masiva',
+        usuario_registro=usuario
+    ))
+    movimientos.append(Movimiento(
+        cuenta=cuenta,
+        tipo_movimiento='EMBARGO',
+        monto=monto,
+        saldo_anterior=cuenta.saldo,
+        saldo_nuevo=cuenta.saldo,
+        descripcion=f'Embargo judicial - Oficio: {oficio}',
+        usuario=usuario
+    ))
+    registrados.append({
+      'fila': numero_fila,
+      'numero_oficio': oficio,
+      'numero_cuenta': cuenta.numero_cuenta,
+      'monto': monto,
+      'es_total': datos['es_total'],
+    })
+
+  return registrados, errores, embargos, movimientos, modificadas
+
+
+def _guardar_embargos(embargos, movimientos, modificadas) -> None:
+  """Inserta los embargos (primero, por su oficio único) y actualiza las cuentas"""
+  from operaciones.models import Movimiento
+
+  if not modificadas:
+    return
+  Embargo.objects.bulk_create(embargos, batch_size=500)
+  Cuenta.objects.bulk_update(
+      modificadas.values(),
+      ['monto_embargado', 'embargo_total', 'saldo_disponible', 'estado',
+       'embargos_vigentes', 'embargos_totales_vigentes'],
+      batch_size=500
+  )
+  Movimiento.objects.bulk_create(movimientos, batch_size=500)
+
+
+def escribir_reporte_errores(errores: List[Dict], destino) -> None:
+  """Escribe el reporte de errores por fila en formato CSV"""
+  escritor = csv.DictWriter(destino,
+                            fieldnames=['fila', 'numero_oficio', 'error'])
+  escritor.writeheader()
+  escritor.writerows(errores)
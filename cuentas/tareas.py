@@ -0,0 +1,15 @@
+from core.trabajos import ejecutar_comando, tarea
+
+from .models import Cuenta
+
+
+@tarea('verificar_saldo_disponible')
+def verificar_saldo_disponible(corregir: bool = False):
+  """Verifica la columna saldo_disponible y opcionalmente la corrige"""
+  return ejecutar_comando('verificar_saldo_disponible', corregir=corregir)
+
+
+@tarea('inactivar_cuentas')
+def inactivar_cuentas():
+  """Inactiva las cuentas sin saldo ni movimientos en DIAS_INACTIVIDAD días"""
+  return {'inactivadas': Cuenta.inactivar_automaticamente()}
@@ -1,3 +1,223 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
 from django.test import TestCase
+from django.utils import timezone
+
+from core.pruebas import DatosBancariosMixin
+from operaciones.models import Movimiento
+
+from .models import Cuenta, Embargo
+from .services import leer_monto, registrar_embargos_masivos
+
+
+class DatosCuentasMixin(DatosBancariosMixin):
+  """Datos bancarios de prueba con una cuenta de ahorro con saldo 100"""
+
+  def setUp(self):
+    super().setUp()
+    self.cuenta = self.crear_cuenta()
+
+  def embargar(self, oficio, monto, es_total=False):
+    embargo = Embargo.objects.create(
+        cuenta=self.cuenta, numero_oficio=oficio, juzgado='1er Juzgado Civil',
+        monto_embargado=Decimal(monto), es_total=es_total,
+        usuario_registro=self.usuario)
+    self.cuenta.aplicar_embargo(embargo)
+    return embargo
+
+  def assertCuenta(self, monto_embargado, saldo_disponible, estado,
+      vigentes, totales):
+    cuenta = Cuenta.objects.get(pk=self.cuenta.pk)
+    self.assertEqual(
+        (cuenta.monto_embargado, cuenta.saldo_disponible, cuenta.estado,
+         cuenta.embargos_vigentes, cuenta.embargos_totales_vigentes,
+         cuenta.embargo_total),
+        (Decimal(monto_embargado), Decimal(saldo_disponible), estado,
+         vigentes, totales, totales > 0))
+
+
+class EmbargoTests(DatosCuentasMixin, TestCase):
+
+  def test_embargo_total_conserva_la_suma_de_los_parciales(self):
+    parcial = self.embargar('OF-1', '30.00')
+    self.assertCuenta('30.00', '70.00', 'EMBARGADA', 1, 0)
+
+    total = self.embargar('OF-2', '100.00', es_total=True)
+    self.assertCuenta('30.00', '0.00', 'EMBARGADA', 2, 1)
+
+    total.levantar_embargo()
+    self.assertCuenta('30.00', '70.00', 'EMBARGADA', 1, 0)
+
+    parcial.levantar_embargo()
+    self.assertCuenta('0.00', '100.00', 'ACTIVA', 0, 0)
+
+  def test_levantar_dos_veces_no_descuenta_de_nuevo(self):
+    embargo = self.embargar('OF-1', '30.00')
+    self.embargar('OF-2', '20.00')
+    embargo.levantar_embargo()
+
+    with self.assertRaises(ValidationError):
+      embargo.levantar_embargo()
+    self.assertCuenta('20.00', '80.00', 'EMBARGADA', 1, 0)
+
+  def test_cuenta_con_embargo_total_no_puede_cerrarse(self):
+    Cuenta.objects.filter(pk=self.cuenta.pk).update(
+        saldo_disponible=Decimal('0.00'), saldo=Decimal('0.00'))
+    self.embargar('OF-1', '0.00', es_total=True)
+
+    cuenta = Cuenta.objects.get(pk=self.cuenta.pk)
+    self.assertFalse(cuenta.puede_cerrarse())
+
+
+class InactivacionTests(DatosCuentasMixin, TestCase):
+
+  def crear(self, saldo='0.00', dias=91, **campos):
+    cuenta = self.crear_cuenta(saldo, **campos)
+    # Las cuentas a plazo se abren con su monto inicial como saldo
+    Cuenta.objects.filter(pk=cuenta.pk).update(
+        saldo_disponible=Decimal(saldo), saldo=Decimal(saldo),
+        fecha_ultimo_movimiento=timezone.now() - timezone.timedelta(days=dias))
+    return cuenta
+
+  def test_inactiva_solo_las_que_cumplen_la_regla_del_modelo(self):
+    candidatas = [
+      self.crear(),
+      self.crear(dias=30),
+      self.crear(saldo='5.00'),
+      self.crear(tipo_cuenta='PLAZO', monto_inicial=Decimal('1000.00'),
+                 plazo_meses=12, tasa_interes_mensual=Decimal('1.00')),
+    ]
+    esperadas = {cuenta.pk for cuenta in Cuenta.objects.filter(
+        pk__in=[c.pk for c in candidatas]) if cuenta.debe_inactivarse_automaticamente()}
+
+    self.assertEqual(Cuenta.inactivar_automaticamente(), 1)
+
+    inactivas = set(Cuenta.objects.filter(
+        estado='INACTIVA', esta_activa=False).values_list('pk', flat=True))
+    self.assertEqual(inactivas, esperadas)
+    self.assertEqual(inactivas, {candidatas[0].pk})
+
+  def test_no_cambia_el_estado_de_cuentas_embargadas(self):
+    cuenta = self.crear()
+    Cuenta.objects.filter(pk=cuenta.pk).update(estado='EMBARGADA')
+
+    self.assertEqual(Cuenta.inactivar_automaticamente(), 0)
+
+
+class EmbargosMasivosTests(DatosCuentasMixin, TestCase):
+
+  def fila(self, numero, oficio, monto, es_total=''):
+    return {'fila': numero, 'numero_oficio': oficio, 'juzgado': 'Juzgado',
+            'cuenta': self.cuenta.numero_cuenta, 'monto': monto,
+            'es_total': es_total}
+
+  def test_registra_las_filas_validas_y_reporta_las_demas(self):
+    self.embargar('OF-EXISTE', '10.00')
+
+    registrados, errores = registrar_embargos_masivos([
+      self.fila(2, 'OF-1', '20.00'),
+      self.fila(3, 'OF-NAN', 'NaN'),
+      self.fila(4, 'OF-DEC', '5.005'),
+      self.fila(5, 'OF-EXISTE', '5.00'),
+      self.fila(6, 'OF-1', '5.00'),
+      self.fila(7, 'OF-TOTAL', '', es_total='SI'),
+    ], self.usuario)
+
+    self.assertEqual([r['numero_oficio'] for r in registrados],
+                     ['OF-1', 'OF-TOTAL'])
+    self.assertEqual([e['fila'] for e in errores], [3, 4, 5, 6])
+    self.assertCuenta('30.00', '0.00', 'EMBARGADA', 3, 1)
+
+  def test_simular_no_guarda_cambios(self):
+    registrados, errores = registrar_embargos_masivos(
+        [self.fila(2, 'OF-1', '20.00')], self.usuario, simular=True)
+
+    self.assertEqual(len(registrados), 1)
+    self.assertEqual(errores, [])
+    self.assertFalse(Embargo.objects.exists())
+    self.assertCuenta('0.00', '100.00', 'ACTIVA', 0, 0)
+
+  def test_las_cuentas_cerradas_no_se_embargan(self):
+    cerrada = self.crear_cuenta('0.00', estado='CERRADA')
+    por_documento = dict(self.fila(3, 'OF-DOC', '10.00'),
+                         cuenta=self.cliente.numero_documento)
+
+    registrados, errores = registrar_embargos_masivos([
+      dict(self.fila(2, 'OF-CERRADA', '10.00'), cuenta=cerrada.numero_cuenta),
+      por_documento,
+    ], self.usuario)
+
+    # La cuenta cerrada no cuenta entre las del titular
+    self.assertEqual([r['numero_oficio'] for r in registrados], ['OF-DOC'])
+    self.assertEqual(errores, [{'fila': 2, 'numero_oficio': 'OF-CERRADA',
+                                'error': 'Cuenta no encontrada o cerrada'}])
+    self.assertCuenta('10.00', '90.00', 'EMBARGADA', 1, 0)
+
+
+class LeerMontoTests(TestCase):
+
+  def test_acepta_separador_de_miles(self):
+    self.assertEqual(leer_monto('1,250.5'), Decimal('1250.50'))
+
+  def test_rechaza_montos_no_finitos_o_con_mas_de_dos_decimales(self):
+    for texto in ('NaN', 'sNaN', 'Infinity', '-inf', '50.005', 'abc',
+                  '99999999999999'):
+      with self.subTest(texto=texto), self.assertRaises(ValueError):
+        leer_monto(texto)
+
+
+class SaldoEnTests(DatosCuentasMixin, TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.t0 = timezone.now() - timezone.timedelta(days=10)
+    self.otra = self.crear_cuenta('0.00')
+    Movimiento.objects.filter(cuenta__in=[self.cuenta, self.otra]).delete()
+
+  def movimiento(self, cuenta, horas, saldo_nuevo):
+    movimiento = Movimiento.objects.create(
+        cuenta=cuenta, tipo_movimiento='DEPOSITO', monto=Decimal('1.00'),
+        saldo_anterior=Decimal('0.00'), saldo_nuevo=Decimal(saldo_nuevo),
+        descripcion='', usuario=self.usuario)
+    Movimiento.objects.filter(pk=movimiento.pk).update(
+        fecha_hora=self.t0 + timezone.timedelta(hours=horas))
+
+  def test_instante_igual_al_de_un_movimiento_lo_incluye(self):
+    self.movimiento(self.cuenta, 1, '10.00')
+    self.movimiento(self.cuenta, 2, '25.00')
+
+    instante = self.t0 + timezone.timedelta(hours=2)
+    self.assertEqual(self.cuenta.saldo_en(instante), Decimal('25.00'))
+    self.assertEqual(
+        self.cuenta.saldo_en(instante - timezone.timedelta(microseconds=1)),
+        Decimal('10.00'))
+
+  def test_movimientos_en_el_mismo_instante_gana_el_ultimo_registrado(self):
+    self.movimiento(self.cuenta, 1, '10.00')
+    self.movimiento(self.cuenta, 1, '15.00')
+
+    self.assertEqual(self.cuenta.saldo_en(self.t0 + timezone.timedelta(hours=1)),
+                     Decimal('15.00'))
+
+  def test_antes_del_primer_movimiento_el_saldo_es_cero(self):
+    self.movimiento(self.cuenta, 1, '10.00')
+
+    self.assertEqual(self.cuenta.saldo_en(self.t0), Decimal('0.00'))
+
+  def test_saldos_en_resuelve_varias_cuentas_a_la_vez(self):
+    self.movimiento(self.cuenta, 1, '10.00')
+    self.movimiento(self.cuenta, 5, '40.00')
+    self.movimiento(self.otra, 3, '7.00')
+    sin_movimientos = self.crear_cuenta('0.00')
+    Movimiento.objects.filter(cuenta=sin_movimientos).delete()
+    cuentas = [self.cuenta.pk, self.otra.pk, sin_movimientos.pk]
 
-# Create your tests here.
+    self.assertEqual(
+        Cuenta.saldos_en(cuentas, self.t0 + timezone.timedelta(hours=3)),
+        {self.cuenta.pk: Decimal('10.00'), self.otra.pk: Decimal('7.00'),
+         sin_movimientos.pk: Decimal('0.00')})
+    self.assertEqual(
+        Cuenta.saldos_en(cuentas, self.t0 + timezone.timedelta(hours=5)),
+        {self.cuenta.pk: Decimal('40.00'), self.otra.pk: Decimal('7.00'),
+         sin_movimientos.pk: Decimal('0.00')})
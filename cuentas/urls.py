@@ -11,6 +11,9 @@ urlpatterns = [
     path('<int:cuenta_id>/inactivar/', views.inactivar_cuenta, name='inactivar_cuenta'),
     path('<int:cuenta_id>/movimientos/', views.movimientos_cuenta, name='movimientos_cuenta'),
     path('<int:cuenta_id>/embargo/', views.registrar_embargo, name='registrar_embargo'),
+    path('embargos/importar/', views.importar_embargos, name='importar_embargos'),
     path('embargo/<int:embargo_id>/levantar/', views.levantar_embargo, name='levantar_embargo'),
     path('buscar/', views.buscar_cuenta_ajax, name='buscar_cuenta_ajax'),
+    path('<int:cuenta_id>/saldo-en/', views.saldo_en_ajax, name='saldo_en_ajax'),
+    path('saldos-en/', views.saldos_en_ajax, name='saldos_en_ajax'),
 ]
\ No newline at end of file
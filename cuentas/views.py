@@ -10,7 +10,9 @@ from django.db.models import Q
 from decimal import Decimal
 
 from .models import Cuenta, Embargo
-from .forms import CuentaForm, EmbargoForm, BuscarCuentaForm, CerrarCuentaForm
+from .forms import CuentaForm, EmbargoForm, BuscarCuentaForm, CerrarCuentaForm, \
+  ImportarEmbargosForm
+from .services import leer_archivo_embargos, registrar_embargos_masivos
 from clientes.models import Cliente
 from operaciones.models import Movimiento
 
@@ -45,6 +47,14 @@ def lista_cuentas(request):
     if estado:
       cuentas = cuentas.filter(estado=estado)
 
+    saldo_minimo = form.cleaned_data.get('saldo_disponible_minimo')
+    if saldo_minimo is not None:
+      cuentas = cuentas.filter(saldo_disponible__gte=saldo_minimo)
+
+    orden = form.cleaned_data.get('orden')
+    if orden:
+      cuentas = cuentas.order_by(orden, '-fecha_apertura')
+
   context = {
     'cuentas': cuentas,
     'form': form,
@@ -115,8 +125,7 @@ def detalle_cuenta(request, cuenta_id):
   embargos_activos = cuenta.embargos.filter(esta_vigente=True).order_by(
     '-fecha_embargo')
 
-  # Calcular saldo disponible
-  saldo_disponible = cuenta.get_saldo_disponible()
+  saldo_disponible = cuenta.saldo_disponible
 
   # Calcular interés si es cuenta a plazo
   interes_generado = None
@@ -225,14 +234,7 @@ def registrar_embargo(request, cuenta_id):
           embargo.save()
 
           # Actualizar cuenta
-          if embargo.es_total:
-            cuenta.embargo_total = True
-            cuenta.monto_embargado = cuenta.saldo
-          else:
-            cuenta.monto_embargado += embargo.monto_embargado
-
-          cuenta.estado = 'EMBARGADA'
-          cuenta.save()
+          cuenta.aplicar_embargo(embargo)
 
           # Registrar movimiento
           Movimiento.objects.create(
@@ -268,6 +270,53 @@ def registrar_embargo(request, cuenta_id):
   return render(request, 'cuentas/embargo.html', context)
 
 
+@login_required
+def importar_embargos(request):
+  """Vista para registrar embargos en bloque desde un archivo de oficios"""
+  registrados = None
+  errores = None
+
+  if request.method == 'POST':
+    form = ImportarEmbargosForm(request.POST, request.FILES)
+    if form.is_valid():
+      try:
+        filas = leer_archivo_embargos(form.cleaned_data['archivo'])
+        simular = form.cleaned_data['simular']
+        registrados, errores = registrar_embargos_masivos(
+            filas, request.user, simular=simular)
+
+        if simular:
+          messages.info(
+              request,
+              f'Validación completada: {len(registrados)} embargo(s) listos para registrar, '
+              f'{len(errores)} fila(s) con errores.'
+          )
+        else:
+          messages.success(
+              request,
+              f'{len(registrados)} embargo(s) registrados exitosamente de {len(filas)} fila(s).'
+          )
+          if errores:
+            messages.warning(request,
+                             f'{len(errores)} fila(s) no se registraron. Revise el detalle.')
+      except ValueError as e:
+        messages.error(request, f'Archivo inválido: {str(e)}')
+      except Exception as e:
+        messages.error(request, f'Error inesperado: {str(e)}')
+    else:
+      messages.error(request, 'Por favor corrija los errores en el formulario.')
+  else:
+    form = ImportarEmbargosForm()
+
+  context = {
+    'form': form,
+    'registrados': registrados,
+    'errores': errores,
+  }
+
+  return render(request, 'cuentas/importar_embargos.html', context)
+
+
 @login_required
 def levantar_embargo(request, embargo_id):
   """Vista para levantar embargo"""
@@ -278,6 +327,7 @@ def levantar_embargo(request, embargo_id):
       with transaction.atomic():
         cuenta = embargo.cuenta
 
+        # Actualiza el embargo y los contadores de la cuenta
         embargo.levantar_embargo()
 
         # Registrar movimiento
@@ -291,14 +341,9 @@ def levantar_embargo(request, embargo_id):
             usuario=request.user
         )
 
-        # Si no hay más embargos, cambiar estado
-        if not cuenta.embargos.filter(esta_vigente=True).exists():
-          cuenta.estado = 'ACTIVA'
-          cuenta.save()
-
         messages.success(request,
                          f'Embargo levantado exitosamente. Oficio: {embargo.numero_oficio}')
-        return redirect('cuentas:detalle_cuenta', cuenta_id=cuenta.cuenta.id)
+        return redirect('cuentas:detalle_cuenta', cuenta_id=cuenta.id)
 
     except Exception as e:
       messages.error(request, f'Error: {str(e)}')
@@ -346,7 +391,97 @@ def buscar_cuenta_ajax(request):
       'moneda': cuenta.get_moneda_display(),
       'saldo': str(cuenta.saldo),
       'cliente': cuenta.cliente.get_nombre_completo(),
-      'saldo_disponible': str(cuenta.get_saldo_disponible()),
+      'saldo_disponible': str(cuenta.saldo_disponible),
     })
 
-  return JsonResponse({'cuentas': resultados})
\ No newline at end of file
+  return JsonResponse({'cuentas': resultados})
+
+
+def _parsear_fecha_hora(valor):
+  """Convierte un parámetro ISO 8601 (fecha o fecha-hora) a datetime aware"""
+  from datetime import datetime, time
+  from django.utils import timezone
+  from django.utils.dateparse import parse_date, parse_datetime
+
+  if not valor:
+    return None
+
+  try:
+    fecha = parse_date(valor)
+    if fecha is not None:
+      # Una fecha sola se interpreta como el cierre de ese día
+      fecha_hora = datetime.combine(fecha, time.max)
+    else:
+      fecha_hora = parse_datetime(valor)
+      if fecha_hora is None:
+        return None
+  except ValueError:
+    return None
+
+  if timezone.is_naive(fecha_hora):
+    fecha_hora = timezone.make_aware(fecha_hora)
+
+  return fecha_hora
+
+
+@login_required
+def saldo_en_ajax(request, cuenta_id):
+  """Vista AJAX para consultar el saldo de una cuenta en un instante dado"""
+  from django.http import JsonResponse
+
+  cuenta = get_object_or_404(Cuenta, pk=cuenta_id)
+
+  fecha_hora = _parsear_fecha_hora(request.GET.get('fecha', ''))
+  if fecha_hora is None:
+    return JsonResponse(
+        {'error': 'Debe indicar una fecha válida (ISO 8601) en el parámetro "fecha"'},
+        status=400
+    )
+
+  return JsonResponse({
+    'id': cuenta.id,
+    'numero_cuenta': cuenta.numero_cuenta,
+    'moneda': cuenta.get_moneda_display(),
+    'fecha': fecha_hora.isoformat(),
+    'saldo': str(cuenta.saldo_en(fecha_hora)),
+  })
+
+
+@login_required
+def saldos_en_ajax(request):
+  """Vista AJAX para consultar el saldo de varias cuentas en un instante dado"""
+  from django.http import JsonResponse
+
+  fecha_hora = _parsear_fecha_hora(request.GET.get('fecha', ''))
+  if fecha_hora is None:
+    return JsonResponse(
+        {'error': 'Debe indicar una fecha válida (ISO 8601) en el parámetro "fecha"'},
+        status=400
+    )
+
+  try:
+    cuenta_ids = [
+      int(valor) for valor in request.GET.get('cuentas', '').split(',')
+      if valor.strip()
+    ]
+  except ValueError:
+    return JsonResponse(
+        {'error': 'El parámetro "cuentas" debe ser una lista de IDs separados por comas'},
+        status=400
+    )
+
+  if not cuenta_ids:
+    return JsonResponse({'fecha': fecha_hora.isoformat(), 'saldos': {}})
+
+  if len(cuenta_ids) > 1000:
+    return JsonResponse(
+        {'error': 'Se pueden consultar como máximo 1000 cuentas por solicitud'},
+        status=400
+    )
+
+  saldos = Cuenta.saldos_en(cuenta_ids, fecha_hora)
+
+  return JsonResponse({
+    'fecha': fecha_hora.isoformat(),
+    'saldos': {str(pk): str(saldo) for pk, saldo in saldos.items()},
+  })
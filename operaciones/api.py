@@ -0,0 +1,324 @@
+import functools
+import json
+
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.http import JsonResponse
+from django.middleware.csrf import get_token
+
+from cuentas.models import Cuenta
+
+from . import services
+from .forms import (
+  DepositoAPIForm, MovimientosAPIForm, RetiroAPIForm, TransferenciaAPIForm,
+  TransferenciaLoteAPIForm,
+)
+from .models import Movimiento, Planilla
+
+
+# Cabecera con la clave de idempotencia de las operaciones
+CABECERA_IDEMPOTENCIA = 'Idempotency-Key'
+LONGITUD_CLAVE = 100
+
+MOVIMIENTOS_POR_PAGINA = 50
+
+
+def _error(mensaje: str, estado: int, codigo: str) -> JsonResponse:
+  return JsonResponse({'errores': {NON_FIELD_ERRORS: [
+    {'codigo': codigo, 'mensaje': mensaje}]}}, status=estado)
+
+
+def _errores(errores_por_campo, estado: int = 400) -> JsonResponse:
+  """Respuesta con los errores de validación de cada campo y su código"""
+  return JsonResponse({'errores': {
+    campo: [{'codigo': error.code or 'invalid', 'mensaje': mensaje}
+            for error in errores for mensaje in error]
+    for campo, errores in errores_por_campo.items()
+  }}, status=estado)
+
+
+def _errores_validacion(error: ValidationError) -> JsonResponse:
+  if hasattr(error, 'error_dict'):
+    return _errores(error.error_dict)
+  return _errores({NON_FIELD_ERRORS: error.error_list})
+
+
+def vista_api(*metodos):
+  """
+  Decorador de las vistas de la API
+
+  Exige sesión iniciada y uno de los métodos indicados, respondiendo en
+  JSON (401/405) en lugar de redirigir al login. Las solicitudes POST
+  siguen protegidas por CSRF: el cliente envía la cabecera X-CSRFToken.
+  """
+  def decorador(vista):
+    @functools.wraps(vista)
+    def envoltura(request, *args, **kwargs):
+      if not request.user.is_authenticated:
+        return _error('Debe iniciar sesión', 401, 'no_autenticado')
+      if request.method not in metodos:
+        respuesta = _error('Método no permitido', 405, 'metodo_no_permitido')
+        respuesta['Allow'] = ', '.join(metodos)
+        return respuesta
+      return vista(request, *args, **kwargs)
+    return envoltura
+  return decorador
+
+
+def _leer_json(request):
+  """Cuerpo JSON de la solicitud o None si no es un objeto válido"""
+  try:
+    datos = json.loads(request.body or b'{}')
+  except (ValueError, UnicodeDecodeError):
+    return None
+  return datos if isinstance(datos, dict) else None
+
+
+def _monto(valor) -> str:
+  return f'{valor:.2f}'
+
+
+def _cuenta(cuenta: Cuenta) -> dict:
+  return {
+    'id': cuenta.id,
+    'numero_cuenta': cuenta.numero_cuenta,
+    'moneda': cuenta.moneda,
+    'saldo': _monto(cuenta.saldo),
+    'saldo_disponible': _monto(cuenta.saldo_disponible),
+  }
+
+
+def _operar(request, formulario, operacion: str, ejecutar) -> JsonResponse:
+  """
+  Valida el cuerpo JSON con `formulario` y ejecuta la operación
+
+  `ejecutar(datos)` llama al servicio y retorna el cuerpo de la respuesta
+  (con '_estado' si no es 201).
+  Con la cabecera Idempotency-Key la operación se registra una sola vez y
+  las repeticiones reciben la misma respuesta.
+  """
+  datos = _leer_json(request)
+  if datos is None:
+    return _error('El cuerpo debe ser un objeto JSON', 400, 'json_invalido')
+
+  form = formulario(datos)
+  if not form.is_valid():
+    return _errores(form.errors.as_data())
+
+  clave = request.headers.get(CABECERA_IDEMPOTENCIA)
+  if clave is not None and not 0 < len(clave) <= LONGITUD_CLAVE:
+    return _error(f'{CABECERA_IDEMPOTENCIA} debe tener entre 1 y '
+                  f'{LONGITUD_CLAVE} caracteres', 400, 'clave_invalida')
+
+  def ejecutar_operacion():
+    cuerpo = ejecutar(form.cleaned_data)
+    return cuerpo.pop('_estado', 201), cuerpo
+
+  try:
+    if clave is None:
+      estado, cuerpo = ejecutar_operacion()
+      repetida = False
+    else:
+      estado, cuerpo, repetida = services.ejecutar_idempotente(
+          request.user, clave, operacion, form.cleaned_data, ejecutar_operacion)
+  except ValidationError as e:
+    return _errores_validacion(e)
+  except services.ConflictoIdempotencia as e:
+    return _error(str(e), 422, 'clave_reutilizada')
+  except services.LoteRechazado as e:
+    return JsonResponse({
+      'errores': {NON_FIELD_ERRORS: [{'codigo': 'lote_rechazado',
+                                      'mensaje': str(e)}]},
+      'resultados': _resultados_lote(e.resultados),
+    }, status=422)
+
+  respuesta = JsonResponse(cuerpo, status=estado)
+  if repetida:
+    respuesta['Idempotent-Replayed'] = 'true'
+  return respuesta
+
+
+@vista_api('GET')
+def csrf(request):
+  """Token CSRF para las operaciones POST de la API"""
+  return JsonResponse({'csrf_token': get_token(request)})
+
+
+@vista_api('POST')
+def deposito(request):
+  """Registra un depósito: {cuenta, monto, clave_autorizacion?, origen_fondos?}"""
+  def ejecutar(datos):
+    deposito = services.depositar(
+        datos['cuenta'], datos['monto'], request.user,
+        clave_autorizacion=datos['clave_autorizacion'] or None,
+        origen_fondos=datos['origen_fondos'] or None
+    )
+    return {
+      'id': deposito.id,
+      'movimiento': deposito.movimiento_id,
+      'monto': _monto(deposito.monto),
+      'requiere_autorizacion': deposito.requiere_autorizacion,
+      'fecha_hora': deposito.fecha_hora.isoformat(),
+      'cuenta': _cuenta(deposito.cuenta),
+    }
+
+  return _operar(request, DepositoAPIForm, 'deposito', ejecutar)
+
+
+@vista_api('POST')
+def retiro(request):
+  """Registra un retiro: {cuenta, monto}"""
+  def ejecutar(datos):
+    retiro = services.retirar(datos['cuenta'], datos['monto'], request.user)
+    return {
+      'id': retiro.id,
+      'movimiento': retiro.movimiento_id,
+      'monto': _monto(retiro.monto),
+      'fecha_hora': retiro.fecha_hora.isoformat(),
+      'cuenta': _cuenta(retiro.cuenta),
+    }
+
+  return _operar(request, RetiroAPIForm, 'retiro', ejecutar)
+
+
+@vista_api('POST')
+def transferencia(request):
+  """
+  Registra una transferencia:
+  {cuenta_origen, cuenta_destino, monto_origen, descripcion?}
+  """
+  def ejecutar(datos):
+    transferencia = services.transferir(
+        datos['cuenta_origen'], datos['cuenta_destino'], datos['monto_origen'],
+        request.user, descripcion=datos['descripcion'] or None
+    )
+    return {
+      'id': transferencia.id,
+      'movimiento_origen': transferencia.movimiento_origen_id,
+      'movimiento_destino': transferencia.movimiento_destino_id,
+      'monto_origen': _monto(transferencia.monto_origen),
+      'monto_destino': _monto(transferencia.monto_destino),
+      'tipo_cambio': (str(transferencia.tipo_cambio)
+                      if transferencia.tipo_cambio is not None else None),
+      'fecha_hora': transferencia.fecha_hora.isoformat(),
+      'cuenta_origen': _cuenta(transferencia.cuenta_origen),
+      'cuenta_destino': _cuenta(transferencia.cuenta_destino),
+    }
+
+  return _operar(request, TransferenciaAPIForm, 'transferencia', ejecutar)
+
+
+def _resultados_lote(resultados):
+  return [{
+    **resultado,
+    'monto_destino': _monto(resultado['monto_destino']),
+    'tipo_cambio': (str(resultado['tipo_cambio'])
+                    if resultado['tipo_cambio'] is not None else None),
+  } if resultado['estado'] == 'REGISTRADA' else resultado
+    for resultado in resultados]
+
+
+@vista_api('POST')
+def transferencia_lote(request):
+  """
+  Registra un lote de transferencias en una sola transacción:
+  {modo: 'todo'|'parcial', transferencias: [{cuenta_origen, cuenta_destino,
+  monto_origen, descripcion?}, ...]}
+
+  En modo 'todo' (por defecto) un lote con alguna transferencia inválida
+  responde 400/422 sin registrar ninguna; en modo 'parcial' se registran
+  las válidas. La respuesta trae un resultado por transferencia.
+  """
+  def ejecutar(datos):
+    transferencias = datos['transferencias']
+    validas = [item for item in transferencias if 'error' not in item]
+    registros = iter(services.transferir_lote(
+        validas, request.user, modo=datos['modo']) if validas else [])
+    # Los rechazados por formato conservan su posición en el lote
+    resultados = [
+      {'indice': indice, 'estado': 'RECHAZADA', **item} if 'error' in item
+      else {**next(registros), 'indice': indice}
+      for indice, item in enumerate(transferencias)
+    ]
+    registradas = sum(1 for r in resultados if r['estado'] == 'REGISTRADA')
+    return {
+      '_estado': 201 if registradas else 200,
+      'modo': datos['modo'],
+      'registradas': registradas,
+      'rechazadas': len(resultados) - registradas,
+      'resultados': _resultados_lote(resultados),
+    }
+
+  return _operar(request, TransferenciaLoteAPIForm, 'transferencia_lote',
+                 ejecutar)
+
+
+@vista_api('GET')
+def saldo(request, cuenta_id):
+  """Saldo y estado de una cuenta"""
+  cuenta = Cuenta.objects.filter(pk=cuenta_id).values(
+      'id', 'numero_cuenta', 'tipo_cuenta', 'moneda', 'estado', 'esta_activa',
+      'saldo', 'saldo_disponible', 'fecha_ultimo_movimiento').first()
+  if cuenta is None:
+    return _error('La cuenta no existe', 404, 'cuenta_inexistente')
+  return JsonResponse(cuenta)
+
+
+@vista_api('GET')
+def movimientos(request, cuenta_id):
+  """
+  Movimientos de una cuenta, del más reciente al más antiguo
+
+  Se paginan por id: ?limite=50&antes_de=<siguiente de la página anterior>
+  """
+  form = MovimientosAPIForm(request.GET)
+  if not form.is_valid():
+    return _errores(form.errors.as_data())
+  if not Cuenta.objects.filter(pk=cuenta_id).exists():
+    return _error('La cuenta no existe', 404, 'cuenta_inexistente')
+
+  limite = form.cleaned_data['limite'] or MOVIMIENTOS_POR_PAGINA
+  consulta = Movimiento.objects.filter(cuenta_id=cuenta_id)
+  if form.cleaned_data['antes_de']:
+    consulta = consulta.filter(pk__lt=form.cleaned_data['antes_de'])
+  filas = list(consulta.order_by('-pk').values(
+      'id', 'tipo_movimiento', 'monto', 'saldo_anterior', 'saldo_nuevo',
+      'descripcion', 'fecha_hora', 'cuenta_destino_id')[:limite + 1])
+
+  return JsonResponse({
+    'cuenta': cuenta_id,
+    'movimientos': filas[:limite],
+    'siguiente': filas[limite - 1]['id'] if len(filas) > limite else None,
+  })
+
+
+@vista_api('GET')
+def planilla(request, planilla_id):
+  """Avance de una planilla y sus líneas fallidas o inválidas"""
+  planilla = Planilla.objects.filter(pk=planilla_id).select_related(
+      'cuenta_origen').first()
+  if planilla is None:
+    return _error('La planilla no existe', 404, 'planilla_inexistente')
+
+  return JsonResponse({
+    'id': planilla.id,
+    'estado': planilla.estado,
+    'descripcion': planilla.descripcion,
+    'cuenta_origen': planilla.cuenta_origen.numero_cuenta,
+    'moneda': planilla.cuenta_origen.moneda,
+    'total': _monto(planilla.total),
+    'total_abonado': _monto(planilla.total_abonado),
+    'total_devuelto': _monto(planilla.total_devuelto),
+    'lineas': planilla.lineas,
+    'lineas_invalidas': planilla.lineas_invalidas,
+    'lineas_abonadas': planilla.lineas_abonadas,
+    'lineas_fallidas': planilla.lineas_fallidas,
+    'lineas_pendientes': planilla.lineas_pendientes,
+    'porcentaje': planilla.porcentaje,
+    'movimiento_debito': planilla.movimiento_debito_id,
+    'movimiento_devolucion': planilla.movimiento_devolucion_id,
+    'fecha_debito': planilla.fecha_debito,
+    'fecha_fin': planilla.fecha_fin,
+    'errores': list(planilla.detalles.filter(estado__in=['INVALIDA', 'FALLIDA'])
+                    .order_by('linea').values('linea', 'numero_cuenta',
+                                              'estado', 'error')),
+  })
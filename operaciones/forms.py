@@ -210,4 +210,92 @@ class RenovarPlazoForm(forms.Form):
     self.helper = FormHelper()
     self.helper.form_method = 'post'
     self.helper.add_input(
-      Submit('submit', 'Renovar Plazo Fijo', css_class='btn btn-success'))
\ No newline at end of file
+      Submit('submit', 'Renovar Plazo Fijo', css_class='btn btn-success'))
+
+# Formularios de la API JSON: solo validan los datos, sin widgets ni
+# querysets de cuentas (la cuenta se valida al bloquearla en el servicio)
+
+def _campo_monto():
+  return forms.DecimalField(max_digits=15, decimal_places=2,
+                            min_value=Decimal('0.01'))
+
+
+class DepositoAPIForm(forms.Form):
+  """Datos de un depósito recibido por la API"""
+  cuenta = forms.IntegerField(min_value=1)
+  monto = _campo_monto()
+  clave_autorizacion = forms.CharField(max_length=50, required=False)
+  origen_fondos = forms.CharField(required=False)
+
+
+class RetiroAPIForm(forms.Form):
+  """Datos de un retiro recibido por la API"""
+  cuenta = forms.IntegerField(min_value=1)
+  monto = _campo_monto()
+
+
+class TransferenciaAPIForm(forms.Form):
+  """Datos de una transferencia recibida por la API"""
+  cuenta_origen = forms.IntegerField(min_value=1)
+  cuenta_destino = forms.IntegerField(min_value=1)
+  monto_origen = _campo_monto()
+  descripcion = forms.CharField(required=False)
+
+  def clean(self):
+    datos = super().clean()
+    if (datos.get('cuenta_origen') is not None and
+        datos.get('cuenta_origen') == datos.get('cuenta_destino')):
+      raise ValidationError('La cuenta origen y destino no pueden ser la misma',
+                            code='misma_cuenta')
+    return datos
+
+
+class MovimientosAPIForm(forms.Form):
+  """Paginación del listado de movimientos de la API"""
+  limite = forms.IntegerField(min_value=1, max_value=200, required=False)
+  antes_de = forms.IntegerField(min_value=1, required=False)
+
+
+class TransferenciaLoteAPIForm(forms.Form):
+  """
+  Lote de transferencias recibido por la API
+
+  En modo 'todo' cualquier transferencia inválida invalida el formulario;
+  en modo 'parcial' las inválidas quedan en cleaned_data como
+  {'codigo', 'error'} para informarlas como rechazadas.
+  """
+  modo = forms.ChoiceField(choices=[('todo', 'Todo o nada'),
+                                    ('parcial', 'Parcial')], required=False)
+  transferencias = forms.JSONField()
+
+  def clean_modo(self):
+    return self.cleaned_data['modo'] or 'todo'
+
+  def clean_transferencias(self):
+    transferencias = self.cleaned_data['transferencias']
+    maximo = getattr(settings, 'TRANSFERENCIAS_LOTE_MAXIMO', 1000)
+    if not isinstance(transferencias, list) or not transferencias:
+      raise ValidationError('Debe enviar una lista de transferencias',
+                            code='lote_vacio')
+    if len(transferencias) > maximo:
+      raise ValidationError(f'El lote admite como máximo {maximo} transferencias',
+                            code='lote_excedido')
+
+    validadas = []
+    errores = []
+    for indice, datos in enumerate(transferencias):
+      form = TransferenciaAPIForm(datos if isinstance(datos, dict) else {})
+      if form.is_valid():
+        validadas.append(form.cleaned_data)
+        continue
+      detalle = [(error.code, f'{campo}: {mensaje}')
+                 for campo, lista in form.errors.as_data().items()
+                 for error in lista for mensaje in error]
+      validadas.append({'codigo': detalle[0][0] or 'invalid',
+                        'error': '; '.join(mensaje for _, mensaje in detalle)})
+      errores += [ValidationError(f'Transferencia {indice}: {mensaje}', code=codigo)
+                  for codigo, mensaje in detalle]
+
+    if errores and self.cleaned_data.get('modo') != 'parcial':
+      raise ValidationError(errores)
+    return validadas
@@ -0,0 +1,432 @@
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from decimal import Decimal
+from multiprocessing import get_context
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.db.models import Sum
+from django.test.utils import (
+  setup_databases, setup_test_environment, teardown_databases,
+  teardown_test_environment,
+)
+from django.utils import timezone
+
+from clientes.models import Cliente
+from core.models import TipoCambio, Usuario
+from cuentas.models import Cuenta
+from operaciones import services
+from operaciones.models import Deposito, Movimiento, Retiro, Transferencia
+
+
+# Signo con el que cada tipo de movimiento afecta el saldo
+SIGNO_MOVIMIENTO = {
+  'DEPOSITO': 1,
+  'TRANSFERENCIA_RECIBIDA': 1,
+  'APERTURA': 1,
+  'INTERES_PLAZO': 1,
+  'RETIRO': -1,
+  'TRANSFERENCIA_ENVIADA': -1,
+  'CANCELACION_PLAZO': -1,
+  'RENOVACION_PLAZO': -1,
+  'CIERRE': 0,
+  'EMBARGO': 0,
+  'DESEMBARGO': 0,
+  'PAGO_PLANILLA': -1,
+  'ABONO_PLANILLA': 1,
+  'DEVOLUCION_PLANILLA': 1,
+}
+
+CENTIMO = Decimal('0.01')
+
+
+def _monto(aleatorio, maximo):
+  return Decimal(aleatorio.randint(100, maximo * 100)) / 100
+
+
+def _trabajador(numero, configuracion):
+  """
+  Ejecuta operaciones aleatorias y retorna lo que se registró
+
+  Corre en su propio hilo, con su propia conexión a la base de datos.
+  """
+  aleatorio = random.Random(configuracion['semilla'] * 1000 + numero)
+  usuario = Usuario.objects.get(pk=configuracion['usuario_id'])
+  cuentas = configuracion['cuentas']
+  resultado = {
+    'operaciones': Counter(),
+    'rechazos': Counter(),
+    'bloqueos': Counter(),
+    'errores': [],
+    'latencias': [],
+    'variacion': defaultdict(Decimal),
+  }
+
+  try:
+    for _ in range(configuracion['operaciones']):
+      eleccion = aleatorio.random()
+      inicio = time.perf_counter()
+      try:
+        if eleccion < configuracion['tasa_depositos']:
+          tipo = 'deposito'
+          cuenta_id, moneda = aleatorio.choice(cuentas)
+          deposito = services.depositar(cuenta_id, _monto(aleatorio, 300), usuario)
+          resultado['variacion'][moneda] += deposito.monto
+        elif eleccion < configuracion['tasa_depositos'] + configuracion['tasa_retiros']:
+          tipo = 'retiro'
+          cuenta_id, moneda = aleatorio.choice(cuentas)
+          retiro = services.retirar(cuenta_id, _monto(aleatorio, 300), usuario)
+          resultado['variacion'][moneda] -= retiro.monto
+        else:
+          (origen, moneda_origen), (destino, moneda_destino) = aleatorio.sample(
+              cuentas, 2)
+          tipo = ('transferencia' if moneda_origen == moneda_destino
+                  else 'transferencia_cambio')
+          transferencia = services.transferir(
+              origen, destino, _monto(aleatorio, 200), usuario,
+              descripcion='Prueba de estrés')
+          resultado['variacion'][moneda_origen] -= transferencia.monto_origen
+          resultado['variacion'][moneda_destino] += transferencia.monto_destino
+      except ValidationError:
+        # Saldo insuficiente o sobregiro agotado: rechazo esperado
+        resultado['rechazos'][tipo] += 1
+        continue
+      except OperationalError as e:
+        if services._tipo_bloqueo(e) is None:
+          resultado['errores'].append(f'{tipo}: {type(e).__name__}: {e}')
+        else:
+          # Reintentos por bloqueo agotados: la operación se revirtió completa
+          resultado['bloqueos'][tipo] += 1
+        continue
+      except Exception as e:
+        resultado['errores'].append(f'{tipo}: {type(e).__name__}: {e}')
+        continue
+      resultado['latencias'].append((time.perf_counter() - inicio) * 1000)
+      resultado['operaciones'][tipo] += 1
+  finally:
+    connections.close_all()
+
+  return resultado
+
+
+def _ejecutar_proceso(proceso, configuracion):
+  """Ejecuta los hilos de un proceso y combina sus resultados"""
+  previas = services.estadisticas_reintentos()
+  hilos = configuracion['hilos']
+  with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+    parciales = list(ejecutor.map(
+        lambda numero: _trabajador(proceso * hilos + numero, configuracion),
+        range(hilos)))
+  posteriores = services.estadisticas_reintentos()
+
+  combinado = _combinar(parciales)
+  combinado['reintentos'] = Counter(
+      {clave: posteriores[clave] - previas[clave] for clave in posteriores})
+  return combinado
+
+
+def _combinar(parciales):
+  combinado = {
+    'operaciones': Counter(),
+    'rechazos': Counter(),
+    'bloqueos': Counter(),
+    'errores': [],
+    'latencias': [],
+    'variacion': defaultdict(Decimal),
+    'reintentos': Counter(),
+  }
+  for parcial in parciales:
+    for clave in ('operaciones', 'rechazos', 'bloqueos', 'reintentos'):
+      combinado[clave].update(parcial.get(clave, {}))
+    combinado['errores'].extend(parcial['errores'])
+    combinado['latencias'].extend(parcial['latencias'])
+    for moneda, monto in parcial['variacion'].items():
+      combinado['variacion'][moneda] += monto
+  return combinado
+
+
+class Command(BaseCommand):
+  help = ('Ejecuta depósitos, retiros y transferencias aleatorias en paralelo '
+          'sobre un conjunto de cuentas en una base de datos de prueba y '
+          'verifica que el dinero se conserve y los movimientos sean consistentes')
+
+  def add_arguments(self, parser):
+    parser.add_argument('--cuentas', type=int, default=10,
+                        help='Cuentas compartidas; menos cuentas, más contención')
+    parser.add_argument('--tasa-dolares', type=float, default=0.3,
+                        help='Fracción de cuentas en dólares')
+    parser.add_argument('--tasa-corrientes', type=float, default=0.3,
+                        help='Fracción de cuentas corrientes con sobregiro')
+    parser.add_argument('--saldo-inicial', type=Decimal, default=Decimal('1000.00'))
+    parser.add_argument('--hilos', type=int, default=8,
+                        help='Hilos por proceso')
+    parser.add_argument('--procesos', type=int, default=1,
+                        help='Procesos (requiere una base de datos de servidor)')
+    parser.add_argument('--operaciones', type=int, default=200,
+                        help='Operaciones por hilo')
+    parser.add_argument('--tasa-depositos', type=float, default=0.3)
+    parser.add_argument('--tasa-retiros', type=float, default=0.25)
+    parser.add_argument('--semilla', type=int, default=42)
+
+  def handle(self, *args, **options):
+    if options['cuentas'] < 2:
+      raise CommandError('Se necesitan al menos 2 cuentas')
+    if options['tasa_depositos'] + options['tasa_retiros'] > 1:
+      raise CommandError('--tasa-depositos más --tasa-retiros no puede superar 1')
+
+    # Base de datos de prueba: nunca se escribe en la base configurada
+    setup_test_environment()
+    configuracion_bd = setup_databases(verbosity=0, interactive=False,
+                                       aliases=set(connections))
+    try:
+      conexion = connections['default']
+      if conexion.vendor == 'sqlite' and conexion.is_in_memory_db():
+        # SQLite en memoria bloquea tablas enteras sin esperar y no admite
+        # varios procesos: no mediría nada útil
+        raise CommandError(
+            'La base de datos de prueba no puede estar en memoria; use MySQL '
+            'o defina TEST NAME con un archivo para SQLite')
+      violaciones = self._ejecutar(options)
+    finally:
+      connections.close_all()
+      teardown_databases(configuracion_bd, verbosity=0)
+      teardown_test_environment()
+
+    if violaciones:
+      raise CommandError(f'{violaciones} invariante(s) violada(s)')
+    self.stdout.write(self.style.SUCCESS('Todas las invariantes se cumplen'))
+
+  def _preparar(self, options):
+    """Crea el usuario, el tipo de cambio y las cuentas con su saldo inicial"""
+    aleatorio = random.Random(options['semilla'])
+    usuario = Usuario.objects.create(
+        username='estres', tipo_usuario='ADMINISTRADOR', is_staff=True)
+    TipoCambio.objects.create(fecha=timezone.localdate(), compra=Decimal('3.750'),
+                              venta=Decimal('3.760'), usuario_registro=usuario)
+    cliente = Cliente.objects.create(
+        tipo_cliente='NATURAL', tipo_documento='DNI', numero_documento='99999999',
+        nombres='Prueba', apellido_paterno='De', apellido_materno='Estrés',
+        direccion='Sin dirección')
+
+    cuentas = []
+    for _ in range(options['cuentas']):
+      corriente = aleatorio.random() < options['tasa_corrientes']
+      cuenta = Cuenta.objects.create(
+          cliente=cliente,
+          tipo_cuenta='CORRIENTE' if corriente else 'AHORRO',
+          moneda='DOLARES' if aleatorio.random() < options['tasa_dolares'] else 'SOLES',
+          monto_sobregiro=Decimal('500.00') if corriente else Decimal('0.00'),
+          usuario_apertura=usuario)
+      services.depositar(cuenta.pk, options['saldo_inicial'], usuario,
+                         clave_autorizacion='ESTRES',
+                         origen_fondos='Saldo inicial de la prueba de estrés')
+      cuentas.append((cuenta.pk, cuenta.moneda))
+    return usuario, cuentas
+
+  def _ejecutar(self, options):
+    usuario, cuentas = self._preparar(options)
+    iniciales = self._totales_por_moneda()
+    registrado_inicial = self._variacion_registrada()
+    cantidades_iniciales = {
+      'deposito': Deposito.objects.count(),
+      'retiro': Retiro.objects.count(),
+      'transferencia': Transferencia.objects.count(),
+    }
+
+    configuracion = {
+      'usuario_id': usuario.pk,
+      'cuentas': cuentas,
+      'hilos': options['hilos'],
+      'operaciones': options['operaciones'],
+      'tasa_depositos': options['tasa_depositos'],
+      'tasa_retiros': options['tasa_retiros'],
+      'semilla': options['semilla'],
+    }
+
+    self.stdout.write(
+        f'{options["procesos"]} proceso(s) x {options["hilos"]} hilo(s) x '
+        f'{options["operaciones"]} operaciones sobre {len(cuentas)} cuentas...')
+
+    inicio = time.perf_counter()
+    if options['procesos'] == 1:
+      resultado = _ejecutar_proceso(0, configuracion)
+    else:
+      # Los procesos hijos abren sus propias conexiones
+      connections.close_all()
+      with ProcessPoolExecutor(max_workers=options['procesos'],
+                               mp_context=get_context('fork')) as ejecutor:
+        resultado = _combinar(list(ejecutor.map(
+            _ejecutar_proceso, range(options['procesos']),
+            [configuracion] * options['procesos'])))
+    segundos = time.perf_counter() - inicio
+
+    self._informar(resultado, segundos)
+    return self._verificar(resultado, iniciales, registrado_inicial,
+                           cantidades_iniciales)
+
+  def _informar(self, resultado, segundos):
+    exitosas = sum(resultado['operaciones'].values())
+    self.stdout.write(
+        f'{exitosas} operación(es) en {segundos:.1f} s '
+        f'({exitosas / max(segundos, 0.001):.0f} op/s)')
+    for tipo, cantidad in sorted(resultado['operaciones'].items()):
+      self.stdout.write(f'  {tipo}: {cantidad}')
+    if resultado['latencias']:
+      latencias = sorted(resultado['latencias'])
+      self.stdout.write(
+          f'Latencia: p50 {statistics.median(latencias):.1f} ms, '
+          f'p95 {latencias[int(len(latencias) * 0.95) - 1]:.1f} ms, '
+          f'máx {latencias[-1]:.1f} ms')
+    self.stdout.write(
+        f'Rechazadas por saldo: {sum(resultado["rechazos"].values())} '
+        f'{dict(resultado["rechazos"])}')
+    reintentos = resultado['reintentos']
+    self.stdout.write(
+        f'Interbloqueos: {reintentos["interbloqueos"]}, esperas de bloqueo '
+        f'agotadas: {reintentos["esperas_agotadas"]}, '
+        f'reintentos: {reintentos["reintentos"]}')
+    if resultado['bloqueos']:
+      self.stdout.write(self.style.WARNING(
+          f'Abandonadas tras agotar los reintentos por bloqueo: '
+          f'{sum(resultado["bloqueos"].values())} {dict(resultado["bloqueos"])}'))
+    if resultado['errores']:
+      self.stdout.write(self.style.ERROR(
+          f'{len(resultado["errores"])} error(es) inesperado(s):'))
+      for error in resultado['errores'][:10]:
+        self.stdout.write(f'  {error}')
+
+  def _totales_por_moneda(self):
+    return {
+      fila['moneda']: (fila['total'] or Decimal('0.00')).quantize(CENTIMO)
+      for fila in Cuenta.objects.values('moneda').annotate(total=Sum('saldo'))
+    }
+
+  def _violacion(self, mensaje):
+    self.stdout.write(self.style.ERROR(f'  {mensaje}'))
+
+  def _verificar(self, resultado, iniciales, registrado_inicial,
+      cantidades_iniciales):
+    """Revisa las invariantes y retorna la cantidad de violaciones"""
+    self.stdout.write('Verificando invariantes...')
+    violaciones = len(resultado['errores'])
+
+    # Cada operación confirmada quedó registrada exactamente una vez
+    registradas = {
+      'deposito': Deposito.objects.count() - cantidades_iniciales['deposito'],
+      'retiro': Retiro.objects.count() - cantidades_iniciales['retiro'],
+      'transferencia': (Transferencia.objects.count()
+                        - cantidades_iniciales['transferencia']),
+    }
+    confirmadas = resultado['operaciones']
+    esperadas = {
+      'deposito': confirmadas['deposito'],
+      'retiro': confirmadas['retiro'],
+      'transferencia': (confirmadas['transferencia']
+                        + confirmadas['transferencia_cambio']),
+    }
+    for tipo, cantidad in esperadas.items():
+      if registradas[tipo] != cantidad:
+        violaciones += 1
+        self._violacion(f'{tipo}: {cantidad} confirmadas, '
+                        f'{registradas[tipo]} registradas')
+
+    # Las conversiones usan el tipo de cambio registrado en la transferencia
+    for transferencia in Transferencia.objects.filter(
+        tipo_cambio__isnull=False).select_related('cuenta_origen'):
+      if transferencia.cuenta_origen.moneda == 'SOLES':
+        esperado = transferencia.monto_origen / transferencia.tipo_cambio
+      else:
+        esperado = transferencia.monto_origen * transferencia.tipo_cambio
+      if transferencia.monto_destino != esperado.quantize(CENTIMO):
+        violaciones += 1
+        self._violacion(
+            f'Transferencia {transferencia.pk}: destino {transferencia.monto_destino}, '
+            f'esperado {esperado.quantize(CENTIMO)} con tipo de cambio '
+            f'{transferencia.tipo_cambio}')
+
+    # Conservación del dinero por moneda: saldos finales contra lo confirmado
+    # por los hilos y contra las operaciones registradas
+    finales = self._totales_por_moneda()
+    registrado_final = self._variacion_registrada()
+    for moneda in sorted(set(finales) | set(iniciales)):
+      inicial = iniciales.get(moneda, Decimal('0.00'))
+      final = finales.get(moneda, Decimal('0.00'))
+      confirmada = resultado['variacion'].get(moneda, Decimal('0.00'))
+      registrada = registrado_final[moneda] - registrado_inicial[moneda]
+      if final - inicial != confirmada or final - inicial != registrada:
+        violaciones += 1
+        self._violacion(
+            f'{moneda}: saldo {inicial} -> {final} ({final - inicial:+}), '
+            f'confirmado {confirmada:+}, registrado {registrada:+}')
+      else:
+        self.stdout.write(f'  {moneda}: {inicial} -> {final} ({final - inicial:+})')
+
+    # Ninguna cuenta de ahorro en negativo ni corriente más allá del sobregiro
+    for cuenta in Cuenta.objects.filter(saldo__lt=0):
+      if cuenta.tipo_cuenta != 'CORRIENTE' or -cuenta.saldo > cuenta.monto_sobregiro:
+        violaciones += 1
+        self._violacion(f'{cuenta.numero_cuenta} ({cuenta.tipo_cuenta}): '
+                        f'saldo {cuenta.saldo}')
+
+    violaciones += self._verificar_cadenas()
+    return violaciones
+
+  def _variacion_registrada(self):
+    """Variación de saldo por moneda según las tablas de operaciones"""
+    variacion = defaultdict(Decimal)
+    for fila in Deposito.objects.values('cuenta__moneda').annotate(total=Sum('monto')):
+      variacion[fila['cuenta__moneda']] += fila['total']
+    for fila in Retiro.objects.values('cuenta__moneda').annotate(total=Sum('monto')):
+      variacion[fila['cuenta__moneda']] -= fila['total']
+    for fila in Transferencia.objects.values('cuenta_origen__moneda').annotate(
+        total=Sum('monto_origen')):
+      variacion[fila['cuenta_origen__moneda']] -= fila['total']
+    for fila in Transferencia.objects.values('cuenta_destino__moneda').annotate(
+        total=Sum('monto_destino')):
+      variacion[fila['cuenta_destino__moneda']] += fila['total']
+    # SQLite suma decimales como flotantes
+    return defaultdict(Decimal, {
+      moneda: total.quantize(CENTIMO) for moneda, total in variacion.items()})
+
+  def _verificar_cadenas(self):
+    """
+    Comprueba que los movimientos de cada cuenta formen una cadena continua
+    desde saldo 0 hasta el saldo actual, con saldos disponibles consistentes
+    """
+    violaciones = 0
+    cuentas = {cuenta.pk: cuenta for cuenta in Cuenta.objects.all()}
+    saldos = dict.fromkeys(cuentas, Decimal('0.00'))
+
+    movimientos = Movimiento.objects.order_by('cuenta_id', 'id').values_list(
+        'cuenta_id', 'id', 'tipo_movimiento', 'monto', 'saldo_anterior',
+        'saldo_nuevo')
+    for cuenta_id, pk, tipo, monto, anterior, nuevo in movimientos.iterator(
+        chunk_size=5000):
+      if anterior != saldos[cuenta_id]:
+        violaciones += 1
+        self._violacion(f'Movimiento {pk}: saldo anterior {anterior}, '
+                        f'se esperaba {saldos[cuenta_id]}')
+      if nuevo - anterior != SIGNO_MOVIMIENTO[tipo] * monto:
+        violaciones += 1
+        self._violacion(f'Movimiento {pk} ({tipo}): {anterior} -> {nuevo} '
+                        f'no corresponde al monto {monto}')
+      saldos[cuenta_id] = nuevo
+
+    for pk, cuenta in cuentas.items():
+      if saldos[pk] != cuenta.saldo:
+        violaciones += 1
+        self._violacion(f'{cuenta.numero_cuenta}: saldo {cuenta.saldo}, '
+                        f'último movimiento {saldos[pk]}')
+      if cuenta.saldo_disponible != cuenta.get_saldo_disponible():
+        violaciones += 1
+        self._violacion(f'{cuenta.numero_cuenta}: saldo disponible '
+                        f'{cuenta.saldo_disponible} inconsistente')
+
+    if not violaciones:
+      self.stdout.write(f'  Cadenas de movimientos consistentes en '
+                        f'{len(cuentas)} cuenta(s)')
+    return violaciones
@@ -0,0 +1,125 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Usuario
+from core.trabajos import encolar
+from cuentas.models import Cuenta
+from operaciones.models import Planilla
+from operaciones.planillas import (
+  crear_planilla, leer_archivo_planilla, procesar_planilla,
+)
+
+
+class Command(BaseCommand):
+  help = ('Paga una planilla desde un archivo CSV (cuenta, monto y nombre '
+          'opcional): debita el total de la cuenta origen una sola vez y '
+          'abona a los empleados por bloques. Con --planilla reanuda una '
+          'planilla interrumpida o con bloques fallidos')
+
+  def add_arguments(self, parser):
+    parser.add_argument('archivo', nargs='?',
+                        help='Ruta del archivo CSV de la planilla')
+    parser.add_argument('--cuenta-origen',
+                        help='Número de la cuenta que paga la planilla')
+    parser.add_argument('--usuario', help='Usuario que registra la planilla')
+    parser.add_argument('--descripcion', default='Pago de planilla',
+                        help='Descripción del pago')
+    parser.add_argument('--planilla', type=int,
+                        help='Id de una planilla registrada para reanudarla')
+    parser.add_argument('--bloque', type=int,
+                        help='Líneas abonadas por transacción '
+                             '(por defecto PLANILLA_TAMANO_BLOQUE)')
+    parser.add_argument('--pausa', type=float, default=0,
+                        help='Segundos de espera entre bloques')
+    parser.add_argument('--solo-cargar', action='store_true',
+                        help='Registra la planilla sin debitar ni abonar')
+    parser.add_argument('--en-segundo-plano', action='store_true',
+                        help='Encola el pago para que lo procese el trabajador')
+
+  def handle(self, *args, **options):
+    if options['bloque'] is not None and options['bloque'] < 1:
+      raise CommandError('--bloque debe ser mayor a 0')
+
+    if options['planilla']:
+      planilla = Planilla.objects.filter(pk=options['planilla']).first()
+      if planilla is None:
+        raise CommandError(f'No existe la planilla {options["planilla"]}')
+      if planilla.estado == 'COMPLETADA':
+        self._resumen(planilla)
+        return
+    else:
+      planilla = self._cargar(options)
+      if options['solo_cargar']:
+        self.stdout.write(self.style.SUCCESS(
+            f'Planilla {planilla.pk} registrada; procésela con '
+            f'--planilla {planilla.pk}'))
+        return
+
+    if options['en_segundo_plano']:
+      trabajo = encolar('procesar_planilla', {'planilla_id': planilla.pk,
+                                              'tamano': options['bloque']})
+      self.stdout.write(self.style.SUCCESS(
+          f'Planilla {planilla.pk} encolada en el trabajo {trabajo.pk}'))
+      return
+
+    try:
+      planilla = procesar_planilla(planilla.pk, tamano=options['bloque'],
+                                   pausa=options['pausa'],
+                                   al_avanzar=self._avance)
+    except ValidationError as e:
+      raise CommandError(f'Planilla {planilla.pk}: {" ".join(e.messages)}')
+    self._resumen(planilla)
+
+  def _cargar(self, options):
+    if not options['archivo'] or not options['cuenta_origen'] or not options['usuario']:
+      raise CommandError('Indique el archivo, --cuenta-origen y --usuario, '
+                         'o --planilla para reanudar una planilla')
+    try:
+      usuario = Usuario.objects.get(username=options['usuario'])
+    except Usuario.DoesNotExist:
+      raise CommandError(f'No existe el usuario {options["usuario"]}')
+    try:
+      cuenta_origen = Cuenta.objects.get(numero_cuenta=options['cuenta_origen'])
+    except Cuenta.DoesNotExist:
+      raise CommandError(f'No existe la cuenta {options["cuenta_origen"]}')
+
+    try:
+      with open(options['archivo'], 'rb') as archivo:
+        filas = leer_archivo_planilla(archivo)
+    except OSError as e:
+      raise CommandError(f'No se pudo leer el archivo: {e}')
+    except ValueError as e:
+      raise CommandError(str(e))
+    if not filas:
+      raise CommandError('El archivo no tiene líneas')
+
+    planilla = crear_planilla(filas, cuenta_origen, usuario,
+                              options['descripcion'], archivo=options['archivo'])
+    self.stdout.write(f'Planilla {planilla.pk}: {planilla.lineas} línea(s), '
+                      f'total {planilla.total:.2f} {cuenta_origen.moneda}')
+    if planilla.lineas_invalidas:
+      self.stdout.write(self.style.WARNING(
+          f'{planilla.lineas_invalidas} línea(s) inválidas:'))
+      for linea, numero, error in (planilla.detalles.filter(estado='INVALIDA')
+                                   .order_by('linea')
+                                   .values_list('linea', 'numero_cuenta', 'error')):
+        self.stdout.write(f'  fila {linea} ({numero}): {error}')
+    return planilla
+
+  def _avance(self, planilla):
+    self.stdout.write(f'  {planilla.porcentaje}% - {planilla.lineas_abonadas} '
+                      f'abonada(s), {planilla.lineas_fallidas} fallida(s), '
+                      f'{planilla.lineas_pendientes} pendiente(s)')
+
+  def _resumen(self, planilla):
+    self.stdout.write(self.style.SUCCESS(
+        f'Planilla {planilla.pk} {planilla.get_estado_display().lower()}: '
+        f'{planilla.lineas_abonadas} abonada(s) por {planilla.total_abonado:.2f}'))
+    if planilla.lineas_fallidas:
+      self.stdout.write(self.style.WARNING(
+          f'{planilla.lineas_fallidas} abono(s) fallido(s); devuelto a la '
+          f'cuenta origen: {planilla.total_devuelto:.2f}'))
+      for linea, numero, error in (planilla.detalles.filter(estado='FALLIDA')
+                                   .order_by('linea')
+                                   .values_list('linea', 'numero_cuenta', 'error')):
+        self.stdout.write(f'  fila {linea} ({numero}): {error}')
@@ -0,0 +1,134 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Usuario
+from cuentas.models import Cuenta
+from cuentas.services import leer_archivo_csv, leer_monto
+from operaciones.services import MODOS_LOTE, LoteRechazado, transferir_lote
+
+
+COLUMNAS_TRANSFERENCIA = ['cuenta_origen', 'cuenta_destino', 'monto']
+COLUMNAS_REPORTE = ['fila', 'estado', 'transferencia', 'monto_destino',
+                    'tipo_cambio', 'codigo', 'error']
+
+
+class Command(BaseCommand):
+  help = ('Registra en una sola transacción las transferencias de un archivo '
+          'CSV (cuenta_origen, cuenta_destino, monto y descripcion opcional)')
+
+  def add_arguments(self, parser):
+    parser.add_argument('archivo', help='Ruta del archivo CSV de transferencias')
+    parser.add_argument('--usuario', required=True,
+                        help='Usuario que registra las transferencias')
+    parser.add_argument('--modo', choices=MODOS_LOTE, default='todo',
+                        help="'todo' registra el lote solo si todas las filas son "
+                             "válidas; 'parcial' registra las válidas")
+    parser.add_argument('--reporte',
+                        help='Ruta del CSV de resultados por fila '
+                             '(por defecto las rechazadas en stdout)')
+
+  def handle(self, *args, **options):
+    try:
+      usuario = Usuario.objects.get(username=options['usuario'])
+    except Usuario.DoesNotExist:
+      raise CommandError(f'No existe el usuario {options["usuario"]}')
+
+    try:
+      with open(options['archivo'], 'rb') as archivo:
+        filas = leer_archivo_csv(archivo, COLUMNAS_TRANSFERENCIA,
+                                 opcionales=['descripcion'])
+    except OSError as e:
+      raise CommandError(f'No se pudo leer el archivo: {e}')
+    except ValueError as e:
+      raise CommandError(str(e))
+    if not filas:
+      raise CommandError('El archivo no tiene transferencias')
+
+    resultados, validas = self._validar_filas(filas)
+    rechazadas = len(filas) - len(validas)
+
+    if rechazadas and options['modo'] == 'todo':
+      self._reportar(resultados, options['reporte'])
+      raise CommandError(f'{rechazadas} fila(s) con errores; no se registró '
+                         f'ninguna transferencia')
+
+    try:
+      registros = transferir_lote([datos for _, datos in validas], usuario,
+                                  modo=options['modo'])
+    except LoteRechazado as e:
+      registros = e.resultados
+      for (numero_fila, _), registro in zip(validas, registros):
+        resultados[numero_fila] = {'fila': numero_fila, **registro}
+      self._reportar(resultados, options['reporte'])
+      raise CommandError(str(e))
+
+    for (numero_fila, _), registro in zip(validas, registros):
+      resultados[numero_fila] = {'fila': numero_fila, **registro}
+
+    registradas = sum(1 for r in resultados.values() if r['estado'] == 'REGISTRADA')
+    self.stdout.write(self.style.SUCCESS(
+        f'{registradas} transferencia(s) registradas de {len(filas)} fila(s)'))
+    if registradas < len(filas):
+      self.stdout.write(self.style.WARNING(
+          f'{len(filas) - registradas} fila(s) rechazadas'))
+    self._reportar(resultados, options['reporte'])
+
+  def _validar_filas(self, filas):
+    """
+    Valida el formato y resuelve los números de cuenta con una consulta
+
+    Returns:
+        (resultados de las filas rechazadas por número de fila,
+         [(fila, datos para transferir_lote)] de las válidas)
+    """
+    numeros = {fila[c] for fila in filas for c in ('cuenta_origen', 'cuenta_destino')}
+    ids = dict(Cuenta.objects.filter(numero_cuenta__in=numeros)
+               .values_list('numero_cuenta', 'pk'))
+
+    resultados = {}
+    validas = []
+    for fila in filas:
+      error = None
+      try:
+        monto = leer_monto(fila['monto'])
+      except ValueError as e:
+        error = ('monto_invalido', str(e))
+      else:
+        if monto <= 0:
+          error = ('monto_invalido', 'El monto debe ser mayor a 0')
+      for campo in ('cuenta_origen', 'cuenta_destino'):
+        if error is None and fila[campo] not in ids:
+          error = ('cuenta_inexistente', f'Cuenta no encontrada: {fila[campo]}')
+
+      if error:
+        resultados[fila['fila']] = {'fila': fila['fila'], 'estado': 'RECHAZADA',
+                                    'codigo': error[0], 'error': error[1]}
+        continue
+      validas.append((fila['fila'], {
+        'cuenta_origen': ids[fila['cuenta_origen']],
+        'cuenta_destino': ids[fila['cuenta_destino']],
+        'monto_origen': monto,
+        'descripcion': fila['descripcion'],
+      }))
+    return resultados, validas
+
+  def _reportar(self, resultados, ruta):
+    """Escribe los resultados por fila (todos en archivo, rechazadas en stdout)"""
+    filas = [resultados[numero] for numero in sorted(resultados)]
+    if ruta:
+      with open(ruta, 'w', newline='', encoding='utf-8') as destino:
+        self._escribir(filas, destino)
+      self.stdout.write(f'Reporte de resultados: {ruta}')
+      return
+
+    rechazadas = [fila for fila in filas if fila['estado'] == 'RECHAZADA']
+    if rechazadas:
+      self._escribir(rechazadas, sys.stdout)
+
+  def _escribir(self, filas, destino):
+    escritor = csv.DictWriter(destino, fieldnames=COLUMNAS_REPORTE,
+                              extrasaction='ignore')
+    escritor.writeheader()
+    escritor.writerows(filas)
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operaciones', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=100)),
+                ('operacion', models.CharField(max_length=30)),
+                ('huella', models.CharField(max_length=64)),
+                ('estado_http', models.PositiveSmallIntegerField(null=True)),
+                ('respuesta', models.JSONField(null=True)),
+                ('fecha_creacion', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='claves_idempotencia', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Clave de Idempotencia',
+                'verbose_name_plural': 'Claves de Idempotencia',
+                'db_table': 'claves_idempotencia',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'clave'), name='clave_idempotencia_unica')],
+            },
+        ),
+    ]
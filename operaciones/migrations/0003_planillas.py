@@ -0,0 +1,77 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuentas', '0003_contadores_embargos'),
+        ('operaciones', '0002_claves_idempotencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimiento',
+            name='tipo_movimiento',
+            field=models.CharField(choices=[('DEPOSITO', 'Depósito'), ('RETIRO', 'Retiro'), ('TRANSFERENCIA_ENVIADA', 'Transferencia Enviada'), ('TRANSFERENCIA_RECIBIDA', 'Transferencia Recibida'), ('APERTURA', 'Apertura de Cuenta'), ('CIERRE', 'Cierre de Cuenta'), ('CANCELACION_PLAZO', 'Cancelación de Plazo Fijo'), ('RENOVACION_PLAZO', 'Renovación de Plazo Fijo'), ('INTERES_PLAZO', 'Interés de Plazo Fijo'), ('EMBARGO', 'Embargo'), ('DESEMBARGO', 'Levantamiento de Embargo'), ('PAGO_PLANILLA', 'Pago de Planilla'), ('ABONO_PLANILLA', 'Abono de Planilla'), ('DEVOLUCION_PLANILLA', 'Devolución de Planilla')], max_length=30),
+        ),
+        migrations.CreateModel(
+            name='Planilla',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('descripcion', models.CharField(max_length=200)),
+                ('archivo', models.CharField(blank=True, max_length=255)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En Proceso'), ('COMPLETADA', 'Completada')], default='PENDIENTE', max_length=15)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('total_abonado', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('total_devuelto', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('lineas', models.PositiveIntegerField(default=0)),
+                ('lineas_invalidas', models.PositiveIntegerField(default=0)),
+                ('lineas_abonadas', models.PositiveIntegerField(default=0)),
+                ('lineas_fallidas', models.PositiveIntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_debito', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('cuenta_origen', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='planillas', to='cuentas.cuenta')),
+                ('movimiento_debito', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='planilla_debitada', to='operaciones.movimiento')),
+                ('movimiento_devolucion', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='planilla_devuelta', to='operaciones.movimiento')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='planillas_registradas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Planilla',
+                'verbose_name_plural': 'Planillas',
+                'db_table': 'planillas',
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PlanillaDetalle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('linea', models.PositiveIntegerField()),
+                ('numero_cuenta', models.CharField(max_length=20)),
+                ('nombre', models.CharField(blank=True, max_length=200)),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('monto_abonado', models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True)),
+                ('tipo_cambio', models.DecimalField(blank=True, decimal_places=3, max_digits=6, null=True)),
+                ('estado', models.CharField(choices=[('INVALIDA', 'Inválida'), ('PENDIENTE', 'Pendiente'), ('ABONADA', 'Abonada'), ('FALLIDA', 'Fallida')], default='PENDIENTE', max_length=10)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('fecha_proceso', models.DateTimeField(blank=True, null=True)),
+                ('cuenta', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='abonos_planilla', to='cuentas.cuenta')),
+                ('movimiento', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='detalle_planilla', to='operaciones.movimiento')),
+                ('planilla', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detalles', to='operaciones.planilla')),
+            ],
+            options={
+                'verbose_name': 'Detalle de Planilla',
+                'verbose_name_plural': 'Detalles de Planilla',
+                'db_table': 'planillas_detalle',
+                'ordering': ['planilla', 'linea'],
+                'indexes': [models.Index(fields=['planilla', 'estado', 'linea'], name='planillas_d_planill_5d3329_idx')],
+                'constraints': [models.UniqueConstraint(fields=('planilla', 'linea'), name='planilla_linea_unica')],
+            },
+        ),
+    ]
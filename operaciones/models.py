@@ -23,6 +23,9 @@ class Movimiento(models.Model):
     ('INTERES_PLAZO', 'Interés de Plazo Fijo'),
     ('EMBARGO', 'Embargo'),
     ('DESEMBARGO', 'Levantamiento de Embargo'),
+    ('PAGO_PLANILLA', 'Pago de Planilla'),
+    ('ABONO_PLANILLA', 'Abono de Planilla'),
+    ('DEVOLUCION_PLANILLA', 'Devolución de Planilla'),
   ]
 
   cuenta = models.ForeignKey(
@@ -125,7 +128,8 @@ class Deposito(models.Model):
       self.requiere_autorizacion = True
       if not self.clave_autorizacion or not self.origen_fondos:
         raise ValidationError(
-            'Para depósitos mayores a S/ 2000 se requiere clave de autorización y origen de fondos'
+            'Para depósitos mayores a S/ 2000 se requiere clave de autorización y origen de fondos',
+            code='autorizacion_requerida'
         )
 
 
@@ -166,10 +170,11 @@ class Retiro(models.Model):
 
     if self.cuenta.tipo_cuenta == 'PLAZO':
       raise ValidationError(
-        'No se pueden realizar retiros de cuentas a plazo fijo')
+        'No se pueden realizar retiros de cuentas a plazo fijo', code='plazo_fijo')
 
     if not self.cuenta.puede_retirar(self.monto):
-      raise ValidationError('Saldo insuficiente o cuenta embargada')
+      raise ValidationError('Saldo insuficiente o cuenta embargada',
+                            code='saldo_insuficiente')
 
 
 class Transferencia(models.Model):
@@ -228,14 +233,17 @@ class Transferencia(models.Model):
 
     if self.cuenta_origen.tipo_cuenta == 'PLAZO':
       raise ValidationError(
-        'No se pueden realizar transferencias desde cuentas a plazo')
+        'No se pueden realizar transferencias desde cuentas a plazo',
+        code='plazo_fijo')
 
     if not self.cuenta_origen.puede_retirar(self.monto_origen):
       raise ValidationError(
-        'Saldo insuficiente en cuenta origen o cuenta embargada')
+        'Saldo insuficiente en cuenta origen o cuenta embargada',
+        code='saldo_insuficiente')
 
     if self.cuenta_origen == self.cuenta_destino:
-      raise ValidationError('La cuenta origen y destino no pueden ser la misma')
+      raise ValidationError('La cuenta origen y destino no pueden ser la misma',
+                            code='misma_cuenta')
 
 
 class OperacionPlazoFijo(models.Model):
@@ -285,4 +293,194 @@ class OperacionPlazoFijo(models.Model):
     ordering = ['-fecha_hora']
 
   def __str__(self):
-    return f"{self.get_tipo_operacion_display()} - {self.cuenta.numero_cuenta}"
\ No newline at end of file
+    return f"{self.get_tipo_operacion_display()} - {self.cuenta.numero_cuenta}"
+
+class ClaveIdempotencia(models.Model):
+  """
+  Resultado de una operación de la API registrada con Idempotency-Key
+
+  Se guarda en la misma transacción que la operación: si la operación falla
+  la clave no queda registrada y el cliente puede reintentar con la misma
+  clave. Una repetición con la misma clave y los mismos datos retorna la
+  respuesta guardada sin volver a ejecutar la operación.
+  """
+  usuario = models.ForeignKey(
+      Usuario,
+      on_delete=models.CASCADE,
+      related_name='claves_idempotencia'
+  )
+  clave = models.CharField(max_length=100)
+  operacion = models.CharField(max_length=30)
+  huella = models.CharField(max_length=64)
+  estado_http = models.PositiveSmallIntegerField(null=True)
+  respuesta = models.JSONField(null=True)
+  fecha_creacion = models.DateTimeField(default=timezone.now, db_index=True)
+
+  class Meta:
+    db_table = 'claves_idempotencia'
+    verbose_name = 'Clave de Idempotencia'
+    verbose_name_plural = 'Claves de Idempotencia'
+    constraints = [
+      models.UniqueConstraint(fields=['usuario', 'clave'],
+                              name='clave_idempotencia_unica'),
+    ]
+
+  def __str__(self):
+    return f"{self.operacion} - {self.clave}"
+
+  @classmethod
+  def purgar_vencidas(cls, horas: int = None) -> int:
+    """Elimina las claves más antiguas que la vigencia; retorna cuántas"""
+    from datetime import timedelta
+    from django.conf import settings
+    horas = horas or getattr(settings, 'API_IDEMPOTENCIA_HORAS', 24)
+    limite = timezone.now() - timedelta(hours=horas)
+    eliminadas, _ = cls.objects.filter(fecha_creacion__lt=limite).delete()
+    return eliminadas
+
+
+class Planilla(models.Model):
+  """
+  Pago de planilla: un débito a la cuenta origen y un abono por empleado
+
+  La cuenta origen se debita una sola vez por el total de las líneas
+  válidas (movimiento_debito). Los abonos se procesan por bloques; el
+  monto de las líneas que fallan al abonarse se devuelve a la cuenta
+  origen al finalizar (movimiento_devolucion).
+  """
+  ESTADO_CHOICES = [
+    ('PENDIENTE', 'Pendiente'),
+    ('EN_PROCESO', 'En Proceso'),
+    ('COMPLETADA', 'Completada'),
+  ]
+
+  cuenta_origen = models.ForeignKey(
+      Cuenta,
+      on_delete=models.PROTECT,
+      related_name='planillas'
+  )
+  descripcion = models.CharField(max_length=200)
+  archivo = models.CharField(max_length=255, blank=True)
+  estado = models.CharField(max_length=15, choices=ESTADO_CHOICES,
+                            default='PENDIENTE')
+  usuario = models.ForeignKey(
+      Usuario,
+      on_delete=models.PROTECT,
+      related_name='planillas_registradas'
+  )
+
+  # Totales en la moneda de la cuenta origen
+  total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+  total_abonado = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+  total_devuelto = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+  # Progreso (se actualiza con cada bloque)
+  lineas = models.PositiveIntegerField(default=0)
+  lineas_invalidas = models.PositiveIntegerField(default=0)
+  lineas_abonadas = models.PositiveIntegerField(default=0)
+  lineas_fallidas = models.PositiveIntegerField(default=0)
+
+  movimiento_debito = models.OneToOneField(
+      Movimiento,
+      on_delete=models.PROTECT,
+      related_name='planilla_debitada',
+      null=True,
+      blank=True
+  )
+  movimiento_devolucion = models.OneToOneField(
+      Movimiento,
+      on_delete=models.PROTECT,
+      related_name='planilla_devuelta',
+      null=True,
+      blank=True
+  )
+
+  fecha_creacion = models.DateTimeField(auto_now_add=True)
+  fecha_debito = models.DateTimeField(null=True, blank=True)
+  fecha_fin = models.DateTimeField(null=True, blank=True)
+
+  class Meta:
+    db_table = 'planillas'
+    verbose_name = 'Planilla'
+    verbose_name_plural = 'Planillas'
+    ordering = ['-fecha_creacion']
+
+  def __str__(self):
+    return f"Planilla {self.pk} - {self.cuenta_origen.numero_cuenta} - {self.total}"
+
+  @property
+  def lineas_pendientes(self):
+    return (self.lineas - self.lineas_invalidas - self.lineas_abonadas -
+            self.lineas_fallidas)
+
+  @property
+  def porcentaje(self):
+    """Porcentaje de líneas válidas ya procesadas"""
+    validas = self.lineas - self.lineas_invalidas
+    if not validas:
+      return 100
+    return round((self.lineas_abonadas + self.lineas_fallidas) * 100 / validas, 1)
+
+
+class PlanillaDetalle(models.Model):
+  """
+  Línea de una planilla: el abono a la cuenta de un empleado
+
+  INVALIDA: no se pudo validar al cargar y no forma parte del débito.
+  FALLIDA: la cuenta no admitió el abono; su monto se devuelve al finalizar.
+  """
+  ESTADO_CHOICES = [
+    ('INVALIDA', 'Inválida'),
+    ('PENDIENTE', 'Pendiente'),
+    ('ABONADA', 'Abonada'),
+    ('FALLIDA', 'Fallida'),
+  ]
+
+  planilla = models.ForeignKey(
+      Planilla,
+      on_delete=models.CASCADE,
+      related_name='detalles'
+  )
+  linea = models.PositiveIntegerField()
+  numero_cuenta = models.CharField(max_length=20)
+  nombre = models.CharField(max_length=200, blank=True)
+  cuenta = models.ForeignKey(
+      Cuenta,
+      on_delete=models.PROTECT,
+      related_name='abonos_planilla',
+      null=True,
+      blank=True
+  )
+  # Monto en la moneda de la cuenta origen
+  monto = models.DecimalField(max_digits=15, decimal_places=2)
+  monto_abonado = models.DecimalField(max_digits=15, decimal_places=2,
+                                      null=True, blank=True)
+  tipo_cambio = models.DecimalField(max_digits=6, decimal_places=3,
+                                    null=True, blank=True)
+  estado = models.CharField(max_length=10, choices=ESTADO_CHOICES,
+                            default='PENDIENTE')
+  error = models.CharField(max_length=255, blank=True)
+  movimiento = models.OneToOneField(
+      Movimiento,
+      on_delete=models.PROTECT,
+      related_name='detalle_planilla',
+      null=True,
+      blank=True
+  )
+  fecha_proceso = models.DateTimeField(null=True, blank=True)
+
+  class Meta:
+    db_table = 'planillas_detalle'
+    verbose_name = 'Detalle de Planilla'
+    verbose_name_plural = 'Detalles de Planilla'
+    ordering = ['planilla', 'linea']
+    constraints = [
+      models.UniqueConstraint(fields=['planilla', 'linea'],
+                              name='planilla_linea_unica'),
+    ]
+    indexes = [
+      models.Index(fields=['planilla', 'estado', 'linea']),
+    ]
+
+  def __str__(self):
+    return f"Planilla {self.planilla_id} - línea {self.linea} - {self.numero_cuenta}"
@@ -0,0 +1,302 @@
+import time
+from decimal import Decimal
+from typing import Callable, Dict, List
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from core import metricas
+from core.models import TipoCambio
+from cuentas.models import Cuenta
+from cuentas.services import leer_archivo_csv, leer_monto
+
+from .models import Movimiento, Planilla, PlanillaDetalle
+from .services import (
+  _aplicar_saldo, _bloquear_cuentas, _crear_en_bloque, _validar_activa,
+  convertir_monto, reintentar_si_bloqueo,
+)
+
+
+COLUMNAS_PLANILLA = ['cuenta', 'monto']
+COLUMNAS_OPCIONALES = ['nombre']
+
+
+def leer_archivo_planilla(archivo) -> List[Dict]:
+  """
+  Lee un archivo CSV de planilla
+
+  Columnas: cuenta (número de cuenta del empleado), monto (en la moneda de
+  la cuenta origen) y nombre opcional.
+  """
+  return leer_archivo_csv(archivo, COLUMNAS_PLANILLA,
+                          opcionales=COLUMNAS_OPCIONALES)
+
+
+def crear_planilla(filas: List[Dict], cuenta_origen: Cuenta, usuario,
+    descripcion: str, archivo: str = '') -> Planilla:
+  """
+  Registra una planilla y sus líneas sin mover dinero
+
+  Los montos se validan y las cuentas destino se resuelven con una sola
+  consulta; las líneas que no pasan quedan INVALIDA con su error y no se
+  incluyen en el total a debitar.
+
+  Args:
+      filas: Filas leídas con leer_archivo_planilla
+      cuenta_origen: Cuenta que paga la planilla
+      usuario: Usuario que registra la planilla
+      descripcion: Descripción del pago (p. ej. "Planilla octubre")
+      archivo: Nombre del archivo de origen, para trazabilidad
+  """
+  numeros = {fila['cuenta'] for fila in filas}
+  cuentas = dict(Cuenta.objects.filter(numero_cuenta__in=numeros)
+                 .values_list('numero_cuenta', 'pk'))
+
+  detalles = []
+  for fila in filas:
+    error = ''
+    monto = Decimal('0.00')
+    try:
+      monto = leer_monto(fila['monto'])
+    except ValueError as e:
+      error = str(e)[:255]
+    else:
+      if monto <= 0:
+        error = 'El monto debe ser mayor a 0'
+
+    cuenta_id = cuentas.get(fila['cuenta'])
+    if not error and cuenta_id is None:
+      error = 'Cuenta no encontrada'
+    elif not error and cuenta_id == cuenta_origen.pk:
+      error = 'La cuenta destino no puede ser la cuenta origen'
+
+    detalles.append(PlanillaDetalle(
+        linea=fila['fila'],
+        numero_cuenta=fila['cuenta'][:20],
+        nombre=fila['nombre'][:200],
+        cuenta_id=None if error else cuenta_id,
+        monto=Decimal('0.00') if error else monto,
+        estado='INVALIDA' if error else 'PENDIENTE',
+        error=error
+    ))
+
+  validas = [detalle for detalle in detalles if detalle.estado == 'PENDIENTE']
+  with transaction.atomic():
+    planilla = Planilla.objects.create(
+        cuenta_origen=cuenta_origen,
+        descripcion=descripcion[:200],
+        archivo=archivo[:255],
+        usuario=usuario,
+        total=sum((detalle.monto for detalle in validas), Decimal('0.00')),
+        lineas=len(detalles),
+        lineas_invalidas=len(detalles) - len(validas)
+    )
+    for detalle in detalles:
+      detalle.planilla = planilla
+    PlanillaDetalle.objects.bulk_create(detalles, batch_size=1000)
+  return planilla
+
+
+@reintentar_si_bloqueo
+def debitar_planilla(planilla_id: int) -> Planilla:
+  """
+  Debita de la cuenta origen el total de la planilla con un solo movimiento
+
+  No hace nada si la planilla ya se debitó, por lo que puede llamarse de
+  nuevo al reanudar un procesamiento interrumpido.
+
+  Raises:
+      ValidationError: Si la cuenta origen no admite el débito
+  """
+  with transaction.atomic():
+    planilla = Planilla.objects.select_for_update().get(pk=planilla_id)
+    if planilla.estado != 'PENDIENTE':
+      return planilla
+
+    ahora = timezone.now()
+    if planilla.total:
+      cuenta = _bloquear_cuentas('planilla', planilla.cuenta_origen_id)[
+        planilla.cuenta_origen_id]
+      _validar_activa(cuenta, 'La cuenta origen no está activa')
+      if not cuenta.puede_retirar(planilla.total):
+        raise ValidationError(
+            'Saldo insuficiente en la cuenta origen para el total de la planilla',
+            code='saldo_insuficiente')
+
+      saldo_anterior = cuenta.saldo
+      _aplicar_saldo(cuenta, saldo_anterior - planilla.total, ahora)
+      planilla.movimiento_debito = Movimiento.objects.create(
+          cuenta=cuenta,
+          tipo_movimiento='PAGO_PLANILLA',
+          monto=planilla.total,
+          saldo_anterior=saldo_anterior,
+          saldo_nuevo=cuenta.saldo,
+          descripcion=f'Pago de planilla {planilla.pk}: {planilla.descripcion}',
+          usuario=planilla.usuario
+      )
+
+    planilla.estado = 'EN_PROCESO'
+    planilla.fecha_debito = ahora
+    planilla.save(update_fields=['estado', 'fecha_debito', 'movimiento_debito'])
+
+  if planilla.movimiento_debito:
+    metricas.registrar_operacion('planilla', planilla.movimiento_debito.cuenta.moneda,
+                                 planilla.total)
+  return planilla
+
+
+@reintentar_si_bloqueo
+def abonar_bloque(planilla_id: int, tamano: int) -> int:
+  """
+  Abona el siguiente bloque de líneas pendientes de una planilla
+
+  Cada bloque es una transacción: las líneas se marcan ABONADA o FALLIDA
+  junto con sus movimientos y saldos, así que un bloque que falla se
+  revierte completo y puede repetirse sin abonar dos veces. El bloqueo de
+  la planilla serializa los bloques aunque varios procesos la atiendan.
+
+  Returns:
+      Cantidad de líneas procesadas (0 cuando no quedan pendientes)
+
+  Raises:
+      ValidationError: Si hace falta el tipo de cambio del día y no está
+          configurado (el bloque no se procesa)
+  """
+  with transaction.atomic():
+    planilla = Planilla.objects.select_for_update().get(pk=planilla_id)
+    if planilla.estado != 'EN_PROCESO':
+      return 0
+    detalles = list(planilla.detalles.filter(estado='PENDIENTE')
+                    .order_by('linea')[:tamano])
+    if not detalles:
+      return 0
+
+    origen = Cuenta.objects.values('numero_cuenta', 'moneda').get(
+        pk=planilla.cuenta_origen_id)
+    cuentas = _bloquear_cuentas('planilla', *{d.cuenta_id for d in detalles})
+    tipo_cambio = None
+    if any(cuenta.moneda != origen['moneda'] for cuenta in cuentas.values()):
+      tipo_cambio = TipoCambio.obtener_actual()
+      if tipo_cambio is None:
+        raise ValidationError('No se ha configurado el tipo de cambio del día',
+                              code='sin_tipo_cambio')
+
+    ahora = timezone.now()
+    movimientos = []
+    abonadas = []
+    fallidas = 0
+    for detalle in detalles:
+      detalle.fecha_proceso = ahora
+      cuenta = cuentas.get(detalle.cuenta_id)
+      try:
+        if cuenta is None:
+          raise ValidationError('La cuenta no existe')
+        _validar_activa(cuenta, 'La cuenta destino no está activa o está cerrada')
+      except ValidationError as e:
+        detalle.estado = 'FALLIDA'
+        detalle.error = ' '.join(e.messages)[:255]
+        fallidas += 1
+        continue
+
+      detalle.monto_abonado, detalle.tipo_cambio = convertir_monto(
+          detalle.monto, origen['moneda'], cuenta.moneda, tipo_cambio)
+      movimiento = Movimiento(
+          cuenta=cuenta,
+          tipo_movimiento='ABONO_PLANILLA',
+          monto=detalle.monto_abonado,
+          saldo_anterior=cuenta.saldo,
+          saldo_nuevo=cuenta.saldo + detalle.monto_abonado,
+          descripcion=(f'Abono de planilla {planilla.pk} desde cuenta '
+                       f'{origen["numero_cuenta"]}'),
+          usuario=planilla.usuario
+      )
+      cuenta.saldo = movimiento.saldo_nuevo
+      detalle.estado = 'ABONADA'
+      movimientos.append(movimiento)
+      abonadas.append((detalle, movimiento))
+
+    _crear_en_bloque(Movimiento, movimientos)
+    for detalle, movimiento in abonadas:
+      detalle.movimiento = movimiento
+    PlanillaDetalle.objects.bulk_update(
+        detalles, ['estado', 'error', 'monto_abonado', 'tipo_cambio',
+                   'movimiento', 'fecha_proceso'], batch_size=500)
+
+    for cuenta_id in {detalle.cuenta_id for detalle, _ in abonadas}:
+      _aplicar_saldo(cuentas[cuenta_id], cuentas[cuenta_id].saldo, ahora)
+
+    Planilla.objects.filter(pk=planilla.pk).update(
+        lineas_abonadas=F('lineas_abonadas') + len(abonadas),
+        lineas_fallidas=F('lineas_fallidas') + fallidas,
+        total_abonado=F('total_abonado') + sum(
+            (detalle.monto for detalle, _ in abonadas), Decimal('0.00'))
+    )
+  return len(detalles)
+
+
+@reintentar_si_bloqueo
+def finalizar_planilla(planilla_id: int) -> Planilla:
+  """
+  Devuelve a la cuenta origen el monto de las líneas fallidas y cierra la
+  planilla
+
+  No hace nada si quedan líneas pendientes o si ya se finalizó.
+  """
+  with transaction.atomic():
+    planilla = Planilla.objects.select_for_update().get(pk=planilla_id)
+    if (planilla.estado != 'EN_PROCESO' or
+        planilla.detalles.filter(estado='PENDIENTE').exists()):
+      return planilla
+
+    fallidas = planilla.detalles.filter(estado='FALLIDA')
+    devolver = fallidas.aggregate(total=Sum('monto'))['total'] or Decimal('0.00')
+    ahora = timezone.now()
+    if devolver:
+      cuenta = _bloquear_cuentas('planilla', planilla.cuenta_origen_id)[
+        planilla.cuenta_origen_id]
+      saldo_anterior = cuenta.saldo
+      _aplicar_saldo(cuenta, saldo_anterior + devolver, ahora)
+      planilla.movimiento_devolucion = Movimiento.objects.create(
+          cuenta=cuenta,
+          tipo_movimiento='DEVOLUCION_PLANILLA',
+          monto=devolver,
+          saldo_anterior=saldo_anterior,
+          saldo_nuevo=cuenta.saldo,
+          descripcion=(f'Devolución de {fallidas.count()} abono(s) fallido(s) '
+                       f'de la planilla {planilla.pk}'),
+          usuario=planilla.usuario
+      )
+
+    planilla.total_devuelto = devolver
+    planilla.estado = 'COMPLETADA'
+    planilla.fecha_fin = ahora
+    planilla.save(update_fields=['total_devuelto', 'estado', 'fecha_fin',
+                                 'movimiento_devolucion'])
+  return planilla
+
+
+def procesar_planilla(planilla_id: int, tamano: int = None, pausa: float = 0,
+    al_avanzar: Callable[[Planilla], None] = None) -> Planilla:
+  """
+  Debita, abona por bloques y finaliza una planilla
+
+  Cada paso es idempotente: si el proceso se interrumpe, volver a llamar a
+  esta función continúa desde las líneas pendientes.
+
+  Args:
+      planilla_id: Planilla a procesar
+      tamano: Líneas por bloque y transacción (PLANILLA_TAMANO_BLOQUE)
+      pausa: Segundos de espera entre bloques
+      al_avanzar: Función llamada con la planilla tras cada bloque
+  """
+  tamano = tamano or getattr(settings, 'PLANILLA_TAMANO_BLOQUE', 500)
+  debitar_planilla(planilla_id)
+  while abonar_bloque(planilla_id, tamano):
+    if al_avanzar:
+      al_avanzar(Planilla.objects.get(pk=planilla_id))
+    if pausa:
+      time.sleep(pausa)
+  return finalizar_planilla(planilla_id)
@@ -0,0 +1,594 @@
+import functools
+import hashlib
+import json
+import random
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, List
+
+from django.core.exceptions import ValidationError
+from django.db import (
+  IntegrityError, OperationalError, connections, router, transaction,
+)
+from django.utils import timezone
+
+from cuentas.models import Cuenta
+from core import metricas
+from core.models import TipoCambio
+
+from .models import ClaveIdempotencia, Deposito, Movimiento, Retiro, Transferencia
+
+
+# Intentos de una operación cuando la base de datos la aborta por bloqueo
+INTENTOS_BLOQUEO = 4
+
+# Códigos de MySQL: interbloqueo y tiempo de espera de bloqueo agotado
+ERROR_INTERBLOQUEO = 1213
+ERROR_ESPERA_BLOQUEO = 1205
+
+_estadisticas = {'reintentos': 0, 'interbloqueos': 0, 'esperas_agotadas': 0}
+_bloqueo_estadisticas = threading.Lock()
+
+
+def _tipo_bloqueo(error: OperationalError):
+  """Clasifica un OperationalError reintentable o retorna None"""
+  codigo = error.args[0] if error.args else None
+  if codigo == ERROR_INTERBLOQUEO:
+    return 'interbloqueos'
+  if codigo == ERROR_ESPERA_BLOQUEO:
+    return 'esperas_agotadas'
+  if 'database is locked' in str(error) or 'database table is locked' in str(error):
+    # SQLite, usado en desarrollo
+    return 'esperas_agotadas'
+  return None
+
+
+def estadisticas_reintentos() -> Dict:
+  """Interbloqueos, esperas agotadas y reintentos del proceso"""
+  with _bloqueo_estadisticas:
+    return dict(_estadisticas)
+
+
+def reintentar_si_bloqueo(funcion):
+  """
+  Repite la operación si la base de datos la aborta por interbloqueo
+
+  La transacción abortada ya se revirtió completa, así que repetirla es
+  seguro. Solo se reintenta cuando la operación abre la transacción; dentro
+  de un atomic() externo el error se propaga para que lo maneje el llamador.
+  """
+  @functools.wraps(funcion)
+  def envoltura(*args, **kwargs):
+    for intento in range(1, INTENTOS_BLOQUEO + 1):
+      reintentable = not transaction.get_connection().in_atomic_block
+      try:
+        return funcion(*args, **kwargs)
+      except OperationalError as e:
+        tipo = _tipo_bloqueo(e)
+        if tipo is None:
+          raise
+        with _bloqueo_estadisticas:
+          _estadisticas[tipo] += 1
+          if reintentable and intento < INTENTOS_BLOQUEO:
+            _estadisticas['reintentos'] += 1
+        if not reintentable or intento == INTENTOS_BLOQUEO:
+          raise
+        metricas.registrar_reintento(tipo)
+        # Espera aleatoria creciente para que las transacciones en conflicto
+        # no vuelvan a chocar al mismo tiempo
+        time.sleep(random.uniform(0, 0.01 * 2 ** intento))
+  return envoltura
+
+
+def _motivo(error: ValidationError) -> str:
+  """Código del primer error de validación, para las métricas"""
+  for detalle in getattr(error, 'error_list', ()):
+    if detalle.code:
+      return detalle.code
+  return 'validacion'
+
+
+def medir_operacion(tipo: str):
+  """
+  Registra en las métricas el resultado de una operación
+
+  La función decorada retorna un Deposito, Retiro o Transferencia; las
+  transferencias se cuentan en la moneda de la cuenta origen.
+  """
+  def decorador(funcion):
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+      try:
+        operacion = funcion(*args, **kwargs)
+      except ValidationError as e:
+        metricas.registrar_fallo(tipo, _motivo(e))
+        raise
+      except OperationalError as e:
+        metricas.registrar_fallo(tipo, _tipo_bloqueo(e) or 'base_de_datos')
+        raise
+      except Exception:
+        metricas.registrar_fallo(tipo, 'error')
+        raise
+
+      if tipo == 'transferencia':
+        metricas.registrar_operacion(tipo, operacion.cuenta_origen.moneda,
+                                     operacion.monto_origen)
+      else:
+        metricas.registrar_operacion(tipo, operacion.cuenta.moneda,
+                                     operacion.monto)
+      return operacion
+    return envoltura
+  return decorador
+
+
+def _bloquear_cuentas(tipo: str, *cuenta_ids) -> Dict[int, Cuenta]:
+  """
+  Bloquea las cuentas con SELECT ... FOR UPDATE y retorna {pk: cuenta}
+
+  Se bloquean siempre en orden de id para que dos operaciones sobre las
+  mismas cuentas no se esperen mutuamente. La espera se registra en las
+  métricas de la operación `tipo`.
+  """
+  inicio = time.perf_counter()
+  cuentas = {
+    cuenta.pk: cuenta
+    for cuenta in Cuenta.objects.select_for_update().filter(
+        pk__in=cuenta_ids).order_by('pk')
+  }
+  metricas.registrar_espera_bloqueo(tipo, time.perf_counter() - inicio)
+  return cuentas
+
+
+def _validar_activa(cuenta: Cuenta, mensaje: str) -> None:
+  if not cuenta.esta_activa or cuenta.estado == 'CERRADA':
+    raise ValidationError(mensaje, code='cuenta_inactiva')
+
+
+def _aplicar_saldo(cuenta: Cuenta, nuevo_saldo: Decimal, ahora) -> None:
+  """Guarda el nuevo saldo de una cuenta bloqueada con un único UPDATE"""
+  cuenta.saldo = nuevo_saldo
+  cuenta.saldo_disponible = cuenta.get_saldo_disponible()
+  cuenta.fecha_ultimo_movimiento = ahora
+  Cuenta.objects.filter(pk=cuenta.pk).update(
+      saldo_disponible=cuenta.saldo_disponible,
+      saldo=cuenta.saldo,
+      fecha_ultimo_movimiento=ahora,
+  )
+
+
+@medir_operacion('deposito')
+@reintentar_si_bloqueo
+def depositar(cuenta_id: int, monto: Decimal, usuario,
+    clave_autorizacion: str = None, origen_fondos: str = None) -> Deposito:
+  """
+  Registra un depósito y su movimiento
+
+  Args:
+      cuenta_id: Cuenta de destino
+      monto: Monto en la moneda de la cuenta
+      usuario: Usuario que registra la operación
+      clave_autorizacion: Requerida para montos sobre el límite de autorización
+      origen_fondos: Requerido para montos sobre el límite de autorización
+
+  Returns:
+      El Deposito guardado, con su movimiento
+
+  Raises:
+      ValidationError: Si la cuenta no admite el depósito
+  """
+  with transaction.atomic():
+    cuenta = _bloquear_cuentas('deposito', cuenta_id).get(cuenta_id)
+    if cuenta is None:
+      raise ValidationError('La cuenta no existe', code='cuenta_inexistente')
+    _validar_activa(
+        cuenta, 'No se pueden realizar depósitos en cuentas inactivas o cerradas')
+
+    deposito = Deposito(cuenta=cuenta, monto=monto, usuario=usuario,
+                        clave_autorizacion=clave_autorizacion,
+                        origen_fondos=origen_fondos)
+    deposito.clean()
+
+    saldo_anterior = cuenta.saldo
+    _aplicar_saldo(cuenta, saldo_anterior + monto, timezone.now())
+
+    deposito.movimiento = Movimiento.objects.create(
+        cuenta=cuenta,
+        tipo_movimiento='DEPOSITO',
+        monto=monto,
+        saldo_anterior=saldo_anterior,
+        saldo_nuevo=cuenta.saldo,
+        descripcion=f'Depósito en {cuenta.get_tipo_cuenta_display()}',
+        usuario=usuario,
+        requiere_autorizacion=deposito.requiere_autorizacion,
+        clave_autorizacion=clave_autorizacion,
+        origen_fondos=origen_fondos
+    )
+    deposito.save()
+    return deposito
+
+
+@medir_operacion('retiro')
+@reintentar_si_bloqueo
+def retirar(cuenta_id: int, monto: Decimal, usuario) -> Retiro:
+  """
+  Registra un retiro y su movimiento
+
+  El saldo y los embargos se validan con la cuenta ya bloqueada, por lo que
+  dos retiros simultáneos no pueden dejar la cuenta por debajo de lo
+  permitido.
+
+  Raises:
+      ValidationError: Si el saldo no alcanza o la cuenta no admite retiros
+  """
+  with transaction.atomic():
+    cuenta = _bloquear_cuentas('retiro', cuenta_id).get(cuenta_id)
+    if cuenta is None:
+      raise ValidationError('La cuenta no existe', code='cuenta_inexistente')
+    _validar_activa(
+        cuenta, 'No se pueden realizar retiros en cuentas inactivas o cerradas')
+
+    retiro = Retiro(cuenta=cuenta, monto=monto, usuario=usuario)
+    retiro.clean()
+
+    saldo_anterior = cuenta.saldo
+    _aplicar_saldo(cuenta, saldo_anterior - monto, timezone.now())
+
+    retiro.movimiento = Movimiento.objects.create(
+        cuenta=cuenta,
+        tipo_movimiento='RETIRO',
+        monto=monto,
+        saldo_anterior=saldo_anterior,
+        saldo_nuevo=cuenta.saldo,
+        descripcion=f'Retiro de {cuenta.get_tipo_cuenta_display()}',
+        usuario=usuario
+    )
+    retiro.save()
+    return retiro
+
+
+def convertir_monto(monto: Decimal, moneda_origen: str,
+    moneda_destino: str, tipo_cambio: TipoCambio = None):
+  """
+  Convierte un monto entre monedas con el tipo de cambio del día
+
+  Returns:
+      (monto convertido, tipo de cambio aplicado o None si no hay conversión)
+  """
+  if moneda_origen == moneda_destino:
+    return monto, None
+
+  tc = tipo_cambio or TipoCambio.obtener_actual()
+  if not tc:
+    raise ValidationError('No se ha configurado el tipo de cambio del día',
+                          code='sin_tipo_cambio')
+
+  if moneda_origen == 'SOLES':
+    # Soles a Dólares
+    return (monto / tc.venta).quantize(Decimal('0.01')), tc.venta
+  # Dólares a Soles
+  return (monto * tc.compra).quantize(Decimal('0.01')), tc.compra
+
+
+@medir_operacion('transferencia')
+@reintentar_si_bloqueo
+def transferir(cuenta_origen_id: int, cuenta_destino_id: int,
+    monto_origen: Decimal, usuario, descripcion: str = None) -> Transferencia:
+  """
+  Registra una transferencia entre cuentas, con conversión de moneda
+
+  Bloquea ambas cuentas en orden de id, valida el saldo de origen con los
+  valores bloqueados y registra los dos movimientos.
+
+  Returns:
+      La Transferencia guardada
+
+  Raises:
+      ValidationError: Si alguna cuenta no admite la operación
+  """
+  if cuenta_origen_id == cuenta_destino_id:
+    raise ValidationError('La cuenta origen y destino no pueden ser la misma',
+                          code='misma_cuenta')
+
+  with transaction.atomic():
+    cuentas = _bloquear_cuentas('transferencia', cuenta_origen_id,
+                                cuenta_destino_id)
+    cuenta_origen = cuentas.get(cuenta_origen_id)
+    cuenta_destino = cuentas.get(cuenta_destino_id)
+    if cuenta_origen is None or cuenta_destino is None:
+      raise ValidationError('La cuenta no existe', code='cuenta_inexistente')
+
+    _validar_activa(cuenta_origen, 'La cuenta origen no está activa')
+    _validar_activa(cuenta_destino, 'La cuenta destino no está activa')
+
+    transferencia = Transferencia(
+        cuenta_origen=cuenta_origen, cuenta_destino=cuenta_destino,
+        monto_origen=monto_origen, usuario=usuario, descripcion=descripcion)
+    transferencia.clean()
+
+    transferencia.monto_destino, transferencia.tipo_cambio = convertir_monto(
+        monto_origen, cuenta_origen.moneda, cuenta_destino.moneda)
+
+    ahora = timezone.now()
+    saldo_anterior_origen = cuenta_origen.saldo
+    _aplicar_saldo(cuenta_origen, saldo_anterior_origen - monto_origen, ahora)
+    saldo_anterior_destino = cuenta_destino.saldo
+    _aplicar_saldo(cuenta_destino,
+                   saldo_anterior_destino + transferencia.monto_destino, ahora)
+
+    transferencia.movimiento_origen = Movimiento.objects.create(
+        cuenta=cuenta_origen,
+        tipo_movimiento='TRANSFERENCIA_ENVIADA',
+        monto=monto_origen,
+        saldo_anterior=saldo_anterior_origen,
+        saldo_nuevo=cuenta_origen.saldo,
+        descripcion=f'Transferencia a cuenta {cuenta_destino.numero_cuenta}',
+        usuario=usuario,
+        cuenta_destino=cuenta_destino
+    )
+    transferencia.movimiento_destino = Movimiento.objects.create(
+        cuenta=cuenta_destino,
+        tipo_movimiento='TRANSFERENCIA_RECIBIDA',
+        monto=transferencia.monto_destino,
+        saldo_anterior=saldo_anterior_destino,
+        saldo_nuevo=cuenta_destino.saldo,
+        descripcion=f'Transferencia desde cuenta {cuenta_origen.numero_cuenta}',
+        usuario=usuario
+    )
+    transferencia.save()
+    return transferencia
+
+
+class ConflictoIdempotencia(Exception):
+  """La clave de idempotencia ya se usó con datos distintos"""
+
+
+def huella_solicitud(operacion: str, datos: Dict) -> str:
+  """SHA-256 de la operación y sus datos validados"""
+  def normalizar(valor):
+    # 10 y 10.00 son el mismo monto
+    return str(valor.normalize()) if isinstance(valor, Decimal) else str(valor)
+  contenido = json.dumps([operacion, datos], sort_keys=True, default=normalizar)
+  return hashlib.sha256(contenido.encode()).hexdigest()
+
+
+def _respuesta_guardada(usuario, clave: str, huella: str):
+  registro = ClaveIdempotencia.objects.filter(
+      usuario=usuario, clave=clave).only('huella', 'estado_http', 'respuesta').first()
+  if registro is not None and registro.huella != huella:
+    raise ConflictoIdempotencia(
+        'La clave de idempotencia ya se usó con datos distintos')
+  return registro
+
+
+@reintentar_si_bloqueo
+def ejecutar_idempotente(usuario, clave: str, operacion: str, datos: Dict,
+    ejecutar):
+  """
+  Ejecuta una operación una sola vez por usuario y clave de idempotencia
+
+  `ejecutar()` corre en la misma transacción que el registro de la clave y
+  retorna (estado_http, cuerpo) con un cuerpo serializable en JSON. Si la
+  operación falla, la clave no queda registrada. Una solicitud simultánea
+  con la misma clave espera en el índice único hasta que la primera
+  termina y luego recibe la respuesta guardada.
+
+  Returns:
+      (estado_http, cuerpo, repetida)
+
+  Raises:
+      ConflictoIdempotencia: Si la clave se usó con otra operación o datos
+  """
+  huella = huella_solicitud(operacion, datos)
+  registro = _respuesta_guardada(usuario, clave, huella)
+  if registro is not None:
+    return registro.estado_http, registro.respuesta, True
+
+  try:
+    with transaction.atomic():
+      registro = ClaveIdempotencia.objects.create(
+          usuario=usuario, clave=clave, operacion=operacion, huella=huella)
+      estado_http, cuerpo = ejecutar()
+      ClaveIdempotencia.objects.filter(pk=registro.pk).update(
+          estado_http=estado_http, respuesta=cuerpo)
+      return estado_http, cuerpo, False
+  except IntegrityError:
+    # Otra solicitud registró la misma clave mientras esta esperaba
+    registro = _respuesta_guardada(usuario, clave, huella)
+    if registro is None:
+      raise
+    return registro.estado_http, registro.respuesta, True
+
+
+# Modos de un lote de transferencias: todo o nada, o registrar las válidas
+MODOS_LOTE = ('todo', 'parcial')
+
+
+class LoteRechazado(Exception):
+  """Lote todo o nada con transferencias inválidas: no se registró ninguna"""
+
+  def __init__(self, resultados: List[Dict]):
+    super().__init__('El lote tiene transferencias rechazadas; no se registró ninguna')
+    self.resultados = resultados
+
+
+# Filas por INSERT de _crear_en_bloque
+TAMANO_INSERCION = 500
+
+
+def _ids_insertados(conexion, cantidad: int) -> List[int]:
+  """
+  Ids de las filas creadas por el último INSERT de la conexión
+
+  InnoDB reserva de una vez los ids de un INSERT de varias filas con VALUES
+  (una "simple insert"), así que son consecutivos salvo por
+  auto_increment_increment; LAST_INSERT_ID() retorna el primero. En SQLite
+  el INSERT toma la base completa y last_insert_rowid() es el último.
+  """
+  with conexion.cursor() as cursor:
+    if conexion.vendor == 'mysql':
+      cursor.execute('SELECT LAST_INSERT_ID(), @@auto_increment_increment')
+      primero, incremento = cursor.fetchone()
+    else:
+      cursor.execute('SELECT last_insert_rowid()')
+      primero, incremento = cursor.fetchone()[0] - cantidad + 1, 1
+  return [primero + posicion * incremento for posicion in range(cantidad)]
+
+
+def _crear_en_bloque(modelo, objetos: List) -> List:
+  """
+  bulk_create que asigna los ids de las filas creadas en cualquier base
+
+  Donde la base los retorna, bulk_create ya los asigna. MySQL no los
+  retorna: se inserta un bloque por INSERT y los ids se obtienen de ese
+  mismo INSERT con _ids_insertados, sin buscar las filas después.
+  """
+  conexion = connections[router.db_for_write(modelo)]
+  for inicio in range(0, len(objetos), TAMANO_INSERCION):
+    bloque = objetos[inicio:inicio + TAMANO_INSERCION]
+    modelo.objects.bulk_create(bloque)
+    if bloque[0].pk is None:
+      for objeto, pk in zip(bloque, _ids_insertados(conexion, len(bloque))):
+        objeto.pk = pk
+  return objetos
+
+
+def _preparar_transferencia(datos: Dict, cuentas: Dict[int, Cuenta], usuario,
+    tipo_cambio: TipoCambio = None):
+  """
+  Valida una transferencia del lote y la aplica a los saldos en memoria
+
+  Returns:
+      (Transferencia sin guardar, movimiento origen, movimiento destino)
+  """
+  if datos['cuenta_origen'] == datos['cuenta_destino']:
+    raise ValidationError('La cuenta origen y destino no pueden ser la misma',
+                          code='misma_cuenta')
+  cuenta_origen = cuentas.get(datos['cuenta_origen'])
+  cuenta_destino = cuentas.get(datos['cuenta_destino'])
+  if cuenta_origen is None or cuenta_destino is None:
+    raise ValidationError('La cuenta no existe', code='cuenta_inexistente')
+
+  _validar_activa(cuenta_origen, 'La cuenta origen no está activa')
+  _validar_activa(cuenta_destino, 'La cuenta destino no está activa')
+
+  monto_origen = datos['monto_origen']
+  transferencia = Transferencia(
+      cuenta_origen=cuenta_origen, cuenta_destino=cuenta_destino,
+      monto_origen=monto_origen, usuario=usuario,
+      descripcion=datos.get('descripcion') or None)
+  # Valida contra el saldo que dejaron las transferencias anteriores del lote
+  transferencia.clean()
+
+  transferencia.monto_destino, transferencia.tipo_cambio = convertir_monto(
+      monto_origen, cuenta_origen.moneda, cuenta_destino.moneda, tipo_cambio)
+
+  movimiento_origen = Movimiento(
+      cuenta=cuenta_origen,
+      tipo_movimiento='TRANSFERENCIA_ENVIADA',
+      monto=monto_origen,
+      saldo_anterior=cuenta_origen.saldo,
+      saldo_nuevo=cuenta_origen.saldo - monto_origen,
+      descripcion=f'Transferencia a cuenta {cuenta_destino.numero_cuenta}',
+      usuario=usuario,
+      cuenta_destino=cuenta_destino
+  )
+  movimiento_destino = Movimiento(
+      cuenta=cuenta_destino,
+      tipo_movimiento='TRANSFERENCIA_RECIBIDA',
+      monto=transferencia.monto_destino,
+      saldo_anterior=cuenta_destino.saldo,
+      saldo_nuevo=cuenta_destino.saldo + transferencia.monto_destino,
+      descripcion=f'Transferencia desde cuenta {cuenta_origen.numero_cuenta}',
+      usuario=usuario
+  )
+  cuenta_origen.saldo = movimiento_origen.saldo_nuevo
+  cuenta_destino.saldo = movimiento_destino.saldo_nuevo
+  return transferencia, movimiento_origen, movimiento_destino
+
+
+@reintentar_si_bloqueo
+def transferir_lote(transferencias: List[Dict], usuario,
+    modo: str = 'todo') -> List[Dict]:
+  """
+  Registra un lote de transferencias en una sola transacción
+
+  Bloquea una sola vez todas las cuentas del lote en orden de id y valida
+  cada transferencia contra los saldos que dejan las anteriores del mismo
+  lote. Los movimientos y transferencias se crean con bulk_create y cada
+  cuenta se actualiza con un único UPDATE, sin importar en cuántas
+  transferencias participe.
+
+  Args:
+      transferencias: Diccionarios con cuenta_origen y cuenta_destino (ids),
+          monto_origen y descripcion opcional
+      usuario: Usuario que registra las operaciones
+      modo: 'todo' registra el lote solo si todas las transferencias son
+          válidas; 'parcial' registra las válidas y rechaza las demás
+
+  Returns:
+      Un resultado por transferencia, en el orden recibido, con estado
+      REGISTRADA (transferencia, monto_destino, tipo_cambio) o RECHAZADA
+      (codigo, error)
+
+  Raises:
+      LoteRechazado: En modo 'todo', si alguna transferencia no es válida;
+          sus resultados marcan las válidas como NO_APLICADA
+  """
+  if modo not in MODOS_LOTE:
+    raise ValueError(f'Modo de lote inválido: {modo}')
+
+  resultados = []
+  registradas = []
+  movimientos = []
+  modificadas = {}
+
+  with transaction.atomic():
+    cuenta_ids = {datos[campo] for datos in transferencias
+                  for campo in ('cuenta_origen', 'cuenta_destino')}
+    cuentas = _bloquear_cuentas('transferencia_lote', *cuenta_ids)
+    tipo_cambio = None
+    if len({cuenta.moneda for cuenta in cuentas.values()}) > 1:
+      tipo_cambio = TipoCambio.obtener_actual()
+
+    for indice, datos in enumerate(transferencias):
+      try:
+        transferencia, movimiento_origen, movimiento_destino = (
+            _preparar_transferencia(datos, cuentas, usuario, tipo_cambio))
+      except ValidationError as e:
+        resultados.append({'indice': indice, 'estado': 'RECHAZADA',
+                           'codigo': _motivo(e), 'error': ' '.join(e.messages)})
+        metricas.registrar_fallo('transferencia', _motivo(e))
+        continue
+
+      movimientos += [movimiento_origen, movimiento_destino]
+      modificadas[transferencia.cuenta_origen.pk] = transferencia.cuenta_origen
+      modificadas[transferencia.cuenta_destino.pk] = transferencia.cuenta_destino
+      resultado = {'indice': indice, 'estado': 'REGISTRADA'}
+      resultados.append(resultado)
+      registradas.append((resultado, transferencia, movimiento_origen,
+                          movimiento_destino))
+
+    if modo == 'todo' and len(registradas) < len(transferencias):
+      for resultado, *_ in registradas:
+        resultado['estado'] = 'NO_APLICADA'
+      raise LoteRechazado(resultados)
+
+    _crear_en_bloque(Movimiento, movimientos)
+    for _, transferencia, movimiento_origen, movimiento_destino in registradas:
+      transferencia.movimiento_origen = movimiento_origen
+      transferencia.movimiento_destino = movimiento_destino
+    _crear_en_bloque(Transferencia, [t for _, t, *_ in registradas])
+
+    ahora = timezone.now()
+    for cuenta in modificadas.values():
+      _aplicar_saldo(cuenta, cuenta.saldo, ahora)
+
+  for resultado, transferencia, *_ in registradas:
+    resultado.update(transferencia=transferencia.pk,
+                     monto_destino=transferencia.monto_destino,
+                     tipo_cambio=transferencia.tipo_cambio)
+    metricas.registrar_operacion('transferencia',
+                                 transferencia.cuenta_origen.moneda,
+                                 transferencia.monto_origen)
+  return resultados
@@ -0,0 +1,28 @@
+from core.trabajos import tarea
+
+from .models import ClaveIdempotencia
+from .planillas import procesar_planilla as _procesar_planilla
+
+
+@tarea('purgar_claves_idempotencia')
+def purgar_claves_idempotencia(horas: int = None):
+  """Elimina las claves de idempotencia vencidas"""
+  return {'eliminadas': ClaveIdempotencia.purgar_vencidas(horas)}
+
+
+@tarea('procesar_planilla', max_intentos=10)
+def procesar_planilla(planilla_id: int, tamano: int = None):
+  """
+  Debita y abona una planilla registrada
+
+  Cada paso es idempotente, así que un reintento continúa desde las líneas
+  pendientes sin abonar dos veces.
+  """
+  planilla = _procesar_planilla(planilla_id, tamano=tamano)
+  return {
+    'estado': planilla.estado,
+    'lineas_abonadas': planilla.lineas_abonadas,
+    'lineas_fallidas': planilla.lineas_fallidas,
+    'total_abonado': planilla.total_abonado,
+    'total_devuelto': planilla.total_devuelto,
+  }
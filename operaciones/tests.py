@@ -1,3 +1,281 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import TipoCambio
+from core.pruebas import DatosBancariosMixin
+from cuentas.models import Cuenta
+
+from . import planillas, services
+from .models import Deposito, Movimiento, Planilla, Transferencia
+
+
+class DatosOperacionesMixin(DatosBancariosMixin):
+  """Datos bancarios de prueba con el tipo de cambio del día"""
+
+  def setUp(self):
+    super().setUp()
+    TipoCambio.objects.create(fecha=timezone.now().date(),
+                              compra=Decimal('3.70'), venta=Decimal('3.80'),
+                              usuario_registro=self.usuario)
+
+
+class OperacionesTests(DatosOperacionesMixin, TestCase):
+
+  def test_deposito_actualiza_saldo_y_registra_movimiento(self):
+    cuenta = self.crear_cuenta()
+
+    deposito = services.depositar(cuenta.pk, Decimal('50.00'), self.usuario)
+
+    cuenta.refresh_from_db()
+    self.assertEqual(cuenta.saldo, Decimal('150.00'))
+    self.assertEqual(cuenta.saldo_disponible, Decimal('150.00'))
+    self.assertEqual(deposito.movimiento.saldo_anterior, Decimal('100.00'))
+    self.assertEqual(deposito.movimiento.saldo_nuevo, Decimal('150.00'))
+
+  def test_retiro_sin_saldo_no_modifica_la_cuenta(self):
+    cuenta = self.crear_cuenta()
+
+    with self.assertRaises(ValidationError):
+      services.retirar(cuenta.pk, Decimal('100.01'), self.usuario)
+
+    cuenta.refresh_from_db()
+    self.assertEqual(cuenta.saldo, Decimal('100.00'))
+    self.assertFalse(Movimiento.objects.filter(cuenta=cuenta).exists())
+
+  def test_transferencia_convierte_con_el_tipo_de_cambio_del_dia(self):
+    origen = self.crear_cuenta('380.00')
+    destino = self.crear_cuenta('0.00', moneda='DOLARES')
+
+    transferencia = services.transferir(origen.pk, destino.pk,
+                                        Decimal('38.00'), self.usuario)
+
+    origen.refresh_from_db()
+    destino.refresh_from_db()
+    self.assertEqual(transferencia.monto_destino, Decimal('10.00'))
+    self.assertEqual(transferencia.tipo_cambio, Decimal('3.80'))
+    self.assertEqual(origen.saldo, Decimal('342.00'))
+    self.assertEqual(destino.saldo, Decimal('10.00'))
+    self.assertEqual(transferencia.movimiento_origen.tipo_movimiento,
+                     'TRANSFERENCIA_ENVIADA')
+    self.assertEqual(transferencia.movimiento_destino.monto, Decimal('10.00'))
+
+
+class PlanillaTests(DatosOperacionesMixin, TestCase):
+
+  def crear(self, lineas):
+    origen = self.crear_cuenta('1000.00')
+    filas = [{'fila': i + 2, 'cuenta': numero, 'monto': monto, 'nombre': ''}
+             for i, (numero, monto) in enumerate(lineas)]
+    return origen, planillas.crear_planilla(filas, origen, self.usuario,
+                                            'Planilla de prueba')
+
+  def test_montos_invalidos_no_entran_al_total(self):
+    empleado = self.crear_cuenta('0.00')
+    _, planilla = self.crear([(empleado.numero_cuenta, '100.00'),
+                              (empleado.numero_cuenta, 'NaN'),
+                              (empleado.numero_cuenta, '50.005')])
+
+    self.assertEqual(planilla.total, Decimal('100.00'))
+    self.assertEqual(planilla.lineas_invalidas, 2)
+
+  def test_reanudar_tras_un_bloque_fallido_no_abona_dos_veces(self):
+    empleados = [self.crear_cuenta('0.00') for _ in range(3)]
+    origen, planilla = self.crear(
+        [(cuenta.numero_cuenta, '100.00') for cuenta in empleados])
+
+    crear_en_bloque = planillas._crear_en_bloque
+    llamadas = []
+
+    def falla_en_el_segundo_bloque(*args, **kwargs):
+      llamadas.append(1)
+      if len(llamadas) == 2:
+        raise RuntimeError('conexión perdida')
+      return crear_en_bloque(*args, **kwargs)
+
+    with mock.patch.object(planillas, '_crear_en_bloque',
+                           falla_en_el_segundo_bloque):
+      with self.assertRaises(RuntimeError):
+        planillas.procesar_planilla(planilla.pk, tamano=2)
+
+    planilla.refresh_from_db()
+    self.assertEqual(planilla.estado, 'EN_PROCESO')
+    self.assertEqual(planilla.lineas_abonadas, 2)
+
+    planilla = planillas.procesar_planilla(planilla.pk, tamano=2)
+
+    self.assertEqual(planilla.estado, 'COMPLETADA')
+    self.assertEqual(planilla.lineas_abonadas, 3)
+    self.assertEqual(planilla.total_abonado, Decimal('300.00'))
+    for cuenta in empleados:
+      cuenta.refresh_from_db()
+      self.assertEqual(cuenta.saldo, Decimal('100.00'))
+    origen.refresh_from_db()
+    self.assertEqual(origen.saldo, Decimal('700.00'))
+    self.assertEqual(Movimiento.objects.filter(
+        tipo_movimiento='PAGO_PLANILLA').count(), 1)
+
+  def test_lineas_fallidas_se_devuelven_a_la_cuenta_origen(self):
+    empleado = self.crear_cuenta('0.00')
+    cerrada = self.crear_cuenta('0.00')
+    origen, planilla = self.crear([(empleado.numero_cuenta, '100.00'),
+                                   (cerrada.numero_cuenta, '40.00')])
+    cerrada.cerrar_cuenta()
+
+    planilla = planillas.procesar_planilla(planilla.pk)
+
+    self.assertEqual(planilla.lineas_fallidas, 1)
+    self.assertEqual(planilla.total_devuelto, Decimal('40.00'))
+    origen.refresh_from_db()
+    self.assertEqual(origen.saldo, Decimal('900.00'))
+    self.assertEqual(Planilla.objects.get(pk=planilla.pk).estado, 'COMPLETADA')
+
+
+class APITests(DatosOperacionesMixin, TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.client.force_login(self.usuario)
+    self.cuenta = self.crear_cuenta()
+
+  def test_deposito_repetido_con_la_misma_clave_se_registra_una_vez(self):
+    url = reverse('operaciones:api_deposito')
+    cuerpo = {'cuenta': self.cuenta.pk, 'monto': '25.00'}
+
+    primera = self.client.post(url, cuerpo, content_type='application/json',
+                               headers={'Idempotency-Key': 'dep-1'})
+    repetida = self.client.post(url, cuerpo, content_type='application/json',
+                                headers={'Idempotency-Key': 'dep-1'})
+
+    self.assertEqual(primera.status_code, 201)
+    self.assertEqual(repetida.status_code, 201)
+    self.assertEqual(repetida['Idempotent-Replayed'], 'true')
+    self.assertEqual(repetida.json(), primera.json())
+    self.assertEqual(Deposito.objects.filter(cuenta=self.cuenta).count(), 1)
+    self.cuenta.refresh_from_db()
+    self.assertEqual(self.cuenta.saldo, Decimal('125.00'))
+
+  def test_clave_reutilizada_con_otros_datos_es_rechazada(self):
+    url = reverse('operaciones:api_deposito')
+    self.client.post(url, {'cuenta': self.cuenta.pk, 'monto': '25.00'},
+                     content_type='application/json',
+                     headers={'Idempotency-Key': 'dep-2'})
+
+    respuesta = self.client.post(url, {'cuenta': self.cuenta.pk, 'monto': '30.00'},
+                                 content_type='application/json',
+                                 headers={'Idempotency-Key': 'dep-2'})
+
+    self.assertEqual(respuesta.status_code, 422)
+    self.assertEqual(Deposito.objects.filter(cuenta=self.cuenta).count(), 1)
+
+  def test_movimientos_se_paginan_por_id_sin_repetir_ni_saltar(self):
+    for _ in range(5):
+      services.depositar(self.cuenta.pk, Decimal('1.00'), self.usuario)
+    url = reverse('operaciones:api_movimientos', args=[self.cuenta.pk])
+
+    vistos = []
+    parametros = {'limite': 2}
+    while True:
+      pagina = self.client.get(url, parametros).json()
+      vistos += [movimiento['id'] for movimiento in pagina['movimientos']]
+      if pagina['siguiente'] is None:
+        break
+      parametros['antes_de'] = pagina['siguiente']
+
+    esperados = list(Movimiento.objects.filter(cuenta=self.cuenta)
+                     .order_by('-pk').values_list('pk', flat=True))
+    self.assertEqual(vistos, esperados)
+    self.assertEqual(len(vistos), 5)
+
+
+class LoteTransferenciasTests(DatosOperacionesMixin, TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.a, self.b, self.c = (self.crear_cuenta('100.00') for _ in range(3))
+
+  def lote(self, *transferencias):
+    return [{'cuenta_origen': origen.pk, 'cuenta_destino': destino.pk,
+             'monto_origen': Decimal(monto)}
+            for origen, destino, monto in transferencias]
+
+  def saldos(self):
+    return [Cuenta.objects.get(pk=cuenta.pk).saldo
+            for cuenta in (self.a, self.b, self.c)]
+
+  def test_todo_o_nada_no_registra_nada_si_una_transferencia_falla(self):
+    with self.assertRaises(services.LoteRechazado) as rechazo:
+      services.transferir_lote(self.lote(
+          (self.a, self.b, '60.00'), (self.b, self.c, '150.00'),
+          (self.a, self.c, '60.00')), self.usuario)
+
+    self.assertEqual([r['estado'] for r in rechazo.exception.resultados],
+                     ['NO_APLICADA', 'NO_APLICADA', 'RECHAZADA'])
+    self.assertEqual(self.saldos(), [Decimal('100.00')] * 3)
+    self.assertFalse(Movimiento.objects.exists())
+
+  def test_parcial_valida_contra_los_saldos_que_deja_el_lote(self):
+    resultados = services.transferir_lote(self.lote(
+        (self.a, self.b, '60.00'), (self.b, self.c, '150.00'),
+        (self.a, self.c, '60.00')), self.usuario, modo='parcial')
+
+    self.assertEqual([r['estado'] for r in resultados],
+                     ['REGISTRADA', 'REGISTRADA', 'RECHAZADA'])
+    self.assertEqual(self.saldos(), [Decimal('40.00'), Decimal('10.00'),
+                                     Decimal('250.00')])
+
+  def test_si_falla_la_escritura_de_una_pata_se_revierte_el_lote(self):
+    with mock.patch.object(Transferencia.objects, 'bulk_create',
+                           side_effect=DatabaseError('conexión perdida')), \
+        self.assertRaises(DatabaseError):
+      services.transferir_lote(self.lote((self.a, self.b, '10.00')),
+                               self.usuario)
+
+    self.assertEqual(self.saldos(), [Decimal('100.00')] * 3)
+    self.assertFalse(Movimiento.objects.exists())
+
+  def test_bloquea_todas_las_cuentas_del_lote_una_vez_en_orden_de_id(self):
+    bloquear = mock.patch.object(services, '_bloquear_cuentas',
+                                 wraps=services._bloquear_cuentas)
+    with bloquear as bloqueo, CaptureQueriesContext(connection) as consultas:
+      services.transferir_lote(self.lote(
+          (self.c, self.a, '10.00'), (self.b, self.a, '10.00')), self.usuario)
+
+    self.assertEqual(bloqueo.call_count, 1)
+    self.assertEqual(set(bloqueo.call_args.args[1:]),
+                     {self.a.pk, self.b.pk, self.c.pk})
+    lecturas = [c['sql'] for c in consultas.captured_queries
+                if c['sql'].startswith('SELECT') and 'FROM "cuentas"' in c['sql']]
+    self.assertEqual(len(lecturas), 1)
+    self.assertTrue(lecturas[0].endswith('ORDER BY "cuentas"."id" ASC'))
+
+  def test_crear_en_bloque_toma_los_ids_de_cada_insert(self):
+    # Simula una base que no retorna los ids del INSERT (MySQL)
+    bulk_create = Movimiento.objects.bulk_create
+
+    def sin_ids(objetos):
+      bulk_create(objetos)
+      for objeto in objetos:
+        objeto.pk = None
+
+    # Con filas previas de otra cuenta los ids no coinciden con las posiciones
+    services.depositar(self.c.pk, Decimal('1.00'), self.usuario)
+    movimientos = [
+      Movimiento(cuenta=self.a, tipo_movimiento='DEPOSITO', monto=Decimal('1.00'),
+                 saldo_anterior=Decimal('0.00'), saldo_nuevo=Decimal('1.00'),
+                 descripcion=f'movimiento {i}', usuario=self.usuario)
+      for i in range(5)
+    ]
+    with mock.patch.object(services, 'TAMANO_INSERCION', 2), \
+        mock.patch.object(Movimiento.objects, 'bulk_create', side_effect=sin_ids):
+      services._crear_en_bloque(Movimiento, movimientos)
 
-# Create your tests here.
+    for movimiento in movimientos:
+      self.assertEqual(Movimiento.objects.get(pk=movimiento.pk).descripcion,
+                       movimiento.descripcion)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'operaciones'
 
@@ -9,4 +9,16 @@ urlpatterns = [
     path('transferencia/', views.realizar_transferencia, name='realizar_transferencia'),
     path('plazo/<int:cuenta_id>/cancelar/', views.cancelar_plazo_fijo, name='cancelar_plazo_fijo'),
     path('plazo/<int:cuenta_id>/renovar/', views.renovar_plazo_fijo, name='renovar_plazo_fijo'),
+
+    # API JSON
+    path('api/csrf/', api.csrf, name='api_csrf'),
+    path('api/deposito/', api.deposito, name='api_deposito'),
+    path('api/retiro/', api.retiro, name='api_retiro'),
+    path('api/transferencia/', api.transferencia, name='api_transferencia'),
+    path('api/transferencias/lote/', api.transferencia_lote,
+         name='api_transferencia_lote'),
+    path('api/planillas/<int:planilla_id>/', api.planilla, name='api_planilla'),
+    path('api/cuentas/<int:cuenta_id>/saldo/', api.saldo, name='api_saldo'),
+    path('api/cuentas/<int:cuenta_id>/movimientos/', api.movimientos,
+         name='api_movimientos'),
 ]
\ No newline at end of file
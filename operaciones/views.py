@@ -9,12 +9,11 @@ from django.core.exceptions import ValidationError
 from decimal import Decimal
 from django.utils import timezone
 
-from .models import Deposito, Retiro, Transferencia, OperacionPlazoFijo, \
-  Movimiento
+from .models import OperacionPlazoFijo, Movimiento
+from . import services
 from .forms import DepositoForm, RetiroForm, TransferenciaForm, \
   CancelarPlazoForm, RenovarPlazoForm
 from cuentas.models import Cuenta
-from core.models import TipoCambio
 
 
 @login_required
@@ -24,49 +23,20 @@ def realizar_deposito(request):
     form = DepositoForm(request.POST)
     if form.is_valid():
       try:
-        with transaction.atomic():
-          deposito = form.save(commit=False)
-          deposito.usuario = request.user
-
-          cuenta = deposito.cuenta
-
-          # Verificar si la cuenta está activa
-          if not cuenta.esta_activa or cuenta.estado == 'CERRADA':
-            raise ValidationError(
-              'No se pueden realizar depósitos en cuentas inactivas o cerradas')
-
-          # Guardar depósito
-          deposito.save()
-
-          # Actualizar saldo de la cuenta
-          saldo_anterior = cuenta.saldo
-          cuenta.saldo += deposito.monto
-          cuenta.actualizar_ultimo_movimiento()
-          cuenta.save()
-
-          # Registrar movimiento
-          movimiento = Movimiento.objects.create(
-              cuenta=cuenta,
-              tipo_movimiento='DEPOSITO',
-              monto=deposito.monto,
-              saldo_anterior=saldo_anterior,
-              saldo_nuevo=cuenta.saldo,
-              descripcion=f'Depósito en {cuenta.get_tipo_cuenta_display()}',
-              usuario=request.user,
-              requiere_autorizacion=deposito.requiere_autorizacion,
-              clave_autorizacion=deposito.clave_autorizacion,
-              origen_fondos=deposito.origen_fondos
-          )
-
-          deposito.movimiento = movimiento
-          deposito.save()
-
-          messages.success(
-              request,
-              f'Depósito de {deposito.monto} {cuenta.get_moneda_display()} realizado exitosamente. '
-              f'Nuevo saldo: {cuenta.saldo}'
-          )
-          return redirect('cuentas:detalle_cuenta', cuenta_id=cuenta.id)
+        datos = form.cleaned_data
+        deposito = services.depositar(
+            datos['cuenta'].pk, datos['monto'], request.user,
+            clave_autorizacion=datos.get('clave_autorizacion'),
+            origen_fondos=datos.get('origen_fondos')
+        )
+        cuenta = deposito.cuenta
+
+        messages.success(
+            request,
+            f'Depósito de {deposito.monto} {cuenta.get_moneda_display()} realizado exitosamente. '
+            f'Nuevo saldo: {cuenta.saldo}'
+        )
+        return redirect('cuentas:detalle_cuenta', cuenta_id=cuenta.id)
 
       except ValidationError as e:
         messages.error(request, str(e))
@@ -92,50 +62,17 @@ def realizar_retiro(request):
     form = RetiroForm(request.POST)
     if form.is_valid():
       try:
-        with transaction.atomic():
-          retiro = form.save(commit=False)
-          retiro.usuario = request.user
-
-          cuenta = retiro.cuenta
-
-          # Verificar si la cuenta está activa
-          if not cuenta.esta_activa or cuenta.estado == 'CERRADA':
-            raise ValidationError(
-              'No se pueden realizar retiros en cuentas inactivas o cerradas')
-
-          # Verificar si puede retirar
-          if not cuenta.puede_retirar(retiro.monto):
-            raise ValidationError('Saldo insuficiente o cuenta embargada')
-
-          # Guardar retiro
-          retiro.save()
-
-          # Actualizar saldo de la cuenta
-          saldo_anterior = cuenta.saldo
-          cuenta.saldo -= retiro.monto
-          cuenta.actualizar_ultimo_movimiento()
-          cuenta.save()
-
-          # Registrar movimiento
-          movimiento = Movimiento.objects.create(
-              cuenta=cuenta,
-              tipo_movimiento='RETIRO',
-              monto=retiro.monto,
-              saldo_anterior=saldo_anterior,
-              saldo_nuevo=cuenta.saldo,
-              descripcion=f'Retiro de {cuenta.get_tipo_cuenta_display()}',
-              usuario=request.user
-          )
-
-          retiro.movimiento = movimiento
-          retiro.save()
-
-          messages.success(
-              request,
-              f'Retiro de {retiro.monto} {cuenta.get_moneda_display()} realizado exitosamente. '
-              f'Nuevo saldo: {cuenta.saldo}'
-          )
-          return redirect('cuentas:detalle_cuenta', cuenta_id=cuenta.id)
+        datos = form.cleaned_data
+        retiro = services.retirar(datos['cuenta'].pk, datos['monto'],
+                                  request.user)
+        cuenta = retiro.cuenta
+
+        messages.success(
+            request,
+            f'Retiro de {retiro.monto} {cuenta.get_moneda_display()} realizado exitosamente. '
+            f'Nuevo saldo: {cuenta.saldo}'
+        )
+        return redirect('cuentas:detalle_cuenta', cuenta_id=cuenta.id)
 
       except ValidationError as e:
         messages.error(request, str(e))
@@ -161,95 +98,21 @@ def realizar_transferencia(request):
     form = TransferenciaForm(request.POST)
     if form.is_valid():
       try:
-        with transaction.atomic():
-          transferencia = form.save(commit=False)
-          transferencia.usuario = request.user
-
-          cuenta_origen = transferencia.cuenta_origen
-          cuenta_destino = transferencia.cuenta_destino
-
-          # Verificar que ambas cuentas estén activas
-          if not cuenta_origen.esta_activa or cuenta_origen.estado == 'CERRADA':
-            raise ValidationError('La cuenta origen no está activa')
-
-          if not cuenta_destino.esta_activa or cuenta_destino.estado == 'CERRADA':
-            raise ValidationError('La cuenta destino no está activa')
-
-          # Verificar si puede retirar de origen
-          if not cuenta_origen.puede_retirar(transferencia.monto_origen):
-            raise ValidationError(
-              'Saldo insuficiente en cuenta origen o cuenta embargada')
-
-          # Calcular monto destino según moneda
-          if cuenta_origen.moneda == cuenta_destino.moneda:
-            transferencia.monto_destino = transferencia.monto_origen
-          else:
-            # Conversión de moneda
-            tc = TipoCambio.obtener_actual()
-            if not tc:
-              raise ValidationError(
-                'No se ha configurado el tipo de cambio del día')
-
-            transferencia.tipo_cambio = tc.venta if cuenta_origen.moneda == 'SOLES' else tc.compra
-
-            if cuenta_origen.moneda == 'SOLES':
-              # Soles a Dólares
-              transferencia.monto_destino = transferencia.monto_origen / tc.venta
-            else:
-              # Dólares a Soles
-              transferencia.monto_destino = transferencia.monto_origen * tc.compra
-
-            transferencia.monto_destino = transferencia.monto_destino.quantize(
-              Decimal('0.01'))
-
-          # Guardar transferencia
-          transferencia.save()
-
-          # Actualizar cuenta origen
-          saldo_anterior_origen = cuenta_origen.saldo
-          cuenta_origen.saldo -= transferencia.monto_origen
-          cuenta_origen.actualizar_ultimo_movimiento()
-          cuenta_origen.save()
-
-          # Actualizar cuenta destino
-          saldo_anterior_destino = cuenta_destino.saldo
-          cuenta_destino.saldo += transferencia.monto_destino
-          cuenta_destino.actualizar_ultimo_movimiento()
-          cuenta_destino.save()
-
-          # Registrar movimiento en cuenta origen
-          movimiento_origen = Movimiento.objects.create(
-              cuenta=cuenta_origen,
-              tipo_movimiento='TRANSFERENCIA_ENVIADA',
-              monto=transferencia.monto_origen,
-              saldo_anterior=saldo_anterior_origen,
-              saldo_nuevo=cuenta_origen.saldo,
-              descripcion=f'Transferencia a cuenta {cuenta_destino.numero_cuenta}',
-              usuario=request.user,
-              cuenta_destino=cuenta_destino
-          )
-
-          # Registrar movimiento en cuenta destino
-          movimiento_destino = Movimiento.objects.create(
-              cuenta=cuenta_destino,
-              tipo_movimiento='TRANSFERENCIA_RECIBIDA',
-              monto=transferencia.monto_destino,
-              saldo_anterior=saldo_anterior_destino,
-              saldo_nuevo=cuenta_destino.saldo,
-              descripcion=f'Transferencia desde cuenta {cuenta_origen.numero_cuenta}',
-              usuario=request.user
-          )
-
-          transferencia.movimiento_origen = movimiento_origen
-          transferencia.movimiento_destino = movimiento_destino
-          transferencia.save()
-
-          mensaje = f'Transferencia realizada exitosamente. '
-          mensaje += f'Origen: {transferencia.monto_origen} {cuenta_origen.get_moneda_display()}, '
-          mensaje += f'Destino: {transferencia.monto_destino} {cuenta_destino.get_moneda_display()}'
-
-          messages.success(request, mensaje)
-          return redirect('cuentas:detalle_cuenta', cuenta_id=cuenta_origen.id)
+        datos = form.cleaned_data
+        transferencia = services.transferir(
+            datos['cuenta_origen'].pk, datos['cuenta_destino'].pk,
+            datos['monto_origen'], request.user,
+            descripcion=datos.get('descripcion')
+        )
+        cuenta_origen = transferencia.cuenta_origen
+        cuenta_destino = transferencia.cuenta_destino
+
+        mensaje = f'Transferencia realizada exitosamente. '
+        mensaje += f'Origen: {transferencia.monto_origen} {cuenta_origen.get_moneda_display()}, '
+        mensaje += f'Destino: {transferencia.monto_destino} {cuenta_destino.get_moneda_display()}'
+
+        messages.success(request, mensaje)
+        return redirect('cuentas:detalle_cuenta', cuenta_id=cuenta_origen.id)
 
       except ValidationError as e:
         messages.error(request, str(e))